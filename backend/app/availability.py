@@ -0,0 +1,349 @@
+"""
+Расчёт свободного времени мастера.
+
+Время дня — целое число минут от полуночи. Занятые интервалы (записи)
+сортируются и сливаются один раз, после чего все допустимые начала
+записи находятся за один проход по свободным промежуткам графика, без
+повторного разбора строк для каждого кандидата.
+
+Кандидаты можно ранжировать по плотности дня (ranked_starts): слот, после
+которого остаются «обрывки» короче самой короткой услуги, хуже слота,
+вплотную примыкающего к записи или краю рабочего дня.
+
+Начала слотов выравниваются по сетке с шагом step от начала рабочего дня.
+buffer — обязательный перерыв между записями: слот не может начинаться
+раньше чем через buffer минут после занятого интервала и должен
+заканчиваться не позже чем за buffer минут до следующего.
+"""
+import heapq
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+Interval = Tuple[int, int]
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value: Any) -> int:
+    """«09:30», «09:30:00» или time -> минуты от полуночи"""
+    if hasattr(value, "hour"):
+        return value.hour * 60 + value.minute
+    hours, minutes = str(value).split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minutes(minutes: int) -> str:
+    """Минуты от полуночи -> «HH:MM»"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def merge_intervals(intervals: Iterable[Interval], buffer: int = 0) -> List[Interval]:
+    """Сортировка и слияние занятых интервалов; каждый расширяется на buffer в обе стороны"""
+    merged: List[Interval] = []
+    for start, end in sorted((start - buffer, end + buffer) for start, end in intervals if end > start):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_intervals(work_start: int, work_end: int, busy: Sequence[Interval]) -> List[Interval]:
+    """Свободные промежутки рабочего дня; busy должен быть результатом merge_intervals"""
+    free: List[Interval] = []
+    cursor = work_start
+    for start, end in busy:
+        if end <= cursor:
+            continue
+        if start >= work_end:
+            break
+        if start > cursor:
+            free.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < work_end:
+        free.append((cursor, work_end))
+    return free
+
+
+def iter_starts(
+    work_start: int,
+    work_end: int,
+    busy: Iterable[Interval],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+    not_before: int = 0,
+) -> Iterator[int]:
+    """Допустимые начала записи по возрастанию; вычисляются лениво, по мере чтения"""
+    if step <= 0:
+        raise ValueError(f"Invalid slot step: {step}")
+    if duration <= 0 or work_end <= work_start:
+        return
+
+    for free_start, free_end in free_intervals(work_start, work_end, merge_intervals(busy, buffer)):
+        # Первая точка сетки внутри свободного промежутка (и не раньше not_before)
+        offset = max(free_start, not_before) - work_start
+        current = work_start + -(-offset // step) * step
+        last = free_end - duration
+        while current <= last:
+            yield current
+            current += step
+
+
+def available_starts(
+    work_start: int,
+    work_end: int,
+    busy: Iterable[Interval],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+) -> List[int]:
+    """Все допустимые начала записи длительностью duration (в минутах от полуночи)"""
+    return list(iter_starts(work_start, work_end, busy, duration, step, buffer))
+
+
+def ranked_starts(
+    work_start: int,
+    work_end: int,
+    busy: Iterable[Interval],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+    min_gap: Optional[int] = None,
+) -> List[Tuple[int, int, int]]:
+    """
+    Допустимые начала с оценкой плотности: [(начало, простой, примыканий)]
+    по возрастанию времени.
+
+    простой — минуты свободного промежутка, которые останутся слева и справа
+    от записи кусками короче min_gap (их уже нельзя продать; по умолчанию
+    min_gap = duration); примыканий — сколько краёв записи (0–2) совпадает
+    с занятым временем или границей дня. Оценка каждого кандидата — O(1),
+    весь день — один проход.
+    """
+    min_gap = duration if min_gap is None else min_gap
+    ranked: List[Tuple[int, int, int]] = []
+    if step <= 0:
+        raise ValueError(f"Invalid slot step: {step}")
+    if duration <= 0 or work_end <= work_start:
+        return ranked
+    for free_start, free_end in free_intervals(work_start, work_end, merge_intervals(busy, buffer)):
+        offset = free_start - work_start
+        current = work_start + -(-offset // step) * step
+        last = free_end - duration
+        while current <= last:
+            left = current - free_start
+            right = last - current
+            idle = (left if left < min_gap else 0) + (right if right < min_gap else 0)
+            ranked.append((current, idle, (left == 0) + (right == 0)))
+            current += step
+    return ranked
+
+
+def rank_key(idle: int, adjacent: int, start: Any = 0) -> Tuple[int, int, Any]:
+    """Ключ сортировки кандидатов: меньше простоя, больше примыканий, раньше"""
+    return idle, -adjacent, start
+
+
+def day_ranked_slots(
+    schedule: Optional[Mapping[str, Any]],
+    busy: Iterable[Interval],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+    min_gap: Optional[int] = None,
+) -> List[Tuple[str, int, int]]:
+    """ranked_starts по строке графика: [(«HH:MM», простой, примыканий)]"""
+    if not schedule or not schedule.get("start_time") or not schedule.get("end_time"):
+        return []
+    ranked = ranked_starts(
+        to_minutes(schedule["start_time"]),
+        to_minutes(schedule["end_time"]),
+        busy,
+        duration,
+        step,
+        buffer,
+        min_gap,
+    )
+    return [(format_minutes(start), idle, adjacent) for start, idle, adjacent in ranked]
+
+
+def has_slot(
+    work_start: int,
+    work_end: int,
+    busy: Iterable[Interval],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+    not_before: int = 0,
+) -> bool:
+    """Есть ли хотя бы одно допустимое начало записи (проход останавливается на первом)"""
+    if step <= 0:
+        raise ValueError(f"Invalid slot step: {step}")
+    if duration <= 0 or work_end <= work_start:
+        return False
+    for free_start, free_end in free_intervals(work_start, work_end, merge_intervals(busy, buffer)):
+        offset = max(free_start, not_before) - work_start
+        if work_start + -(-offset // step) * step + duration <= free_end:
+            return True
+    return False
+
+
+def busy_from_rows(rows: Iterable[Mapping[str, Any]], start_key: str = "start_time", end_key: str = "end_time") -> List[Interval]:
+    """Строки записей (start_time/end_time) -> интервалы в минутах; записи без времени пропускаются"""
+    busy: List[Interval] = []
+    for row in rows:
+        start, end = row.get(start_key), row.get(end_key)
+        if start and end:
+            busy.append((to_minutes(start), to_minutes(end)))
+    return busy
+
+
+def day_slots(
+    schedule: Optional[Mapping[str, Any]],
+    busy: Iterable[Interval],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+) -> List[str]:
+    """Свободные начала записи на день по строке графика (start_time/end_time) в виде «HH:MM»"""
+    if not schedule or not schedule.get("start_time") or not schedule.get("end_time"):
+        return []
+    starts = available_starts(
+        to_minutes(schedule["start_time"]),
+        to_minutes(schedule["end_time"]),
+        busy,
+        duration,
+        step,
+        buffer,
+    )
+    return [format_minutes(start) for start in starts]
+
+
+def masters_day_slots(
+    schedules: Mapping[int, Mapping[str, Any]],
+    bookings: Mapping[int, Iterable[Mapping[str, Any]]],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+) -> Dict[int, List[str]]:
+    """Свободные начала записи нескольких мастеров: {master_id: [«HH:MM»]} (только работающие)"""
+    return {
+        master_id: day_slots(schedule, busy_from_rows(bookings.get(master_id, ())), duration, step, buffer)
+        for master_id, schedule in schedules.items()
+    }
+
+
+def slot_map(slots_by_master: Mapping[int, Sequence[str]]) -> Dict[str, List[int]]:
+    """{master_id: [слоты]} -> {слот: [master_id]} по возрастанию времени"""
+    result: Dict[str, List[int]] = {}
+    for master_id, slots in slots_by_master.items():
+        for slot in slots:
+            result.setdefault(slot, []).append(master_id)
+    return dict(sorted(result.items()))
+
+
+def resolve_schedule(
+    week: Mapping[int, Mapping[str, Any]],
+    dated: Optional[Mapping[str, Mapping[str, Any]]],
+    day: date,
+) -> Optional[Mapping[str, Any]]:
+    """График на день: строка на дату (если есть) перекрывает недельную; без времени — выходной"""
+    if dated:
+        schedule = dated.get(day.isoformat())
+        if schedule is not None:
+            return schedule
+    return week.get(day.weekday())
+
+
+def available_days(
+    schedules: Mapping[int, Mapping[int, Mapping[str, Any]]],
+    bookings: Mapping[int, Mapping[str, Iterable[Mapping[str, Any]]]],
+    days: Iterable[date],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+    dated: Optional[Mapping[int, Mapping[str, Mapping[str, Any]]]] = None,
+    not_before: Optional[datetime] = None,
+) -> List[date]:
+    """
+    Дни, в которые хотя бы у одного мастера есть свободное время.
+
+    schedules — {master_id: {day_of_week: строка графика}},
+    bookings — {master_id: {«YYYY-MM-DD»: [записи]}}, dated — графики
+    на даты {master_id: {«YYYY-MM-DD»: строка}}, перекрывающие недельные;
+    день проверяется до первого мастера со свободным слотом. Слоты раньше
+    not_before (например, текущего времени) не учитываются.
+    """
+    dated = dated or {}
+    result: List[date] = []
+    for day in days:
+        if not_before is not None and day < not_before.date():
+            continue
+        earliest = to_minutes(not_before) if not_before is not None and day == not_before.date() else 0
+        day_key = day.isoformat()
+        for master_id, week in schedules.items():
+            schedule = resolve_schedule(week, dated.get(master_id), day)
+            if not schedule or not schedule.get("start_time") or not schedule.get("end_time"):
+                continue
+            busy = busy_from_rows(bookings.get(master_id, {}).get(day_key, ()))
+            if has_slot(
+                to_minutes(schedule["start_time"]), to_minutes(schedule["end_time"]),
+                busy, duration, step, buffer, earliest,
+            ):
+                result.append(day)
+                break
+    return result
+
+
+def _tagged(starts: Iterator[int], order: int, master_id: int) -> Iterator[Tuple[int, int, int]]:
+    for start in starts:
+        yield start, order, master_id
+
+
+def earliest_slots(
+    schedules: Mapping[int, Mapping[int, Mapping[str, Any]]],
+    bookings: Mapping[int, Mapping[str, Iterable[Mapping[str, Any]]]],
+    days: Iterable[date],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+    limit: int = 5,
+    not_before: Optional[datetime] = None,
+    dated: Optional[Mapping[int, Mapping[str, Mapping[str, Any]]]] = None,
+) -> List[Tuple[date, str, int]]:
+    """
+    Первые limit свободных слотов по всем мастерам: [(день, «HH:MM», master_id)]
+    по возрастанию дня и времени (при равном времени — в порядке schedules).
+
+    Форматы schedules, bookings и dated — как в available_days. Дни, в которые никто
+    не работает, пропускаются без расчёта; слоты мастеров одного дня сливаются
+    лениво, поэтому полный список слотов не строится ни для одного дня.
+    Слоты раньше not_before (например, текущего времени) не предлагаются.
+    """
+    dated = dated or {}
+    result: List[Tuple[date, str, int]] = []
+    if limit <= 0:
+        return result
+    for day in days:
+        if not_before is not None and day < not_before.date():
+            continue
+        earliest = to_minutes(not_before) if not_before is not None and day == not_before.date() else 0
+        day_key = day.isoformat()
+        streams = []
+        for order, (master_id, week) in enumerate(schedules.items()):
+            schedule = resolve_schedule(week, dated.get(master_id), day)
+            if not schedule or not schedule.get("start_time") or not schedule.get("end_time"):
+                continue
+            busy = busy_from_rows(bookings.get(master_id, {}).get(day_key, ()))
+            starts = iter_starts(
+                to_minutes(schedule["start_time"]), to_minutes(schedule["end_time"]),
+                busy, duration, step, buffer, earliest,
+            )
+            streams.append(_tagged(starts, order, master_id))
+        for start, _, master_id in heapq.merge(*streams):
+            result.append((day, format_minutes(start), master_id))
+            if len(result) >= limit:
+                return result
+    return result
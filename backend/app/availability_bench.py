@@ -0,0 +1,91 @@
+"""
+Сравнение скалярного и векторного (NumPy) расчёта свободного времени.
+
+Генерирует случайные графики и записи для заданного числа мастеров,
+проверяет, что оба пути дают одинаковые слоты, и печатает среднее время
+одного расчёта дня для всех мастеров. Запуск из каталога backend:
+
+    python -m app.availability_bench --masters 5 10 20 40 80
+"""
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app import availability, availability_np
+
+
+def generate_day(masters: int, bookings_per_master: int, seed: int = 0) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, List[Dict[str, Any]]]]:
+    """Графики (8–12 часов с 08:00–11:00) и записи по 30–120 минут; часть записей пересекается"""
+    rng = random.Random(seed)
+    schedules: Dict[int, Dict[str, Any]] = {}
+    bookings: Dict[int, List[Dict[str, Any]]] = {}
+    for master_id in range(1, masters + 1):
+        start = rng.randrange(8 * 60, 11 * 60 + 1, 30)
+        end = start + rng.randrange(8 * 60, 12 * 60 + 1, 30)
+        schedules[master_id] = {
+            "start_time": availability.format_minutes(start),
+            "end_time": availability.format_minutes(min(end, availability.MINUTES_PER_DAY)),
+        }
+        rows = []
+        for _ in range(bookings_per_master):
+            booking_start = rng.randrange(start, max(start + 1, end - 30), 5)
+            rows.append({
+                "start_time": availability.format_minutes(booking_start),
+                "end_time": availability.format_minutes(min(booking_start + rng.randrange(30, 121, 15), availability.MINUTES_PER_DAY)),
+            })
+        bookings[master_id] = rows
+    return schedules, bookings
+
+
+def _timed(func, repeat: int) -> Tuple[float, Any]:
+    result = None
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def run(masters: int, bookings_per_master: int, duration: int, step: int, buffer: int, repeat: int) -> Dict[str, Any]:
+    schedules, bookings = generate_day(masters, bookings_per_master, seed=masters)
+    scalar_time, scalar = _timed(
+        lambda: availability.masters_day_slots(schedules, bookings, duration, step, buffer), repeat
+    )
+    numpy_time, vectorized = _timed(
+        lambda: availability_np.masters_day_slots(schedules, bookings, duration, step, buffer), repeat
+    )
+    return {
+        "masters": masters,
+        "scalar_ms": scalar_time * 1000,
+        "numpy_ms": numpy_time * 1000,
+        "speedup": scalar_time / numpy_time if numpy_time else 0.0,
+        "same": scalar == vectorized,
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Скалярный и NumPy расчёт свободного времени")
+    parser.add_argument("--masters", type=int, nargs="+", default=[1, 5, 10, 20, 40, 80])
+    parser.add_argument("--bookings", type=int, default=6, help="записей на мастера")
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("--step", type=int, default=15)
+    parser.add_argument("--buffer", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if not availability_np.HAS_NUMPY:
+        print("NumPy is not installed: pip install numpy")
+        return 1
+
+    print(f"{'masters':>8} {'scalar ms':>10} {'numpy ms':>10} {'speedup':>8}  same")
+    mismatches = 0
+    for masters in args.masters:
+        row = run(masters, args.bookings, args.duration, args.step, args.buffer, args.repeat)
+        mismatches += not row["same"]
+        print(f"{row['masters']:>8} {row['scalar_ms']:>10.3f} {row['numpy_ms']:>10.3f} {row['speedup']:>7.2f}x  {row['same']}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,197 @@
+"""
+Кэш свободного времени мастеров.
+
+Рассчитанные слоты хранятся в памяти процесса с вытеснением давно не
+использованных (LRU) по ключу (мастер, дата, длительность, шаг, перерыв).
+Вместе со слотами запоминается версия (мастер, дата) из таблицы
+availability_versions: её увеличивают триггеры БД при любом изменении
+записей мастера на эту дату и его графика (миграция 5), а также
+закрытий салона (миграция 8). Поэтому запись, созданная, отменённая или
+перенесённая любым путём — ботом, API или вручную в БД — сбрасывает кэш
+и в процессе бота, и в процессе API.
+
+Проверка версий — один запрос по первичному ключу на все запрошенные
+мастера; графики и записи загружаются только для мастеров, чьи данные
+изменились или ещё не в кэше.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app import availability, availability_np, repository, slot_grid
+from app.closures import salon_calendar, whole_day
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[int, str, int, int, int]
+Versions = Tuple[int, int]
+
+
+def _ids(master_ids: Iterable[int]) -> List[int]:
+    return list(dict.fromkeys(int(master_id) for master_id in master_ids if master_id is not None))
+
+
+def load_day(conn, master_ids: Iterable[int], appointment_date: str, day_of_week: int):
+    """Графики работающих в этот день мастеров и их занятость (записи, перерывы, закрытия салона)"""
+    closures = salon_calendar.for_day(conn, date.fromisoformat(appointment_date))
+    if closures and whole_day(closures):
+        # Салон закрыт — никто не работает
+        return {}, {}
+    schedules = repository.get_schedules_for_masters(conn, master_ids, day_of_week, appointment_date)
+    bookings = repository.get_bookings_for_masters(conn, list(schedules), appointment_date)
+    # Перерывы и выходные занимают время так же, как записи
+    for master_id, breaks in repository.get_breaks_for_masters(conn, list(schedules), appointment_date).items():
+        bookings[master_id].extend(breaks)
+    for master_id in schedules:
+        bookings[master_id].extend(closures)
+    return schedules, bookings
+
+
+def _load_parts(conn, ids: List[int], appointment_date: str, day_of_week: int, buffer: int):
+    """
+    Графики и занятость мастеров на дату частями (графики, занятость, buffer для расчёта):
+    по актуальной сетке slot_grid (buffer в ней уже учтён) и расчётом из таблиц для остальных
+    """
+    schedules, bookings, covered = slot_grid.load_grid_day(conn, ids, appointment_date, buffer)
+    parts = [(schedules, bookings, 0)] if covered else []
+    rest = [master_id for master_id in ids if master_id not in covered]
+    if rest:
+        parts.append((*load_day(conn, rest, appointment_date, day_of_week), buffer))
+    return parts
+
+
+def compute_slots(
+    conn,
+    master_ids: Iterable[int],
+    appointment_date: str,
+    day_of_week: int,
+    duration: int,
+    step: int,
+    buffer: int,
+) -> Dict[int, Optional[List[str]]]:
+    """Слоты мастеров без кэша: {master_id: [«HH:MM»]}, None — мастер в этот день не работает"""
+    ids = _ids(master_ids)
+    slots: Dict[int, List[str]] = {}
+    for schedules, bookings, day_buffer in _load_parts(conn, ids, appointment_date, day_of_week, buffer):
+        # Для большого числа мастеров — векторный расчёт (те же результаты)
+        engine = availability_np if availability_np.use_numpy(len(schedules)) else availability
+        slots.update(engine.masters_day_slots(schedules, bookings, duration, step, day_buffer))
+    return {master_id: slots.get(master_id) for master_id in ids}
+
+
+def compute_ranked_slots(
+    conn,
+    master_ids: Iterable[int],
+    appointment_date: str,
+    day_of_week: int,
+    duration: int,
+    step: int,
+    buffer: int,
+    min_gap: Optional[int] = None,
+) -> Dict[int, List[Tuple[str, int, int]]]:
+    """
+    Слоты мастеров с оценкой плотности (см. availability.ranked_starts):
+    {master_id: [(«HH:MM», простой, примыканий)]} в порядке master_ids,
+    только работающие в этот день
+    """
+    ids = _ids(master_ids)
+    ranked: Dict[int, List[Tuple[str, int, int]]] = {}
+    for schedules, bookings, day_buffer in _load_parts(conn, ids, appointment_date, day_of_week, buffer):
+        for master_id, schedule in schedules.items():
+            ranked[master_id] = availability.day_ranked_slots(
+                schedule, availability.busy_from_rows(bookings[master_id]),
+                duration, step, day_buffer, min_gap,
+            )
+    return {master_id: ranked[master_id] for master_id in ids if master_id in ranked}
+
+
+class AvailabilityCache:
+    """LRU-кэш слотов с проверкой версий из БД"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[Versions, Optional[List[str]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_slots(
+        self,
+        conn,
+        master_ids: Iterable[int],
+        appointment_date: str,
+        day_of_week: int,
+        duration: int,
+        step: int = 15,
+        buffer: int = 0,
+    ) -> Dict[int, List[str]]:
+        """
+        Свободные слоты мастеров на дату: {master_id: [«HH:MM»]} в порядке
+        master_ids; мастера, не работающие в этот день, не попадают в результат
+        """
+        ids = _ids(master_ids)
+        if not ids:
+            return {}
+        try:
+            # Версии читаются до данных: изменение между запросами не оставит устаревший кэш
+            versions = repository.get_availability_versions(conn, ids, appointment_date)
+        except Exception as e:
+            # Таблицы версий нет (миграции не применены) — считаем без кэша
+            logger.warning(f"Availability cache disabled: {e}")
+            computed = compute_slots(conn, ids, appointment_date, day_of_week, duration, step, buffer)
+            return {master_id: slots for master_id, slots in computed.items() if slots is not None}
+
+        found: Dict[int, Optional[List[str]]] = {}
+        missing = []
+        with self._lock:
+            for master_id in ids:
+                key = (master_id, appointment_date, duration, step, buffer)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == versions[master_id]:
+                    self._entries.move_to_end(key)
+                    found[master_id] = entry[1]
+                    self._hits += 1
+                else:
+                    missing.append(master_id)
+                    self._misses += 1
+
+        if missing:
+            computed = compute_slots(conn, missing, appointment_date, day_of_week, duration, step, buffer)
+            with self._lock:
+                for master_id, slots in computed.items():
+                    key = (master_id, appointment_date, duration, step, buffer)
+                    self._entries[key] = (versions[master_id], slots)
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._evictions += 1
+            found.update(computed)
+
+        return {master_id: list(found[master_id]) for master_id in ids if found.get(master_id) is not None}
+
+    def invalidate(self, master_id: Optional[int] = None, appointment_date: Optional[str] = None) -> int:
+        """Удаление записей кэша процесса по мастеру и/или дате (без аргументов — всех)"""
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if (master_id is None or key[0] == master_id)
+                and (appointment_date is None or key[1] == appointment_date)
+            ]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,148 @@
+"""
+Векторизованный расчёт свободного времени (NumPy, необязательно).
+
+Каждый мастер-день — строка булевой матрицы по минутам (от начала самого
+раннего графика до конца самого позднего): True, если минута внутри графика
+и не занята записью или перерывом (с учётом buffer). Строки времени
+разбираются одним векторным проходом.
+Начало записи допустимо, если все duration минут после него свободны:
+это проверяется для всех мастеров сразу через префиксные суммы строк
+(скользящее окно ширины duration), после чего остаются только точки сетки
+с шагом step от начала рабочего дня.
+
+Результаты совпадают с availability.masters_day_slots. Без NumPy модуль
+импортируется, но HAS_NUMPY = False и use_numpy() всегда ложно — расчёт
+идёт скалярным путём.
+"""
+from typing import Any, Dict, Iterable, List, Mapping, Sequence
+
+from app import availability
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+# Векторный путь выгоден, начиная с этого числа мастеров в одном запросе
+# (см. python -m app.availability_bench); 0 — не использовать
+MIN_MASTERS = 20
+
+_LABELS = [availability.format_minutes(minute) for minute in range(availability.MINUTES_PER_DAY)]
+
+
+def configure(min_masters: int) -> None:
+    """Порог числа мастеров для векторного пути (из настроек бота или API)"""
+    global MIN_MASTERS
+    MIN_MASTERS = min_masters
+
+
+def use_numpy(masters_count: int) -> bool:
+    return HAS_NUMPY and MIN_MASTERS > 0 and masters_count >= MIN_MASTERS
+
+
+def parse_minutes(values: Sequence[Any]):
+    """
+    «HH:MM» / «HH:MM:SS» -> массив минут от полуночи одним векторным
+    разбором кодов символов; прочие форматы (time, «9:30») — по одному
+    """
+    if not values:
+        return np.zeros(0, dtype=np.int32)
+    if all(type(value) is str and len(value) >= 5 and value[2] == ":" for value in values):
+        digits = np.asarray(values, dtype="<U5").view(np.uint32).reshape(-1, 5).astype(np.int32) - ord("0")
+        return (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 3] * 10 + digits[:, 4]
+    return np.fromiter((availability.to_minutes(value) for value in values), dtype=np.int32, count=len(values))
+
+
+def free_minutes(work, busy_rows, busy_starts, busy_ends, buffer: int = 0, origin: int = 0,
+                 width: int = availability.MINUTES_PER_DAY):
+    """
+    Матрица свободных минут (строк × width) для минут origin..origin+width.
+    work — массив (строк × 2) начала и конца графика; занятые интервалы —
+    три массива одинаковой длины: строка, начало, конец (в минутах)
+    """
+    rows = len(work)
+    bounds = work - origin
+    minutes = np.arange(width, dtype=np.int32)
+    free = (minutes >= bounds[:, :1]) & (minutes < bounds[:, 1:])
+
+    # Занятость — разностный массив: +1 в начале интервала, -1 в конце
+    keep = busy_ends > busy_starts
+    if keep.any():
+        delta = np.zeros((rows, width + 1), dtype=np.int16)
+        busy_rows = busy_rows[keep]
+        np.add.at(delta, (busy_rows, np.clip(busy_starts[keep] - buffer - origin, 0, width)), 1)
+        np.add.at(delta, (busy_rows, np.clip(busy_ends[keep] + buffer - origin, 0, width)), -1)
+        free &= np.cumsum(delta[:, :width], axis=1, dtype=np.int16) == 0
+    return free
+
+
+def window_starts(free, offsets, duration: int, step: int = 15):
+    """
+    Допустимые начала на сетке: строка r проверяется в точках offsets[r] + k * step
+    (k = 0, 1, ...). Возвращает (маска строк × точек, точки) — окно из duration
+    минут после точки свободно целиком (скользящее окно по префиксным суммам)
+    """
+    rows, width = free.shape
+    counts = np.zeros((rows, width + 1), dtype=np.int16)
+    np.cumsum(free, axis=1, dtype=np.int16, out=counts[:, 1:])
+    points = np.asarray(offsets, dtype=np.int32).reshape(rows, 1) + np.arange(0, width, step, dtype=np.int32)
+    ends = points + duration
+    # За пределами матрицы окно заведомо не помещается
+    window = np.take_along_axis(counts, np.minimum(ends, width), axis=1) - np.take_along_axis(
+        counts, np.minimum(points, width), axis=1
+    )
+    return (ends <= width) & (window == duration), points
+
+
+def masters_day_slots(
+    schedules: Mapping[int, Mapping[str, Any]],
+    bookings: Mapping[int, Iterable[Mapping[str, Any]]],
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+) -> Dict[int, List[str]]:
+    """То же, что availability.masters_day_slots, одним векторным проходом по всем мастерам"""
+    if step <= 0:
+        raise ValueError(f"Invalid slot step: {step}")
+    result: Dict[int, List[str]] = {master_id: [] for master_id in schedules}
+    if duration <= 0:
+        return result
+
+    # Сначала собираем все строки времени, затем разбираем их разом
+    master_ids, work_times = [], []
+    busy_rows, busy_times = [], []
+    for master_id, schedule in schedules.items():
+        if not schedule or not schedule.get("start_time") or not schedule.get("end_time"):
+            continue
+        row = len(master_ids)
+        master_ids.append(master_id)
+        work_times += (schedule["start_time"], schedule["end_time"])
+        for booking in bookings.get(master_id, ()):
+            start, end = booking.get("start_time"), booking.get("end_time")
+            if start and end:
+                busy_rows.append(row)
+                busy_times += (start, end)
+    if not master_ids:
+        return result
+
+    work = parse_minutes(work_times).reshape(-1, 2)
+    busy = parse_minutes(busy_times).reshape(-1, 2)
+    # Матрица покрывает только минуты, в которые работает хоть кто-то
+    origin = int(work[:, 0].min())
+    width = max(int(work[:, 1].max()) - origin, 0)
+    if width < duration:
+        return result
+    valid, points = window_starts(
+        free_minutes(work, np.asarray(busy_rows, dtype=np.intp), busy[:, 0], busy[:, 1], buffer, origin, width),
+        work[:, 0] - origin,
+        duration,
+        step,
+    )
+    rows, columns = np.nonzero(valid)
+    starts = (points[rows, columns] + origin).tolist()
+    labels = _LABELS
+    for row, start in zip(rows.tolist(), starts):
+        result[master_ids[row]].append(labels[start])
+    return result
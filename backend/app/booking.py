@@ -0,0 +1,216 @@
+"""
+Проверка пересечений при создании и переносе записи.
+
+Функции вызываются внутри транзакции записи (задание потока-писателя
+в BEGIN IMMEDIATE для SQLite или транзакция PostgresWriter), поэтому
+проверка и вставка атомарны: конкурентная запись к тому же мастеру
+либо ждёт блокировки, либо видит уже вставленную строку.
+
+Глобальной блокировки нет: в SQLite транзакцию записи и так держит один
+писатель (BEGIN IMMEDIATE), а в PostgreSQL блокируется только строка
+мастера (SELECT ... FOR UPDATE), и записи к разным мастерам идут
+параллельно.
+
+first_available ищет ближайшее свободное время на несколько дней вперёд.
+"""
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from app import availability, repository
+from app.availability_cache import compute_slots
+from app.closures import add_to_bookings, salon_calendar
+from app.rows import fetch_dicts
+
+
+class SlotConflict(Exception):
+    """Время мастера уже занято; conflicts — пересекающиеся записи и перерывы"""
+
+    def __init__(self, master_id: int, appointment_date: str, start_time: str, end_time: str,
+                 conflicts: List[Dict[str, Any]], alternatives: Optional[List[str]] = None):
+        super().__init__(f"Master {master_id} is busy on {appointment_date} {start_time}-{end_time}")
+        self.master_id = master_id
+        self.appointment_date = appointment_date
+        self.start_time = start_time
+        self.end_time = end_time
+        self.conflicts = conflicts
+        self.alternatives = alternatives or []
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "error": "slot_conflict",
+            "message": "Время уже занято",
+            "master_id": self.master_id,
+            "appointment_date": self.appointment_date,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "conflicts": self.conflicts,
+            "alternatives": self.alternatives,
+        }
+
+
+def lock_master(conn, master_id: int) -> None:
+    """Блокировка строки мастера до конца транзакции (только PostgreSQL)"""
+    if isinstance(conn, sqlite3.Connection):
+        # Транзакция уже открыта как BEGIN IMMEDIATE — других писателей нет
+        return
+    conn.execute("SELECT id FROM masters WHERE id = ? FOR UPDATE", (master_id,))
+
+
+def find_conflicts(
+    conn,
+    master_id: int,
+    appointment_date: str,
+    start_time: str,
+    end_time: str,
+    buffer: int = 0,
+    exclude_appointment_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Записи и перерывы мастера и закрытия салона, пересекающиеся с [start_time, end_time)
+    с учётом перерыва buffer между записями. Записи ищутся по индексу
+    (master_id, appointment_date, start_time).
+    """
+    start = availability.to_minutes(start_time)
+    end = availability.to_minutes(end_time)
+    # Границы с учётом перерыва: занятая запись должна закончиться до start - buffer
+    # и начаться после end + buffer
+    window_start = availability.format_minutes(max(0, start - buffer))
+    window_end = availability.format_minutes(min(availability.MINUTES_PER_DAY, end + buffer))
+
+    query = f"""
+        SELECT id, start_time, end_time, status FROM appointments
+        WHERE master_id = ? AND appointment_date = ?
+        AND start_time < ? AND end_time > ?
+        AND status IN ({', '.join('?' for _ in repository.BUSY_STATUSES)})
+    """
+    params: List[Any] = [master_id, appointment_date, window_end, window_start, *repository.BUSY_STATUSES]
+    if exclude_appointment_id is not None:
+        query += " AND id != ?"
+        params.append(exclude_appointment_id)
+    cursor = conn.cursor()
+    cursor.execute(query, tuple(params))
+    conflicts = [dict(row, type="appointment") for row in fetch_dicts(cursor)]
+
+    # Перерывы без учёта buffer: это не записи
+    cursor.execute("""
+        SELECT id, start_time, end_time, reason FROM master_breaks
+        WHERE master_id = ? AND end_date >= ? AND start_date <= ?
+        AND (start_time IS NULL OR (start_time < ? AND end_time > ?))
+    """, (master_id, appointment_date, appointment_date, end_time, start_time))
+    conflicts += [dict(row, type="break") for row in fetch_dicts(cursor)]
+
+    cursor.execute("""
+        SELECT id, start_time, end_time, reason FROM salon_closures
+        WHERE end_date >= ? AND start_date <= ?
+        AND (start_time IS NULL OR (start_time < ? AND end_time > ?))
+    """, (appointment_date, appointment_date, end_time, start_time))
+    conflicts += [dict(row, type="closure") for row in fetch_dicts(cursor)]
+    return conflicts
+
+
+def alternative_slots(
+    conn,
+    master_id: int,
+    appointment_date: str,
+    day_of_week: int,
+    duration: int,
+    near: Optional[str] = None,
+    step: int = 15,
+    buffer: int = 0,
+    limit: int = 5,
+) -> List[str]:
+    """Свободные начала записи в тот же день, ближайшие к near (по возрастанию времени)"""
+    slots = compute_slots(conn, [master_id], appointment_date, day_of_week, duration, step, buffer).get(master_id) or []
+    if near is not None:
+        target = availability.to_minutes(near)
+        slots = sorted(slots, key=lambda slot: abs(availability.to_minutes(slot) - target))
+    return sorted(slots[:limit])
+
+
+def ensure_slot_free(
+    conn,
+    master_id: int,
+    appointment_date: str,
+    day_of_week: int,
+    start_time: str,
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+    exclude_appointment_id: Optional[int] = None,
+) -> str:
+    """
+    Блокировка мастера и проверка, что время свободно; возвращает время
+    окончания. При пересечении — SlotConflict с альтернативными слотами.
+    """
+    start = availability.to_minutes(start_time)
+    end_time = availability.format_minutes(start + duration)
+    lock_master(conn, master_id)
+    conflicts = find_conflicts(conn, master_id, appointment_date, start_time, end_time, buffer, exclude_appointment_id)
+    if conflicts:
+        alternatives = alternative_slots(
+            conn, master_id, appointment_date, day_of_week, duration, start_time, step, buffer
+        )
+        raise SlotConflict(master_id, appointment_date, start_time, end_time, conflicts, alternatives)
+    return end_time
+
+
+def first_available(
+    conn,
+    master_ids: Iterable[int],
+    start_date: date,
+    days: int,
+    duration: int,
+    step: int = 15,
+    buffer: int = 0,
+    limit: int = 5,
+    not_before: Optional[datetime] = None,
+    chunk_days: int = 7,
+) -> List[Dict[str, Any]]:
+    """
+    Первые limit свободных слотов мастеров за days дней начиная со start_date:
+    [{"date", "time", "master_id"}] по возрастанию.
+
+    Недельные графики, графики на даты и закрытия салона на горизонте
+    читаются один раз, и дни, в которые никто из мастеров не работает,
+    пропускаются без запросов. Записи и перерывы загружаются
+    порциями по chunk_days дней (по индексам master_id + дата) только для
+    работающих мастеров; поиск заканчивается на первой порции, в которой
+    набралось limit слотов.
+    """
+    ids = list(dict.fromkeys(int(master_id) for master_id in master_ids if master_id is not None))
+    if not ids or days <= 0 or limit <= 0:
+        return []
+    horizon = [start_date + timedelta(days=offset) for offset in range(days)]
+    week, dated = repository.get_schedules_for_period(conn, ids, horizon[0].isoformat(), horizon[-1].isoformat())
+    # Порядок мастеров при одинаковом времени — как в master_ids
+    schedules = {master_id: week[master_id] for master_id in ids if master_id in week}
+    closures, closed = salon_calendar.for_period(conn, horizon[0], horizon[-1])
+
+    def works(master_id: int, day: date) -> bool:
+        if day.isoformat() in closed:
+            return False
+        schedule = availability.resolve_schedule(schedules[master_id], dated.get(master_id), day)
+        return bool(schedule and schedule.get("start_time") and schedule.get("end_time"))
+
+    found: List[Dict[str, Any]] = []
+    for offset in range(0, len(horizon), chunk_days):
+        chunk = [day for day in horizon[offset:offset + chunk_days] if any(works(m, day) for m in schedules)]
+        if not chunk:
+            continue
+        working = [master_id for master_id in schedules if any(works(master_id, day) for day in chunk)]
+        date_from, date_to = chunk[0].isoformat(), chunk[-1].isoformat()
+        bookings = repository.get_bookings_for_period(conn, working, date_from, date_to)
+        # Перерывы и выходные занимают время так же, как записи
+        for master_id, days_off in repository.get_breaks_for_period(conn, working, date_from, date_to).items():
+            for day, intervals in days_off.items():
+                bookings[master_id].setdefault(day, []).extend(intervals)
+        add_to_bookings(bookings, closures)
+        slots = availability.earliest_slots(
+            {master_id: schedules[master_id] for master_id in working},
+            bookings, chunk, duration, step, buffer, limit - len(found), not_before, dated,
+        )
+        found.extend({"date": day.isoformat(), "time": time, "master_id": master_id} for day, time, master_id in slots)
+        if len(found) >= limit:
+            break
+    return found
@@ -0,0 +1,38 @@
+"""
+Перерывы и выходные мастеров: общий запрос списка и проверка входных
+данных для эндпоинтов main.py и routers/schedule.py (проверка используется
+и для закрытий салона — у них те же поля дат и времени).
+"""
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app import availability
+from app.statements import registry as statements
+
+# Перерывы мастера, пересекающие период (фильтры необязательны)
+BREAKS_LIST = statements.template(
+    "master_breaks.list",
+    "SELECT * FROM master_breaks WHERE master_id = ?",
+    (
+        ("date_from", "end_date >= ?"),
+        ("date_to", "start_date <= ?"),
+    ),
+    " ORDER BY start_date, start_time",
+)
+
+
+def validate_break(start_date: date, end_date: date, start_time: Optional[str], end_time: Optional[str]):
+    """Проверка перерыва: даты по порядку, время указано целиком (или не указано) и start < end"""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="Дата окончания раньше даты начала")
+    if (start_time is None) != (end_time is None):
+        raise HTTPException(status_code=400, detail="Укажите и start_time, и end_time (или ни одного для выходного)")
+    if start_time is not None:
+        try:
+            start, end = availability.to_minutes(start_time), availability.to_minutes(end_time)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Время должно быть в формате HH:MM")
+        if not 0 <= start < end <= availability.MINUTES_PER_DAY:
+            raise HTTPException(status_code=400, detail="Время начала должно быть раньше времени окончания")
@@ -0,0 +1,125 @@
+"""
+Пакетная запись в БД.
+
+Дочерние строки (услуги записи, переводы, связи мастер–услуга) вставляются
+не по одной, а несколькими многострочными INSERT ... VALUES (...), (...)
+внутри уже открытой транзакции вызывающего кода (задание потока-писателя
+или соединение пула). Число параметров в одном запросе ограничено, поэтому
+строки делятся на пачки.
+
+SQL совместим с SQLite (3.24+) и PostgreSQL.
+"""
+import re
+from typing import Any, Iterable, List, Optional, Sequence
+
+# Лимит параметров на запрос: у старых сборок SQLite — 999
+MAX_VARIABLES = 999
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _identifier(name: str) -> str:
+    # Имена таблиц и колонок подставляются в SQL, поэтому принимаем только идентификаторы
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return name
+
+
+def _batches(rows: Sequence[Sequence[Any]], width: int) -> Iterable[Sequence[Sequence[Any]]]:
+    size = max(1, MAX_VARIABLES // width)
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _insert_prefix(table: str, columns: Sequence[str]) -> str:
+    return f"INSERT INTO {_identifier(table)} ({', '.join(_identifier(c) for c in columns)}) VALUES "
+
+
+def _values(columns: Sequence[str], count: int) -> str:
+    row = "(" + ", ".join("?" for _ in columns) + ")"
+    return ", ".join(row for _ in range(count))
+
+
+def _normalize(rows: Iterable[Sequence[Any]], width: int) -> List[tuple]:
+    normalized = [tuple(row) for row in rows]
+    for row in normalized:
+        if len(row) != width:
+            raise ValueError(f"Row {row!r} does not match {width} columns")
+    return normalized
+
+
+def executemany(conn, query: str, rows: Iterable[Sequence[Any]]) -> int:
+    """Один подготовленный запрос для всех строк; возвращает число затронутых строк"""
+    rows = [tuple(row) for row in rows]
+    if not rows:
+        return 0
+    cursor = conn.cursor()
+    cursor.executemany(query, rows)
+    return cursor.rowcount if cursor.rowcount >= 0 else len(rows)
+
+
+def insert_rows(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    ignore_conflicts: bool = False,
+) -> int:
+    """
+    Многострочный INSERT; возвращает число вставленных строк.
+
+    ignore_conflicts=True пропускает строки, нарушающие уникальность
+    (ON CONFLICT DO NOTHING).
+    """
+    prefix = _insert_prefix(table, columns)
+    suffix = " ON CONFLICT DO NOTHING" if ignore_conflicts else ""
+    rows = _normalize(rows, len(columns))
+    cursor = conn.cursor()
+    inserted = 0
+    for batch in _batches(rows, len(columns)):
+        query = prefix + _values(columns, len(batch)) + suffix
+        cursor.execute(query, [value for row in batch for value in row])
+        inserted += cursor.rowcount if cursor.rowcount >= 0 else len(batch)
+    return inserted
+
+
+def upsert_rows(
+    conn,
+    table: str,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    conflict_columns: Sequence[str],
+    update_columns: Optional[Sequence[str]] = None,
+) -> int:
+    """
+    Пакетный upsert: INSERT ... ON CONFLICT (conflict_columns) DO UPDATE.
+
+    По умолчанию обновляются все колонки, кроме ключевых. Для conflict_columns
+    нужен уникальный индекс. Из строк с одинаковым ключом остаётся последняя.
+    """
+    prefix = _insert_prefix(table, columns)
+    if update_columns is None:
+        update_columns = [column for column in columns if column not in conflict_columns]
+
+    # Одна строка на ключ: одна команда не может обновить строку дважды
+    key_positions = [list(columns).index(column) for column in conflict_columns]
+    unique = {}
+    for row in _normalize(rows, len(columns)):
+        unique[tuple(row[position] for position in key_positions)] = row
+    rows = list(unique.values())
+
+    conflict = ", ".join(_identifier(column) for column in conflict_columns)
+    if update_columns:
+        action = "DO UPDATE SET " + ", ".join(
+            f"{_identifier(column)} = excluded.{_identifier(column)}" for column in update_columns
+        )
+    else:
+        action = "DO NOTHING"
+
+    cursor = conn.cursor()
+    written = 0
+    for batch in _batches(rows, len(columns)):
+        query = f"{prefix}{_values(columns, len(batch))} ON CONFLICT ({conflict}) {action}"
+        cursor.execute(query, [value for row in batch for value in row])
+        written += cursor.rowcount if cursor.rowcount >= 0 else len(batch)
+    return written
@@ -0,0 +1,95 @@
+"""
+Календарь закрытий салона (праздники, сокращённые дни).
+
+Закрытия хранятся в памяти процесса по годам: {дата: [интервалы]} и
+множество дат, закрытых на весь день. Проверка дня не делает запросов к БД,
+кроме одного чтения версии закрытий (строка салона в availability_versions,
+её увеличивают триггеры salon_closures, миграция 8) на расчёт; год
+перечитывается одним запросом, только если версия изменилась. Поэтому
+закрытие, добавленное через API, сразу видно и в процессе бота.
+
+Закрытые интервалы занимают время всех мастеров так же, как перерывы.
+"""
+import threading
+from datetime import date
+from typing import Any, Dict, List, Mapping, MutableMapping, Optional, Set, Tuple
+
+from app import availability, repository
+
+Closures = Dict[str, List[Dict[str, Any]]]
+
+
+def whole_day(intervals: List[Dict[str, Any]]) -> bool:
+    """Интервалы закрытия покрывают весь день"""
+    return any(
+        availability.to_minutes(interval["start_time"]) == 0
+        and availability.to_minutes(interval["end_time"]) >= availability.MINUTES_PER_DAY
+        for interval in intervals
+    )
+
+
+def add_to_bookings(bookings: Mapping[int, MutableMapping[str, List[Dict[str, Any]]]], closures: Closures) -> None:
+    """Закрытия занимают время каждого мастера: {master_id: {дата: [интервалы]}}"""
+    for days in bookings.values():
+        for day, intervals in closures.items():
+            days.setdefault(day, []).extend(intervals)
+
+
+class ClosureCalendar:
+    """Закрытия салона по годам с проверкой версии из БД"""
+
+    def __init__(self):
+        self._version: Optional[int] = None
+        # Ключ — (версия закрытий, год): год, прочитанный при старой версии,
+        # не попадёт к читателю, увидевшему новую, даже если загрузка закончится позже
+        self._years: Dict[Tuple[Optional[int], int], Tuple[Closures, Set[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _year(self, conn, version: Optional[int], year: int) -> Tuple[Closures, Set[str]]:
+        with self._lock:
+            cached = self._years.get((version, year))
+        if cached is None:
+            closures = repository.get_salon_closures(conn, f"{year:04d}-01-01", f"{year:04d}-12-31")
+            cached = (closures, {day for day, intervals in closures.items() if whole_day(intervals)})
+            with self._lock:
+                if self._version == version:
+                    self._years[(version, year)] = cached
+        return cached
+
+    def refresh(self, conn) -> Optional[int]:
+        """
+        Версия закрытий из БД (один запрос по первичному ключу); при её
+        изменении годы других версий выбрасываются
+        """
+        version = repository.get_closures_version(conn)
+        with self._lock:
+            if version != self._version:
+                self._years = {key: value for key, value in self._years.items() if key[0] == version}
+                self._version = version
+        return version
+
+    def for_period(self, conn, date_from: date, date_to: date) -> Tuple[Closures, Set[str]]:
+        """Закрытия за период: ({дата: [интервалы]}, даты, закрытые на весь день)"""
+        version = self.refresh(conn)
+        closures: Closures = {}
+        closed: Set[str] = set()
+        first, last = date_from.isoformat(), date_to.isoformat()
+        for year in range(date_from.year, date_to.year + 1):
+            year_closures, year_closed = self._year(conn, version, year)
+            closures.update((day, intervals) for day, intervals in year_closures.items() if first <= day <= last)
+            closed.update(day for day in year_closed if first <= day <= last)
+        return closures, closed
+
+    def for_day(self, conn, day: date) -> List[Dict[str, Any]]:
+        """Закрытые интервалы дня ([] — салон работает как обычно)"""
+        closures, _ = self.for_period(conn, day, day)
+        return closures.get(day.isoformat(), [])
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._years.clear()
+            self._version = None
+
+
+# Один календарь на процесс (бот или API)
+salon_calendar = ClosureCalendar()
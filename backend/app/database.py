@@ -1,22 +1,185 @@
+import asyncio
+import functools
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator, Optional, Dict, Any
+from typing import Any, Awaitable, Callable, Dict, Generator, Iterable, Optional, Sequence, TypeVar
 from fastapi import HTTPException
+from app.config import settings
+from app import availability_np, bulk
+from app.availability_cache import AvailabilityCache
+from app.pool import ConnectionPool, PooledConnection
+from app.storage import POSTGRESQL, PostgresBackend, PostgresWriter, parse_database_url
+from app.rows import fetch_dict, fetch_dicts
+from app.sqlite_profile import SqliteProfile
+from app.writer import configure_connection, shared_writer
 import logging
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+def _execute(conn: sqlite3.Connection, query: str, params: tuple = None) -> sqlite3.Cursor:
+    return conn.execute(query, params) if params else conn.execute(query)
+
 class DatabaseManager:
-    def __init__(self, db_path: str = "salon.db"):
+    def __init__(self, db_path: Optional[str] = None, pool_size: Optional[int] = None, database_url: Optional[str] = None):
+        # Явный db_path — всегда SQLite, иначе хранилище выбирается по DATABASE_URL
+        self.database_url = database_url or (f"sqlite:///{db_path}" if db_path else settings.DATABASE_URL)
+        self.dialect, target = parse_database_url(self.database_url)
+        
+        if self.dialect == POSTGRESQL:
+            self.db_path = target
+            self.pool = PostgresBackend(
+                target,
+                max_size=pool_size or settings.DB_POOL_SIZE,
+                timeout=settings.DB_POOL_TIMEOUT,
+            )
+            self.writer = PostgresWriter(
+                self.pool,
+                max_retries=settings.DB_WRITE_MAX_RETRIES,
+                retry_backoff=settings.DB_WRITE_RETRY_BACKOFF,
+            )
+            self.readonly_pool = PostgresBackend(
+                target,
+                max_size=settings.DB_READONLY_POOL_SIZE,
+                timeout=settings.DB_READONLY_POOL_TIMEOUT,
+                read_only=True,
+                statement_timeout=settings.DB_READONLY_STATEMENT_TIMEOUT,
+            )
+        else:
+            self._init_sqlite(db_path or settings.DB_PATH, pool_size)
+        
+        # Ограниченный пул потоков для блокирующих обращений к БД из async-кода.
+        # По умолчанию потоков столько же, сколько соединений, чтобы потоки не ждали пул.
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.DB_EXECUTOR_WORKERS or self.pool.max_size,
+            thread_name_prefix="db",
+        )
+        # Тяжёлые отчёты выполняются в своих потоках и не занимают потоки записи
+        self.readonly_executor = ThreadPoolExecutor(
+            max_workers=self.readonly_pool.max_size,
+            thread_name_prefix="db-ro",
+        )
+        # Кэш свободного времени мастеров (общий формат с ботом, сброс по версиям из БД)
+        self.availability_cache = AvailabilityCache(settings.AVAILABILITY_CACHE_SIZE)
+        availability_np.configure(settings.AVAILABILITY_NUMPY_MIN_MASTERS)
+    
+    def _init_sqlite(self, db_path: str, pool_size: Optional[int]):
         self.db_path = db_path
+        self.profile = SqliteProfile(
+            synchronous=settings.SQLITE_SYNCHRONOUS,
+            cache_size_kb=settings.SQLITE_CACHE_SIZE_KB,
+            mmap_size_mb=settings.SQLITE_MMAP_SIZE_MB,
+            temp_store=settings.SQLITE_TEMP_STORE,
+            foreign_keys=settings.SQLITE_FOREIGN_KEYS,
+        )
+        self.pool = ConnectionPool(
+            self.db_path,
+            max_size=pool_size or settings.DB_POOL_SIZE,
+            timeout=settings.DB_POOL_TIMEOUT,
+            health_check_interval=settings.DB_POOL_HEALTH_CHECK_INTERVAL,
+            on_connect=lambda conn: configure_connection(conn, settings.DB_BUSY_TIMEOUT, profile=self.profile),
+        )
+        # Все записи процесса идут через один поток-писатель (BEGIN IMMEDIATE + повторы)
+        self.writer = shared_writer(
+            self.db_path,
+            busy_timeout=settings.DB_BUSY_TIMEOUT,
+            max_retries=settings.DB_WRITE_MAX_RETRIES,
+            retry_backoff=settings.DB_WRITE_RETRY_BACKOFF,
+            profile=self.profile,
+        )
+        # Соединения только для чтения (mode=ro + query_only) с ограничением времени запросов
+        self.readonly_pool = ConnectionPool(
+            self.db_path,
+            max_size=settings.DB_READONLY_POOL_SIZE,
+            timeout=settings.DB_READONLY_POOL_TIMEOUT,
+            health_check_interval=settings.DB_POOL_HEALTH_CHECK_INTERVAL,
+            on_connect=lambda conn: configure_connection(
+                conn, settings.DB_BUSY_TIMEOUT, wal=False, profile=self.profile
+            ),
+            read_only=True,
+            statement_timeout=settings.DB_READONLY_STATEMENT_TIMEOUT,
+        )
+    
+    def connect(self) -> PooledConnection:
+        """Соединение из пула; close() возвращает его обратно в пул"""
+        return self.pool.acquire()
+    
+    def connect_readonly(self) -> PooledConnection:
+        """Соединение только для чтения (аналитика, отчёты); запись в нём невозможна"""
+        return self.readonly_pool.acquire()
+    
+    def close(self):
+        """Остановка пулов потоков, писателя и закрытие пулов соединений"""
+        self.readonly_executor.shutdown(wait=True)
+        self.executor.shutdown(wait=True)
+        self.writer.close()
+        self.readonly_pool.close()
+        self.pool.close()
+    
+    async def aclose(self):
+        """Закрытие, включая асинхронные пулы PostgreSQL"""
+        if self.dialect == POSTGRESQL:
+            await self.readonly_pool.aclose()
+            await self.pool.aclose()
+        self.close()
+    
+    def write(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Выполнение func(conn, ...) в транзакции потока-писателя"""
+        return self.writer.execute(func, *args, **kwargs)
+    
+    # ==================== ASYNC ДОСТУП ====================
+    
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Выполнение блокирующей функции в пуле потоков БД, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+    
+    async def run_readonly(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Как run, но в отдельном пуле потоков для отчётов"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.readonly_executor, functools.partial(func, *args, **kwargs))
+    
+    async def write_async(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Асинхронный write"""
+        return await self.writer.run(func, *args, **kwargs)
+    
+    async def execute_query_async(self, query: str, params: tuple = None) -> Optional[sqlite3.Cursor]:
+        """Асинхронный execute_query"""
+        return await self.run(self.execute_query, query, params)
+    
+    async def fetch_one_async(self, query: str, params: tuple = None) -> Optional[Dict[str, Any]]:
+        """Асинхронный fetch_one (для PostgreSQL — через асинхронный пул, без потоков)"""
+        if self.dialect == POSTGRESQL:
+            try:
+                return await self.pool.fetch_one(query, params)
+            except Exception as e:
+                logger.error(f"Fetch one error: {e}, query: {query}")
+                return None
+        return await self.run(self.fetch_one, query, params)
+    
+    async def fetch_all_async(self, query: str, params: tuple = None) -> list:
+        """Асинхронный fetch_all (для PostgreSQL — через асинхронный пул, без потоков)"""
+        if self.dialect == POSTGRESQL:
+            try:
+                return await self.pool.fetch_all(query, params)
+            except Exception as e:
+                logger.error(f"Fetch all error: {e}, query: {query}")
+                return []
+        return await self.run(self.fetch_all, query, params)
+    
+    async def insert_and_get_id_async(self, query: str, params: tuple = None) -> int:
+        """Асинхронный insert_and_get_id"""
+        return await self.run(self.insert_and_get_id, query, params)
         
     @contextmanager
     def get_connection(self) -> Generator[sqlite3.Connection, None, None]:
         """Получение соединения с БД"""
         conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
+            conn = self.pool.acquire()
             yield conn
             conn.commit()
         except sqlite3.Error as e:
@@ -31,13 +194,7 @@ class DatabaseManager:
     def execute_query(self, query: str, params: tuple = None) -> Optional[sqlite3.Cursor]:
         """Выполнение SQL запроса"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                if params:
-                    cursor.execute(query, params)
-                else:
-                    cursor.execute(query)
-                return cursor
+            return self.write(_execute, query, params)
         except Exception as e:
             logger.error(f"Query error: {e}, query: {query}")
             return None
@@ -51,8 +208,7 @@ class DatabaseManager:
                     cursor.execute(query, params)
                 else:
                     cursor.execute(query)
-                row = cursor.fetchone()
-                return dict(row) if row else None
+                return fetch_dict(cursor)
         except Exception as e:
             logger.error(f"Fetch one error: {e}, query: {query}")
             return None
@@ -66,8 +222,7 @@ class DatabaseManager:
                     cursor.execute(query, params)
                 else:
                     cursor.execute(query)
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                return fetch_dicts(cursor)
         except Exception as e:
             logger.error(f"Fetch all error: {e}, query: {query}")
             return []
@@ -75,20 +230,67 @@ class DatabaseManager:
     def insert_and_get_id(self, query: str, params: tuple = None) -> int:
         """Вставка записи и получение ID"""
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                if params:
-                    cursor.execute(query, params)
-                else:
-                    cursor.execute(query)
-                return cursor.lastrowid
+            return self.write(_execute, query, params).lastrowid
         except Exception as e:
             logger.error(f"Insert error: {e}, query: {query}")
             return -1
+    
+    # ==================== ПАКЕТНАЯ ЗАПИСЬ ====================
+    # Одна транзакция писателя на пакет; ошибки пробрасываются вызывающему
+    
+    def execute_many(self, query: str, rows: Iterable[Sequence[Any]]) -> int:
+        """Один запрос для множества наборов параметров (executemany)"""
+        return self.write(bulk.executemany, query, list(rows))
+    
+    def insert_rows(self, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    ignore_conflicts: bool = False) -> int:
+        """Многострочный INSERT ... VALUES; число вставленных строк"""
+        return self.write(bulk.insert_rows, table, columns, list(rows), ignore_conflicts)
+    
+    def upsert_rows(self, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    conflict_columns: Sequence[str], update_columns: Optional[Sequence[str]] = None) -> int:
+        """Пакетный INSERT ... ON CONFLICT DO UPDATE"""
+        return self.write(bulk.upsert_rows, table, columns, list(rows), conflict_columns, update_columns)
 
 # Инициализация менеджера БД
 db = DatabaseManager()
 
+_worker_loops = threading.local()
+
+def _run_in_worker(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Выполнение обработчика в потоке БД (корутины — в собственном event loop потока)"""
+    if not asyncio.iscoroutinefunction(func):
+        return func(*args, **kwargs)
+    loop = getattr(_worker_loops, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _worker_loops.loop = loop
+    return loop.run_until_complete(func(*args, **kwargs))
+
+def offload_db(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    """
+    Декоратор для эндпоинтов с синхронной работой с БД.
+
+    Тело обработчика выполняется в ограниченном пуле потоков db.executor,
+    а event loop в это время обслуживает другие запросы. Сигнатура
+    сохраняется (functools.wraps), поэтому FastAPI видит те же параметры.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await db.run(_run_in_worker, func, *args, **kwargs)
+    return wrapper
+
+def offload_readonly(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    """
+    offload_db для аналитики и отчётов: обработчик выполняется в пуле
+    потоков db.readonly_executor и берёт соединения через db.connect_readonly(),
+    не конкурируя с записями за потоки и соединения.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await db.run_readonly(_run_in_worker, func, *args, **kwargs)
+    return wrapper
+
 # Функция инициализации админа
 def init_admin():
     """Создание администратора по умолчанию если его нет"""
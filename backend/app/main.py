@@ -2,11 +2,11 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Depends, Query, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response
 from contextlib import asynccontextmanager
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 import logging
-import sqlite3
 import os
 from datetime import datetime, date, timedelta
 import uuid
@@ -14,6 +14,18 @@ from pathlib import Path
 import imghdr
 import json
 
+from app.config import settings as app_settings
+from app.database import db, offload_db, offload_readonly
+from app.storage import SQLITE
+from app.maintenance import MaintenanceScheduler, parse_quiet_hours
+from app.migrations import get_schema_version, latest_version, migrate
+from app import availability, booking, bulk, repository, slot_grid
+from app.availability_cache import compute_ranked_slots
+from app.breaks import BREAKS_LIST, validate_break
+from app.closures import salon_calendar
+from app.rows import dumps_json, fetch_columns, fetch_dict, fetch_dicts
+from app.statements import registry as statements
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -43,6 +55,20 @@ class Settings:
     # Директории
     MASTERS_UPLOAD_DIR = "masters"
     
+    # Настройки БД — общие с app.database (переменные окружения читает app.config)
+    DB_BUSY_TIMEOUT = app_settings.DB_BUSY_TIMEOUT
+    DB_MAINTENANCE_ENABLED = app_settings.DB_MAINTENANCE_ENABLED
+    DB_MAINTENANCE_HOURS = app_settings.DB_MAINTENANCE_HOURS
+    DB_MAINTENANCE_INTERVAL = app_settings.DB_MAINTENANCE_INTERVAL
+    DB_MAINTENANCE_VACUUM_PAGES = app_settings.DB_MAINTENANCE_VACUUM_PAGES
+    
+    # Сетка свободного времени (как у бота): шаг начала записи и перерыв между записями, минуты
+    SLOT_STEP_MINUTES = app_settings.SLOT_STEP_MINUTES
+    APPOINTMENT_BUFFER_MINUTES = app_settings.APPOINTMENT_BUFFER_MINUTES
+    # Материализованная сетка свободного времени: дней вперёд (0 — выключить) и период перестройки, секунд
+    SLOT_GRID_DAYS = app_settings.SLOT_GRID_DAYS
+    SLOT_GRID_REFRESH_INTERVAL = app_settings.SLOT_GRID_REFRESH_INTERVAL
+    
     @property
     def upload_base_dir(self):
         return self.UPLOAD_DIR
@@ -94,6 +120,63 @@ class ServiceUpdate(BaseModel):
     is_active: Optional[bool] = None
     translations: Optional[List[TranslationBase]] = None
 
+# Pydantic модели для перерывов мастеров
+class MasterBreakCreate(BaseModel):
+    start_date: date
+    end_date: Optional[date] = None  # по умолчанию — один день
+    start_time: Optional[str] = None  # без времени — выходной на весь день
+    end_time: Optional[str] = None
+    reason: Optional[str] = ""
+
+class MasterBreakUpdate(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    reason: Optional[str] = None
+    whole_day: Optional[bool] = None  # True — убрать время и закрыть дни целиком
+
+# Pydantic модели для закрытий салона
+class SalonClosureCreate(BaseModel):
+    start_date: date
+    end_date: Optional[date] = None  # по умолчанию — один день
+    start_time: Optional[str] = None  # без времени — салон закрыт весь день
+    end_time: Optional[str] = None    # "16:00"–"24:00" — сокращённый день
+    reason: Optional[str] = ""
+
+class SalonClosureUpdate(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    reason: Optional[str] = None
+    whole_day: Optional[bool] = None
+
+# Pydantic модели для шаблонов графика
+class ScheduleTemplateDay(BaseModel):
+    day_of_week: int  # 0 — понедельник
+    start_time: str
+    end_time: str
+
+class ScheduleTemplateCreate(BaseModel):
+    name: str
+    description: Optional[str] = ""
+    days: List[ScheduleTemplateDay]  # дни недели без интервала — выходные
+
+class ScheduleTemplateUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    days: Optional[List[ScheduleTemplateDay]] = None
+
+class SchedulePeriod(BaseModel):
+    date_from: date
+    date_to: date
+
+class ScheduleTemplateApply(BaseModel):
+    master_ids: List[int]
+    periods: List[SchedulePeriod]
+    update_weekly: bool = False  # также заменить недельный график мастеров шаблоном
+
 # Pydantic модели для записей
 class AppointmentCreate(BaseModel):
     client_id: int
@@ -256,369 +339,33 @@ def get_unique_client_telegram_id(cursor):
     return max_id + 1
 
 def get_db_connection():
-    """Создание соединения с БД"""
-    conn = sqlite3.connect("salon.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Соединение с БД из общего пула (close() возвращает его в пул)"""
+    return db.connect()
+
+def get_readonly_connection():
+    """Соединение только для чтения для аналитики (отдельный пул, без блокировок записи)"""
+    return db.connect_readonly()
+
+def json_response(payload: Any) -> Response:
+    """JSON-ответ для больших списков: сериализация без jsonable_encoder"""
+    return Response(content=dumps_json(payload), media_type="application/json")
 
 def init_database():
-    """Инициализация базы данных"""
+    """Инициализация базы данных: применение недостающих миграций схемы"""
     try:
-        logger.info("Initializing database...")
-        
-        db_path = "salon.db"
-        
-        if not os.path.exists(db_path):
-            logger.info(f"Database file not found, creating: {db_path}")
-        
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # SQL команды для создания таблиц
-        tables_sql = [
-            # users
-            """CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                telegram_id INTEGER UNIQUE,
-                role TEXT NOT NULL,
-                first_name TEXT,
-                last_name TEXT,
-                phone TEXT,
-                email TEXT,
-                language TEXT DEFAULT 'ru',
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            );""",
-            
-            # masters
-            """CREATE TABLE IF NOT EXISTS masters (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                photo TEXT,
-                qualification TEXT,
-                description TEXT,
-                is_active INTEGER DEFAULT 1,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            );""",
-            
-            # master_work_schedule
-            """CREATE TABLE IF NOT EXISTS master_work_schedule (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                master_id INTEGER NOT NULL,
-                day_of_week INTEGER NOT NULL,
-                start_time TIME NOT NULL,
-                end_time TIME NOT NULL,
-                FOREIGN KEY (master_id) REFERENCES masters(id)
-            );""",
-            
-            # service_categories
-            """CREATE TABLE IF NOT EXISTS service_categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                parent_id INTEGER,
-                is_active INTEGER DEFAULT 1,
-                FOREIGN KEY (parent_id) REFERENCES service_categories(id)
-            );""",
-            
-            # service_category_translations
-            """CREATE TABLE IF NOT EXISTS service_category_translations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category_id INTEGER NOT NULL,
-                language TEXT NOT NULL,
-                title TEXT NOT NULL,
-                FOREIGN KEY (category_id) REFERENCES service_categories(id)
-            );""",
-            
-            # services
-            """CREATE TABLE IF NOT EXISTS services (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category_id INTEGER NOT NULL,
-                duration_minutes INTEGER NOT NULL,
-                price REAL NOT NULL,
-                is_active INTEGER DEFAULT 1,
-                FOREIGN KEY (category_id) REFERENCES service_categories(id)
-            );""",
-            
-            # service_translations
-            """CREATE TABLE IF NOT EXISTS service_translations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                service_id INTEGER NOT NULL,
-                language TEXT NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT,
-                FOREIGN KEY (service_id) REFERENCES services(id)
-            );""",
-            
-            # appointments
-            """CREATE TABLE IF NOT EXISTS appointments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER NOT NULL,
-                master_id INTEGER,
-                appointment_date DATE NOT NULL,
-                start_time TIME NOT NULL,
-                end_time TIME NOT NULL,
-                status TEXT NOT NULL DEFAULT 'pending',
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (client_id) REFERENCES users(id),
-                FOREIGN KEY (master_id) REFERENCES masters(id)
-            );""",
-            
-            # appointment_services
-            """CREATE TABLE IF NOT EXISTS appointment_services (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                appointment_id INTEGER NOT NULL,
-                service_id INTEGER NOT NULL,
-                FOREIGN KEY (appointment_id) REFERENCES appointments(id),
-                FOREIGN KEY (service_id) REFERENCES services(id)
-            );""",
-            
-            # master_services (НОВАЯ таблица для связи мастер-услуги)
-            """CREATE TABLE IF NOT EXISTS master_services (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                master_id INTEGER NOT NULL,
-                service_id INTEGER NOT NULL,
-                category_id INTEGER NOT NULL,
-                is_primary INTEGER DEFAULT 1,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (master_id) REFERENCES masters(id),
-                FOREIGN KEY (service_id) REFERENCES services(id),
-                FOREIGN KEY (category_id) REFERENCES service_categories(id),
-                UNIQUE(master_id, service_id)
-            );""",
-            
-            # reviews
-            """CREATE TABLE IF NOT EXISTS reviews (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                appointment_id INTEGER NOT NULL,
-                client_id INTEGER NOT NULL,
-                master_id INTEGER NOT NULL,
-                rating INTEGER NOT NULL,
-                text TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (appointment_id) REFERENCES appointments(id),
-                FOREIGN KEY (client_id) REFERENCES users(id),
-                FOREIGN KEY (master_id) REFERENCES masters(id)
-            );""",
-            
-            # review_photos
-            """CREATE TABLE IF NOT EXISTS review_photos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                review_id INTEGER NOT NULL,
-                photo_url TEXT NOT NULL,
-                FOREIGN KEY (review_id) REFERENCES reviews(id)
-            );""",
-            
-            # bonuses
-            """CREATE TABLE IF NOT EXISTS bonuses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER NOT NULL UNIQUE,
-                balance INTEGER DEFAULT 0,
-                FOREIGN KEY (client_id) REFERENCES users(id)
-            );""",
-            
-            # bonus_history
-            """CREATE TABLE IF NOT EXISTS bonus_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER NOT NULL,
-                amount INTEGER NOT NULL,
-                reason TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (client_id) REFERENCES users(id)
-            );""",
-            
-            # admin_logs
-            """CREATE TABLE IF NOT EXISTS admin_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                admin_id INTEGER NOT NULL,
-                action TEXT NOT NULL,
-                details TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (admin_id) REFERENCES users(id)
-            );"""
-        ]
-        
-        # Создаем таблицы
-        for sql in tables_sql:
-            try:
-                cursor.execute(sql)
-            except Exception as e:
-                logger.error(f"Error creating table: {e}")
-        
-        # Создаем индексы
-        indexes_sql = [
-            "CREATE INDEX IF NOT EXISTS idx_masters_user_id ON masters(user_id);",
-            "CREATE INDEX IF NOT EXISTS idx_masters_is_active ON masters(is_active);",
-            "CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);",
-            "CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);",
-            "CREATE INDEX IF NOT EXISTS idx_service_categories_parent_id ON service_categories(parent_id);",
-            "CREATE INDEX IF NOT EXISTS idx_service_categories_is_active ON service_categories(is_active);",
-            "CREATE INDEX IF NOT EXISTS idx_services_category_id ON services(category_id);",
-            "CREATE INDEX IF NOT EXISTS idx_services_is_active ON services(is_active);",
-            # Индексы для новой таблицы master_services
-            "CREATE INDEX IF NOT EXISTS idx_master_services_master_id ON master_services(master_id);",
-            "CREATE INDEX IF NOT EXISTS idx_master_services_service_id ON master_services(service_id);",
-            "CREATE INDEX IF NOT EXISTS idx_master_services_category_id ON master_services(category_id);",
-        ]
-        
-        for sql in indexes_sql:
-            try:
-                cursor.execute(sql)
-            except Exception as e:
-                logger.error(f"Error creating index: {e}")
-        
-        conn.commit()
-        
-        # Создаем тестового мастера если таблица пуста
-        cursor.execute("SELECT COUNT(*) as count FROM masters")
-        count = cursor.fetchone()["count"]
-        
-        if count == 0:
-            logger.info("Creating test master...")
-            # Генерируем уникальный telegram_id для тестового мастера
-            telegram_id = 1000
-            
-            # Проверяем, существует ли уже пользователь с таким telegram_id
-            cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-            existing_user = cursor.fetchone()
-            
-            if not existing_user:
-                # Создаем пользователя для мастера
-                cursor.execute("""
-                    INSERT INTO users (telegram_id, role, first_name, last_name, phone, email, language)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (telegram_id, 'master', 'Иван', 'Иванов', '+79991234567', 'master@example.com', 'ru'))
-                
-                user_id = cursor.lastrowid
-                
-                # Создаем мастера
-                cursor.execute("""
-                    INSERT INTO masters (user_id, qualification, description, is_active)
-                    VALUES (?, ?, ?, ?)
-                """, (user_id, 'Топ-мастер', 'Опытный мастер с 10-летним стажем', 1))
-                
-                conn.commit()
-                logger.info("Test master created successfully")
-            else:
-                logger.info("Test master already exists")
-        
-        # Создаем тестовые категории если таблица пуста
-        cursor.execute("SELECT COUNT(*) as count FROM service_categories")
-        category_count = cursor.fetchone()["count"]
-        
-        if category_count == 0:
-            logger.info("Creating test categories...")
-            
-            # Создаем корневые категории
-            cursor.execute("""
-                INSERT INTO service_categories (parent_id, is_active) 
-                VALUES (NULL, 1)
-            """)
-            hair_category_id = cursor.lastrowid
-            
-            cursor.execute("""
-                INSERT INTO service_categories (parent_id, is_active) 
-                VALUES (NULL, 1)
-            """)
-            nails_category_id = cursor.lastrowid
-            
-            # Создаем подкатегории
-            cursor.execute("""
-                INSERT INTO service_categories (parent_id, is_active) 
-                VALUES (?, 1)
-            """, (hair_category_id,))
-            womens_hair_id = cursor.lastrowid
-            
-            cursor.execute("""
-                INSERT INTO service_categories (parent_id, is_active) 
-                VALUES (?, 1)
-            """, (hair_category_id,))
-            mens_hair_id = cursor.lastrowid
-            
-            # Добавляем переводы для категорий
-            categories_translations = [
-                (hair_category_id, 'ru', 'Парикмахерские услуги'),
-                (hair_category_id, 'en', 'Hair Services'),
-                (hair_category_id, 'tr', 'Kuaför Hizmetleri'),
-                (nails_category_id, 'ru', 'Маникюр и педикюр'),
-                (nails_category_id, 'en', 'Manicure & Pedicure'),
-                (nails_category_id, 'tr', 'Manikür & Pedikür'),
-                (womens_hair_id, 'ru', 'Женская стрижка'),
-                (womens_hair_id, 'en', 'Women\'s Haircut'),
-                (womens_hair_id, 'tr', 'Kadın Saç Kesimi'),
-                (mens_hair_id, 'ru', 'Мужская стрижка'),
-                (mens_hair_id, 'en', 'Men\'s Haircut'),
-                (mens_hair_id, 'tr', 'Erkek Saç Kesimi'),
-            ]
-            
-            for cat_id, lang, title in categories_translations:
-                cursor.execute("""
-                    INSERT INTO service_category_translations (category_id, language, title)
-                    VALUES (?, ?, ?)
-                """, (cat_id, lang, title))
-            
-            conn.commit()
-            logger.info("Test categories created successfully")
-        
-        # Создаем тестового клиента если таблица пуста
-        cursor.execute("SELECT COUNT(*) as count FROM users WHERE role = 'client'")
-        client_count = cursor.fetchone()["count"]
-        
-        if client_count == 0:
-            logger.info("Creating test clients...")
-            
-            # Создаем тестовых клиентов
-            test_clients = [
-                (2001, 'client', 'Мария', 'Петрова', '+79997654321', 'client1@example.com', 'ru'),
-                (2002, 'client', 'Иван', 'Иванов', '+79991234567', 'client2@example.com', 'ru'),
-                (2003, 'client', 'Анна', 'Сидорова', '+79992345678', 'client3@example.com', 'ru'),
-            ]
-            
-            for telegram_id, role, first_name, last_name, phone, email, language in test_clients:
-                cursor.execute("""
-                    INSERT INTO users (telegram_id, role, first_name, last_name, phone, email, language)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (telegram_id, role, first_name, last_name, phone, email, language))
-            
-            conn.commit()
-            logger.info("Test clients created successfully")
-
-        # Создаем тестовые услуги если таблица пуста
-        cursor.execute("SELECT COUNT(*) as count FROM services")
-        services_count = cursor.fetchone()["count"]
-        
-        if services_count == 0 and 'womens_hair_id' in locals() and 'mens_hair_id' in locals():
-            logger.info("Creating test services...")
-            
-            # Создаем тестовые услуги
-            test_services = [
-                (womens_hair_id, 60, 1500.0, 1),
-                (womens_hair_id, 90, 2000.0, 1),
-                (mens_hair_id, 30, 800.0, 1),
-                (mens_hair_id, 45, 1200.0, 1),
-            ]
-            
-            for category_id, duration, price, is_active in test_services:
-                cursor.execute("""
-                    INSERT INTO services (category_id, duration_minutes, price, is_active)
-                    VALUES (?, ?, ?, ?)
-                """, (category_id, duration, price, is_active))
-                
-                service_id = cursor.lastrowid
-                
-                # Добавляем переводы для услуги
-                cursor.execute("""
-                    INSERT INTO service_translations (service_id, language, title, description)
-                    VALUES (?, ?, ?, ?)
-                """, (service_id, 'ru', f'Тестовая услуга {service_id}', f'Описание тестовой услуги {service_id}'))
+        conn = get_db_connection()
+        try:
+            current = get_schema_version(conn)
+            if current >= latest_version():
+                logger.info(f"Database schema is up to date (version {current})")
+                return True
             
-            conn.commit()
-            logger.info("Test services created successfully")
-        
-        cursor.close()
-        conn.close()
-        
-        logger.info("Database initialized successfully")
-        return True
+            logger.info(f"Migrating {db.dialect} database from version {current} to {latest_version()}...")
+            applied = migrate(conn)
+            logger.info(f"Database initialized successfully, applied {len(applied)} migration(s)")
+            return True
+        finally:
+            conn.close()
         
     except Exception as e:
         logger.error(f"Error initializing database: {e}", exc_info=True)
@@ -638,11 +385,42 @@ async def lifespan(app: FastAPI):
         logger.error("Failed to initialize database")
         raise RuntimeError("Database initialization failed")
     
+    # Обслуживание файла SQLite в тихие часы (для PostgreSQL — средствами сервера)
+    maintenance = None
+    if db.dialect == SQLITE and settings.DB_MAINTENANCE_ENABLED:
+        maintenance = MaintenanceScheduler(
+            db.db_path,
+            quiet_hours=parse_quiet_hours(settings.DB_MAINTENANCE_HOURS),
+            interval=settings.DB_MAINTENANCE_INTERVAL,
+            busy_timeout=max(settings.DB_BUSY_TIMEOUT, 30.0),
+            profile=db.profile,
+            vacuum_pages=settings.DB_MAINTENANCE_VACUUM_PAGES,
+        )
+        maintenance.start()
+    app.state.maintenance = maintenance
+    
+    # Сетка свободного времени на ближайшие дни (app.slot_grid)
+    grid_refresher = None
+    if settings.SLOT_GRID_DAYS > 0:
+        grid_refresher = slot_grid.SlotGridRefresher(
+            db.write,
+            days=settings.SLOT_GRID_DAYS,
+            buffer=settings.APPOINTMENT_BUFFER_MINUTES,
+            interval=settings.SLOT_GRID_REFRESH_INTERVAL,
+        )
+        grid_refresher.start()
+    app.state.slot_grid = grid_refresher
+    
     logger.info("Application initialized successfully")
     
     yield
     
     logger.info("Shutting down Beauty Salon Admin API")
+    if maintenance is not None:
+        maintenance.stop(timeout=5)
+    if grid_refresher is not None:
+        grid_refresher.stop(timeout=5)
+    await db.aclose()
 
 # Создание FastAPI приложения
 app = FastAPI(
@@ -673,6 +451,7 @@ from fastapi import APIRouter
 analytics_router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 @analytics_router.get("/dashboard")
+@offload_readonly
 async def get_dashboard_stats(
     period_days: int = Query(30, ge=1, le=365)
 ):
@@ -682,7 +461,7 @@ async def get_dashboard_stats(
     logger.info(f"✅ Dashboard request")
     
     try:
-        conn = get_db_connection()
+        conn = get_readonly_connection()
         cursor = conn.cursor()
         
         # Рассчитываем дату начала периода
@@ -816,6 +595,7 @@ async def get_dashboard_stats(
         }
 
 @analytics_router.get("/masters-load")
+@offload_readonly
 async def get_masters_load(
     days: int = Query(7, ge=1, le=30)
 ):
@@ -825,7 +605,7 @@ async def get_masters_load(
     logger.info(f"✅ Masters load request")
     
     try:
-        conn = get_db_connection()
+        conn = get_readonly_connection()
         cursor = conn.cursor()
         
         # Рассчитываем дату начала периода
@@ -889,6 +669,7 @@ async def get_masters_load(
         }
 
 @analytics_router.get("/services-popularity")
+@offload_readonly
 async def get_services_popularity(
     period_days: int = Query(30, ge=1, le=365)
 ):
@@ -898,7 +679,7 @@ async def get_services_popularity(
     logger.info(f"✅ Services popularity request")
     
     try:
-        conn = get_db_connection()
+        conn = get_readonly_connection()
         cursor = conn.cursor()
         
         start_date = date.today() - timedelta(days=period_days)
@@ -944,6 +725,7 @@ async def get_services_popularity(
         }
 
 @analytics_router.get("/recent-appointments")
+@offload_readonly
 async def get_recent_appointments(
     limit: int = Query(10, ge=1, le=50)
 ):
@@ -951,7 +733,7 @@ async def get_recent_appointments(
     Получение последних записей
     """
     try:
-        conn = get_db_connection()
+        conn = get_readonly_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -1021,6 +803,7 @@ app.include_router(analytics_router)
 # ==================== API ДЛЯ СВЯЗИ МАСТЕР-УСЛУГИ ====================
 
 @app.get("/masters/{master_id}/services")
+@offload_db
 async def get_master_services(
     master_id: int,
     language: str = Query("ru")
@@ -1080,6 +863,7 @@ async def get_master_services(
 
 
 @app.post("/masters/{master_id}/services")
+@offload_db
 async def add_service_to_master(
     master_id: int,
     service_id: str = Form(...),  # Получаем как строку
@@ -1151,6 +935,7 @@ async def add_service_to_master(
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.delete("/masters/{master_id}/services/{service_id}")
+@offload_db
 async def remove_service_from_master(
     master_id: int,
     service_id: int
@@ -1190,6 +975,7 @@ async def remove_service_from_master(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/services/{service_id}/masters")
+@offload_db
 async def get_service_masters(
     service_id: int,
     page: int = Query(1, ge=1),
@@ -1260,6 +1046,7 @@ async def get_service_masters(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/masters/{master_id}/services/batch")
+@offload_db
 async def add_services_to_master(
     master_id: int,
     batch_data: MasterServicesBatchAdd
@@ -1276,44 +1063,29 @@ async def add_services_to_master(
         if not cursor.fetchone():
             raise HTTPException(status_code=404, detail="Мастер не найден")
         
-        added_count = 0
         failed_services = []
         
+        # Услуги и уже привязанные к мастеру услуги — по одному запросу
+        services = repository.get_services_by_ids(conn, batch_data.service_ids)
+        cursor.execute("SELECT service_id FROM master_services WHERE master_id = ?", (master_id,))
+        linked = {row[0] for row in cursor.fetchall()}
+        
+        rows = []
         for service_id in batch_data.service_ids:
-            try:
-                # Проверяем существование услуги
-                cursor.execute("""
-                    SELECT id, category_id FROM services 
-                    WHERE id = ? AND is_active = 1
-                """, (service_id,))
-                
-                service = cursor.fetchone()
-                if not service:
-                    failed_services.append({"service_id": service_id, "reason": "Не найдена или не активна"})
-                    continue
-                
-                category_id = service[1]
-                
-                # Проверяем, не привязана ли уже
-                cursor.execute("""
-                    SELECT id FROM master_services 
-                    WHERE master_id = ? AND service_id = ?
-                """, (master_id, service_id))
-                
-                if cursor.fetchone():
-                    failed_services.append({"service_id": service_id, "reason": "Уже привязана"})
-                    continue
-                
-                # Добавляем связь
-                cursor.execute("""
-                    INSERT INTO master_services (master_id, service_id, category_id, is_primary)
-                    VALUES (?, ?, ?, ?)
-                """, (master_id, service_id, category_id, 1 if batch_data.is_primary else 0))
-                
-                added_count += 1
-                
-            except Exception as e:
-                failed_services.append({"service_id": service_id, "reason": str(e)})
+            service = services.get(service_id)
+            if not service:
+                failed_services.append({"service_id": service_id, "reason": "Не найдена или не активна"})
+            elif service_id in linked:
+                failed_services.append({"service_id": service_id, "reason": "Уже привязана"})
+            else:
+                linked.add(service_id)
+                rows.append((master_id, service_id, service["category_id"], 1 if batch_data.is_primary else 0))
+        
+        # Добавляем связи одним запросом
+        added_count = bulk.insert_rows(
+            conn, "master_services", ("master_id", "service_id", "category_id", "is_primary"), rows,
+            ignore_conflicts=True,
+        )
         
         conn.commit()
         conn.close()
@@ -1334,6 +1106,7 @@ async def add_services_to_master(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/masters/{master_id}/available-services")
+@offload_db
 async def get_available_services_for_master(
     master_id: int,
     language: str = Query("ru"),
@@ -1412,7 +1185,29 @@ async def get_available_services_for_master(
 
 # ==================== ОБНОВЛЕННЫЕ ENDPOINT ДЛЯ МАСТЕРОВ ====================
 
+MASTERS_FILTERS = (
+    ("is_active", "m.is_active = ?"),
+    ("search", "(u.first_name LIKE ? OR u.last_name LIKE ? OR u.phone LIKE ? OR m.qualification LIKE ? OR u.email LIKE ?)"),
+)
+
+MASTERS_LIST = statements.template("masters.list", """
+    SELECT 
+        m.*, 
+        u.first_name, u.last_name, u.phone, u.email, u.telegram_id,
+        (SELECT COUNT(*) FROM master_services ms WHERE ms.master_id = m.id) as services_count
+    FROM masters m
+    JOIN users u ON m.user_id = u.id
+    WHERE u.role = 'master'
+""", MASTERS_FILTERS, " ORDER BY m.created_at DESC LIMIT ? OFFSET ?")
+
+MASTERS_COUNT = statements.template(
+    "masters.count",
+    "SELECT COUNT(*) as count FROM masters m JOIN users u ON m.user_id = u.id WHERE u.role = 'master'",
+    MASTERS_FILTERS,
+)
+
 @app.get("/masters")
+@offload_db
 async def get_masters(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
@@ -1426,82 +1221,31 @@ async def get_masters(
     offset = (page - 1) * per_page
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Базовый запрос с количеством услуг
-        query = """
-            SELECT 
-                m.*, 
-                u.first_name, u.last_name, u.phone, u.email, u.telegram_id,
-                (SELECT COUNT(*) FROM master_services ms WHERE ms.master_id = m.id) as services_count
-            FROM masters m
-            JOIN users u ON m.user_id = u.id
-            WHERE u.role = 'master'
-        """
-        
-        count_query = "SELECT COUNT(*) as count FROM masters m JOIN users u ON m.user_id = u.id WHERE u.role = 'master'"
-        params = []
-        count_params = []
-        
-        if is_active is not None:
-            query += " AND m.is_active = ?"
-            count_query += " AND m.is_active = ?"
-            params.append(int(is_active))
-            count_params.append(int(is_active))
-        
-        if search:
-            query += " AND (u.first_name LIKE ? OR u.last_name LIKE ? OR u.phone LIKE ? OR m.qualification LIKE ? OR u.email LIKE ?)"
-            count_query += " AND (u.first_name LIKE ? OR u.last_name LIKE ? OR u.phone LIKE ? OR m.qualification LIKE ? OR u.email LIKE ?)"
-            search_term = f"%{search}%"
-            params.extend([search_term, search_term, search_term, search_term, search_term])
-            count_params.extend([search_term, search_term, search_term, search_term, search_term])
-        
-        query += " ORDER BY m.created_at DESC LIMIT ? OFFSET ?"
-        params.extend([per_page, offset])
+        filters = {
+            "is_active": int(is_active) if is_active is not None else None,
+            "search": f"%{search}%" if search else None,
+        }
         
-        cursor.execute(query, tuple(params))
-        masters = []
-        for row in cursor.fetchall():
-            master_dict = {}
-            for key in row.keys():
-                master_dict[key] = row[key]
-            
+        MASTERS_LIST.execute(cursor, filters, tail=(per_page, offset))
+        masters = fetch_dicts(cursor)
+        for master_dict in masters:
             # Добавляем URL фото
             if master_dict.get("photo"):
                 master_dict["photo_url"] = f"{settings.BASE_URL}/uploads/masters/{master_dict['photo']}"
             else:
                 master_dict["photo_url"] = None
-            
-            masters.append(master_dict)
         
-        # Если запрошены услуги, загружаем их для каждого мастера
+        # Если запрошены услуги, загружаем их одним запросом для всех мастеров
         if with_services:
+            services_by_master = repository.get_services_for_masters(conn, [m["id"] for m in masters])
             for master in masters:
-                cursor.execute("""
-                    SELECT 
-                        ms.service_id, ms.category_id, ms.is_primary,
-                        s.price, s.duration_minutes,
-                        st.title as service_title
-                    FROM master_services ms
-                    JOIN services s ON ms.service_id = s.id
-                    LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = 'ru'
-                    WHERE ms.master_id = ?
-                    ORDER BY ms.is_primary DESC
-                """, (master["id"],))
-                
-                services = []
-                for service_row in cursor.fetchall():
-                    service_dict = {}
-                    for key in service_row.keys():
-                        service_dict[key] = service_row[key]
-                    services.append(service_dict)
-                
-                master["services"] = services
+                master["services"] = services_by_master.get(master["id"], [])
         
         # Общее количество
-        cursor.execute(count_query, tuple(count_params))
+        MASTERS_COUNT.execute(cursor, filters)
         count_result = cursor.fetchone()
         total = count_result[0] if count_result else 0
         
@@ -1509,13 +1253,13 @@ async def get_masters(
         
         logger.info(f"Found {len(masters)} masters, total: {total}")
         
-        return {
+        return json_response({
             "items": masters,
             "total": total,
             "page": page,
             "per_page": per_page,
             "total_pages": (total + per_page - 1) // per_page if per_page > 0 else 0
-        }
+        })
         
     except Exception as e:
         logger.error(f"Error fetching masters: {e}", exc_info=True)
@@ -1529,7 +1273,33 @@ async def get_masters(
 
 # ==================== APPOINTMENTS API ====================
 
+APPOINTMENTS_FILTERS = (
+    ("start_date", "a.appointment_date >= ?"),
+    ("end_date", "a.appointment_date <= ?"),
+    ("master_id", "a.master_id = ?"),
+    ("client_id", "a.client_id = ?"),
+    ("status", "a.status = ?"),
+)
+
+APPOINTMENTS_LIST = statements.template("appointments.list", """
+    SELECT a.*, 
+           u1.first_name as client_first_name, u1.last_name as client_last_name,
+           u2.first_name as master_first_name, u2.last_name as master_last_name
+    FROM appointments a
+    LEFT JOIN users u1 ON a.client_id = u1.id
+    LEFT JOIN masters m ON a.master_id = m.id
+    LEFT JOIN users u2 ON m.user_id = u2.id
+    WHERE 1=1
+""", APPOINTMENTS_FILTERS, " ORDER BY a.appointment_date DESC, a.start_time DESC LIMIT ? OFFSET ?")
+
+APPOINTMENTS_COUNT = statements.template(
+    "appointments.count",
+    "SELECT COUNT(*) as count FROM appointments a WHERE 1=1",
+    APPOINTMENTS_FILTERS,
+)
+
 @app.get("/appointments")
+@offload_db
 async def get_appointments(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
@@ -1545,85 +1315,27 @@ async def get_appointments(
     offset = (page - 1) * per_page
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
-        query = """
-            SELECT a.*, 
-                   u1.first_name as client_first_name, u1.last_name as client_last_name,
-                   u2.first_name as master_first_name, u2.last_name as master_last_name
-            FROM appointments a
-            LEFT JOIN users u1 ON a.client_id = u1.id
-            LEFT JOIN masters m ON a.master_id = m.id
-            LEFT JOIN users u2 ON m.user_id = u2.id
-            WHERE 1=1
-        """
-        
-        count_query = "SELECT COUNT(*) as count FROM appointments WHERE 1=1"
-        params = []
-        count_params = []
-        
-        if start_date:
-            query += " AND a.appointment_date >= ?"
-            count_query += " AND appointment_date >= ?"
-            params.append(start_date)
-            count_params.append(start_date)
-        
-        if end_date:
-            query += " AND a.appointment_date <= ?"
-            count_query += " AND appointment_date <= ?"
-            params.append(end_date)
-            count_params.append(end_date)
-        
-        if master_id:
-            query += " AND a.master_id = ?"
-            count_query += " AND master_id = ?"
-            params.append(master_id)
-            count_params.append(master_id)
-        
-        if client_id:
-            query += " AND a.client_id = ?"
-            count_query += " AND client_id = ?"
-            params.append(client_id)
-            count_params.append(client_id)
-        
-        if status:
-            query += " AND a.status = ?"
-            count_query += " AND status = ?"
-            params.append(status)
-            count_params.append(status)
-        
-        query += " ORDER BY a.appointment_date DESC, a.start_time DESC LIMIT ? OFFSET ?"
-        params.extend([per_page, offset])
+        filters = {
+            "start_date": start_date or None,
+            "end_date": end_date or None,
+            "master_id": master_id or None,
+            "client_id": client_id or None,
+            "status": status or None,
+        }
         
-        cursor.execute(query, tuple(params))
-        appointments = []
-        for row in cursor.fetchall():
-            appointment_dict = {}
-            for key in row.keys():
-                appointment_dict[key] = row[key]
-            appointments.append(appointment_dict)
+        APPOINTMENTS_LIST.execute(cursor, filters, tail=(per_page, offset))
+        appointments = fetch_dicts(cursor)
         
-        # Добавляем услуги для каждой записи
+        # Добавляем услуги всех записей одним запросом
+        services_by_appointment = repository.get_services_for_appointments(conn, [a["id"] for a in appointments])
         for appointment in appointments:
-            cursor.execute("""
-                SELECT s.id, st.title, s.duration_minutes, s.price
-                FROM appointment_services aps
-                JOIN services s ON aps.service_id = s.id
-                LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = 'ru'
-                WHERE aps.appointment_id = ?
-            """, (appointment["id"],))
-            services = []
-            for row in cursor.fetchall():
-                service_dict = {}
-                for key in row.keys():
-                    service_dict[key] = row[key]
-                services.append(service_dict)
-            appointment["services"] = services
+            appointment["services"] = services_by_appointment.get(appointment["id"], [])
         
         # Общее количество
-        cursor.execute(count_query, tuple(count_params))
+        APPOINTMENTS_COUNT.execute(cursor, filters)
         count_result = cursor.fetchone()
         total = count_result[0] if count_result else 0
         
@@ -1631,13 +1343,13 @@ async def get_appointments(
         
         logger.info(f"Found {len(appointments)} appointments, total: {total}")
         
-        return {
+        return json_response({
             "items": appointments,
             "total": total,
             "page": page,
             "per_page": per_page,
             "total_pages": (total + per_page - 1) // per_page if per_page > 0 else 0
-        }
+        })
     
     except Exception as e:
         logger.error(f"Error fetching appointments: {e}", exc_info=True)
@@ -1650,12 +1362,12 @@ async def get_appointments(
         }
 
 @app.post("/appointments")
+@offload_db
 async def create_appointment(appointment_data: AppointmentCreate):
     """Создание новой записи"""
     logger.info(f"Create appointment request: {appointment_data}")
     
-    try:
-        conn = sqlite3.connect("salon.db")
+    def _write(conn):
         cursor = conn.cursor()
         
         # Проверяем существование клиента
@@ -1672,19 +1384,29 @@ async def create_appointment(appointment_data: AppointmentCreate):
                 raise HTTPException(status_code=400, detail="Мастер не найден или не активен")
         
         # Рассчитываем общую длительность услуг
-        total_duration = 0
-        
+        services = repository.get_services_by_ids(conn, appointment_data.services)
         for service_id in appointment_data.services:
-            cursor.execute("SELECT duration_minutes FROM services WHERE id = ? AND is_active = 1", (service_id,))
-            service = cursor.fetchone()
-            if not service:
+            if service_id not in services:
                 raise HTTPException(status_code=400, detail=f"Услуга с ID {service_id} не найдена или не активна")
-            total_duration += service[0]
-        
-        # Рассчитываем время окончания
-        start_dt = datetime.strptime(appointment_data.start_time, "%H:%M")
-        end_dt = datetime.combine(date.today(), start_dt.time()) + timedelta(minutes=total_duration)
-        end_time = end_dt.strftime("%H:%M")
+        total_duration, _ = repository.services_totals(services, appointment_data.services)
+        
+        if appointment_data.master_id and appointment_data.status in repository.BUSY_STATUSES:
+            # Проверка пересечений в той же транзакции, что и вставка: двойная запись невозможна
+            end_time = booking.ensure_slot_free(
+                conn,
+                appointment_data.master_id,
+                appointment_data.appointment_date.isoformat(),
+                appointment_data.appointment_date.weekday(),
+                appointment_data.start_time,
+                total_duration,
+                step=settings.SLOT_STEP_MINUTES,
+                buffer=settings.APPOINTMENT_BUFFER_MINUTES,
+            )
+        else:
+            # Рассчитываем время окончания
+            start_dt = datetime.strptime(appointment_data.start_time, "%H:%M")
+            end_dt = datetime.combine(date.today(), start_dt.time()) + timedelta(minutes=total_duration)
+            end_time = end_dt.strftime("%H:%M")
         
         # Создаем запись
         cursor.execute("""
@@ -1705,17 +1427,24 @@ async def create_appointment(appointment_data: AppointmentCreate):
         if not appointment_id:
             raise HTTPException(status_code=500, detail="Не удалось создать запись")
         
-        # Добавляем услуги к записи
-        for service_id in appointment_data.services:
-            cursor.execute("""
-                INSERT INTO appointment_services (appointment_id, service_id)
-                VALUES (?, ?)
-            """, (appointment_id, service_id))
+        if appointment_data.master_id and appointment_data.status in repository.BUSY_STATUSES:
+            # Запись занимает время в сетке слотов той же транзакцией
+            slot_grid.occupy(
+                conn, appointment_data.master_id, appointment_data.appointment_date.isoformat(),
+                appointment_data.start_time, end_time, settings.APPOINTMENT_BUFFER_MINUTES,
+            )
         
-        conn.commit()
+        # Добавляем услуги к записи одним запросом
+        bulk.insert_rows(
+            conn, "appointment_services", ("appointment_id", "service_id"),
+            [(appointment_id, service_id) for service_id in appointment_data.services],
+        )
         
-        # Упрощенный ответ без сложного преобразования
-        conn.close()
+        return appointment_id
+    
+    try:
+        # Проверки и вставка выполняются одной транзакцией потока-писателя
+        appointment_id = db.write(_write)
         
         logger.info(f"Appointment {appointment_id} created successfully")
         
@@ -1725,6 +1454,9 @@ async def create_appointment(appointment_data: AppointmentCreate):
             "appointment_id": appointment_id
         }
     
+    except booking.SlotConflict as e:
+        logger.info(f"Appointment rejected: {e}")
+        raise HTTPException(status_code=409, detail=e.as_dict())
     except HTTPException:
         raise
     except Exception as e:
@@ -1732,12 +1464,12 @@ async def create_appointment(appointment_data: AppointmentCreate):
         raise HTTPException(status_code=500, detail=f"Ошибка при создании записи: {str(e)}")
 
 @app.put("/appointments/{appointment_id}")
+@offload_db
 async def update_appointment(appointment_id: int, appointment_data: AppointmentUpdate):
     """Обновление записи"""
     logger.info(f"Update appointment {appointment_id} request")
     
-    try:
-        conn = sqlite3.connect("salon.db")
+    def _write(conn):
         cursor = conn.cursor()
         
         # Проверяем существование записи
@@ -1790,19 +1522,58 @@ async def update_appointment(appointment_id: int, appointment_data: AppointmentU
             update_fields.append("status = ?")
             params.append(appointment_data.status)
         
+        # Перенос к мастеру/на дату/время или возврат в занятый статус (например,
+        # отменённой записи) — проверка пересечений в той же транзакции
+        moved = any(value is not None for value in (
+            appointment_data.master_id, appointment_data.appointment_date, appointment_data.start_time
+        ))
+        new_master_id = appointment_data.master_id or existing_appointment["master_id"]
+        new_status = appointment_data.status or existing_appointment["status"]
+        became_busy = existing_appointment["status"] not in repository.BUSY_STATUSES
+        if (moved or became_busy) and new_master_id and new_status in repository.BUSY_STATUSES:
+            new_date = appointment_data.appointment_date or date.fromisoformat(str(existing_appointment["appointment_date"]))
+            new_start = appointment_data.start_time or existing_appointment["start_time"]
+            duration = availability.to_minutes(existing_appointment["end_time"]) - availability.to_minutes(existing_appointment["start_time"])
+            if appointment_data.start_time is not None:
+                duration = total_duration
+            booking.ensure_slot_free(
+                conn,
+                new_master_id,
+                new_date.isoformat(),
+                new_date.weekday(),
+                new_start,
+                duration,
+                step=settings.SLOT_STEP_MINUTES,
+                buffer=settings.APPOINTMENT_BUFFER_MINUTES,
+                exclude_appointment_id=appointment_id,
+            )
+        
         if update_fields:
             params.append(appointment_id)
             cursor.execute(
                 f"UPDATE appointments SET {', '.join(update_fields)} WHERE id = ?",
                 tuple(params)
             )
-        
-        conn.commit()
-        conn.close()
+            # Сетка слотов: старый и новый мастер-день пересчитываются той же транзакцией
+            cursor.execute("SELECT master_id, appointment_date FROM appointments WHERE id = ?", (appointment_id,))
+            updated = fetch_dict(cursor)
+            days = {
+                (existing_appointment["master_id"], str(existing_appointment["appointment_date"])),
+                (updated["master_id"], str(updated["appointment_date"])),
+            }
+            for master_id, day in days:
+                if master_id:
+                    slot_grid.refresh_day(conn, master_id, day, settings.APPOINTMENT_BUFFER_MINUTES)
+    
+    try:
+        db.write(_write)
         
         logger.info(f"Appointment {appointment_id} updated successfully")
         return {"message": "Запись успешно обновлена"}
     
+    except booking.SlotConflict as e:
+        logger.info(f"Appointment {appointment_id} update rejected: {e}")
+        raise HTTPException(status_code=409, detail=e.as_dict())
     except HTTPException:
         raise
     except Exception as e:
@@ -1810,6 +1581,7 @@ async def update_appointment(appointment_id: int, appointment_data: AppointmentU
         raise HTTPException(status_code=500, detail=f"Ошибка при обновлении записи: {str(e)}")
 
 @app.put("/appointments/{appointment_id}/status")
+@offload_db
 async def update_appointment_status(
     appointment_id: int,
     status: str = Query(..., description="Новый статус")
@@ -1817,8 +1589,7 @@ async def update_appointment_status(
     """Обновление статуса записи"""
     logger.info(f"Update appointment {appointment_id} status to {status}")
     
-    try:
-        conn = sqlite3.connect("salon.db")
+    def _write(conn):
         cursor = conn.cursor()
         
         # Проверяем существование записи
@@ -1831,16 +1602,42 @@ async def update_appointment_status(
         if status not in valid_statuses:
             raise HTTPException(status_code=400, detail=f"Недопустимый статус. Допустимые значения: {', '.join(valid_statuses)}")
         
+        master_id = existing_appointment["master_id"]
+        if (master_id and status in repository.BUSY_STATUSES
+                and existing_appointment["status"] not in repository.BUSY_STATUSES):
+            # Запись снова занимает время (например, восстановлена после отмены) —
+            # проверка пересечений в той же транзакции, как при создании
+            appointment_date = date.fromisoformat(str(existing_appointment["appointment_date"]))
+            booking.ensure_slot_free(
+                conn,
+                master_id,
+                appointment_date.isoformat(),
+                appointment_date.weekday(),
+                existing_appointment["start_time"],
+                availability.to_minutes(existing_appointment["end_time"]) - availability.to_minutes(existing_appointment["start_time"]),
+                step=settings.SLOT_STEP_MINUTES,
+                buffer=settings.APPOINTMENT_BUFFER_MINUTES,
+                exclude_appointment_id=appointment_id,
+            )
+        
         cursor.execute("""
             UPDATE appointments SET status = ? WHERE id = ?
         """, (status, appointment_id))
-        
-        conn.commit()
-        conn.close()
+        if existing_appointment["master_id"]:
+            slot_grid.refresh_day(
+                conn, existing_appointment["master_id"], str(existing_appointment["appointment_date"]),
+                settings.APPOINTMENT_BUFFER_MINUTES,
+            )
+    
+    try:
+        db.write(_write)
         
         logger.info(f"Appointment {appointment_id} status updated to {status}")
         return {"message": "Статус записи успешно обновлен"}
     
+    except booking.SlotConflict as e:
+        logger.info(f"Appointment {appointment_id} status change rejected: {e}")
+        raise HTTPException(status_code=409, detail=e.as_dict())
     except HTTPException:
         raise
     except Exception as e:
@@ -1848,12 +1645,12 @@ async def update_appointment_status(
         raise HTTPException(status_code=500, detail=f"Ошибка при обновлении статуса записи: {str(e)}")
 
 @app.delete("/appointments/{appointment_id}")
+@offload_db
 async def delete_appointment(appointment_id: int):
     """Удаление записи"""
     logger.info(f"Delete appointment {appointment_id} request")
     
-    try:
-        conn = sqlite3.connect("salon.db")
+    def _write(conn):
         cursor = conn.cursor()
         
         # Проверяем существование записи
@@ -1867,9 +1664,14 @@ async def delete_appointment(appointment_id: int):
         
         # Удаляем запись
         cursor.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
-        
-        conn.commit()
-        conn.close()
+        if existing_appointment["master_id"]:
+            slot_grid.refresh_day(
+                conn, existing_appointment["master_id"], str(existing_appointment["appointment_date"]),
+                settings.APPOINTMENT_BUFFER_MINUTES,
+            )
+    
+    try:
+        db.write(_write)
         
         logger.info(f"Appointment {appointment_id} deleted successfully")
         return {"message": "Запись успешно удалена"}
@@ -1883,12 +1685,12 @@ async def delete_appointment(appointment_id: int):
 # ==================== ДОПОЛНИТЕЛЬНЫЕ ENDPOINTS ДЛЯ УПРАВЛЕНИЯ УСЛУГАМИ ЗАПИСИ ====================
 
 @app.delete("/appointments/{appointment_id}/services")
+@offload_db
 async def delete_appointment_services(appointment_id: int):
     """Удаление всех услуг записи"""
     logger.info(f"Delete appointment {appointment_id} services")
     
-    try:
-        conn = sqlite3.connect("salon.db")
+    def _write(conn):
         cursor = conn.cursor()
         
         # Проверяем существование записи
@@ -1898,9 +1700,9 @@ async def delete_appointment_services(appointment_id: int):
         
         # Удаляем услуги
         cursor.execute("DELETE FROM appointment_services WHERE appointment_id = ?", (appointment_id,))
-        
-        conn.commit()
-        conn.close()
+    
+    try:
+        db.write(_write)
         
         logger.info(f"Appointment {appointment_id} services deleted")
         return {"message": "Услуги записи удалены"}
@@ -1912,12 +1714,12 @@ async def delete_appointment_services(appointment_id: int):
         raise HTTPException(status_code=500, detail=f"Ошибка при удалении услуг: {str(e)}")
 
 @app.post("/appointments/{appointment_id}/services")
+@offload_db
 async def add_appointment_service(appointment_id: int, service_data: dict):
     """Добавление услуги к записи"""
     logger.info(f"Add service to appointment {appointment_id}: {service_data}")
     
-    try:
-        conn = sqlite3.connect("salon.db")
+    def _write(conn):
         cursor = conn.cursor()
         
         # Проверяем существование записи
@@ -1940,8 +1742,10 @@ async def add_appointment_service(appointment_id: int, service_data: dict):
             VALUES (?, ?)
         """, (appointment_id, service_id))
         
-        conn.commit()
-        conn.close()
+        return service_id
+    
+    try:
+        service_id = db.write(_write)
         
         logger.info(f"Service {service_id} added to appointment {appointment_id}")
         return {"message": "Услуга добавлена"}
@@ -1954,7 +1758,24 @@ async def add_appointment_service(appointment_id: int, service_data: dict):
 
 # ==================== CLIENTS API ====================
 
+CLIENTS_FILTERS = (
+    ("search", "(first_name LIKE ? OR last_name LIKE ? OR phone LIKE ? OR email LIKE ?)"),
+)
+
+CLIENTS_LIST = statements.template("clients.list", """
+    SELECT id, telegram_id, first_name, last_name, phone, email, created_at, language
+    FROM users
+    WHERE role = 'client'
+""", CLIENTS_FILTERS, " ORDER BY created_at DESC LIMIT ? OFFSET ?")
+
+CLIENTS_COUNT = statements.template(
+    "clients.count",
+    "SELECT COUNT(*) as count FROM users WHERE role = 'client'",
+    CLIENTS_FILTERS,
+)
+
 @app.get("/clients")
+@offload_db
 async def get_clients(
     search: Optional[str] = Query(None, description="Поиск по имени, фамилии или телефону"),
     page: int = Query(1, ge=1),
@@ -1966,37 +1787,13 @@ async def get_clients(
     offset = (page - 1) * per_page
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
-        query = """
-            SELECT id, telegram_id, first_name, last_name, phone, email, created_at, language
-            FROM users
-            WHERE role = 'client'
-        """
-        
-        count_query = "SELECT COUNT(*) as count FROM users WHERE role = 'client'"
-        params = []
-        count_params = []
-        
-        if search and search.strip():
-            search_term = f"%{search.strip()}%"
-            query += " AND (first_name LIKE ? OR last_name LIKE ? OR phone LIKE ? OR email LIKE ?)"
-            count_query += " AND (first_name LIKE ? OR last_name LIKE ? OR phone LIKE ? OR email LIKE ?)"
-            params.extend([search_term, search_term, search_term, search_term])
-            count_params.extend([search_term, search_term, search_term, search_term])
+        filters = {"search": f"%{search.strip()}%" if search and search.strip() else None}
         
-        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-        params.extend([per_page, offset])
-        
-        cursor.execute(query, tuple(params))
-        clients = []
-        for row in cursor.fetchall():
-            client_dict = {}
-            for key in row.keys():
-                client_dict[key] = row[key]
-            clients.append(client_dict)
+        CLIENTS_LIST.execute(cursor, filters, tail=(per_page, offset))
+        clients = fetch_dicts(cursor)
         
         # Добавляем статистику для каждого клиента
         for client in clients:
@@ -2011,7 +1808,7 @@ async def get_clients(
             client["completed_count"] = stats[1] if stats else 0
         
         # Общее количество
-        cursor.execute(count_query, tuple(count_params))
+        CLIENTS_COUNT.execute(cursor, filters)
         count_result = cursor.fetchone()
         total = count_result[0] if count_result else 0
         
@@ -2039,12 +1836,13 @@ async def get_clients(
 
 # Два варианта создания клиента для совместимости
 @app.post("/clients")
+@offload_db
 async def create_client_json(client_data: ClientCreate):
     """Создание нового клиента (JSON версия)"""
     logger.info(f"Create client request (JSON): {client_data}")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем обязательные поля
@@ -2111,6 +1909,7 @@ async def create_client_json(client_data: ClientCreate):
         raise HTTPException(status_code=500, detail=f"Ошибка при создании клиента: {str(e)}")
 
 @app.post("/clients/form")
+@offload_db
 async def create_client_form(
     first_name: str = Form(...),
     last_name: Optional[str] = Form(None),
@@ -2121,7 +1920,7 @@ async def create_client_form(
     logger.info(f"Create client request (Form): {first_name} {last_name}, {phone}, {email}")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем обязательные поля
@@ -2189,12 +1988,13 @@ async def create_client_form(
         raise HTTPException(status_code=500, detail=f"Ошибка при создании клиента: {str(e)}")
 
 @app.put("/clients/{client_id}")
+@offload_db
 async def update_client(client_id: int, client_data: ClientUpdate):
     """Обновление информации о клиенте"""
     logger.info(f"Update client {client_id} request: {client_data}")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование клиента
@@ -2260,12 +2060,13 @@ async def update_client(client_id: int, client_data: ClientUpdate):
         raise HTTPException(status_code=500, detail=f"Ошибка при обновлении клиента: {str(e)}")
 
 @app.delete("/clients/{client_id}")
+@offload_db
 async def delete_client(client_id: int):
     """Удаление клиента"""
     logger.info(f"Delete client {client_id} request")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование клиента
@@ -2320,13 +2121,13 @@ async def delete_client(client_id: int):
         raise HTTPException(status_code=500, detail=f"Ошибка при удалении клиента: {str(e)}")
 
 @app.get("/clients/{client_id}/stats")
+@offload_readonly
 async def get_client_stats(client_id: int):
     """Получение статистики клиента"""
     logger.info(f"Get client {client_id} stats")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_readonly_connection()
         cursor = conn.cursor()
         
         # Проверяем существование клиента
@@ -2425,6 +2226,7 @@ async def get_client_stats(client_id: int):
         raise HTTPException(status_code=500, detail=f"Ошибка при получении статистики клиента: {str(e)}")
 
 @app.get("/clients/{client_id}/recent-appointments")
+@offload_db
 async def get_client_recent_appointments(
     client_id: int,
     limit: int = Query(5, ge=1, le=20, description="Количество последних записей")
@@ -2433,8 +2235,7 @@ async def get_client_recent_appointments(
     logger.info(f"Get client {client_id} recent appointments")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование клиента
@@ -2453,29 +2254,12 @@ async def get_client_recent_appointments(
             LIMIT ?
         """, (client_id, limit))
         
-        appointments = []
-        for row in cursor.fetchall():
-            appointment_dict = {}
-            for key in row.keys():
-                appointment_dict[key] = row[key]
-            appointments.append(appointment_dict)
+        appointments = fetch_dicts(cursor)
         
-        # Добавляем услуги для каждой записи
+        # Добавляем услуги всех записей одним запросом
+        services_by_appointment = repository.get_services_for_appointments(conn, [a["id"] for a in appointments])
         for appointment in appointments:
-            cursor.execute("""
-                SELECT s.id, st.title, s.duration_minutes, s.price
-                FROM appointment_services aps
-                JOIN services s ON aps.service_id = s.id
-                LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = 'ru'
-                WHERE aps.appointment_id = ?
-            """, (appointment["id"],))
-            services = []
-            for row in cursor.fetchall():
-                service_dict = {}
-                for key in row.keys():
-                    service_dict[key] = row[key]
-                services.append(service_dict)
-            appointment["services"] = services
+            appointment["services"] = services_by_appointment.get(appointment["id"], [])
         
         conn.close()
         
@@ -2494,6 +2278,7 @@ async def get_client_recent_appointments(
 # ==================== КАТЕГОРИИ УСЛУГ API ====================
 
 @app.get("/services/categories")
+@offload_db
 async def get_categories(
     is_active: Optional[bool] = Query(None, description="Фильтр по активности"),
     language: str = Query("ru", description="Язык переводов"),
@@ -2503,8 +2288,7 @@ async def get_categories(
     logger.info(f"Get categories request: language={language}, include_children={include_children}")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         query = """
@@ -2525,12 +2309,7 @@ async def get_categories(
         query += " ORDER BY sc.parent_id NULLS FIRST, sc.id"
         
         cursor.execute(query, tuple(params))
-        categories = []
-        for row in cursor.fetchall():
-            category_dict = {}
-            for key in row.keys():
-                category_dict[key] = row[key]
-            categories.append(category_dict)
+        categories = fetch_dicts(cursor)
         
         conn.close()
         
@@ -2567,6 +2346,7 @@ async def get_categories(
         raise HTTPException(status_code=500, detail=f"Ошибка при загрузке категорий: {str(e)}")
 
 @app.get("/services/categories/tree")
+@offload_db
 async def get_categories_tree(
     language: str = Query("ru", description="Язык переводов"),
     include_inactive: bool = Query(False, description="Включать неактивные категории")
@@ -2575,8 +2355,7 @@ async def get_categories_tree(
     logger.info(f"Get categories tree request: language={language}")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         query = """
@@ -2595,12 +2374,7 @@ async def get_categories_tree(
         query += " ORDER BY sc.parent_id NULLS FIRST, sc.id"
         
         cursor.execute(query, tuple(params))
-        categories = []
-        for row in cursor.fetchall():
-            category_dict = {}
-            for key in row.keys():
-                category_dict[key] = row[key]
-            categories.append(category_dict)
+        categories = fetch_dicts(cursor)
         
         conn.close()
         
@@ -2638,13 +2412,14 @@ async def get_categories_tree(
         
         result = build_tree_select_data(categories)
         logger.info(f"Generated tree with {len(result)} root nodes")
-        return result
+        return json_response(result)
     
     except Exception as e:
         logger.error(f"Error fetching categories tree: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Ошибка при построении дерева категорий: {str(e)}")
 
 @app.get("/services/categories/{category_id}")
+@offload_db
 async def get_category(
     category_id: int,
     language: str = Query("ru", description="Язык переводов")
@@ -2653,8 +2428,7 @@ async def get_category(
     logger.info(f"Get category {category_id} request")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -2676,9 +2450,7 @@ async def get_category(
                 detail="Категория не найдена"
             )
         
-        category_dict = {}
-        for key in row.keys():
-            category_dict[key] = row[key]
+        category_dict = dict(row)
         
         return {
             "id": category_dict["id"],
@@ -2696,12 +2468,13 @@ async def get_category(
         raise HTTPException(status_code=500, detail=f"Ошибка при загрузке категории: {str(e)}")
 
 @app.post("/services/categories")
+@offload_db
 async def create_category(category_data: CategoryCreate):
     """Создание новой категории услуг"""
     logger.info(f"Create category request")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем parent_id если указан
@@ -2732,11 +2505,10 @@ async def create_category(category_data: CategoryCreate):
             )
         
         # Добавляем переводы
-        for translation in category_data.translations:
-            cursor.execute("""
-                INSERT INTO service_category_translations (category_id, language, title)
-                VALUES (?, ?, ?)
-            """, (category_id, translation.language, translation.title))
+        bulk.insert_rows(
+            conn, "service_category_translations", ("category_id", "language", "title"),
+            [(category_id, t.language, t.title) for t in category_data.translations],
+        )
         
         conn.commit()
         conn.close()
@@ -2756,12 +2528,13 @@ async def create_category(category_data: CategoryCreate):
         raise HTTPException(status_code=500, detail=f"Ошибка при создании категории: {str(e)}")
 
 @app.put("/services/categories/{category_id}")
+@offload_db
 async def update_category(category_id: int, category_data: CategoryUpdate):
     """Обновление категории услуг"""
     logger.info(f"Update category {category_id} request")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование категории
@@ -2812,27 +2585,13 @@ async def update_category(category_id: int, category_data: CategoryUpdate):
                 tuple(params)
             )
         
-        # Обновляем переводы
+        # Обновляем переводы (добавляем недостающие языки)
         if category_data.translations:
-            for translation in category_data.translations:
-                cursor.execute("""
-                    SELECT id FROM service_category_translations 
-                    WHERE category_id = ? AND language = ?
-                """, (category_id, translation.language))
-                
-                existing_translation = cursor.fetchone()
-                
-                if existing_translation:
-                    cursor.execute("""
-                        UPDATE service_category_translations 
-                        SET title = ?
-                        WHERE id = ?
-                    """, (translation.title, existing_translation[0]))
-                else:
-                    cursor.execute("""
-                        INSERT INTO service_category_translations (category_id, language, title)
-                        VALUES (?, ?, ?)
-                    """, (category_id, translation.language, translation.title))
+            bulk.upsert_rows(
+                conn, "service_category_translations", ("category_id", "language", "title"),
+                [(category_id, t.language, t.title) for t in category_data.translations],
+                conflict_columns=("category_id", "language"),
+            )
         
         conn.commit()
         conn.close()
@@ -2863,6 +2622,7 @@ def get_all_subcategories(cursor, parent_id):
     return all_subcategories
 
 @app.delete("/services/categories/{category_id}")
+@offload_db
 async def delete_category(
     category_id: int,
     recursive: bool = Query(False, description="Рекурсивное удаление с подкатегориями"),
@@ -2874,7 +2634,7 @@ async def delete_category(
     logger.info(f"Delete category {category_id} request (recursive={recursive})")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование категории
@@ -3004,12 +2764,13 @@ async def delete_category(
         )
 
 @app.get("/services/categories/{category_id}/stats")
+@offload_db
 async def get_category_stats(category_id: int, language: str = Query("ru")):
     """Получение статистики по категории"""
     logger.info(f"Get category stats for {category_id}")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -3046,7 +2807,32 @@ async def get_category_stats(category_id: int, language: str = Query("ru")):
 
 # ==================== УСЛУГИ API ====================
 
+SERVICES_FILTERS = (
+    ("category_id", "s.category_id = ?"),
+    ("is_active", "s.is_active = ?"),
+    ("search", "(st.title LIKE ? OR st.description LIKE ?)"),
+)
+
+SERVICES_LIST = statements.template("services.list", """
+    SELECT s.*, st.title, st.description, sct.title as category_title
+    FROM services s
+    LEFT JOIN service_translations st 
+        ON s.id = st.service_id AND st.language = ?
+    LEFT JOIN service_categories sc ON s.category_id = sc.id
+    LEFT JOIN service_category_translations sct 
+        ON sc.id = sct.category_id AND sct.language = ?
+    WHERE 1=1
+""", SERVICES_FILTERS, " ORDER BY s.id DESC LIMIT ? OFFSET ?")
+
+SERVICES_COUNT = statements.template("services.count", """
+    SELECT COUNT(*) as count 
+    FROM services s
+    LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
+    WHERE 1=1
+""", SERVICES_FILTERS)
+
 @app.get("/services")
+@offload_db
 async def get_services(
     category_id: Optional[int] = Query(None, description="ID категории для фильтрации"),
     is_active: Optional[bool] = Query(None, description="Фильтр по активности"),
@@ -3061,70 +2847,21 @@ async def get_services(
     offset = (page - 1) * per_page
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Основной запрос для получения услуг
-        query = """
-            SELECT s.*, st.title, st.description, sct.title as category_title
-            FROM services s
-            LEFT JOIN service_translations st 
-                ON s.id = st.service_id AND st.language = ?
-            LEFT JOIN service_categories sc ON s.category_id = sc.id
-            LEFT JOIN service_category_translations sct 
-                ON sc.id = sct.category_id AND sct.language = ?
-            WHERE 1=1
-        """
-        
-        # Запрос для подсчета общего количества
-        count_query = """
-            SELECT COUNT(*) as count 
-            FROM services s
-            LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
-            WHERE 1=1
-        """
-        
-        params = [language, language]
-        count_params = [language]
-        
-        # Добавляем фильтр по категории
-        if category_id is not None:
-            query += " AND s.category_id = ?"
-            count_query += " AND s.category_id = ?"
-            params.append(category_id)
-            count_params.append(category_id)
-        
-        # Фильтр по активности
-        if is_active is not None:
-            query += " AND s.is_active = ?"
-            count_query += " AND s.is_active = ?"
-            params.append(int(is_active))
-            count_params.append(int(is_active))
-        
-        # Поиск
-        if search and search.strip():
-            search_term = f"%{search.strip()}%"
-            query += " AND (st.title LIKE ? OR st.description LIKE ?)"
-            count_query += " AND (st.title LIKE ? OR st.description LIKE ?)"
-            params.extend([search_term, search_term])
-            count_params.extend([search_term, search_term])
-        
-        # Сортировка и пагинация
-        query += " ORDER BY s.id DESC LIMIT ? OFFSET ?"
-        params.extend([per_page, offset])
+        search_term = f"%{search.strip()}%" if search and search.strip() else None
+        filters = {
+            "category_id": category_id,
+            "is_active": int(is_active) if is_active is not None else None,
+            "search": search_term,
+        }
         
-        # Выполняем запросы
-        cursor.execute(query, tuple(params))
-        services = []
-        for row in cursor.fetchall():
-            service_dict = {}
-            for key in row.keys():
-                service_dict[key] = row[key]
-            services.append(service_dict)
+        SERVICES_LIST.execute(cursor, filters, params=(language, language), tail=(per_page, offset))
+        services = fetch_dicts(cursor)
         
         # Общее количество
-        cursor.execute(count_query, tuple(count_params))
+        SERVICES_COUNT.execute(cursor, filters, params=(language,))
         count_result = cursor.fetchone()
         total = count_result[0] if count_result else 0
         
@@ -3132,13 +2869,13 @@ async def get_services(
         
         logger.info(f"Found {len(services)} services, total: {total}")
         
-        return {
+        return json_response({
             "items": services,
             "total": total,
             "page": page,
             "per_page": per_page,
             "total_pages": (total + per_page - 1) // per_page if per_page > 0 else 0
-        }
+        })
     
     except Exception as e:
         logger.error(f"Error fetching services: {e}", exc_info=True)
@@ -3151,12 +2888,13 @@ async def get_services(
         }
 
 @app.post("/services")
+@offload_db
 async def create_service(service_data: ServiceCreate):
     """Создание новой услуги"""
     logger.info(f"Create service request")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование категории
@@ -3189,16 +2927,10 @@ async def create_service(service_data: ServiceCreate):
             )
         
         # Добавляем переводы
-        for translation in service_data.translations:
-            cursor.execute("""
-                INSERT INTO service_translations (service_id, language, title, description)
-                VALUES (?, ?, ?, ?)
-            """, (
-                service_id,
-                translation.language,
-                translation.title,
-                translation.description or ""
-            ))
+        bulk.insert_rows(
+            conn, "service_translations", ("service_id", "language", "title", "description"),
+            [(service_id, t.language, t.title, t.description or "") for t in service_data.translations],
+        )
         
         conn.commit()
         conn.close()
@@ -3217,13 +2949,13 @@ async def create_service(service_data: ServiceCreate):
         raise HTTPException(status_code=500, detail=f"Ошибка при создании услуги: {str(e)}")
 
 @app.get("/services/{service_id}")
+@offload_db
 async def get_service(service_id: int, language: str = Query("ru")):
     """Получение полной информации об услуге с переводами"""
     logger.info(f"Get service {service_id} request")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Основная информация об услуге
@@ -3244,9 +2976,7 @@ async def get_service(service_id: int, language: str = Query("ru")):
                 detail="Услуга не найдена"
             )
         
-        service_dict = {}
-        for key in row.keys():
-            service_dict[key] = row[key]
+        service_dict = dict(row)
         
         # Все переводы услуги
         cursor.execute("""
@@ -3256,12 +2986,7 @@ async def get_service(service_id: int, language: str = Query("ru")):
             ORDER BY language
         """, (service_id,))
         
-        translations = []
-        for row in cursor.fetchall():
-            translation_dict = {}
-            for key in row.keys():
-                translation_dict[key] = row[key]
-            translations.append(translation_dict)
+        translations = fetch_dicts(cursor)
         
         conn.close()
         
@@ -3283,12 +3008,13 @@ async def get_service(service_id: int, language: str = Query("ru")):
         raise HTTPException(status_code=500, detail=f"Ошибка при загрузке услуги: {str(e)}")
 
 @app.put("/services/{service_id}")
+@offload_db
 async def update_service(service_id: int, service_data: ServiceUpdate):
     """Обновление услуги"""
     logger.info(f"Update service {service_id} request")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование услуги
@@ -3337,36 +3063,13 @@ async def update_service(service_id: int, service_data: ServiceUpdate):
                 tuple(params)
             )
         
-        # Обновляем переводы
+        # Обновляем переводы (добавляем недостающие языки)
         if service_data.translations:
-            for translation in service_data.translations:
-                cursor.execute("""
-                    SELECT id FROM service_translations 
-                    WHERE service_id = ? AND language = ?
-                """, (service_id, translation.language))
-                
-                existing_translation = cursor.fetchone()
-                
-                if existing_translation:
-                    cursor.execute("""
-                        UPDATE service_translations 
-                        SET title = ?, description = ?
-                        WHERE id = ?
-                    """, (
-                        translation.title,
-                        translation.description or "",
-                        existing_translation[0]
-                    ))
-                else:
-                    cursor.execute("""
-                        INSERT INTO service_translations (service_id, language, title, description)
-                        VALUES (?, ?, ?, ?)
-                    """, (
-                        service_id,
-                        translation.language,
-                        translation.title,
-                        translation.description or ""
-                    ))
+            bulk.upsert_rows(
+                conn, "service_translations", ("service_id", "language", "title", "description"),
+                [(service_id, t.language, t.title, t.description or "") for t in service_data.translations],
+                conflict_columns=("service_id", "language"),
+            )
         
         conn.commit()
         conn.close()
@@ -3381,12 +3084,13 @@ async def update_service(service_id: int, service_data: ServiceUpdate):
         raise HTTPException(status_code=500, detail=f"Ошибка при обновлении услуги: {str(e)}")
 
 @app.delete("/services/{service_id}")
+@offload_db
 async def delete_service(service_id: int):
     """Удаление/деактивация услуги"""
     logger.info(f"Delete service {service_id} request")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование услуги
@@ -3414,12 +3118,13 @@ async def delete_service(service_id: int):
         raise HTTPException(status_code=500, detail=f"Ошибка при деактивации услуги: {str(e)}")
 
 @app.delete("/services/{service_id}/force")
+@offload_db
 async def force_delete_service(service_id: int):
     """Полное удаление услуги (только если нет связанных записей)"""
     logger.info(f"Force delete service {service_id} request")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование услуги
@@ -3464,6 +3169,7 @@ async def force_delete_service(service_id: int):
 # ==================== ОБНОВЛЕННЫЕ ENDPOINTS ДЛЯ МАСТЕРОВ ====================
 
 @app.put("/masters/{master_id}")
+@offload_db
 async def update_master(
     master_id: int,
     first_name: Optional[str] = Form(None),
@@ -3488,8 +3194,7 @@ async def update_master(
     conn = None
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Получаем текущие данные мастера
@@ -3499,9 +3204,7 @@ async def update_master(
         if not row:
             raise HTTPException(status_code=404, detail="Мастер не найден")
         
-        master_dict = {}
-        for key in row.keys():
-            master_dict[key] = row[key]
+        master_dict = dict(row)
         
         master_user_id = master_dict["user_id"]
         old_photo = master_dict["photo"]
@@ -3635,11 +3338,7 @@ async def update_master(
             logger.info(f"DEBUG - Type of telegram_id from DB: {type(updated_row['telegram_id'])}")
             
             # Создаем словарь из результата запроса
-            updated_master_dict = {}
-            for key in updated_row.keys():
-                value = updated_row[key]
-                logger.info(f"DEBUG - Key: {key}, Value: {value}, Type: {type(value)}")
-                updated_master_dict[key] = value
+            updated_master_dict = dict(updated_row)
             
             # ИСПРАВЛЕНО: Убеждаемся, что telegram_id корректно преобразуется в строку
             if 'telegram_id' in updated_master_dict and updated_master_dict['telegram_id'] is not None:
@@ -3700,11 +3399,11 @@ async def update_master(
         if conn:
             conn.close()
 @app.get("/masters/{master_id}")
+@offload_db
 async def get_master(master_id: int):
     """Получение информации о мастере"""
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -3724,14 +3423,10 @@ async def get_master(master_id: int):
         if not row:
             raise HTTPException(status_code=404, detail="Master not found")
         
-        master_dict = {}
-        for key in row.keys():
-            value = row[key]
-            # Преобразуем telegram_id в строку если он не None
-            if key == 'telegram_id' and value is not None:
-                master_dict[key] = str(value)
-            else:
-                master_dict[key] = value
+        master_dict = dict(row)
+        # Преобразуем telegram_id в строку если он не None
+        if master_dict.get('telegram_id') is not None:
+            master_dict['telegram_id'] = str(master_dict['telegram_id'])
         
         if master_dict.get("photo"):
             master_dict["photo_url"] = f"{settings.BASE_URL}/uploads/masters/{master_dict['photo']}"
@@ -3747,12 +3442,12 @@ async def get_master(master_id: int):
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.delete("/masters/{master_id}")
+@offload_db
 async def delete_master(master_id: int):
     """Удаление мастера (БЕЗ АВТОРИЗАЦИИ)"""
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Получаем данные мастера
@@ -3762,9 +3457,7 @@ async def delete_master(master_id: int):
         if not row:
             raise HTTPException(status_code=404, detail="Мастер не найден")
         
-        master_dict = {}
-        for key in row.keys():
-            master_dict[key] = row[key]
+        master_dict = dict(row)
         
         # Удаляем фото если есть
         if master_dict["photo"]:
@@ -3793,11 +3486,11 @@ async def delete_master(master_id: int):
 # ==================== SCHEDULE API ====================
 
 @app.get("/schedule/masters/{master_id}")
+@offload_db
 async def get_master_schedule(master_id: int):
     """Получение графика работы мастера (БЕЗ АВТОРИЗАЦИИ)"""
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -3806,12 +3499,7 @@ async def get_master_schedule(master_id: int):
             ORDER BY day_of_week
         """, (master_id,))
         
-        schedule = []
-        for row in cursor.fetchall():
-            schedule_dict = {}
-            for key in row.keys():
-                schedule_dict[key] = row[key]
-            schedule.append(schedule_dict)
+        schedule = fetch_dicts(cursor)
         
         conn.close()
         
@@ -3822,13 +3510,14 @@ async def get_master_schedule(master_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/schedule/masters/{master_id}")
+@offload_db
 async def set_master_schedule(
     master_id: int,
     schedule_data: dict
 ):
     """Установка графика работы мастера (БЕЗ АВТОРИЗАЦИИ)"""
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Проверяем существование мастера
@@ -3843,27 +3532,12 @@ async def set_master_schedule(
         if day_of_week is None or start_time is None or end_time is None:
             raise HTTPException(status_code=400, detail="Необходимо указать day_of_week, start_time и end_time")
         
-        # Проверяем существующий график на этот день
-        cursor.execute("""
-            SELECT id FROM master_work_schedule 
-            WHERE master_id = ? AND day_of_week = ?
-        """, (master_id, day_of_week))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Обновляем существующий график
-            cursor.execute("""
-                UPDATE master_work_schedule 
-                SET start_time = ?, end_time = ?
-                WHERE id = ?
-            """, (start_time, end_time, existing[0]))
-        else:
-            # Создаем новый график
-            cursor.execute("""
-                INSERT INTO master_work_schedule (master_id, day_of_week, start_time, end_time)
-                VALUES (?, ?, ?, ?)
-            """, (master_id, day_of_week, start_time, end_time))
+        # Создаем или обновляем график на этот день
+        bulk.upsert_rows(
+            conn, "master_work_schedule", ("master_id", "day_of_week", "start_time", "end_time"),
+            [(master_id, day_of_week, start_time, end_time)],
+            conflict_columns=("master_id", "day_of_week"),
+        )
         
         conn.commit()
         conn.close()
@@ -3879,10 +3553,11 @@ async def set_master_schedule(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/schedule/masters/{master_id}/days/{day_of_week}")
+@offload_db
 async def remove_schedule_day(master_id: int, day_of_week: int):
     """Удаление графика на конкретный день (БЕЗ АВТОРИЗАЦИИ)"""
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -3901,6 +3576,878 @@ async def remove_schedule_day(master_id: int, day_of_week: int):
         logger.error(f"Error removing schedule: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+# ==================== ПЕРЕРЫВЫ И ВЫХОДНЫЕ МАСТЕРОВ ====================
+
+@app.get("/schedule/masters/{master_id}/breaks")
+@offload_db
+async def get_master_breaks(
+    master_id: int,
+    date_from: Optional[date] = Query(None, description="Перерывы, заканчивающиеся не раньше даты"),
+    date_to: Optional[date] = Query(None, description="Перерывы, начинающиеся не позже даты")
+):
+    """Перерывы и выходные мастера"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        filters = {
+            "date_from": date_from.isoformat() if date_from else None,
+            "date_to": date_to.isoformat() if date_to else None,
+        }
+        BREAKS_LIST.execute(cursor, filters, params=(master_id,))
+        breaks = fetch_dicts(cursor)
+        conn.close()
+        
+        return breaks
+        
+    except Exception as e:
+        logger.error(f"Error fetching master breaks: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/schedule/masters/{master_id}/breaks")
+@offload_db
+async def add_master_break(master_id: int, break_data: MasterBreakCreate):
+    """Добавление перерыва (start_time/end_time) или выходного (без времени) на дату или диапазон дат"""
+    end_date = break_data.end_date or break_data.start_date
+    validate_break(break_data.start_date, end_date, break_data.start_time, break_data.end_time)
+    
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM masters WHERE id = ?", (master_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Мастер не найден")
+        
+        cursor.execute("""
+            INSERT INTO master_breaks (master_id, start_date, end_date, start_time, end_time, reason)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            master_id,
+            break_data.start_date.isoformat(),
+            end_date.isoformat(),
+            break_data.start_time,
+            break_data.end_time,
+            break_data.reason or "",
+        ))
+        return cursor.lastrowid
+    
+    try:
+        break_id = db.write(_write)
+        logger.info(f"Break {break_id} added for master {master_id}: {break_data.start_date}..{end_date}")
+        return {"success": True, "message": "Перерыв добавлен", "break_id": break_id}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding master break: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/schedule/breaks/{break_id}")
+@offload_db
+async def update_master_break(break_id: int, break_data: MasterBreakUpdate):
+    """Изменение перерыва мастера"""
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM master_breaks WHERE id = ?", (break_id,))
+        existing = fetch_dict(cursor)
+        if not existing:
+            raise HTTPException(status_code=404, detail="Перерыв не найден")
+        
+        start_date = break_data.start_date or date.fromisoformat(str(existing["start_date"]))
+        end_date = break_data.end_date or date.fromisoformat(str(existing["end_date"]))
+        if break_data.whole_day:
+            start_time = end_time = None
+        else:
+            start_time = break_data.start_time if break_data.start_time is not None else existing["start_time"]
+            end_time = break_data.end_time if break_data.end_time is not None else existing["end_time"]
+        reason = break_data.reason if break_data.reason is not None else existing["reason"]
+        validate_break(start_date, end_date, start_time, end_time)
+        
+        cursor.execute("""
+            UPDATE master_breaks
+            SET start_date = ?, end_date = ?, start_time = ?, end_time = ?, reason = ?
+            WHERE id = ?
+        """, (start_date.isoformat(), end_date.isoformat(), start_time, end_time, reason, break_id))
+    
+    try:
+        db.write(_write)
+        logger.info(f"Break {break_id} updated")
+        return {"success": True, "message": "Перерыв обновлен"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating master break: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/schedule/breaks/{break_id}")
+@offload_db
+async def delete_master_break(break_id: int):
+    """Удаление перерыва мастера"""
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM master_breaks WHERE id = ?", (break_id,))
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Перерыв не найден")
+    
+    try:
+        db.write(_write)
+        logger.info(f"Break {break_id} deleted")
+        return {"success": True, "message": "Перерыв удален"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting master break: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ==================== ШАБЛОНЫ ГРАФИКА ====================
+
+# Не больше дней в одном периоде применения шаблона и просмотра графика
+MAX_SCHEDULE_PERIOD_DAYS = 366
+# Не больше мастер-дней (мастеров × дат) за одно применение шаблона: все строки
+# пишутся одной транзакцией писателя
+MAX_TEMPLATE_APPLY_MASTER_DAYS = 20000
+
+def validate_template_days(days: List[ScheduleTemplateDay]):
+    """Проверка дней шаблона: день недели 0–6 не повторяется, время HH:MM и start < end"""
+    seen = set()
+    for day in days:
+        if not 0 <= day.day_of_week <= 6:
+            raise HTTPException(status_code=400, detail="day_of_week должен быть от 0 (пн) до 6 (вс)")
+        if day.day_of_week in seen:
+            raise HTTPException(status_code=400, detail=f"День недели {day.day_of_week} указан дважды")
+        seen.add(day.day_of_week)
+        try:
+            start, end = availability.to_minutes(day.start_time), availability.to_minutes(day.end_time)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Время должно быть в формате HH:MM")
+        if not 0 <= start < end <= availability.MINUTES_PER_DAY:
+            raise HTTPException(status_code=400, detail="Время начала должно быть раньше времени окончания")
+
+def validate_period(date_from: date, date_to: date):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="Дата окончания раньше даты начала")
+    if (date_to - date_from).days + 1 > MAX_SCHEDULE_PERIOD_DAYS:
+        raise HTTPException(status_code=400, detail=f"Период не может быть длиннее {MAX_SCHEDULE_PERIOD_DAYS} дней")
+
+def _template_rows(template_id: int, days: List[ScheduleTemplateDay]) -> List[tuple]:
+    return [
+        (template_id, day.day_of_week, availability.format_minutes(availability.to_minutes(day.start_time)),
+         availability.format_minutes(availability.to_minutes(day.end_time)))
+        for day in days
+    ]
+
+def _fetch_template(cursor, template_id: int) -> Optional[Dict[str, Any]]:
+    cursor.execute("SELECT * FROM schedule_templates WHERE id = ?", (template_id,))
+    template = fetch_dict(cursor)
+    if template:
+        cursor.execute("""
+            SELECT day_of_week, start_time, end_time FROM schedule_template_days
+            WHERE template_id = ? ORDER BY day_of_week
+        """, (template_id,))
+        template["days"] = fetch_dicts(cursor)
+    return template
+
+@app.get("/schedule/templates")
+@offload_db
+async def get_schedule_templates():
+    """Шаблоны недельного графика с днями"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM schedule_templates ORDER BY name")
+        templates = fetch_dicts(cursor)
+        cursor.execute("""
+            SELECT template_id, day_of_week, start_time, end_time FROM schedule_template_days
+            ORDER BY template_id, day_of_week
+        """)
+        days = {}
+        for day in fetch_dicts(cursor):
+            days.setdefault(day.pop("template_id"), []).append(day)
+        conn.close()
+        
+        for template in templates:
+            template["days"] = days.get(template["id"], [])
+        return templates
+        
+    except Exception as e:
+        logger.error(f"Error fetching schedule templates: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/schedule/templates")
+@offload_db
+async def create_schedule_template(template_data: ScheduleTemplateCreate):
+    """Создание именованного шаблона недельного графика"""
+    name = template_data.name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Укажите название шаблона")
+    validate_template_days(template_data.days)
+    
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM schedule_templates WHERE name = ?", (name,))
+        if cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Шаблон с таким названием уже существует")
+        cursor.execute(
+            "INSERT INTO schedule_templates (name, description) VALUES (?, ?)",
+            (name, template_data.description),
+        )
+        template_id = cursor.lastrowid
+        bulk.insert_rows(
+            conn, "schedule_template_days", ("template_id", "day_of_week", "start_time", "end_time"),
+            _template_rows(template_id, template_data.days),
+        )
+        return _fetch_template(cursor, template_id)
+    
+    try:
+        template = db.write(_write)
+        logger.info(f"Schedule template {template['id']} '{name}' created")
+        return template
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating schedule template: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/schedule/templates/{template_id}")
+@offload_db
+async def update_schedule_template(template_id: int, template_data: ScheduleTemplateUpdate):
+    """Изменение шаблона; уже применённые к мастерам дни не меняются (примените шаблон заново)"""
+    if template_data.days is not None:
+        validate_template_days(template_data.days)
+    
+    def _write(conn):
+        cursor = conn.cursor()
+        if not _fetch_template(cursor, template_id):
+            raise HTTPException(status_code=404, detail="Шаблон не найден")
+        
+        update_fields = []
+        params = []
+        if template_data.name is not None:
+            name = template_data.name.strip()
+            if not name:
+                raise HTTPException(status_code=400, detail="Укажите название шаблона")
+            cursor.execute("SELECT id FROM schedule_templates WHERE name = ? AND id != ?", (name, template_id))
+            if cursor.fetchone():
+                raise HTTPException(status_code=400, detail="Шаблон с таким названием уже существует")
+            update_fields.append("name = ?")
+            params.append(name)
+        if template_data.description is not None:
+            update_fields.append("description = ?")
+            params.append(template_data.description)
+        if update_fields:
+            cursor.execute(
+                f"UPDATE schedule_templates SET {', '.join(update_fields)} WHERE id = ?",
+                (*params, template_id),
+            )
+        
+        if template_data.days is not None:
+            cursor.execute("DELETE FROM schedule_template_days WHERE template_id = ?", (template_id,))
+            bulk.insert_rows(
+                conn, "schedule_template_days", ("template_id", "day_of_week", "start_time", "end_time"),
+                _template_rows(template_id, template_data.days),
+            )
+        return _fetch_template(cursor, template_id)
+    
+    try:
+        template = db.write(_write)
+        logger.info(f"Schedule template {template_id} updated")
+        return template
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating schedule template: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/schedule/templates/{template_id}")
+@offload_db
+async def delete_schedule_template(template_id: int):
+    """Удаление шаблона; применённые по нему дни мастеров остаются"""
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM schedule_templates WHERE id = ?", (template_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Шаблон не найден")
+        cursor.execute("UPDATE master_schedule_days SET template_id = NULL WHERE template_id = ?", (template_id,))
+        cursor.execute("DELETE FROM schedule_template_days WHERE template_id = ?", (template_id,))
+        cursor.execute("DELETE FROM schedule_templates WHERE id = ?", (template_id,))
+    
+    try:
+        db.write(_write)
+        logger.info(f"Schedule template {template_id} deleted")
+        return {"success": True, "message": "Шаблон удален"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting schedule template: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/schedule/templates/{template_id}/apply")
+@offload_db
+async def apply_schedule_template(template_id: int, apply_data: ScheduleTemplateApply):
+    """
+    Применение шаблона к мастерам на периоды дат одной транзакцией: на каждый
+    мастер-день записывается интервал из шаблона (дни недели без интервала —
+    выходные), существующий график на эти даты заменяется
+    """
+    master_ids = list(dict.fromkeys(apply_data.master_ids))
+    if not master_ids or not apply_data.periods:
+        raise HTTPException(status_code=400, detail="Укажите мастеров и периоды")
+    for period in apply_data.periods:
+        validate_period(period.date_from, period.date_to)
+    # Сумма длин периодов ограничивает и число дат, и размер множества ниже
+    period_days = sum((period.date_to - period.date_from).days + 1 for period in apply_data.periods)
+    too_many = (
+        f"За одно применение можно записать не больше {MAX_TEMPLATE_APPLY_MASTER_DAYS} "
+        f"мастер-дней (мастеров × дат), разбейте периоды или мастеров на части"
+    )
+    if period_days > MAX_TEMPLATE_APPLY_MASTER_DAYS:
+        raise HTTPException(status_code=400, detail=too_many)
+    dates = sorted({
+        period.date_from + timedelta(days=offset)
+        for period in apply_data.periods
+        for offset in range((period.date_to - period.date_from).days + 1)
+    })
+    if len(master_ids) * len(dates) > MAX_TEMPLATE_APPLY_MASTER_DAYS:
+        raise HTTPException(status_code=400, detail=too_many)
+    
+    def _write(conn):
+        cursor = conn.cursor()
+        template = _fetch_template(cursor, template_id)
+        if not template:
+            raise HTTPException(status_code=404, detail="Шаблон не найден")
+        
+        found = repository.get_masters_by_ids(conn, master_ids)
+        missing = [master_id for master_id in master_ids if master_id not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Мастера не найдены: {', '.join(map(str, missing))}")
+        
+        week = {day["day_of_week"]: day for day in template["days"]}
+        rows = []
+        for master_id in master_ids:
+            for day in dates:
+                interval = week.get(day.weekday())
+                rows.append((
+                    master_id, day.isoformat(),
+                    interval["start_time"] if interval else None,
+                    interval["end_time"] if interval else None,
+                    template_id,
+                ))
+        written = bulk.upsert_rows(
+            conn, "master_schedule_days", ("master_id", "work_date", "start_time", "end_time", "template_id"),
+            rows, conflict_columns=("master_id", "work_date"),
+        )
+        
+        if apply_data.update_weekly:
+            # Недельный график мастеров становится таким же, как шаблон
+            cursor.execute(
+                f"DELETE FROM master_work_schedule WHERE master_id IN ({', '.join('?' for _ in master_ids)})",
+                tuple(master_ids),
+            )
+            bulk.insert_rows(
+                conn, "master_work_schedule", ("master_id", "day_of_week", "start_time", "end_time"),
+                [
+                    (master_id, day["day_of_week"], day["start_time"], day["end_time"])
+                    for master_id in master_ids for day in template["days"]
+                ],
+            )
+        return {"masters": len(master_ids), "dates": len(dates), "days_written": written}
+    
+    try:
+        result = db.write(_write)
+        logger.info(
+            f"Schedule template {template_id} applied: {result['masters']} masters x {result['dates']} dates"
+        )
+        return {"success": True, **result}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error applying schedule template: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/schedule/masters/{master_id}/days")
+@offload_db
+async def get_master_schedule_days(
+    master_id: int,
+    date_from: date = Query(..., description="Начало периода"),
+    date_to: date = Query(..., description="Конец периода (включительно)")
+):
+    """График мастера по дням периода: график на дату (source=date) или недельный (source=week)"""
+    validate_period(date_from, date_to)
+    try:
+        conn = get_db_connection()
+        try:
+            week, dated = repository.get_schedules_for_period(conn, [master_id], date_from.isoformat(), date_to.isoformat())
+        finally:
+            conn.close()
+        
+        week, dated = week.get(master_id, {}), dated.get(master_id, {})
+        days = []
+        for offset in range((date_to - date_from).days + 1):
+            day = date_from + timedelta(days=offset)
+            schedule = availability.resolve_schedule(week, dated, day)
+            working = bool(schedule and schedule.get("start_time") and schedule.get("end_time"))
+            days.append({
+                "date": day.isoformat(),
+                "start_time": schedule["start_time"] if working else None,
+                "end_time": schedule["end_time"] if working else None,
+                "source": "date" if day.isoformat() in dated else ("week" if working else None),
+                "template_id": dated[day.isoformat()]["template_id"] if day.isoformat() in dated else None
+            })
+        return days
+        
+    except Exception as e:
+        logger.error(f"Error fetching master schedule days: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/schedule/masters/{master_id}/days")
+@offload_db
+async def reset_master_schedule_days(
+    master_id: int,
+    date_from: date = Query(..., description="Начало периода"),
+    date_to: date = Query(..., description="Конец периода (включительно)")
+):
+    """Удаление графика на даты периода: в эти дни снова действует недельный график"""
+    validate_period(date_from, date_to)
+    
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM master_schedule_days
+            WHERE master_id = ? AND work_date BETWEEN ? AND ?
+        """, (master_id, date_from.isoformat(), date_to.isoformat()))
+        return cursor.rowcount
+    
+    try:
+        deleted = db.write(_write)
+        logger.info(f"Schedule days reset for master {master_id}: {deleted} days")
+        return {"success": True, "deleted": deleted}
+    
+    except Exception as e:
+        logger.error(f"Error resetting master schedule days: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ==================== ЗАКРЫТИЯ САЛОНА ====================
+
+@app.get("/closures")
+@offload_db
+async def get_salon_closures(
+    year: Optional[int] = Query(None, description="Закрытия, пересекающие год"),
+    date_from: Optional[date] = Query(None, description="Закрытия, заканчивающиеся не раньше даты"),
+    date_to: Optional[date] = Query(None, description="Закрытия, начинающиеся не позже даты")
+):
+    """Праздники и сокращённые дни салона"""
+    if year is not None:
+        date_from = max(date_from or date.min, date(year, 1, 1))
+        date_to = min(date_to or date.max, date(year, 12, 31))
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        query = "SELECT * FROM salon_closures WHERE 1=1"
+        params = []
+        if date_from:
+            query += " AND end_date >= ?"
+            params.append(date_from.isoformat())
+        if date_to:
+            query += " AND start_date <= ?"
+            params.append(date_to.isoformat())
+        query += " ORDER BY start_date, start_time"
+        cursor.execute(query, params)
+        closures = fetch_dicts(cursor)
+        conn.close()
+        
+        return closures
+        
+    except Exception as e:
+        logger.error(f"Error fetching salon closures: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/closures")
+@offload_db
+async def add_salon_closure(closure_data: SalonClosureCreate):
+    """Закрытие салона на дату или диапазон дат: на весь день (без времени) или на интервал"""
+    end_date = closure_data.end_date or closure_data.start_date
+    validate_break(closure_data.start_date, end_date, closure_data.start_time, closure_data.end_time)
+    
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO salon_closures (start_date, end_date, start_time, end_time, reason)
+            VALUES (?, ?, ?, ?, ?)
+        """, (
+            closure_data.start_date.isoformat(),
+            end_date.isoformat(),
+            closure_data.start_time,
+            closure_data.end_time,
+            closure_data.reason or "",
+        ))
+        return cursor.lastrowid
+    
+    try:
+        closure_id = db.write(_write)
+        logger.info(f"Salon closure {closure_id} added: {closure_data.start_date}..{end_date}")
+        return {"success": True, "message": "Закрытие добавлено", "closure_id": closure_id}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding salon closure: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/closures/{closure_id}")
+@offload_db
+async def update_salon_closure(closure_id: int, closure_data: SalonClosureUpdate):
+    """Изменение закрытия салона"""
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM salon_closures WHERE id = ?", (closure_id,))
+        existing = fetch_dict(cursor)
+        if not existing:
+            raise HTTPException(status_code=404, detail="Закрытие не найдено")
+        
+        start_date = closure_data.start_date or date.fromisoformat(str(existing["start_date"]))
+        end_date = closure_data.end_date or date.fromisoformat(str(existing["end_date"]))
+        if closure_data.whole_day:
+            start_time = end_time = None
+        else:
+            start_time = closure_data.start_time if closure_data.start_time is not None else existing["start_time"]
+            end_time = closure_data.end_time if closure_data.end_time is not None else existing["end_time"]
+        reason = closure_data.reason if closure_data.reason is not None else existing["reason"]
+        validate_break(start_date, end_date, start_time, end_time)
+        
+        cursor.execute("""
+            UPDATE salon_closures
+            SET start_date = ?, end_date = ?, start_time = ?, end_time = ?, reason = ?
+            WHERE id = ?
+        """, (start_date.isoformat(), end_date.isoformat(), start_time, end_time, reason, closure_id))
+    
+    try:
+        db.write(_write)
+        logger.info(f"Salon closure {closure_id} updated")
+        return {"success": True, "message": "Закрытие обновлено"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating salon closure: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/closures/{closure_id}")
+@offload_db
+async def delete_salon_closure(closure_id: int):
+    """Удаление закрытия салона"""
+    def _write(conn):
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM salon_closures WHERE id = ?", (closure_id,))
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Закрытие не найдено")
+    
+    try:
+        db.write(_write)
+        logger.info(f"Salon closure {closure_id} deleted")
+        return {"success": True, "message": "Закрытие удалено"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting salon closure: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ==================== КАЛЕНДАРЬ ====================
+
+# Не больше дней в одном запросе календаря
+MAX_CALENDAR_DAYS = 31
+
+@app.get("/calendar")
+@offload_db
+async def get_calendar(
+    date_from: date = Query(..., description="Начало периода"),
+    date_to: Optional[date] = Query(None, description="Конец периода (включительно), по умолчанию — неделя"),
+    master_ids: Optional[List[int]] = Query(None, description="Только эти мастера (по умолчанию — все активные)"),
+    include_cancelled: bool = Query(False, description="Показывать отменённые записи"),
+    language: str = Query("ru", description="Язык названий услуг")
+):
+    """
+    Календарь всех мастеров за период: часы работы, перерывы, закрытия салона
+    и записи с услугами. Ответ по колонкам ({колонка: [значения]}), запросов —
+    фиксированное число при любом количестве мастеров.
+    """
+    date_to = date_to or date_from + timedelta(days=6)
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="Дата окончания раньше даты начала")
+    if (date_to - date_from).days + 1 > MAX_CALENDAR_DAYS:
+        raise HTTPException(status_code=400, detail=f"Период не может быть длиннее {MAX_CALENDAR_DAYS} дней")
+    first, last = date_from.isoformat(), date_to.isoformat()
+    days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+    
+    try:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT m.id, u.first_name, u.last_name, m.photo
+                FROM masters m
+                JOIN users u ON m.user_id = u.id
+                WHERE m.is_active = 1
+                ORDER BY u.first_name, u.last_name, m.id
+            """)
+            masters = fetch_columns(cursor)
+            
+            cursor.execute("""
+                SELECT w.master_id, w.day_of_week, w.start_time, w.end_time
+                FROM masters m
+                JOIN master_work_schedule w ON w.master_id = m.id
+                WHERE m.is_active = 1
+            """)
+            week = {}
+            for row in fetch_dicts(cursor):
+                week.setdefault(row["master_id"], {})[row["day_of_week"]] = row
+            
+            cursor.execute("""
+                SELECT master_id, work_date, start_time, end_time FROM master_schedule_days
+                WHERE work_date BETWEEN ? AND ?
+            """, (first, last))
+            dated = {}
+            for row in fetch_dicts(cursor):
+                dated.setdefault(row["master_id"], {})[str(row["work_date"])] = row
+            
+            cursor.execute("""
+                SELECT master_id, start_date, end_date, start_time, end_time, reason FROM master_breaks
+                WHERE end_date >= ? AND start_date <= ?
+                ORDER BY master_id, start_date, start_time
+            """, (first, last))
+            breaks = fetch_dicts(cursor)
+            
+            closures, _ = salon_calendar.for_period(conn, date_from, date_to)
+            
+            status_filter = "" if include_cancelled else " AND a.status != 'cancelled'"
+            cursor.execute(f"""
+                SELECT a.id, a.master_id, a.appointment_date AS date, a.start_time, a.end_time, a.status,
+                    a.client_id, u.first_name AS client_first_name, u.last_name AS client_last_name
+                FROM appointments a
+                LEFT JOIN users u ON a.client_id = u.id
+                WHERE a.appointment_date BETWEEN ? AND ?{status_filter}
+                ORDER BY a.appointment_date, a.start_time, a.id
+            """, (first, last))
+            appointments = fetch_columns(cursor)
+            
+            cursor.execute(f"""
+                SELECT aps.appointment_id, s.id, COALESCE(st.title, 'Услуга ' || s.id) AS title
+                FROM appointments a
+                JOIN appointment_services aps ON aps.appointment_id = a.id
+                JOIN services s ON aps.service_id = s.id
+                LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
+                WHERE a.appointment_date BETWEEN ? AND ?{status_filter}
+                ORDER BY aps.appointment_id, aps.id
+            """, (language, first, last))
+            appointment_services = cursor.fetchall()
+        finally:
+            conn.close()
+        
+        if master_ids:
+            # Фильтр по мастерам — по уже загруженным колонкам, без дополнительных запросов
+            selected = set(master_ids)
+            keep = [i for i, master_id in enumerate(masters["id"]) if master_id in selected]
+            masters = {key: [values[i] for i in keep] for key, values in masters.items()}
+        visible = set(masters["id"])
+        
+        masters["photo"] = [repository.photo_url(settings.BASE_URL, photo) for photo in masters["photo"]]
+        
+        # Часы работы по дням: график на дату перекрывает недельный
+        hours = {"master_id": [], "date": [], "start_time": [], "end_time": []}
+        for master_id in masters["id"]:
+            for day in days:
+                schedule = availability.resolve_schedule(week.get(master_id, {}), dated.get(master_id), day)
+                if schedule and schedule.get("start_time") and schedule.get("end_time"):
+                    hours["master_id"].append(master_id)
+                    hours["date"].append(day.isoformat())
+                    hours["start_time"].append(schedule["start_time"])
+                    hours["end_time"].append(schedule["end_time"])
+        
+        break_columns = {key: [] for key in ("master_id", "start_date", "end_date", "start_time", "end_time", "reason")}
+        for row in breaks:
+            if row["master_id"] in visible:
+                for key, values in break_columns.items():
+                    values.append(row[key])
+        
+        closure_columns = {"date": [], "start_time": [], "end_time": []}
+        for day in sorted(closures):
+            for interval in closures[day]:
+                closure_columns["date"].append(day)
+                closure_columns["start_time"].append(interval["start_time"])
+                closure_columns["end_time"].append(interval["end_time"])
+        
+        # Услуги: справочник {id, title} один раз, у записей — списки id
+        service_ids = {}
+        services = {}
+        for appointment_id, service_id, title in appointment_services:
+            service_ids.setdefault(appointment_id, []).append(service_id)
+            services[service_id] = title
+        keep = [
+            i for i, master_id in enumerate(appointments["master_id"])
+            if master_id in visible or (master_id is None and not master_ids)
+        ]
+        appointments = {key: [values[i] for i in keep] for key, values in appointments.items()}
+        appointments["service_ids"] = [service_ids.get(appointment_id, []) for appointment_id in appointments["id"]]
+        used = sorted({service_id for ids in appointments["service_ids"] for service_id in ids})
+        
+        return json_response({
+            "date_from": first,
+            "date_to": last,
+            "dates": [day.isoformat() for day in days],
+            "masters": masters,
+            "hours": hours,
+            "breaks": break_columns,
+            "closures": closure_columns,
+            "appointments": appointments,
+            "services": {"id": used, "title": [services[service_id] for service_id in used]}
+        })
+        
+    except Exception as e:
+        logger.error(f"Error building calendar: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ==================== ПОИСК СВОБОДНОГО ВРЕМЕНИ ====================
+
+@app.get("/schedule/first-available")
+@offload_db
+async def get_first_available_slots(
+    service_ids: List[int] = Query(..., description="Услуги записи"),
+    master_id: Optional[int] = Query(None, description="Только этот мастер"),
+    date_from: Optional[date] = Query(None, description="Начало поиска (по умолчанию сегодня)"),
+    days: int = Query(14, ge=1, le=90),
+    limit: int = Query(5, ge=1, le=50)
+):
+    """Ближайшие свободные слоты на набор услуг у всех подходящих мастеров"""
+    today = date.today()
+    start_date = max(date_from or today, today)
+    
+    try:
+        conn = get_db_connection()
+        try:
+            services = repository.get_services_by_ids(conn, service_ids)
+            if len(services) != len(set(service_ids)):
+                raise HTTPException(status_code=400, detail="Некоторые услуги не найдены или неактивны")
+            total_duration, _ = repository.services_totals(services, service_ids)
+            
+            masters = repository.get_masters_providing_services(conn, service_ids, active_only=True)
+            if master_id is not None:
+                masters = [master for master in masters if master["master_id"] == master_id]
+            
+            slots = booking.first_available(
+                conn,
+                [master["master_id"] for master in masters],
+                start_date,
+                days,
+                total_duration,
+                step=settings.SLOT_STEP_MINUTES,
+                buffer=settings.APPOINTMENT_BUFFER_MINUTES,
+                limit=limit,
+                not_before=datetime.now(),
+            )
+        finally:
+            conn.close()
+        
+        names = {
+            master["master_id"]: f"{master.get('first_name') or ''} {master.get('last_name') or ''}".strip()
+            for master in masters
+        }
+        for slot in slots:
+            slot["master_name"] = names.get(slot["master_id"])
+        
+        return {
+            "service_ids": service_ids,
+            "duration_minutes": total_duration,
+            "date_from": start_date.isoformat(),
+            "days": days,
+            "slots": slots
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching first available slots: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/schedule/slots")
+@offload_db
+async def get_ranked_slots(
+    service_ids: List[int] = Query(..., description="Услуги записи"),
+    appointment_date: date = Query(..., description="Дата записи"),
+    master_id: Optional[int] = Query(None, description="Только этот мастер"),
+    sort: str = Query("rank", description="rank — сначала слоты, плотнее заполняющие день; time — по времени")
+):
+    """Свободные слоты подходящих мастеров на дату с оценкой плотности дня"""
+    if sort not in ("rank", "time"):
+        raise HTTPException(status_code=400, detail="Недопустимая сортировка. Допустимые значения: rank, time")
+    
+    try:
+        conn = get_db_connection()
+        try:
+            services = repository.get_services_by_ids(conn, service_ids)
+            if len(services) != len(set(service_ids)):
+                raise HTTPException(status_code=400, detail="Некоторые услуги не найдены или неактивны")
+            total_duration, _ = repository.services_totals(services, service_ids)
+            
+            masters = repository.get_masters_providing_services(conn, service_ids, active_only=True)
+            if master_id is not None:
+                masters = [master for master in masters if master["master_id"] == master_id]
+            
+            min_gap = repository.get_min_service_duration(conn)
+            ranked_by_master = compute_ranked_slots(
+                conn,
+                [master["master_id"] for master in masters],
+                appointment_date.isoformat(),
+                appointment_date.weekday(),
+                total_duration,
+                step=settings.SLOT_STEP_MINUTES,
+                buffer=settings.APPOINTMENT_BUFFER_MINUTES,
+                min_gap=min_gap,
+            )
+        finally:
+            conn.close()
+        
+        names = {
+            master["master_id"]: f"{master.get('first_name') or ''} {master.get('last_name') or ''}".strip()
+            for master in masters
+        }
+        slots = [
+            {
+                "time": slot,
+                "master_id": ranked_master_id,
+                "master_name": names.get(ranked_master_id),
+                "idle_minutes": idle,
+                "adjacent": adjacent,
+                "recommended": idle == 0 and adjacent > 0
+            }
+            for ranked_master_id, ranked in ranked_by_master.items()
+            for slot, idle, adjacent in ranked
+        ]
+        if sort == "rank":
+            slots.sort(key=lambda item: availability.rank_key(item["idle_minutes"], item["adjacent"], item["time"]))
+        else:
+            slots.sort(key=lambda item: item["time"])
+        
+        return {
+            "appointment_date": appointment_date.isoformat(),
+            "duration_minutes": total_duration,
+            "min_gap_minutes": min_gap or total_duration,
+            "slots": slots
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error ranking slots: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ==================== ОСНОВНЫЕ ENDPOINTS ====================
 
 @app.get("/")
@@ -3928,19 +4475,26 @@ async def root():
     }
 
 @app.get("/health")
+@offload_db
 async def health_check():
     """Проверка здоровья приложения"""
     try:
-        conn = sqlite3.connect("salon.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
-        conn.close()
+        if not db.pool.health_check():
+            raise RuntimeError("Database health check failed")
         
+        maintenance = getattr(app.state, "maintenance", None)
+        grid_refresher = getattr(app.state, "slot_grid", None)
         return {
             "status": "healthy",
             "service": settings.APP_NAME,
             "version": settings.APP_VERSION,
             "database": "connected",
+            "pool": db.pool.stats(),
+            "readonly_pool": db.readonly_pool.stats(),
+            "availability_cache": db.availability_cache.stats(),
+            "writer": db.writer.metrics(),
+            "maintenance": maintenance.status() if maintenance else None,
+            "slot_grid": grid_refresher.status() if grid_refresher else None,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -3954,8 +4508,14 @@ async def health_check():
             "timestamp": datetime.now().isoformat()
         }
 
+@app.get("/health/statements")
+async def statements_stats():
+    """Число выполнений и время по вариантам запросов списков"""
+    return statements.summary()
+
 # ==================== TEST ENDPOINTS ====================
 
+
 @app.post("/test/upload")
 async def test_upload(
     file: UploadFile = File(...),
@@ -4067,6 +4627,24 @@ if __name__ == "__main__":
     logger.info("  • GET    /schedule/masters/{id} - Get master schedule")
     logger.info("  • POST   /schedule/masters/{id} - Set master schedule")
     logger.info("  • DELETE /schedule/masters/{id}/days/{day} - Remove schedule day")
+    logger.info("  • GET    /schedule/masters/{id}/breaks - Get master breaks")
+    logger.info("  • POST   /schedule/masters/{id}/breaks - Add master break / day off")
+    logger.info("  • PUT    /schedule/breaks/{id} - Update master break")
+    logger.info("  • DELETE /schedule/breaks/{id} - Delete master break")
+    logger.info("  • GET    /schedule/templates - List schedule templates")
+    logger.info("  • POST   /schedule/templates - Create schedule template")
+    logger.info("  • PUT    /schedule/templates/{id} - Update schedule template")
+    logger.info("  • DELETE /schedule/templates/{id} - Delete schedule template")
+    logger.info("  • POST   /schedule/templates/{id}/apply - Apply template to masters and periods")
+    logger.info("  • GET    /schedule/masters/{id}/days - Resolved schedule by date")
+    logger.info("  • DELETE /schedule/masters/{id}/days - Reset dated schedule to weekly")
+    logger.info("  • GET    /closures - List salon closures")
+    logger.info("  • POST   /closures - Add salon closure")
+    logger.info("  • PUT    /closures/{id} - Update salon closure")
+    logger.info("  • DELETE /closures/{id} - Delete salon closure")
+    logger.info("  • GET    /calendar - Week calendar of all masters (columnar)")
+    logger.info("  • GET    /schedule/first-available - Earliest free slots for services")
+    logger.info("  • GET    /schedule/slots - Free slots ranked by schedule density")
     logger.info("=" * 60)
     logger.info("✅ Ready to accept requests!")
     
@@ -0,0 +1,239 @@
+"""
+Регламентное обслуживание файла SQLite.
+
+Задачи выполняются в «тихие часы» (по умолчанию ночью) не чаще заданного
+интервала на отдельном соединении в режиме autocommit:
+
+    analyze            ANALYZE — статистика для планировщика запросов
+    optimize           PRAGMA optimize — дообновление статистики по мере роста таблиц
+    incremental_vacuum возврат свободных страниц в ОС (auto_vacuum=INCREMENTAL;
+                       у старой БД режим включается один раз через VACUUM)
+    checkpoint         PRAGMA wal_checkpoint(TRUNCATE) — перенос WAL в БД и усечение -wal
+
+При занятой БД задача ждёт busy_timeout; ошибка одной задачи не отменяет
+остальные. Разовый запуск вручную:
+
+    python -m app.maintenance --db salon.db
+    python -m app.maintenance --db salon.db --tasks analyze checkpoint
+"""
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.sqlite_profile import SqliteProfile
+from app.writer import configure_connection
+
+logger = logging.getLogger(__name__)
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+DEFAULT_TASKS = ("analyze", "optimize", "incremental_vacuum", "checkpoint")
+
+
+def parse_quiet_hours(value: str) -> Tuple[int, int]:
+    """«3-5» -> (3, 5): с 3:00 до 5:00; окно может переходить через полночь («23-2»)"""
+    try:
+        start, end = (int(part) for part in value.split("-", 1))
+    except ValueError:
+        raise ValueError(f"Invalid quiet hours: {value!r} (expected e.g. '3-5')")
+    if not (0 <= start <= 23 and 0 <= end <= 24) or start == end:
+        raise ValueError(f"Invalid quiet hours: {value!r}")
+    return start, end
+
+
+def in_quiet_hours(hours: Tuple[int, int], now: Optional[datetime] = None) -> bool:
+    start, end = hours
+    hour = (now or datetime.now()).hour
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+# ==================== ЗАДАЧИ ====================
+
+def _analyze(conn: sqlite3.Connection, vacuum_pages: int) -> Any:
+    conn.execute("ANALYZE")
+
+
+def _optimize(conn: sqlite3.Connection, vacuum_pages: int) -> Any:
+    # Ограничение строк на индекс, чтобы optimize не превращался в полный ANALYZE
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("PRAGMA optimize")
+
+
+def _incremental_vacuum(conn: sqlite3.Connection, vacuum_pages: int) -> Any:
+    freelist_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+        # Режим auto_vacuum у существующей БД меняется только полным VACUUM
+        logger.info("Switching database to auto_vacuum=INCREMENTAL (one-time VACUUM)")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    elif vacuum_pages > 0:
+        conn.execute(f"PRAGMA incremental_vacuum({vacuum_pages})")
+    else:
+        conn.execute("PRAGMA incremental_vacuum")
+    freelist_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"freed_pages": freelist_before - freelist_after}
+
+
+def _checkpoint(conn: sqlite3.Connection, vacuum_pages: int) -> Any:
+    busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    return {"busy": bool(busy), "wal_pages": wal_pages, "checkpointed": checkpointed}
+
+
+TASKS: Dict[str, Callable[[sqlite3.Connection, int], Any]] = {
+    "analyze": _analyze,
+    "optimize": _optimize,
+    "incremental_vacuum": _incremental_vacuum,
+    "checkpoint": _checkpoint,
+}
+
+
+def run_maintenance(
+    db_path: str,
+    tasks: Sequence[str] = DEFAULT_TASKS,
+    busy_timeout: float = 30.0,
+    profile: Optional[SqliteProfile] = None,
+    vacuum_pages: int = 0,
+) -> Dict[str, Dict[str, Any]]:
+    """Разовый запуск задач обслуживания; результат и длительность по каждой задаче"""
+    unknown = [name for name in tasks if name not in TASKS]
+    if unknown:
+        raise ValueError(f"Unknown maintenance tasks: {', '.join(unknown)}")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        configure_connection(conn, busy_timeout, profile=profile)
+        for name in tasks:
+            started = time.monotonic()
+            try:
+                result = TASKS[name](conn, vacuum_pages)
+                results[name] = {"ok": True, "result": result}
+            except sqlite3.Error as e:
+                logger.error(f"Maintenance task {name} failed: {e}")
+                results[name] = {"ok": False, "error": str(e)}
+            results[name]["duration_ms"] = round((time.monotonic() - started) * 1000, 3)
+    finally:
+        conn.close()
+    return results
+
+
+# ==================== ПЛАНИРОВЩИК ====================
+
+class MaintenanceScheduler:
+    """
+    Фоновый поток, запускающий run_maintenance в тихие часы.
+
+    Поток просыпается раз в check_interval секунд; задачи выполняются, если
+    текущий час попадает в quiet_hours и с прошлого запуска прошло не меньше
+    interval секунд.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        quiet_hours: Tuple[int, int] = (3, 5),
+        interval: float = 24 * 3600,
+        check_interval: float = 300,
+        tasks: Sequence[str] = DEFAULT_TASKS,
+        busy_timeout: float = 30.0,
+        profile: Optional[SqliteProfile] = None,
+        vacuum_pages: int = 0,
+    ):
+        self.db_path = db_path
+        self.quiet_hours = quiet_hours
+        self.interval = interval
+        self.check_interval = check_interval
+        self.tasks = tuple(tasks)
+        self.busy_timeout = busy_timeout
+        self.profile = profile
+        self.vacuum_pages = vacuum_pages
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_run: Optional[float] = None
+        self._last_started_at: Optional[str] = None
+        self._last_results: Dict[str, Dict[str, Any]] = {}
+        self._runs = 0
+
+    def due(self, now: Optional[datetime] = None) -> bool:
+        """Пора ли запускать обслуживание"""
+        if not in_quiet_hours(self.quiet_hours, now):
+            return False
+        return self._last_run is None or time.monotonic() - self._last_run >= self.interval
+
+    def run_once(self) -> Dict[str, Dict[str, Any]]:
+        """Запуск задач сейчас, независимо от расписания"""
+        logger.info(f"Database maintenance started: {', '.join(self.tasks)}")
+        self._last_started_at = datetime.now().isoformat(timespec="seconds")
+        results = run_maintenance(self.db_path, self.tasks, self.busy_timeout, self.profile, self.vacuum_pages)
+        self._last_run = time.monotonic()
+        self._last_results = results
+        self._runs += 1
+        failed = [name for name, result in results.items() if not result["ok"]]
+        if failed:
+            logger.warning(f"Database maintenance finished with errors in: {', '.join(failed)}")
+        else:
+            logger.info("Database maintenance finished")
+        return results
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            if not self.due():
+                continue
+            try:
+                self.run_once()
+            except Exception as e:
+                # Не даём потоку умереть: следующая попытка — в следующий интервал
+                self._last_run = time.monotonic()
+                logger.error(f"Database maintenance error: {e}", exc_info=True)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="db-maintenance", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Database maintenance scheduled daily between "
+            f"{self.quiet_hours[0]:02d}:00 and {self.quiet_hours[1] % 24:02d}:00"
+        )
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None,
+            "quiet_hours": f"{self.quiet_hours[0]}-{self.quiet_hours[1]}",
+            "tasks": list(self.tasks),
+            "runs": self._runs,
+            "last_started_at": self._last_started_at,
+            "last_results": self._last_results,
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Обслуживание файла SQLite")
+    parser.add_argument("--db", default="salon.db", help="путь к файлу БД")
+    parser.add_argument("--tasks", nargs="+", choices=sorted(TASKS), default=list(DEFAULT_TASKS))
+    parser.add_argument("--vacuum-pages", type=int, default=0, help="страниц за один incremental_vacuum (0 — все)")
+    args = parser.parse_args(argv)
+
+    results = run_maintenance(args.db, args.tasks, vacuum_pages=args.vacuum_pages)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    return 0 if all(result["ok"] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,719 @@
+"""
+Версионные миграции схемы БД.
+
+Каждая миграция имеет номер версии и применяется один раз, в своей транзакции.
+Применённые версии записываются в таблицу schema_version. Если версия БД уже
+совпадает с последней миграцией, при старте выполняется единственный SELECT
+и никакого DDL.
+
+Запуск вручную (из каталога backend):
+    python -m app.migrations             # применить недостающие миграции
+    python -m app.migrations --dry-run   # проверить миграции и откатить
+    python -m app.migrations --status    # текущая и последняя версии
+"""
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class Migration:
+    """Одна миграция: SQL-выражения и/или функция, работающая с курсором"""
+
+    def __init__(
+        self,
+        version: int,
+        name: str,
+        statements: Sequence[str] = (),
+        func: Optional[Callable[[sqlite3.Cursor], None]] = None,
+    ):
+        self.version = version
+        self.name = name
+        self.statements = list(statements)
+        self.func = func
+
+    def apply(self, cursor: sqlite3.Cursor) -> None:
+        for sql in self.statements:
+            cursor.execute(sql)
+        if self.func:
+            self.func(cursor)
+
+    def __repr__(self) -> str:
+        return f"<Migration {self.version}: {self.name}>"
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def register(migration: Migration) -> Migration:
+    """Регистрация миграции (версии должны идти строго по возрастанию)"""
+    if MIGRATIONS and migration.version <= MIGRATIONS[-1].version:
+        raise ValueError(f"Migration version {migration.version} is not greater than {MIGRATIONS[-1].version}")
+    MIGRATIONS.append(migration)
+    return migration
+
+
+def migration(version: int, name: str) -> Callable[[Callable[[sqlite3.Cursor], None]], Callable[[sqlite3.Cursor], None]]:
+    """Декоратор для миграций, написанных на Python"""
+    def decorator(func: Callable[[sqlite3.Cursor], None]) -> Callable[[sqlite3.Cursor], None]:
+        register(Migration(version, name, func=func))
+        return func
+    return decorator
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+# ==================== МИГРАЦИИ ====================
+
+register(Migration(1, "initial schema", [
+    """CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        telegram_id INTEGER UNIQUE,
+        role TEXT NOT NULL,
+        first_name TEXT,
+        last_name TEXT,
+        phone TEXT,
+        email TEXT,
+        language TEXT DEFAULT 'ru',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS masters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        photo TEXT,
+        qualification TEXT,
+        description TEXT,
+        is_active INTEGER DEFAULT 1,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS master_work_schedule (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        master_id INTEGER NOT NULL,
+        day_of_week INTEGER NOT NULL,
+        start_time TIME NOT NULL,
+        end_time TIME NOT NULL,
+        FOREIGN KEY (master_id) REFERENCES masters(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS service_categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        parent_id INTEGER,
+        is_active INTEGER DEFAULT 1,
+        FOREIGN KEY (parent_id) REFERENCES service_categories(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS service_category_translations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_id INTEGER NOT NULL,
+        language TEXT NOT NULL,
+        title TEXT NOT NULL,
+        FOREIGN KEY (category_id) REFERENCES service_categories(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS services (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_id INTEGER NOT NULL,
+        duration_minutes INTEGER NOT NULL,
+        price REAL NOT NULL,
+        is_active INTEGER DEFAULT 1,
+        FOREIGN KEY (category_id) REFERENCES service_categories(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS service_translations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        service_id INTEGER NOT NULL,
+        language TEXT NOT NULL,
+        title TEXT NOT NULL,
+        description TEXT,
+        FOREIGN KEY (service_id) REFERENCES services(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER NOT NULL,
+        master_id INTEGER,
+        appointment_date DATE NOT NULL,
+        start_time TIME NOT NULL,
+        end_time TIME NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (client_id) REFERENCES users(id),
+        FOREIGN KEY (master_id) REFERENCES masters(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS appointment_services (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        appointment_id INTEGER NOT NULL,
+        service_id INTEGER NOT NULL,
+        FOREIGN KEY (appointment_id) REFERENCES appointments(id),
+        FOREIGN KEY (service_id) REFERENCES services(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS master_services (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        master_id INTEGER NOT NULL,
+        service_id INTEGER NOT NULL,
+        category_id INTEGER NOT NULL,
+        is_primary INTEGER DEFAULT 1,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (master_id) REFERENCES masters(id),
+        FOREIGN KEY (service_id) REFERENCES services(id),
+        FOREIGN KEY (category_id) REFERENCES service_categories(id),
+        UNIQUE(master_id, service_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS reviews (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        appointment_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        master_id INTEGER NOT NULL,
+        rating INTEGER NOT NULL,
+        text TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (appointment_id) REFERENCES appointments(id),
+        FOREIGN KEY (client_id) REFERENCES users(id),
+        FOREIGN KEY (master_id) REFERENCES masters(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS review_photos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        review_id INTEGER NOT NULL,
+        photo_url TEXT NOT NULL,
+        FOREIGN KEY (review_id) REFERENCES reviews(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS bonuses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER NOT NULL UNIQUE,
+        balance INTEGER DEFAULT 0,
+        FOREIGN KEY (client_id) REFERENCES users(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS bonus_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        reason TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (client_id) REFERENCES users(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS admin_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        admin_id INTEGER NOT NULL,
+        action TEXT NOT NULL,
+        details TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (admin_id) REFERENCES users(id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_masters_user_id ON masters(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_masters_is_active ON masters(is_active)",
+    "CREATE INDEX IF NOT EXISTS idx_users_role ON users(role)",
+    "CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)",
+    "CREATE INDEX IF NOT EXISTS idx_service_categories_parent_id ON service_categories(parent_id)",
+    "CREATE INDEX IF NOT EXISTS idx_service_categories_is_active ON service_categories(is_active)",
+    "CREATE INDEX IF NOT EXISTS idx_services_category_id ON services(category_id)",
+    "CREATE INDEX IF NOT EXISTS idx_services_is_active ON services(is_active)",
+    "CREATE INDEX IF NOT EXISTS idx_master_services_master_id ON master_services(master_id)",
+    "CREATE INDEX IF NOT EXISTS idx_master_services_service_id ON master_services(service_id)",
+    "CREATE INDEX IF NOT EXISTS idx_master_services_category_id ON master_services(category_id)",
+]))
+
+
+@migration(2, "demo data")
+def _seed_demo_data(cursor: sqlite3.Cursor) -> None:
+    """Тестовые мастер, категории, клиенты и услуги для пустой БД"""
+    cursor.execute("SELECT COUNT(*) FROM masters")
+    if cursor.fetchone()[0] == 0:
+        telegram_id = 1000
+        cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
+        if not cursor.fetchone():
+            cursor.execute("""
+                INSERT INTO users (telegram_id, role, first_name, last_name, phone, email, language)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (telegram_id, 'master', 'Иван', 'Иванов', '+79991234567', 'master@example.com', 'ru'))
+            user_id = cursor.lastrowid
+            cursor.execute("""
+                INSERT INTO masters (user_id, qualification, description, is_active)
+                VALUES (?, ?, ?, ?)
+            """, (user_id, 'Топ-мастер', 'Опытный мастер с 10-летним стажем', 1))
+            logger.info("Test master created")
+
+    womens_hair_id = mens_hair_id = None
+    cursor.execute("SELECT COUNT(*) FROM service_categories")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("INSERT INTO service_categories (parent_id, is_active) VALUES (NULL, 1)")
+        hair_category_id = cursor.lastrowid
+        cursor.execute("INSERT INTO service_categories (parent_id, is_active) VALUES (NULL, 1)")
+        nails_category_id = cursor.lastrowid
+        cursor.execute("INSERT INTO service_categories (parent_id, is_active) VALUES (?, 1)", (hair_category_id,))
+        womens_hair_id = cursor.lastrowid
+        cursor.execute("INSERT INTO service_categories (parent_id, is_active) VALUES (?, 1)", (hair_category_id,))
+        mens_hair_id = cursor.lastrowid
+
+        cursor.executemany("""
+            INSERT INTO service_category_translations (category_id, language, title)
+            VALUES (?, ?, ?)
+        """, [
+            (hair_category_id, 'ru', 'Парикмахерские услуги'),
+            (hair_category_id, 'en', 'Hair Services'),
+            (hair_category_id, 'tr', 'Kuaför Hizmetleri'),
+            (nails_category_id, 'ru', 'Маникюр и педикюр'),
+            (nails_category_id, 'en', 'Manicure & Pedicure'),
+            (nails_category_id, 'tr', 'Manikür & Pedikür'),
+            (womens_hair_id, 'ru', 'Женская стрижка'),
+            (womens_hair_id, 'en', 'Women\'s Haircut'),
+            (womens_hair_id, 'tr', 'Kadın Saç Kesimi'),
+            (mens_hair_id, 'ru', 'Мужская стрижка'),
+            (mens_hair_id, 'en', 'Men\'s Haircut'),
+            (mens_hair_id, 'tr', 'Erkek Saç Kesimi'),
+        ])
+        logger.info("Test categories created")
+
+    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'client'")
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany("""
+            INSERT INTO users (telegram_id, role, first_name, last_name, phone, email, language)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (2001, 'client', 'Мария', 'Петрова', '+79997654321', 'client1@example.com', 'ru'),
+            (2002, 'client', 'Иван', 'Иванов', '+79991234567', 'client2@example.com', 'ru'),
+            (2003, 'client', 'Анна', 'Сидорова', '+79992345678', 'client3@example.com', 'ru'),
+        ])
+        logger.info("Test clients created")
+
+    cursor.execute("SELECT COUNT(*) FROM services")
+    if cursor.fetchone()[0] == 0 and womens_hair_id and mens_hair_id:
+        for category_id, duration, price in [
+            (womens_hair_id, 60, 1500.0),
+            (womens_hair_id, 90, 2000.0),
+            (mens_hair_id, 30, 800.0),
+            (mens_hair_id, 45, 1200.0),
+        ]:
+            cursor.execute("""
+                INSERT INTO services (category_id, duration_minutes, price, is_active)
+                VALUES (?, ?, ?, 1)
+            """, (category_id, duration, price))
+            service_id = cursor.lastrowid
+            cursor.execute("""
+                INSERT INTO service_translations (service_id, language, title, description)
+                VALUES (?, ?, ?, ?)
+            """, (service_id, 'ru', f'Тестовая услуга {service_id}', f'Описание тестовой услуги {service_id}'))
+        logger.info("Test services created")
+
+
+register(Migration(3, "appointment access path indexes", [
+    # Занятость мастера на дату (слоты бота, записи мастера, проверка пересечений)
+    "CREATE INDEX IF NOT EXISTS idx_appointments_master_date ON appointments(master_id, appointment_date, start_time)",
+    # История клиента и «новые клиенты» на дашборде
+    "CREATE INDEX IF NOT EXISTS idx_appointments_client_date ON appointments(client_id, appointment_date)",
+    # Диапазоны дат с фильтром по статусу (аналитика, уведомления, список записей)
+    "CREATE INDEX IF NOT EXISTS idx_appointments_date_status ON appointments(appointment_date, status)",
+    "CREATE INDEX IF NOT EXISTS idx_appointments_status_date ON appointments(status, appointment_date)",
+    "CREATE INDEX IF NOT EXISTS idx_appointment_services_appointment_service ON appointment_services(appointment_id, service_id)",
+    "CREATE INDEX IF NOT EXISTS idx_appointment_services_service_id ON appointment_services(service_id)",
+    "CREATE INDEX IF NOT EXISTS idx_service_translations_service_language ON service_translations(service_id, language)",
+    "CREATE INDEX IF NOT EXISTS idx_service_category_translations_category_language ON service_category_translations(category_id, language)",
+    "CREATE INDEX IF NOT EXISTS idx_master_work_schedule_master_day ON master_work_schedule(master_id, day_of_week)",
+    # Одиночные индексы из старых версий БД перекрываются составными выше
+    "DROP INDEX IF EXISTS idx_appointments_master_id",
+    "DROP INDEX IF EXISTS idx_appointments_client_id",
+    "DROP INDEX IF EXISTS idx_appointments_date",
+    "DROP INDEX IF EXISTS idx_appointments_status",
+    "DROP INDEX IF EXISTS idx_appointment_services_appointment_id",
+]))
+
+
+register(Migration(4, "unique keys for bulk upserts", [
+    # Один перевод на язык и один интервал графика на день: дубликаты схлопываются
+    # в последнюю запись, после чего ключи становятся уникальными (ON CONFLICT в upsert_rows)
+    """DELETE FROM service_translations WHERE id NOT IN (
+        SELECT MAX(id) FROM service_translations GROUP BY service_id, language
+    )""",
+    """DELETE FROM service_category_translations WHERE id NOT IN (
+        SELECT MAX(id) FROM service_category_translations GROUP BY category_id, language
+    )""",
+    """DELETE FROM master_work_schedule WHERE id NOT IN (
+        SELECT MAX(id) FROM master_work_schedule GROUP BY master_id, day_of_week
+    )""",
+    "DROP INDEX IF EXISTS idx_service_translations_service_language",
+    "DROP INDEX IF EXISTS idx_service_category_translations_category_language",
+    "DROP INDEX IF EXISTS idx_master_work_schedule_master_day",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_service_translations_service_language ON service_translations(service_id, language)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_service_category_translations_category_language ON service_category_translations(category_id, language)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_master_work_schedule_master_day ON master_work_schedule(master_id, day_of_week)",
+]))
+
+
+# Изменения записей и графика увеличивают версию (мастер, дата) — по ней процессы API
+# и бота проверяют свои кэши свободного времени (app.availability_cache). Изменение
+# графика помечается датой «*»: оно затрагивает все даты мастера.
+_SQLITE_AVAILABILITY_BUMP = """
+    INSERT INTO availability_versions (master_id, appointment_date, version)
+    SELECT {master}, {date}, 1 WHERE {master} IS NOT NULL
+    ON CONFLICT (master_id, appointment_date) DO UPDATE SET version = version + 1;
+"""
+
+_POSTGRES_AVAILABILITY_TRIGGERS = [
+    """CREATE OR REPLACE FUNCTION bump_availability_version(p_master_id INTEGER, p_date TEXT) RETURNS void AS $$
+    BEGIN
+        IF p_master_id IS NOT NULL THEN
+            INSERT INTO availability_versions (master_id, appointment_date, version)
+            VALUES (p_master_id, p_date, 1)
+            ON CONFLICT (master_id, appointment_date)
+            DO UPDATE SET version = availability_versions.version + 1;
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION appointments_availability_version() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM bump_availability_version(OLD.master_id, OLD.appointment_date::text);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM bump_availability_version(NEW.master_id, NEW.appointment_date::text);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION schedule_availability_version() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM bump_availability_version(OLD.master_id, '*');
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM bump_availability_version(NEW.master_id, '*');
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS trg_appointments_availability ON appointments",
+    """CREATE TRIGGER trg_appointments_availability
+    AFTER INSERT OR DELETE OR UPDATE OF master_id, appointment_date, start_time, end_time, status
+    ON appointments FOR EACH ROW EXECUTE FUNCTION appointments_availability_version()""",
+    "DROP TRIGGER IF EXISTS trg_schedule_availability ON master_work_schedule",
+    """CREATE TRIGGER trg_schedule_availability
+    AFTER INSERT OR UPDATE OR DELETE ON master_work_schedule
+    FOR EACH ROW EXECUTE FUNCTION schedule_availability_version()""",
+]
+
+
+def _availability_triggers(table: str, name: str, columns: str, master: str, date: str) -> List[str]:
+    old = _SQLITE_AVAILABILITY_BUMP.format(master=f"OLD.{master}", date=date.format(row="OLD"))
+    new = _SQLITE_AVAILABILITY_BUMP.format(master=f"NEW.{master}", date=date.format(row="NEW"))
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON {table} BEGIN {new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_update AFTER UPDATE{columns} ON {table} BEGIN {old} {new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON {table} BEGIN {old} END",
+    ]
+
+
+@migration(5, "availability versions")
+def _availability_versions(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS availability_versions (
+            master_id INTEGER NOT NULL,
+            appointment_date TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (master_id, appointment_date)
+        )
+    """)
+    if isinstance(cursor, sqlite3.Cursor):
+        statements = _availability_triggers(
+            "appointments", "trg_appointments_availability",
+            " OF master_id, appointment_date, start_time, end_time, status",
+            "master_id", "{row}.appointment_date",
+        ) + _availability_triggers(
+            "master_work_schedule", "trg_schedule_availability", "", "master_id", "'*'",
+        )
+    else:
+        statements = _POSTGRES_AVAILABILITY_TRIGGERS
+    for sql in statements:
+        cursor.execute(sql)
+
+
+@migration(6, "master breaks")
+def _master_breaks(cursor: sqlite3.Cursor) -> None:
+    # Перерыв или выходной мастера: даты включительно, без времени — весь день
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS master_breaks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            master_id INTEGER NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            start_time TEXT,
+            end_time TEXT,
+            reason TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (master_id) REFERENCES masters(id)
+        )
+    """)
+    # Перерывы, пересекающие дату: master_id = ? AND end_date >= ? AND start_date <= ?
+    # (прошедшие перерывы отсекаются диапазоном по end_date)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_master_breaks_master_dates ON master_breaks(master_id, end_date, start_date)"
+    )
+    # Перерывы влияют на все даты диапазона — помечаются как изменение графика
+    if isinstance(cursor, sqlite3.Cursor):
+        statements = _availability_triggers("master_breaks", "trg_breaks_availability", "", "master_id", "'*'")
+    else:
+        statements = [
+            "DROP TRIGGER IF EXISTS trg_breaks_availability ON master_breaks",
+            """CREATE TRIGGER trg_breaks_availability
+            AFTER INSERT OR UPDATE OR DELETE ON master_breaks
+            FOR EACH ROW EXECUTE FUNCTION schedule_availability_version()""",
+        ]
+    for sql in statements:
+        cursor.execute(sql)
+
+
+@migration(7, "schedule templates")
+def _schedule_templates(cursor: sqlite3.Cursor) -> None:
+    # Именованный недельный шаблон: интервал работы на каждый рабочий день недели
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_schedule_templates_name ON schedule_templates(name)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_template_days (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            template_id INTEGER NOT NULL,
+            day_of_week INTEGER NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            FOREIGN KEY (template_id) REFERENCES schedule_templates(id)
+        )
+    """)
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_schedule_template_days_template_day "
+        "ON schedule_template_days(template_id, day_of_week)"
+    )
+    # График мастера на конкретную дату (применённый шаблон); перекрывает недельный
+    # master_work_schedule, без времени — выходной. Одна строка на мастер-день.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS master_schedule_days (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            master_id INTEGER NOT NULL,
+            work_date TEXT NOT NULL,
+            start_time TEXT,
+            end_time TEXT,
+            template_id INTEGER,
+            FOREIGN KEY (master_id) REFERENCES masters(id),
+            FOREIGN KEY (template_id) REFERENCES schedule_templates(id)
+        )
+    """)
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_master_schedule_days_master_date "
+        "ON master_schedule_days(master_id, work_date)"
+    )
+    # Изменение графика на дату сбрасывает кэш только этой даты мастера
+    if isinstance(cursor, sqlite3.Cursor):
+        statements = _availability_triggers(
+            "master_schedule_days", "trg_schedule_days_availability",
+            " OF master_id, work_date, start_time, end_time",
+            "master_id", "{row}.work_date",
+        )
+    else:
+        statements = [
+            """CREATE OR REPLACE FUNCTION schedule_days_availability_version() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    PERFORM bump_availability_version(OLD.master_id, OLD.work_date::text);
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM bump_availability_version(NEW.master_id, NEW.work_date::text);
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql""",
+            "DROP TRIGGER IF EXISTS trg_schedule_days_availability ON master_schedule_days",
+            """CREATE TRIGGER trg_schedule_days_availability
+            AFTER INSERT OR DELETE OR UPDATE OF master_id, work_date, start_time, end_time
+            ON master_schedule_days FOR EACH ROW EXECUTE FUNCTION schedule_days_availability_version()""",
+        ]
+    for sql in statements:
+        cursor.execute(sql)
+
+
+
+# Закрытие салона меняет график всех мастеров сразу: версия «*» увеличивается у каждого
+# мастера и у строки салона (master_id = 0), по которой процессы обновляют календарь закрытий
+_SQLITE_CLOSURES_BUMP = """
+    INSERT INTO availability_versions (master_id, appointment_date, version)
+    SELECT id, '*', 1 FROM (SELECT id FROM masters UNION ALL SELECT 0) WHERE true
+    ON CONFLICT (master_id, appointment_date) DO UPDATE SET version = version + 1;
+"""
+
+
+@migration(8, "salon closures")
+def _salon_closures(cursor: sqlite3.Cursor) -> None:
+    # Праздник или сокращённый день салона: даты включительно, без времени — весь день,
+    # со временем — салон закрыт в этот интервал
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS salon_closures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            start_time TEXT,
+            end_time TEXT,
+            reason TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_salon_closures_dates ON salon_closures(end_date, start_date)"
+    )
+    if isinstance(cursor, sqlite3.Cursor):
+        statements = [
+            f"CREATE TRIGGER IF NOT EXISTS trg_closures_availability_{event} "
+            f"AFTER {event.upper()} ON salon_closures BEGIN {_SQLITE_CLOSURES_BUMP} END"
+            for event in ("insert", "update", "delete")
+        ]
+    else:
+        statements = [
+            """CREATE OR REPLACE FUNCTION closures_availability_version() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO availability_versions (master_id, appointment_date, version)
+                SELECT ids.id, '*', 1 FROM (SELECT id FROM masters UNION ALL SELECT 0) ids
+                ON CONFLICT (master_id, appointment_date)
+                DO UPDATE SET version = availability_versions.version + 1;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql""",
+            "DROP TRIGGER IF EXISTS trg_closures_availability ON salon_closures",
+            """CREATE TRIGGER trg_closures_availability
+            AFTER INSERT OR UPDATE OR DELETE ON salon_closures
+            FOR EACH STATEMENT EXECUTE FUNCTION closures_availability_version()""",
+        ]
+    for sql in statements:
+        cursor.execute(sql)
+
+
+@migration(9, "slot grid")
+def _slot_grid(cursor: sqlite3.Cursor) -> None:
+    # Свободные минуты мастер-дня битовой маской (180 байт) и версии, по которым она
+    # построена (app.slot_grid); без work_start — мастер в этот день не работает
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS slot_grid (
+            master_id INTEGER NOT NULL,
+            grid_date TEXT NOT NULL,
+            buffer INTEGER NOT NULL DEFAULT 0,
+            work_start INTEGER,
+            work_end INTEGER,
+            free_mask BLOB,
+            day_version INTEGER NOT NULL DEFAULT 0,
+            schedule_version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (master_id, grid_date)
+        )
+    """)
+    # Чтение и очистка горизонта по дате: grid_date = ? / grid_date < ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_slot_grid_date ON slot_grid(grid_date)")
+
+
+@migration(10, "calendar indexes")
+def _calendar_indexes(cursor: sqlite3.Cursor) -> None:
+    # Календарь всех мастеров за период (GET /calendar) выбирает строки по датам без master_id
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_master_schedule_days_date ON master_schedule_days(work_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_master_breaks_dates ON master_breaks(end_date, start_date)")
+
+# ==================== ПРИМЕНЕНИЕ ====================
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы (0 — миграции ещё не применялись)"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        # Таблицы schema_version ещё нет (в PostgreSQL ошибка прерывает транзакцию)
+        if conn.in_transaction:
+            conn.rollback()
+        return 0
+    return row[0] or 0
+
+
+def pending_migrations(conn: sqlite3.Connection, target: Optional[int] = None) -> List[Migration]:
+    """Миграции, которые ещё не применены (до версии target включительно)"""
+    current = get_schema_version(conn)
+    target = latest_version() if target is None else target
+    return [m for m in MIGRATIONS if current < m.version <= target]
+
+
+def migrate(conn: sqlite3.Connection, dry_run: bool = False, target: Optional[int] = None) -> List[Migration]:
+    """
+    Применение недостающих миграций.
+
+    Каждая миграция выполняется в отдельной транзакции вместе с записью
+    в schema_version. В режиме dry_run миграции выполняются и откатываются,
+    т.е. проверяется, что они применимы к текущей БД, но ничего не меняется.
+    Возвращает список применённых (в dry_run — проверенных) миграций.
+    """
+    target = latest_version() if target is None else target
+    if get_schema_version(conn) >= target:
+        return []
+
+    if conn.in_transaction:
+        conn.commit()
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """)
+    conn.commit()
+
+    pending = pending_migrations(conn, target)
+    cursor = conn.cursor()
+    try:
+        if dry_run:
+            cursor.execute("BEGIN")
+        for m in pending:
+            logger.info(f"{'Checking' if dry_run else 'Applying'} migration {m.version}: {m.name}")
+            if not dry_run:
+                cursor.execute("BEGIN")
+            m.apply(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (m.version, m.name, datetime.now().isoformat(sep=' ', timespec='seconds'))
+            )
+            if not dry_run:
+                conn.commit()
+        if dry_run:
+            conn.rollback()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return pending
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import argparse
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Миграции схемы БД салона")
+    parser.add_argument("--db", default=settings.DB_PATH, help="путь к файлу БД")
+    parser.add_argument("--dry-run", action="store_true", help="проверить миграции и откатить")
+    parser.add_argument("--target", type=int, help="мигрировать до указанной версии")
+    parser.add_argument("--status", action="store_true", help="показать версию схемы")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.status:
+            print(f"Schema version: {get_schema_version(conn)} (latest: {latest_version()})")
+            for m in pending_migrations(conn, args.target):
+                print(f"  pending {m.version}: {m.name}")
+            return 0
+        applied = migrate(conn, dry_run=args.dry_run, target=args.target)
+        action = "Checked" if args.dry_run else "Applied"
+        print(f"{action} {len(applied)} migration(s); schema version: {get_schema_version(conn)}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -56,6 +56,72 @@ class WorkScheduleResponse(BaseModel):
     start_time: str
     end_time: str
 
+# Перерывы и выходные мастеров (без времени — весь день)
+class MasterBreakCreate(BaseModel):
+    start_date: date
+    end_date: Optional[date] = None  # по умолчанию — один день
+    start_time: Optional[str] = None  # "13:00"
+    end_time: Optional[str] = None    # "14:00"
+    reason: Optional[str] = ""
+
+class MasterBreakUpdate(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    reason: Optional[str] = None
+    whole_day: Optional[bool] = None
+
+class MasterBreakResponse(BaseModel):
+    id: int
+    master_id: int
+    start_date: str
+    end_date: str
+    start_time: Optional[str]
+    end_time: Optional[str]
+    reason: Optional[str]
+
+# Закрытия салона
+class SalonClosureCreate(BaseModel):
+    start_date: date
+    end_date: Optional[date] = None  # по умолчанию — один день
+    start_time: Optional[str] = None  # без времени — салон закрыт весь день
+    end_time: Optional[str] = None
+    reason: Optional[str] = ""
+
+class SalonClosureUpdate(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    reason: Optional[str] = None
+    whole_day: Optional[bool] = None
+
+# Шаблоны графика
+class ScheduleTemplateDay(BaseModel):
+    day_of_week: int  # 0 — понедельник
+    start_time: str
+    end_time: str
+
+class ScheduleTemplateCreate(BaseModel):
+    name: str
+    description: Optional[str] = ""
+    days: List[ScheduleTemplateDay]  # дни недели без интервала — выходные
+
+class ScheduleTemplateUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    days: Optional[List[ScheduleTemplateDay]] = None
+
+class SchedulePeriod(BaseModel):
+    date_from: date
+    date_to: date
+
+class ScheduleTemplateApply(BaseModel):
+    master_ids: List[int]
+    periods: List[SchedulePeriod]
+    update_weekly: bool = False
+
 # Услуги и категории
 class CategoryCreate(BaseModel):
     parent_id: Optional[int] = None
@@ -0,0 +1,302 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+from urllib.parse import quote
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Не удалось получить соединение из пула за отведённое время"""
+
+
+class PooledConnection:
+    """
+    Соединение, выданное пулом.
+
+    Ведёт себя как обычный sqlite3.Connection, но close() не закрывает
+    соединение, а возвращает его в пул (незавершённая транзакция откатывается).
+    Если обёртку забыли закрыть, соединение вернётся в пул при сборке мусора.
+    """
+    __slots__ = ("_pool", "_conn", "__weakref__")
+
+    def __init__(self, pool: "ConnectionPool", conn: sqlite3.Connection):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    def _raw(self) -> sqlite3.Connection:
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return conn
+
+    def __getattr__(self, name: str) -> Any:
+        if name in PooledConnection.__slots__:
+            raise AttributeError(name)
+        return getattr(self._raw(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._raw(), name, value)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        # Та же семантика, что у sqlite3.Connection: commit/rollback без закрытия
+        return self._raw().__exit__(exc_type, exc, tb)
+
+    def close(self) -> None:
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            self._pool._release(conn)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Пул долгоживущих соединений SQLite.
+
+    Соединения переиспользуются между запросами (и, по возможности, остаются
+    закреплены за потоком, который ими пользовался), поэтому схема БД и кэш
+    подготовленных выражений не разбираются заново на каждый запрос.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        health_check_interval: float = 60.0,
+        cached_statements: int = 256,
+        on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+        read_only: bool = False,
+        statement_timeout: Optional[float] = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.cached_statements = cached_statements
+        self.on_connect = on_connect
+        self.read_only = read_only
+        self.statement_timeout = statement_timeout
+        # Срок выполнения запросов для выданных соединений: id(conn) -> [deadline]
+        self._deadlines: Dict[int, List[Optional[float]]] = {}
+
+        self._idle: List[Tuple[sqlite3.Connection, float]] = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+        self._local = threading.local()
+
+        self._created = 0
+        self._reused = 0
+        self._discarded = 0
+        self._waits = 0
+        self._timeouts = 0
+
+    # ==================== СОЕДИНЕНИЯ ====================
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            # mode=ro: SQLite сам отказывает в записи, блокировка на запись не берётся никогда
+            conn = sqlite3.connect(
+                f"file:{quote(os.path.abspath(self.db_path))}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+            )
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                cached_statements=self.cached_statements,
+            )
+        conn.row_factory = sqlite3.Row
+        if self.on_connect:
+            self.on_connect(conn)
+        if self.statement_timeout:
+            self._install_timeout(conn)
+        return conn
+
+    def _install_timeout(self, conn: sqlite3.Connection) -> None:
+        """Прерывание запросов, выполняющихся дольше statement_timeout с момента выдачи соединения"""
+        deadline: List[Optional[float]] = [None]
+
+        def check() -> int:
+            if deadline[0] is not None and time.monotonic() > deadline[0]:
+                with self._cond:
+                    self._timeouts += 1
+                return 1  # sqlite3.OperationalError: interrupted
+            return 0
+
+        # Проверка раз в ~10 тыс. инструкций VM: копеечно для коротких запросов
+        conn.set_progress_handler(check, 10000)
+        self._deadlines[id(conn)] = deadline
+
+    def _arm_timeout(self, conn: sqlite3.Connection, armed: bool) -> None:
+        deadline = self._deadlines.get(id(conn))
+        if deadline is not None:
+            deadline[0] = time.monotonic() + self.statement_timeout if armed else None
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        self._deadlines.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _take_idle(self) -> Optional[Tuple[sqlite3.Connection, float]]:
+        """Берёт свободное соединение, предпочитая то, которым уже пользовался текущий поток"""
+        if not self._idle:
+            return None
+        last = getattr(self._local, "last", None)
+        if last is not None:
+            for i, item in enumerate(self._idle):
+                if item[0] is last:
+                    return self._idle.pop(i)
+        return self._idle.pop()
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """Получение соединения из пула"""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+
+        while True:
+            item = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise sqlite3.ProgrammingError("Connection pool is closed")
+                    item = self._take_idle()
+                    if item is not None:
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Timed out waiting for a database connection (pool size {self.max_size})"
+                        )
+                    self._waits += 1
+                    self._cond.wait(remaining)
+
+            if item is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created += 1
+                break
+
+            conn, released_at = item
+            if (time.monotonic() - released_at) > self.health_check_interval and not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+            with self._cond:
+                self._reused += 1
+            break
+
+        self._local.last = conn
+        self._arm_timeout(conn, True)
+        return PooledConnection(self, conn)
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        """Возврат соединения в пул"""
+        self._arm_timeout(conn, False)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                close_now = True
+            else:
+                self._idle.append((conn, time.monotonic()))
+                close_now = False
+            self._cond.notify()
+        if close_now:
+            self._deadlines.pop(id(conn), None)
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Generator[PooledConnection, None, None]:
+        """Соединение из пула на время блока with"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ==================== ОБСЛУЖИВАНИЕ ====================
+
+    def health_check(self) -> bool:
+        """Проверка, что БД отвечает через соединение из пула"""
+        with self.connection() as conn:
+            return self._is_healthy(conn)
+
+    def close(self) -> None:
+        """Закрытие всех свободных соединений; занятые закроются при возврате"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._deadlines.pop(id(conn), None)
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика пула для мониторинга"""
+        with self._cond:
+            return {
+                "db_path": self.db_path,
+                "max_size": self.max_size,
+                "read_only": self.read_only,
+                "open": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "created": self._created,
+                "reused": self._reused,
+                "discarded": self._discarded,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+            }
@@ -0,0 +1,374 @@
+"""
+Проверка планов выполнения «горячих» запросов.
+
+Для каждого запроса из HOT_QUERIES выполняется EXPLAIN QUERY PLAN на схеме
+последней миграции; если SQLite выбирает полный проход по таблице (SCAN без
+индекса), проверка падает. Проверяется именно схема: планы строятся на пустой
+БД без статистики ANALYZE, иначе на маленьких таблицах SQLite законно
+предпочитает полный проход. Запускается в CI/перед релизом:
+
+    python -m app.query_plans                # схема из миграций
+    python -m app.query_plans --db salon.db  # схема существующей БД
+"""
+import os
+import sqlite3
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+from app.migrations import migrate
+
+# (название, SQL, параметры) — запросы в том виде, в каком их выполняют API и бот
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("bot.get_busy_time_slots", """
+        SELECT start_time, end_time FROM appointments
+        WHERE master_id = ? AND appointment_date = ?
+        AND status IN ('pending', 'confirmed', 'in_progress')
+        ORDER BY start_time
+    """, (1, "2025-01-01")),
+    ("bot.get_master_appointments", """
+        SELECT a.*, u.first_name as client_first_name,
+               GROUP_CONCAT(DISTINCT COALESCE(st.title, 'Услуга ' || s.id)) as services_titles
+        FROM appointments a
+        JOIN users u ON a.client_id = u.id
+        LEFT JOIN appointment_services aps ON a.id = aps.appointment_id
+        LEFT JOIN services s ON aps.service_id = s.id
+        LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = 'ru'
+        WHERE a.master_id = ? AND a.status IN ('pending', 'confirmed') AND a.appointment_date = ?
+        GROUP BY a.id ORDER BY a.start_time
+    """, (1, "2025-01-01")),
+    ("bot.get_user_appointments", """
+        SELECT a.id, a.appointment_date, a.start_time, u1.first_name as master_first_name,
+               GROUP_CONCAT(DISTINCT COALESCE(st.title, 'Услуга ' || s.id)) as services_titles
+        FROM appointments a
+        LEFT JOIN masters m ON a.master_id = m.id
+        LEFT JOIN users u1 ON m.user_id = u1.id
+        LEFT JOIN appointment_services aps ON a.id = aps.appointment_id
+        LEFT JOIN services s ON aps.service_id = s.id
+        LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = 'ru'
+        WHERE a.client_id = ?
+        GROUP BY a.id
+        ORDER BY a.appointment_date DESC, a.start_time DESC
+        LIMIT ?
+    """, (1, 10)),
+    ("bot.get_upcoming_appointments_for_notification", """
+        SELECT a.*, u.telegram_id as client_telegram_id, m.user_id as master_user_id
+        FROM appointments a
+        JOIN users u ON a.client_id = u.id
+        LEFT JOIN masters m ON a.master_id = m.id
+        WHERE a.status IN ('pending', 'confirmed')
+        AND a.appointment_date = ?
+        AND TIME(a.start_time) BETWEEN TIME(?) AND TIME(?, '+1 hour')
+    """, ("2025-01-01", "10:00", "10:30")),
+    ("bot.get_services_by_category", """
+        SELECT s.id, s.price, COALESCE(st.title, 'Услуга ' || s.id) as title, st.description
+        FROM services s
+        LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
+        WHERE s.category_id = ? AND s.is_active = 1
+        ORDER BY s.price
+    """, ("ru", 1)),
+    ("bot.get_category_by_id", """
+        SELECT sc.id, COALESCE(sct.title, 'Категория ' || sc.id) as title
+        FROM service_categories sc
+        LEFT JOIN service_category_translations sct ON sc.id = sct.category_id AND sct.language = ?
+        WHERE sc.id = ?
+    """, ("ru", 1)),
+    ("bot.get_master_schedule", """
+        SELECT start_time, end_time, template_id, 1 AS dated FROM master_schedule_days
+        WHERE master_id = ? AND work_date = ?
+        UNION ALL
+        SELECT start_time, end_time, NULL, 0 FROM master_work_schedule
+        WHERE master_id = ? AND day_of_week = ?
+        ORDER BY dated DESC
+        LIMIT 1
+    """, (1, "2025-01-01", 1, 2)),
+    ("api.dashboard.appointment_stats", """
+        SELECT COUNT(*) as total,
+               SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed
+        FROM appointments
+        WHERE appointment_date >= ?
+    """, ("2025-01-01",)),
+    ("api.dashboard.new_clients", """
+        SELECT COUNT(DISTINCT client_id) as new_clients
+        FROM appointments a
+        WHERE appointment_date >= ?
+        AND NOT EXISTS (
+            SELECT 1 FROM appointments a2
+            WHERE a2.client_id = a.client_id
+            AND a2.appointment_date < ?
+        )
+    """, ("2025-01-01", "2025-01-01")),
+    ("api.dashboard.revenue", """
+        SELECT COALESCE(SUM(s.price), 0) as total_revenue
+        FROM appointments a
+        JOIN appointment_services aps ON a.id = aps.appointment_id
+        JOIN services s ON aps.service_id = s.id
+        WHERE a.appointment_date >= ? AND a.status = 'completed'
+    """, ("2025-01-01",)),
+    ("api.get_appointments.by_master_and_dates", """
+        SELECT a.*, u1.first_name as client_first_name, u2.first_name as master_first_name
+        FROM appointments a
+        LEFT JOIN users u1 ON a.client_id = u1.id
+        LEFT JOIN masters m ON a.master_id = m.id
+        LEFT JOIN users u2 ON m.user_id = u2.id
+        WHERE 1=1 AND a.appointment_date >= ? AND a.appointment_date <= ? AND a.master_id = ?
+        ORDER BY a.appointment_date DESC, a.start_time DESC
+        LIMIT ? OFFSET ?
+    """, ("2025-01-01", "2025-01-31", 1, 20, 0)),
+    ("api.get_appointments.by_status", """
+        SELECT COUNT(*) as count FROM appointments WHERE 1=1 AND status = ?
+    """, ("pending",)),
+    ("api.appointment_services", """
+        SELECT s.id, st.title, s.duration_minutes, s.price
+        FROM appointment_services aps
+        JOIN services s ON aps.service_id = s.id
+        LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = 'ru'
+        WHERE aps.appointment_id = ?
+    """, (1,)),
+    ("api.client_recent_appointments", """
+        SELECT a.*, u.first_name as master_first_name
+        FROM appointments a
+        LEFT JOIN masters m ON a.master_id = m.id
+        LEFT JOIN users u ON m.user_id = u.id
+        WHERE a.client_id = ?
+        ORDER BY a.appointment_date DESC, a.start_time DESC
+        LIMIT ?
+    """, (1, 5)),
+    ("api.service_in_use", """
+        SELECT id FROM appointment_services WHERE service_id = ?
+    """, (1,)),
+    ("repository.get_services_by_ids", """
+        SELECT s.id, s.duration_minutes, s.price, COALESCE(st.title, 'Услуга ' || s.id) as title
+        FROM services s
+        LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
+        WHERE s.id IN (?, ?, ?) AND s.is_active = 1
+    """, ("ru", 1, 2, 3)),
+    ("repository.get_services_for_appointments", """
+        SELECT aps.appointment_id, s.id, st.title, s.duration_minutes, s.price
+        FROM appointment_services aps
+        JOIN services s ON aps.service_id = s.id
+        LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
+        WHERE aps.appointment_id IN (?, ?, ?)
+        ORDER BY aps.appointment_id, aps.id
+    """, ("ru", 1, 2, 3)),
+    ("repository.get_masters_by_ids", """
+        SELECT m.id, m.photo, u.first_name, u.telegram_id
+        FROM masters m
+        JOIN users u ON m.user_id = u.id
+        WHERE m.id IN (?, ?, ?)
+    """, (1, 2, 3)),
+    ("repository.get_services_for_masters", """
+        SELECT ms.master_id, ms.service_id, s.price, st.title as service_title
+        FROM master_services ms
+        JOIN services s ON ms.service_id = s.id
+        LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
+        WHERE ms.master_id IN (?, ?, ?)
+        ORDER BY ms.master_id, ms.is_primary DESC
+    """, ("ru", 1, 2, 3)),
+    ("repository.get_masters_providing_services", """
+        SELECT m.id as master_id, u.telegram_id
+        FROM master_services ms
+        JOIN masters m ON ms.master_id = m.id
+        JOIN users u ON m.user_id = u.id
+        WHERE ms.service_id IN (?, ?) AND m.is_active = 1
+        GROUP BY m.id, u.telegram_id
+        HAVING COUNT(DISTINCT ms.service_id) = ?
+    """, (1, 2, 2)),
+    ("repository.get_schedules_for_masters", """
+        SELECT * FROM master_work_schedule
+        WHERE day_of_week = ? AND master_id IN (?, ?, ?)
+    """, (0, 1, 2, 3)),
+    ("repository.get_schedule_days_for_period", """
+        SELECT master_id, work_date, start_time, end_time, template_id FROM master_schedule_days
+        WHERE master_id IN (?, ?, ?)
+        AND work_date BETWEEN ? AND ?
+    """, (1, 2, 3, "2025-01-01", "2025-01-31")),
+    ("repository.get_bookings_for_masters", """
+        SELECT master_id, start_time, end_time FROM appointments
+        WHERE appointment_date = ?
+        AND master_id IN (?, ?, ?)
+        AND status IN (?, ?, ?)
+        ORDER BY master_id, start_time
+    """, ("2025-01-01", 1, 2, 3, "pending", "confirmed", "in_progress")),
+    ("repository.get_week_schedules_for_masters", """
+        SELECT * FROM master_work_schedule
+        WHERE master_id IN (?, ?, ?)
+    """, (1, 2, 3)),
+    ("repository.get_bookings_for_period", """
+        SELECT master_id, appointment_date, start_time, end_time FROM appointments
+        WHERE master_id IN (?, ?, ?)
+        AND appointment_date BETWEEN ? AND ?
+        AND status IN (?, ?, ?)
+        ORDER BY master_id, appointment_date, start_time
+    """, (1, 2, 3, "2025-01-01", "2025-01-31", "pending", "confirmed", "in_progress")),
+    ("repository.get_breaks_for_period", """
+        SELECT master_id, start_date, end_date, start_time, end_time FROM master_breaks
+        WHERE master_id IN (?, ?, ?)
+        AND end_date >= ? AND start_date <= ?
+    """, (1, 2, 3, "2025-01-01", "2025-01-31")),
+    ("repository.get_availability_versions", """
+        SELECT master_id, appointment_date, version FROM availability_versions
+        WHERE master_id IN (?, ?, ?)
+        AND appointment_date IN (?, ?)
+    """, (1, 2, 3, "2025-01-01", "*")),
+    ("booking.find_conflicts", """
+        SELECT id, start_time, end_time, status FROM appointments
+        WHERE master_id = ? AND appointment_date = ?
+        AND start_time < ? AND end_time > ?
+        AND status IN (?, ?, ?)
+        AND id != ?
+    """, (1, "2025-01-01", "11:00", "10:00", "pending", "confirmed", "in_progress", 1)),
+    ("booking.find_conflicts.breaks", """
+        SELECT id, start_time, end_time, reason FROM master_breaks
+        WHERE master_id = ? AND end_date >= ? AND start_date <= ?
+        AND (start_time IS NULL OR (start_time < ? AND end_time > ?))
+    """, (1, "2025-01-01", "2025-01-01", "11:00", "10:00")),
+    ("booking.find_conflicts.closures", """
+        SELECT id, start_time, end_time, reason FROM salon_closures
+        WHERE end_date >= ? AND start_date <= ?
+        AND (start_time IS NULL OR (start_time < ? AND end_time > ?))
+    """, ("2025-01-01", "2025-01-01", "11:00", "10:00")),
+    ("repository.get_salon_closures", """
+        SELECT start_date, end_date, start_time, end_time FROM salon_closures
+        WHERE end_date >= ? AND start_date <= ?
+    """, ("2025-01-01", "2025-12-31")),
+    ("repository.get_closures_version", """
+        SELECT version FROM availability_versions WHERE master_id = ? AND appointment_date = ?
+    """, (0, "*")),
+    ("repository.get_slot_grid", """
+        SELECT g.master_id, g.work_start, g.work_end, g.free_mask FROM slot_grid g
+        LEFT JOIN availability_versions d ON d.master_id = g.master_id AND d.appointment_date = g.grid_date
+        LEFT JOIN availability_versions s ON s.master_id = g.master_id AND s.appointment_date = ?
+        WHERE g.grid_date = ? AND g.master_id IN (?, ?, ?)
+        AND g.buffer = ?
+        AND g.day_version = COALESCE(d.version, 0) AND g.schedule_version = COALESCE(s.version, 0)
+    """, ("*", "2025-01-01", 1, 2, 3, 0)),
+    ("repository.get_fresh_slot_grid_days", """
+        SELECT g.master_id, g.grid_date FROM slot_grid g
+        LEFT JOIN availability_versions d ON d.master_id = g.master_id AND d.appointment_date = g.grid_date
+        LEFT JOIN availability_versions s ON s.master_id = g.master_id AND s.appointment_date = ?
+        WHERE g.grid_date BETWEEN ? AND ? AND g.buffer = ?
+        AND g.day_version = COALESCE(d.version, 0) AND g.schedule_version = COALESCE(s.version, 0)
+    """, ("*", "2025-01-01", "2025-01-14", 0)),
+    ("slot_grid.occupy", """
+        SELECT work_start, free_mask, buffer, day_version, schedule_version FROM slot_grid
+        WHERE master_id = ? AND grid_date = ?
+    """, (1, "2025-01-01")),
+    ("calendar.masters", """
+        SELECT m.id, u.first_name, u.last_name, m.photo
+        FROM masters m
+        JOIN users u ON m.user_id = u.id
+        WHERE m.is_active = 1
+    """, ()),
+    ("calendar.week", """
+        SELECT w.master_id, w.day_of_week, w.start_time, w.end_time
+        FROM masters m
+        JOIN master_work_schedule w ON w.master_id = m.id
+        WHERE m.is_active = 1
+    """, ()),
+    ("calendar.schedule_days", """
+        SELECT master_id, work_date, start_time, end_time FROM master_schedule_days
+        WHERE work_date BETWEEN ? AND ?
+    """, ("2025-01-01", "2025-01-07")),
+    ("calendar.breaks", """
+        SELECT master_id, start_date, end_date, start_time, end_time, reason FROM master_breaks
+        WHERE end_date >= ? AND start_date <= ?
+    """, ("2025-01-01", "2025-01-07")),
+    ("calendar.appointments", """
+        SELECT a.id, a.master_id, a.appointment_date AS date, a.start_time, a.end_time, a.status,
+            a.client_id, u.first_name AS client_first_name, u.last_name AS client_last_name
+        FROM appointments a
+        LEFT JOIN users u ON a.client_id = u.id
+        WHERE a.appointment_date BETWEEN ? AND ? AND a.status != 'cancelled'
+        ORDER BY a.appointment_date, a.start_time, a.id
+    """, ("2025-01-01", "2025-01-07")),
+    ("calendar.services", """
+        SELECT aps.appointment_id, s.id, COALESCE(st.title, 'Услуга ' || s.id) AS title
+        FROM appointments a
+        JOIN appointment_services aps ON aps.appointment_id = a.id
+        JOIN services s ON aps.service_id = s.id
+        LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
+        WHERE a.appointment_date BETWEEN ? AND ? AND a.status != 'cancelled'
+        ORDER BY aps.appointment_id, aps.id
+    """, ("ru", "2025-01-01", "2025-01-07")),
+]
+
+
+def full_scans(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> List[str]:
+    """Строки плана с полным проходом по таблице (без индекса)"""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", tuple(params)).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[3]
+        # «SCAN t USING INDEX ...» — проход по индексу, «SCAN t» — по всей таблице
+        if detail.startswith("SCAN ") and " USING " not in detail and "CONSTANT ROW" not in detail:
+            scans.append(detail)
+    return scans
+
+
+def check_query_plans(
+    conn: sqlite3.Connection,
+    queries: Optional[List[Tuple[str, str, tuple]]] = None,
+) -> List[Tuple[str, List[str]]]:
+    """Список (запрос, проблемные строки плана) для запросов с полным проходом"""
+    failures = []
+    for name, sql, params in (HOT_QUERIES if queries is None else queries):
+        scans = full_scans(conn, sql, params)
+        if scans:
+            failures.append((name, scans))
+    return failures
+
+
+def load_schema(source_path: Optional[str] = None) -> sqlite3.Connection:
+    """Пустая БД в памяти со схемой из миграций или из существующего файла БД"""
+    conn = sqlite3.connect(":memory:")
+    if source_path is None:
+        migrate(conn)
+        # Демо-данные из миграций не влияют на планы: без ANALYZE статистики нет
+        return conn
+
+    source = sqlite3.connect(source_path)
+    try:
+        rows = source.execute("""
+            SELECT sql FROM sqlite_master
+            WHERE sql IS NOT NULL AND type IN ('table', 'index') AND name NOT LIKE 'sqlite_%'
+            ORDER BY type = 'index'
+        """).fetchall()
+    finally:
+        source.close()
+    for (sql,) in rows:
+        conn.execute(sql)
+    return conn
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN для горячих запросов")
+    parser.add_argument("--db", help="взять схему из файла БД (по умолчанию — из миграций)")
+    args = parser.parse_args(argv)
+    if args.db is not None and not os.path.isfile(args.db):
+        # sqlite3.connect создал бы пустой файл
+        parser.error(f"database file not found: {args.db}")
+
+    conn = load_schema(args.db)
+    try:
+        failures = check_query_plans(conn)
+    except sqlite3.OperationalError as e:
+        # Например, --db указывает на БД без миграций: нет таблиц или колонок запросов
+        print(f"Cannot build query plans: {e}", file=sys.stderr)
+        if args.db is not None:
+            print(f"Apply migrations first: python -m app.migrations --db {args.db}", file=sys.stderr)
+        return 2
+    finally:
+        conn.close()
+
+    for name, scans in failures:
+        print(f"FULL SCAN in {name}:")
+        for detail in scans:
+            print(f"    {detail}")
+    print(f"{len(HOT_QUERIES) - len(failures)}/{len(HOT_QUERIES)} hot queries use indexes")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,523 @@
+"""
+Общие запросы к БД салона для API и бота.
+
+Функции принимают открытое соединение (из пула API, sqlite3 бота или
+соединение потока-писателя) и выбирают данные пачкой по списку id одним
+запросом с IN (...) вместо запроса на каждый элемент. Результат —
+словари, ключ — id; порядок и повторы задаёт вызывающий код.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.rows import fetch_dict, fetch_dicts
+
+# Не больше параметров в одном IN (...): старые сборки SQLite ограничены 999
+MAX_IN_PARAMS = 500
+
+# Статусы записей, занимающих время мастера
+BUSY_STATUSES = ("pending", "confirmed", "in_progress")
+
+# Дата в availability_versions, которой триггеры помечают изменения графика
+SCHEDULE_VERSION_KEY = "*"
+
+# master_id строки availability_versions, версия которой отмечает изменения закрытий салона
+SALON_VERSION_ID = 0
+
+
+def _unique(ids: Iterable[Any]) -> List[int]:
+    seen = {}
+    for item_id in ids:
+        if item_id is not None:
+            seen.setdefault(int(item_id), None)
+    return list(seen)
+
+
+def _chunks(ids: Sequence[int]) -> Iterator[Sequence[int]]:
+    for start in range(0, len(ids), MAX_IN_PARAMS):
+        yield ids[start:start + MAX_IN_PARAMS]
+
+
+def _placeholders(count: int) -> str:
+    return ", ".join("?" for _ in range(count))
+
+
+def photo_url(base_url: Optional[str], photo: Optional[str]) -> Optional[str]:
+    """URL фото мастера (None, если фото нет)"""
+    if not photo or base_url is None:
+        return None
+    return f"{base_url}/uploads/masters/{photo}"
+
+
+# ==================== УСЛУГИ ====================
+
+def get_services_by_ids(
+    conn,
+    service_ids: Iterable[int],
+    language: str = "ru",
+    active_only: bool = True,
+) -> Dict[int, Dict[str, Any]]:
+    """Услуги с переводом по списку id: {id: услуга}"""
+    ids = _unique(service_ids)
+    services: Dict[int, Dict[str, Any]] = {}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        query = f"""
+            SELECT
+                s.id,
+                s.category_id,
+                s.duration_minutes,
+                s.price,
+                s.is_active,
+                COALESCE(st.title, 'Услуга ' || s.id) as title,
+                st.description
+            FROM services s
+            LEFT JOIN service_translations st
+                ON s.id = st.service_id AND st.language = ?
+            WHERE s.id IN ({_placeholders(len(chunk))})
+        """
+        if active_only:
+            query += " AND s.is_active = 1"
+        cursor.execute(query, (language, *chunk))
+        for service in fetch_dicts(cursor):
+            services[service["id"]] = service
+    return services
+
+
+def services_totals(services: Dict[int, Dict[str, Any]], service_ids: Iterable[int]) -> Tuple[int, float]:
+    """Общая длительность (мин) и стоимость выбранных услуг; повторы учитываются"""
+    duration = 0
+    price = 0.0
+    for service_id in service_ids:
+        service = services.get(int(service_id))
+        if service:
+            duration += service.get("duration_minutes") or 0
+            price += service.get("price") or 0
+    return duration, price
+
+
+def get_min_service_duration(conn) -> Optional[int]:
+    """Длительность самой короткой активной услуги (мин): меньший простой продать нельзя"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT MIN(duration_minutes) AS duration FROM services WHERE is_active = 1 AND duration_minutes > 0")
+    row = fetch_dict(cursor)
+    return row["duration"] if row and row["duration"] else None
+
+
+def get_services_for_appointments(
+    conn,
+    appointment_ids: Iterable[int],
+    language: str = "ru",
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Услуги записей: {appointment_id: [услуги]} (у записей без услуг — пустой список)"""
+    ids = _unique(appointment_ids)
+    result: Dict[int, List[Dict[str, Any]]] = {appointment_id: [] for appointment_id in ids}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT aps.appointment_id, s.id, st.title, s.duration_minutes, s.price
+            FROM appointment_services aps
+            JOIN services s ON aps.service_id = s.id
+            LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
+            WHERE aps.appointment_id IN ({_placeholders(len(chunk))})
+            ORDER BY aps.appointment_id, aps.id
+        """, (language, *chunk))
+        for service in fetch_dicts(cursor):
+            result[service.pop("appointment_id")].append(service)
+    return result
+
+
+# ==================== МАСТЕРА ====================
+
+def get_masters_by_ids(
+    conn,
+    master_ids: Iterable[int],
+    base_url: Optional[str] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """Мастера с данными пользователя по списку id: {id: мастер}"""
+    ids = _unique(master_ids)
+    masters: Dict[int, Dict[str, Any]] = {}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT
+                m.id,
+                m.photo,
+                m.qualification,
+                m.description,
+                m.is_active,
+                u.first_name,
+                u.last_name,
+                u.phone,
+                u.telegram_id,
+                u.id as user_id
+            FROM masters m
+            JOIN users u ON m.user_id = u.id
+            WHERE m.id IN ({_placeholders(len(chunk))})
+        """, tuple(chunk))
+        for master in fetch_dicts(cursor):
+            master["photo_url"] = photo_url(base_url, master.get("photo"))
+            masters[master["id"]] = master
+    return masters
+
+
+def get_services_for_masters(
+    conn,
+    master_ids: Iterable[int],
+    language: str = "ru",
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Услуги мастеров: {master_id: [услуги]} (основные услуги первыми)"""
+    ids = _unique(master_ids)
+    result: Dict[int, List[Dict[str, Any]]] = {master_id: [] for master_id in ids}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT
+                ms.master_id,
+                ms.service_id, ms.category_id, ms.is_primary,
+                s.price, s.duration_minutes,
+                st.title as service_title
+            FROM master_services ms
+            JOIN services s ON ms.service_id = s.id
+            LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = ?
+            WHERE ms.master_id IN ({_placeholders(len(chunk))})
+            ORDER BY ms.master_id, ms.is_primary DESC
+        """, (language, *chunk))
+        for service in fetch_dicts(cursor):
+            result[service.pop("master_id")].append(service)
+    return result
+
+
+def get_masters_providing_services(
+    conn,
+    service_ids: Iterable[int],
+    active_only: bool = False,
+) -> List[Dict[str, Any]]:
+    """Мастера, оказывающие все перечисленные услуги: [{master_id, telegram_id, first_name, last_name}]"""
+    ids = _unique(service_ids)
+    if not ids:
+        return []
+    if len(ids) > MAX_IN_PARAMS:
+        raise ValueError(f"Too many services in one request: {len(ids)}")
+    active = " AND m.is_active = 1" if active_only else ""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT m.id as master_id, u.telegram_id, u.first_name, u.last_name
+        FROM master_services ms
+        JOIN masters m ON ms.master_id = m.id
+        JOIN users u ON m.user_id = u.id
+        WHERE ms.service_id IN ({_placeholders(len(ids))}){active}
+        GROUP BY m.id, u.telegram_id, u.first_name, u.last_name
+        HAVING COUNT(DISTINCT ms.service_id) = ?
+    """, (*ids, len(ids)))
+    return fetch_dicts(cursor)
+
+
+# ==================== ГРАФИК И ЗАНЯТОСТЬ ====================
+
+def get_schedules_for_masters(
+    conn,
+    master_ids: Iterable[int],
+    day_of_week: int,
+    appointment_date: Optional[str] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    График мастеров на день недели: {master_id: строка графика} (без графика — нет ключа).
+    Если указана appointment_date, график на эту дату (master_schedule_days)
+    перекрывает недельный; выходной на дату — тоже нет ключа.
+    """
+    ids = _unique(master_ids)
+    schedules: Dict[int, Dict[str, Any]] = {}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT * FROM master_work_schedule
+            WHERE day_of_week = ? AND master_id IN ({_placeholders(len(chunk))})
+        """, (day_of_week, *chunk))
+        for schedule in fetch_dicts(cursor):
+            schedules[schedule["master_id"]] = schedule
+    if appointment_date is not None:
+        for master_id, days in get_schedule_days_for_period(conn, ids, appointment_date, appointment_date).items():
+            for schedule in days.values():
+                if schedule["start_time"] and schedule["end_time"]:
+                    schedules[master_id] = schedule
+                else:
+                    schedules.pop(master_id, None)
+    return schedules
+
+
+def get_schedule_days_for_period(
+    conn,
+    master_ids: Iterable[int],
+    date_from: str,
+    date_to: str,
+) -> Dict[int, Dict[str, Dict[str, Any]]]:
+    """
+    Графики мастеров на конкретные даты периода (включительно):
+    {master_id: {дата: строка}}; строка без времени — выходной
+    """
+    ids = _unique(master_ids)
+    result: Dict[int, Dict[str, Dict[str, Any]]] = {}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT master_id, work_date, start_time, end_time, template_id FROM master_schedule_days
+            WHERE master_id IN ({_placeholders(len(chunk))})
+            AND work_date BETWEEN ? AND ?
+        """, (*chunk, date_from, date_to))
+        for schedule in fetch_dicts(cursor):
+            result.setdefault(schedule["master_id"], {})[str(schedule["work_date"])] = schedule
+    return result
+
+
+def get_schedules_for_period(
+    conn,
+    master_ids: Iterable[int],
+    date_from: str,
+    date_to: str,
+) -> Tuple[Dict[int, Dict[int, Dict[str, Any]]], Dict[int, Dict[str, Dict[str, Any]]]]:
+    """
+    Недельные графики и графики на даты периода (см. availability.resolve_schedule).
+    Мастера, у которых есть только графики на даты, тоже попадают в недельные (пустые).
+    """
+    week = get_week_schedules_for_masters(conn, master_ids)
+    dated = get_schedule_days_for_period(conn, master_ids, date_from, date_to)
+    for master_id in dated:
+        week.setdefault(master_id, {})
+    return week, dated
+
+
+def get_resolved_schedule(conn, master_id: int, work_date: str) -> Optional[Dict[str, Any]]:
+    """
+    График мастера на дату одним запросом по двум индексам: сначала график
+    на дату, иначе недельный. None — мастер в этот день не работает.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT start_time, end_time, template_id, 1 AS dated FROM master_schedule_days
+        WHERE master_id = ? AND work_date = ?
+        UNION ALL
+        SELECT start_time, end_time, NULL, 0 FROM master_work_schedule
+        WHERE master_id = ? AND day_of_week = ?
+        ORDER BY dated DESC
+        LIMIT 1
+    """, (master_id, work_date, master_id, date.fromisoformat(work_date).weekday()))
+    schedule = fetch_dict(cursor)
+    if not schedule or not schedule["start_time"] or not schedule["end_time"]:
+        return None
+    schedule["master_id"] = master_id
+    schedule["work_date"] = work_date
+    return schedule
+
+
+def get_bookings_for_masters(
+    conn,
+    master_ids: Iterable[int],
+    appointment_date: str,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Записи мастеров на дату, занимающие время: {master_id: [{start_time, end_time}]}"""
+    ids = _unique(master_ids)
+    result: Dict[int, List[Dict[str, Any]]] = {master_id: [] for master_id in ids}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT master_id, start_time, end_time FROM appointments
+            WHERE appointment_date = ?
+            AND master_id IN ({_placeholders(len(chunk))})
+            AND status IN ({_placeholders(len(BUSY_STATUSES))})
+            ORDER BY master_id, start_time
+        """, (appointment_date, *chunk, *BUSY_STATUSES))
+        for booking in fetch_dicts(cursor):
+            result[booking.pop("master_id")].append(booking)
+    return result
+
+
+def get_week_schedules_for_masters(
+    conn,
+    master_ids: Iterable[int],
+) -> Dict[int, Dict[int, Dict[str, Any]]]:
+    """Недельные графики мастеров: {master_id: {day_of_week: строка графика}}"""
+    ids = _unique(master_ids)
+    result: Dict[int, Dict[int, Dict[str, Any]]] = {}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT * FROM master_work_schedule
+            WHERE master_id IN ({_placeholders(len(chunk))})
+        """, tuple(chunk))
+        for schedule in fetch_dicts(cursor):
+            result.setdefault(schedule["master_id"], {})[schedule["day_of_week"]] = schedule
+    return result
+
+
+def get_bookings_for_period(
+    conn,
+    master_ids: Iterable[int],
+    date_from: str,
+    date_to: str,
+) -> Dict[int, Dict[str, List[Dict[str, Any]]]]:
+    """Записи мастеров за период (включительно): {master_id: {дата: [{start_time, end_time}]}}"""
+    ids = _unique(master_ids)
+    result: Dict[int, Dict[str, List[Dict[str, Any]]]] = {master_id: {} for master_id in ids}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT master_id, appointment_date, start_time, end_time FROM appointments
+            WHERE master_id IN ({_placeholders(len(chunk))})
+            AND appointment_date BETWEEN ? AND ?
+            AND status IN ({_placeholders(len(BUSY_STATUSES))})
+            ORDER BY master_id, appointment_date, start_time
+        """, (*chunk, date_from, date_to, *BUSY_STATUSES))
+        for booking in fetch_dicts(cursor):
+            master_id = booking.pop("master_id")
+            day = str(booking.pop("appointment_date"))
+            result[master_id].setdefault(day, []).append(booking)
+    return result
+
+
+# Перерыв без времени закрывает весь день
+_BREAK_COLUMNS = """
+    master_id, start_date, end_date,
+    COALESCE(start_time, '00:00') as start_time,
+    COALESCE(end_time, '24:00') as end_time
+"""
+
+
+def get_breaks_for_masters(
+    conn,
+    master_ids: Iterable[int],
+    appointment_date: str,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Перерывы мастеров, действующие в дату: {master_id: [{start_time, end_time}]}"""
+    return {
+        master_id: days.get(appointment_date, [])
+        for master_id, days in get_breaks_for_period(conn, master_ids, appointment_date, appointment_date).items()
+    }
+
+
+def get_breaks_for_period(
+    conn,
+    master_ids: Iterable[int],
+    date_from: str,
+    date_to: str,
+) -> Dict[int, Dict[str, List[Dict[str, Any]]]]:
+    """
+    Перерывы мастеров за период (включительно), разложенные по дням:
+    {master_id: {дата: [{start_time, end_time}]}}. Выбираются только
+    перерывы, пересекающие период (индекс по master_id, end_date).
+    """
+    ids = _unique(master_ids)
+    result: Dict[int, Dict[str, List[Dict[str, Any]]]] = {master_id: {} for master_id in ids}
+    period_start, period_end = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT {_BREAK_COLUMNS} FROM master_breaks
+            WHERE master_id IN ({_placeholders(len(chunk))})
+            AND end_date >= ? AND start_date <= ?
+        """, (*chunk, date_from, date_to))
+        for row in fetch_dicts(cursor):
+            interval = {"start_time": row["start_time"], "end_time": row["end_time"]}
+            day = max(date.fromisoformat(str(row["start_date"])), period_start)
+            last = min(date.fromisoformat(str(row["end_date"])), period_end)
+            while day <= last:
+                result[row["master_id"]].setdefault(day.isoformat(), []).append(interval)
+                day += timedelta(days=1)
+    return result
+
+
+def get_salon_closures(conn, date_from: str, date_to: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Закрытия салона за период (включительно), разложенные по дням:
+    {дата: [{start_time, end_time}]}; закрытие на весь день — 00:00–24:00
+    """
+    period_start, period_end = date.fromisoformat(date_from), date.fromisoformat(date_to)
+    result: Dict[str, List[Dict[str, Any]]] = {}
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT start_date, end_date,
+            COALESCE(start_time, '00:00') as start_time,
+            COALESCE(end_time, '24:00') as end_time
+        FROM salon_closures
+        WHERE end_date >= ? AND start_date <= ?
+    """, (date_from, date_to))
+    for row in fetch_dicts(cursor):
+        interval = {"start_time": row["start_time"], "end_time": row["end_time"]}
+        day = max(date.fromisoformat(str(row["start_date"])), period_start)
+        last = min(date.fromisoformat(str(row["end_date"])), period_end)
+        while day <= last:
+            result.setdefault(day.isoformat(), []).append(interval)
+            day += timedelta(days=1)
+    return result
+
+
+def get_closures_version(conn) -> int:
+    """Версия закрытий салона (0 — закрытия не менялись)"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT version FROM availability_versions WHERE master_id = ? AND appointment_date = ?",
+        (SALON_VERSION_ID, SCHEDULE_VERSION_KEY),
+    )
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def get_availability_versions(
+    conn,
+    master_ids: Iterable[int],
+    appointment_date: str,
+) -> Dict[int, Tuple[int, int]]:
+    """Версии занятости мастеров: {master_id: (версия записей на дату, версия графика)}; нет строки — 0"""
+    ids = _unique(master_ids)
+    found: Dict[Tuple[int, str], int] = {}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT master_id, appointment_date, version FROM availability_versions
+            WHERE master_id IN ({_placeholders(len(chunk))})
+            AND appointment_date IN (?, ?)
+        """, (*chunk, appointment_date, SCHEDULE_VERSION_KEY))
+        for master_id, day, version in cursor.fetchall():
+            found[(master_id, day)] = version
+    return {
+        master_id: (found.get((master_id, appointment_date), 0), found.get((master_id, SCHEDULE_VERSION_KEY), 0))
+        for master_id in ids
+    }
+
+
+_FRESH_GRID = """
+    LEFT JOIN availability_versions d ON d.master_id = g.master_id AND d.appointment_date = g.grid_date
+    LEFT JOIN availability_versions s ON s.master_id = g.master_id AND s.appointment_date = ?
+"""
+
+
+def get_slot_grid(conn, master_ids: Iterable[int], grid_date: str, buffer: int) -> Dict[int, Dict[str, Any]]:
+    """
+    Актуальные строки сетки свободного времени на дату (версии совпадают
+    с availability_versions): {master_id: {work_start, work_end, free_mask}}
+    """
+    ids = _unique(master_ids)
+    rows: Dict[int, Dict[str, Any]] = {}
+    cursor = conn.cursor()
+    for chunk in _chunks(ids):
+        cursor.execute(f"""
+            SELECT g.master_id, g.work_start, g.work_end, g.free_mask FROM slot_grid g
+            {_FRESH_GRID}
+            WHERE g.grid_date = ? AND g.master_id IN ({_placeholders(len(chunk))})
+            AND g.buffer = ?
+            AND g.day_version = COALESCE(d.version, 0) AND g.schedule_version = COALESCE(s.version, 0)
+        """, (SCHEDULE_VERSION_KEY, grid_date, *chunk, buffer))
+        for row in fetch_dicts(cursor):
+            rows[row["master_id"]] = row
+    return rows
+
+
+def get_fresh_slot_grid_days(conn, date_from: str, date_to: str, buffer: int) -> Set[Tuple[int, str]]:
+    """Актуальные мастер-дни сетки за период: {(master_id, дата)}"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT g.master_id, g.grid_date FROM slot_grid g
+        {_FRESH_GRID}
+        WHERE g.grid_date BETWEEN ? AND ? AND g.buffer = ?
+        AND g.day_version = COALESCE(d.version, 0) AND g.schedule_version = COALESCE(s.version, 0)
+    """, (SCHEDULE_VERSION_KEY, date_from, date_to, buffer))
+    return {(master_id, str(grid_date)) for master_id, grid_date in cursor.fetchall()}
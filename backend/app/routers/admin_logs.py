@@ -1,14 +1,37 @@
 from fastapi import APIRouter, Depends, Query
 from typing import Optional  # Добавьте этот импорт!
 from app.auth import get_current_admin
-from app.database import db
+from app.database import db, offload_db
 from app.models import PaginatedResponse
+from app.rows import fetch_dict, fetch_dicts
+from app.statements import registry as statements
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/admin-logs", tags=["admin logs"])
 
+LOGS_FILTERS = (
+    ("admin_id", "al.admin_id = ?"),
+    ("action", "al.action LIKE ?"),
+    ("start_date", "DATE(al.created_at) >= ?"),
+    ("end_date", "DATE(al.created_at) <= ?"),
+)
+
+LOGS_LIST = statements.template("admin_logs.list", """
+    SELECT al.*, u.first_name, u.last_name
+    FROM admin_logs al
+    JOIN users u ON al.admin_id = u.id
+    WHERE 1=1
+""", LOGS_FILTERS, " ORDER BY al.created_at DESC LIMIT ? OFFSET ?")
+
+LOGS_COUNT = statements.template(
+    "admin_logs.count",
+    "SELECT COUNT(*) as count FROM admin_logs al JOIN users u ON al.admin_id = u.id WHERE 1=1",
+    LOGS_FILTERS,
+)
+
 @router.get("/", response_model=PaginatedResponse)
+@offload_db
 async def get_admin_logs(
     current_user: dict = Depends(get_current_admin),
     admin_id: Optional[int] = None,
@@ -23,42 +46,21 @@ async def get_admin_logs(
     """
     offset = (page - 1) * per_page
     
-    query = """
-        SELECT al.*, u.first_name, u.last_name
-        FROM admin_logs al
-        JOIN users u ON al.admin_id = u.id
-        WHERE 1=1
-    """
-    count_query = "SELECT COUNT(*) as count FROM admin_logs al JOIN users u ON al.admin_id = u.id WHERE 1=1"
-    params = []
-    
-    if admin_id:
-        query += " AND al.admin_id = ?"
-        count_query += " AND al.admin_id = ?"
-        params.append(admin_id)
-    
-    if action:
-        query += " AND al.action LIKE ?"
-        count_query += " AND al.action LIKE ?"
-        params.append(f"%{action}%")
-    
-    if start_date:
-        query += " AND DATE(al.created_at) >= ?"
-        count_query += " AND DATE(al.created_at) >= ?"
-        params.append(start_date)
-    
-    if end_date:
-        query += " AND DATE(al.created_at) <= ?"
-        count_query += " AND DATE(al.created_at) <= ?"
-        params.append(end_date)
-    
-    query += " ORDER BY al.created_at DESC LIMIT ? OFFSET ?"
-    params.extend([per_page, offset])
-    
-    logs = db.fetch_all(query, tuple(params))
+    filters = {
+        "admin_id": admin_id or None,
+        "action": f"%{action}%" if action else None,
+        "start_date": start_date or None,
+        "end_date": end_date or None,
+    }
     
-    # Общее количество
-    count_result = db.fetch_one(count_query, tuple(params[:len(params)-2] if len(params) > 2 else ()))
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        LOGS_LIST.execute(cursor, filters, tail=(per_page, offset))
+        logs = fetch_dicts(cursor)
+        
+        # Общее количество
+        LOGS_COUNT.execute(cursor, filters)
+        count_result = fetch_dict(cursor)
     total = count_result["count"] if count_result else 0
     
     return {
@@ -3,19 +3,18 @@ from fastapi import APIRouter, Depends, Query
 from app.auth import get_current_admin
 import logging
 from datetime import date, timedelta
-import sqlite3
 from typing import Dict, Any
+from app.database import db, offload_readonly
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 def get_db_connection():
-    """Создание соединения с БД"""
-    conn = sqlite3.connect("salon.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Соединение только для чтения из отдельного пула для отчётов"""
+    return db.connect_readonly()
 
 @router.get("/dashboard")
+@offload_readonly
 async def get_dashboard_stats(
     current_user: dict = Depends(get_current_admin),
     period_days: int = Query(30, ge=1, le=365)
@@ -148,6 +147,7 @@ async def get_dashboard_stats(
         }
 
 @router.get("/masters-load")
+@offload_readonly
 async def get_masters_load(
     current_user: dict = Depends(get_current_admin),
     days: int = Query(7, ge=1, le=30)
@@ -222,6 +222,7 @@ async def get_masters_load(
         }
 
 @router.get("/services-popularity")
+@offload_readonly
 async def get_services_popularity(
     current_user: dict = Depends(get_current_admin),
     period_days: int = Query(30, ge=1, le=365)
@@ -278,6 +279,7 @@ async def get_services_popularity(
         }
 
 @router.get("/recent-appointments")
+@offload_readonly
 async def get_recent_appointments(
     current_user: dict = Depends(get_current_admin),
     limit: int = Query(10, ge=1, le=50)
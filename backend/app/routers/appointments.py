@@ -1,9 +1,11 @@
 #routers/apointments.py
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from app import booking, bulk, repository, slot_grid
 from app.auth import get_current_admin, log_admin_action
-from app.database import db
+from app.config import settings
+from app.database import db, offload_db
 from app.models import AppointmentCreate, AppointmentUpdate, PaginatedResponse
 import logging
 
@@ -11,6 +13,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
 @router.get("/", response_model=PaginatedResponse)
+@offload_db
 async def get_appointments(
     current_user: dict = Depends(get_current_admin),
     start_date: Optional[date] = None,
@@ -75,16 +78,11 @@ async def get_appointments(
     
     appointments = db.fetch_all(query, tuple(params))
     
-    # Добавляем услуги для каждой записи
+    # Добавляем услуги всех записей одним запросом
+    with db.get_connection() as conn:
+        services_by_appointment = repository.get_services_for_appointments(conn, [a["id"] for a in appointments])
     for appointment in appointments:
-        services = db.fetch_all("""
-            SELECT s.id, st.title, s.duration_minutes, s.price
-            FROM appointment_services aps
-            JOIN services s ON aps.service_id = s.id
-            LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = 'ru'
-            WHERE aps.appointment_id = ?
-        """, (appointment["id"],))
-        appointment["services"] = services
+        appointment["services"] = services_by_appointment.get(appointment["id"], [])
     
     # Общее количество
     count_result = db.fetch_one(count_query, tuple(count_params))
@@ -99,6 +97,7 @@ async def get_appointments(
     }
 
 @router.post("/")
+@offload_db
 async def create_appointment(
     appointment_data: AppointmentCreate,
     current_user: dict = Depends(get_current_admin)
@@ -106,38 +105,59 @@ async def create_appointment(
     """
     Создание новой записи
     """
-    # Рассчитываем время окончания на основе услуг
-    total_duration = 0
-    for service_id in appointment_data.services:
-        service = db.fetch_one("SELECT duration_minutes FROM services WHERE id = ?", (service_id,))
-        if service:
-            total_duration += service["duration_minutes"]
-    
-    # Преобразуем время окончания
-    start_datetime = datetime.strptime(appointment_data.start_time, "%H:%M")
-    end_datetime = start_datetime.replace(minute=start_datetime.minute + total_duration)
-    end_time = end_datetime.strftime("%H:%M")
-    
-    # Создаем запись
-    appointment_id = db.insert_and_get_id("""
-        INSERT INTO appointments 
-        (client_id, master_id, appointment_date, start_time, end_time, status)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        appointment_data.client_id,
-        appointment_data.master_id,
-        appointment_data.appointment_date,
-        appointment_data.start_time,
-        end_time,
-        appointment_data.status
-    ))
-    
-    # Добавляем услуги
-    for service_id in appointment_data.services:
-        db.execute_query("""
-            INSERT INTO appointment_services (appointment_id, service_id)
-            VALUES (?, ?)
-        """, (appointment_id, service_id))
+    def _write(conn):
+        # Рассчитываем время окончания на основе услуг
+        services = repository.get_services_by_ids(conn, appointment_data.services, active_only=False)
+        total_duration, _ = repository.services_totals(services, appointment_data.services)
+        
+        if appointment_data.master_id and appointment_data.status in repository.BUSY_STATUSES:
+            # Проверка пересечений и вставка — одна транзакция
+            end_time = booking.ensure_slot_free(
+                conn,
+                appointment_data.master_id,
+                appointment_data.appointment_date.isoformat(),
+                appointment_data.appointment_date.weekday(),
+                appointment_data.start_time,
+                total_duration,
+                step=settings.SLOT_STEP_MINUTES,
+                buffer=settings.APPOINTMENT_BUFFER_MINUTES,
+            )
+        else:
+            start_datetime = datetime.strptime(appointment_data.start_time, "%H:%M")
+            end_time = (start_datetime + timedelta(minutes=total_duration)).strftime("%H:%M")
+        
+        # Создаем запись
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO appointments 
+            (client_id, master_id, appointment_date, start_time, end_time, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            appointment_data.client_id,
+            appointment_data.master_id,
+            appointment_data.appointment_date,
+            appointment_data.start_time,
+            end_time,
+            appointment_data.status
+        ))
+        appointment_id = cursor.lastrowid
+        if appointment_data.master_id and appointment_data.status in repository.BUSY_STATUSES:
+            slot_grid.occupy(
+                conn, appointment_data.master_id, appointment_data.appointment_date.isoformat(),
+                appointment_data.start_time, end_time, settings.APPOINTMENT_BUFFER_MINUTES,
+            )
+        
+        # Добавляем услуги одним запросом
+        bulk.insert_rows(
+            conn, "appointment_services", ("appointment_id", "service_id"),
+            [(appointment_id, service_id) for service_id in appointment_data.services],
+        )
+        return appointment_id
+    
+    try:
+        appointment_id = db.write(_write)
+    except booking.SlotConflict as e:
+        raise HTTPException(status_code=409, detail=e.as_dict())
     
     log_admin_action(
         current_user["id"], 
@@ -148,6 +168,7 @@ async def create_appointment(
     return {"id": appointment_id, "message": "Appointment created"}
 
 @router.put("/{appointment_id}")
+@offload_db
 async def update_appointment(
     appointment_id: int,
     appointment_data: AppointmentUpdate,
@@ -181,6 +202,7 @@ async def update_appointment(
     return {"message": "Appointment updated"}
 
 @router.put("/{appointment_id}/status")
+@offload_db
 async def update_appointment_status(
     appointment_id: int,
     status: str,
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional
 from app.auth import get_current_admin, log_admin_action
-from app.database import db
+from app.database import db, offload_db
 from app.models import BonusUpdate, PaginatedResponse
 import logging
 
@@ -9,6 +9,7 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/bonuses", tags=["bonuses"])
 
 @router.get("/{client_id}/balance")
+@offload_db
 async def get_client_bonus_balance(
     client_id: int,
     current_user: dict = Depends(get_current_admin)
@@ -43,6 +44,7 @@ async def get_client_bonus_balance(
     }
 
 @router.post("/{client_id}/add")
+@offload_db
 async def add_bonuses(
     client_id: int,
     bonus_data: BonusUpdate,
@@ -87,6 +89,7 @@ async def add_bonuses(
     return {"message": f"Added {bonus_data.amount} bonuses"}
 
 @router.post("/{client_id}/subtract")
+@offload_db
 async def subtract_bonuses(
     client_id: int,
     bonus_data: BonusUpdate,
@@ -129,6 +132,7 @@ async def subtract_bonuses(
     return {"message": f"Subtracted {bonus_data.amount} bonuses"}
 
 @router.get("/{client_id}/history")
+@offload_db
 async def get_bonus_history(
     client_id: int,
     current_user: dict = Depends(get_current_admin),
@@ -2,8 +2,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Form
 from typing import Optional, List
 from datetime import datetime
-import sqlite3
 import logging
+from app import repository
+from app.database import db, offload_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["clients"])
@@ -12,6 +13,7 @@ router = APIRouter(tags=["clients"])
 # или содержать дополнительные эндпоинты, которых нет в main.py
 
 @router.get("/search")
+@offload_db
 async def search_clients(
     query: str = Query(..., min_length=2, description="Поисковый запрос"),
     limit: int = Query(10, ge=1, le=50, description="Лимит результатов")
@@ -20,8 +22,7 @@ async def search_clients(
     logger.info(f"Search clients: {query}")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = db.connect()
         cursor = conn.cursor()
         
         search_term = f"%{query}%"
@@ -49,13 +50,13 @@ async def search_clients(
         raise HTTPException(status_code=500, detail=f"Ошибка при поиске клиентов: {str(e)}")
 
 @router.get("/{client_id}/stats")
+@offload_db
 async def get_client_stats(client_id: int):
     """Получение статистики клиента"""
     logger.info(f"Get client {client_id} stats")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = db.connect()
         cursor = conn.cursor()
         
         # Проверяем существование клиента
@@ -154,6 +155,7 @@ async def get_client_stats(client_id: int):
         raise HTTPException(status_code=500, detail=f"Ошибка при получении статистики клиента: {str(e)}")
 
 @router.get("/{client_id}/recent-appointments")
+@offload_db
 async def get_client_recent_appointments(
     client_id: int,
     limit: int = Query(5, ge=1, le=20, description="Количество последних записей")
@@ -162,8 +164,7 @@ async def get_client_recent_appointments(
     logger.info(f"Get client {client_id} recent appointments")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = db.connect()
         cursor = conn.cursor()
         
         # Проверяем существование клиента
@@ -184,17 +185,10 @@ async def get_client_recent_appointments(
         
         appointments = [dict(row) for row in cursor.fetchall()]
         
-        # Добавляем услуги для каждой записи
+        # Добавляем услуги всех записей одним запросом
+        services_by_appointment = repository.get_services_for_appointments(conn, [a["id"] for a in appointments])
         for appointment in appointments:
-            cursor.execute("""
-                SELECT s.id, st.title, s.duration_minutes, s.price
-                FROM appointment_services aps
-                JOIN services s ON aps.service_id = s.id
-                LEFT JOIN service_translations st ON s.id = st.service_id AND st.language = 'ru'
-                WHERE aps.appointment_id = ?
-            """, (appointment["id"],))
-            services = [dict(row) for row in cursor.fetchall()]
-            appointment["services"] = services
+            appointment["services"] = services_by_appointment.get(appointment["id"], [])
         
         conn.close()
         
@@ -211,6 +205,7 @@ async def get_client_recent_appointments(
         raise HTTPException(status_code=500, detail=f"Ошибка при получении записей клиента: {str(e)}")
 
 @router.put("/{client_id}")
+@offload_db
 async def update_client(
     client_id: int,
     first_name: Optional[str] = Form(None),
@@ -222,7 +217,7 @@ async def update_client(
     logger.info(f"Update client {client_id}")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = db.connect()
         cursor = conn.cursor()
         
         # Проверяем существование клиента
@@ -286,12 +281,13 @@ async def update_client(
         raise HTTPException(status_code=500, detail=f"Ошибка при обновлении клиента: {str(e)}")
 
 @router.delete("/{client_id}")
+@offload_db
 async def delete_client(client_id: int):
     """Удаление клиента"""
     logger.info(f"Delete client {client_id} request")
     
     try:
-        conn = sqlite3.connect("salon.db")
+        conn = db.connect()
         cursor = conn.cursor()
         
         # Проверяем существование клиента
@@ -346,6 +342,7 @@ async def delete_client(client_id: int):
         raise HTTPException(status_code=500, detail=f"Ошибка при удалении клиента: {str(e)}")
 
 @router.get("/{client_id}/appointments/{appointment_id}/services")
+@offload_db
 async def get_client_appointment_services(
     client_id: int,
     appointment_id: int
@@ -354,8 +351,7 @@ async def get_client_appointment_services(
     logger.info(f"Get appointment {appointment_id} services for client {client_id}")
     
     try:
-        conn = sqlite3.connect("salon.db")
-        conn.row_factory = sqlite3.Row
+        conn = db.connect()
         cursor = conn.cursor()
         
         # Проверяем, принадлежит ли запись клиенту
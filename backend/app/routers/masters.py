@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form, status
 from typing import List, Optional
 from app.auth import get_current_admin, log_admin_action
-from app.database import db
+from app.database import db, offload_db
 from app.models import MasterCreate, MasterUpdate, MasterResponse, PaginatedResponse
 from app.config import settings
 import os
@@ -180,6 +180,7 @@ def get_next_telegram_id() -> int:
         return 1001
 
 @router.get("", response_model=PaginatedResponse)
+@offload_db
 async def get_masters(
     current_user: dict = Depends(get_current_admin),
     page: int = Query(1, ge=1),
@@ -264,6 +265,7 @@ async def get_masters(
         )
 
 @router.post("", status_code=status.HTTP_201_CREATED)
+@offload_db
 async def create_master(
     first_name: str = Form(...),
     last_name: str = Form(...),
@@ -408,6 +410,7 @@ async def create_master(
             connection.close()
 
 @router.get("/{master_id}")
+@offload_db
 async def get_master(
     master_id: int,
     current_user: dict = Depends(get_current_admin)
@@ -449,6 +452,7 @@ async def get_master(
         )
 
 @router.put("/{master_id}")
+@offload_db
 async def update_master(
     master_id: int,
     first_name: Optional[str] = Form(None),
@@ -651,6 +655,7 @@ async def update_master(
             connection.close()
 
 @router.delete("/{master_id}")
+@offload_db
 async def delete_master(
     master_id: int,
     current_user: dict = Depends(get_current_admin)
@@ -754,6 +759,7 @@ async def delete_master(
             connection.close()
 
 @router.patch("/{master_id}/status")
+@offload_db
 async def toggle_master_status(
     master_id: int,
     is_active: bool = Form(...),
@@ -1,14 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import List
+from datetime import date
+from typing import List, Optional
 from app.auth import get_current_admin, log_admin_action
-from app.database import db
-from app.models import WorkScheduleCreate, WorkScheduleResponse
+from app.breaks import BREAKS_LIST, validate_break
+from app.database import db, offload_db
+from app.models import (
+    MasterBreakCreate, MasterBreakResponse, MasterBreakUpdate, WorkScheduleCreate, WorkScheduleResponse
+)
+from app.rows import fetch_dicts
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/schedule", tags=["work schedule"])
 
 @router.get("/masters/{master_id}", response_model=List[WorkScheduleResponse])
+@offload_db
 async def get_master_schedule(
     master_id: int,
     current_user: dict = Depends(get_current_admin)
@@ -25,6 +31,7 @@ async def get_master_schedule(
     return schedule
 
 @router.post("/masters/{master_id}", response_model=WorkScheduleResponse)
+@offload_db
 async def set_master_schedule(
     master_id: int,
     schedule_data: WorkScheduleCreate,
@@ -38,33 +45,17 @@ async def set_master_schedule(
     if not master:
         raise HTTPException(status_code=404, detail="Master not found")
     
-    # Проверяем существующий график на этот день
-    existing = db.fetch_one("""
-        SELECT id FROM master_work_schedule 
-        WHERE master_id = ? AND day_of_week = ?
-    """, (master_id, schedule_data.day_of_week))
-    
-    if existing:
-        # Обновляем существующий график
-        db.execute_query("""
-            UPDATE master_work_schedule 
-            SET start_time = ?, end_time = ?
-            WHERE id = ?
-        """, (schedule_data.start_time, schedule_data.end_time, existing["id"]))
-        
-        schedule_id = existing["id"]
-    else:
-        # Создаем новый график
-        schedule_id = db.insert_and_get_id("""
-            INSERT INTO master_work_schedule (master_id, day_of_week, start_time, end_time)
-            VALUES (?, ?, ?, ?)
-        """, (master_id, schedule_data.day_of_week, 
-              schedule_data.start_time, schedule_data.end_time))
+    # Создаем или обновляем график на этот день
+    db.upsert_rows(
+        "master_work_schedule", ("master_id", "day_of_week", "start_time", "end_time"),
+        [(master_id, schedule_data.day_of_week, schedule_data.start_time, schedule_data.end_time)],
+        conflict_columns=("master_id", "day_of_week"),
+    )
     
     # Получаем созданный/обновленный график
     schedule = db.fetch_one("""
-        SELECT * FROM master_work_schedule WHERE id = ?
-    """, (schedule_id,))
+        SELECT * FROM master_work_schedule WHERE master_id = ? AND day_of_week = ?
+    """, (master_id, schedule_data.day_of_week))
     
     log_admin_action(
         current_user["id"], 
@@ -75,6 +66,7 @@ async def set_master_schedule(
     return schedule
 
 @router.delete("/masters/{master_id}/days/{day_of_week}")
+@offload_db
 async def remove_schedule_day(
     master_id: int,
     day_of_week: int,
@@ -96,25 +88,120 @@ async def remove_schedule_day(
     
     return {"message": "Schedule day removed"}
 
-@router.post("/masters/{master_id}/breaks")
+@router.get("/masters/{master_id}/breaks", response_model=List[MasterBreakResponse])
+@offload_db
+async def get_master_breaks(
+    master_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: dict = Depends(get_current_admin)
+):
+    """
+    Перерывы и выходные мастера (пересекающие период, если он указан)
+    """
+    conn = db.connect()
+    try:
+        cursor = conn.cursor()
+        BREAKS_LIST.execute(cursor, {
+            "date_from": date_from.isoformat() if date_from else None,
+            "date_to": date_to.isoformat() if date_to else None,
+        }, params=(master_id,))
+        return fetch_dicts(cursor)
+    finally:
+        conn.close()
+
+@router.post("/masters/{master_id}/breaks", response_model=MasterBreakResponse)
+@offload_db
 async def add_break_slot(
     master_id: int,
-    break_date: str,  # "2024-01-15"
-    start_time: str,
-    end_time: str,
-    reason: str = "",
+    break_data: MasterBreakCreate,
     current_user: dict = Depends(get_current_admin)
 ):
     """
-    Добавление временного перерыва/закрытия
-    (Для реализации потребуется дополнительная таблица master_breaks)
+    Добавление перерыва (start_time/end_time) или выходного (без времени)
+    на дату или диапазон дат; учитывается при расчёте свободного времени
     """
-    # В реальной реализации нужно создать таблицу master_breaks
-    # Для демо: просто логируем действие
+    end_date = break_data.end_date or break_data.start_date
+    validate_break(break_data.start_date, end_date, break_data.start_time, break_data.end_time)
+    
+    master = db.fetch_one("SELECT id FROM masters WHERE id = ?", (master_id,))
+    if not master:
+        raise HTTPException(status_code=404, detail="Master not found")
+    
+    break_id = db.insert_and_get_id("""
+        INSERT INTO master_breaks (master_id, start_date, end_date, start_time, end_time, reason)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (
+        master_id,
+        break_data.start_date.isoformat(),
+        end_date.isoformat(),
+        break_data.start_time,
+        break_data.end_time,
+        break_data.reason or "",
+    ))
+    
     log_admin_action(
         current_user["id"], 
         "ADD_BREAK", 
-        f"Added break for master {master_id} on {break_date} {start_time}-{end_time}: {reason}"
+        f"Added break {break_id} for master {master_id} on {break_data.start_date}..{end_date} "
+        f"{break_data.start_time or 'all day'}-{break_data.end_time or ''}: {break_data.reason}"
+    )
+    
+    return db.fetch_one("SELECT * FROM master_breaks WHERE id = ?", (break_id,))
+
+@router.put("/breaks/{break_id}", response_model=MasterBreakResponse)
+@offload_db
+async def update_break(
+    break_id: int,
+    break_data: MasterBreakUpdate,
+    current_user: dict = Depends(get_current_admin)
+):
+    """
+    Изменение перерыва
+    """
+    existing = db.fetch_one("SELECT * FROM master_breaks WHERE id = ?", (break_id,))
+    if not existing:
+        raise HTTPException(status_code=404, detail="Break not found")
+    
+    start_date = break_data.start_date or date.fromisoformat(str(existing["start_date"]))
+    end_date = break_data.end_date or date.fromisoformat(str(existing["end_date"]))
+    if break_data.whole_day:
+        start_time = end_time = None
+    else:
+        start_time = break_data.start_time if break_data.start_time is not None else existing["start_time"]
+        end_time = break_data.end_time if break_data.end_time is not None else existing["end_time"]
+    reason = break_data.reason if break_data.reason is not None else existing["reason"]
+    validate_break(start_date, end_date, start_time, end_time)
+    
+    db.execute_query("""
+        UPDATE master_breaks
+        SET start_date = ?, end_date = ?, start_time = ?, end_time = ?, reason = ?
+        WHERE id = ?
+    """, (start_date.isoformat(), end_date.isoformat(), start_time, end_time, reason, break_id))
+    
+    log_admin_action(current_user["id"], "UPDATE_BREAK", f"Updated break {break_id}")
+    
+    return db.fetch_one("SELECT * FROM master_breaks WHERE id = ?", (break_id,))
+
+@router.delete("/breaks/{break_id}")
+@offload_db
+async def delete_break(
+    break_id: int,
+    current_user: dict = Depends(get_current_admin)
+):
+    """
+    Удаление перерыва
+    """
+    existing = db.fetch_one("SELECT id, master_id FROM master_breaks WHERE id = ?", (break_id,))
+    if not existing:
+        raise HTTPException(status_code=404, detail="Break not found")
+    
+    db.execute_query("DELETE FROM master_breaks WHERE id = ?", (break_id,))
+    
+    log_admin_action(
+        current_user["id"], 
+        "REMOVE_BREAK", 
+        f"Removed break {break_id} for master {existing['master_id']}"
     )
     
-    return {"message": "Break added (not implemented in demo)"}
\ No newline at end of file
+    return {"message": "Break removed"}
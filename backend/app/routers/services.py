@@ -2,7 +2,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from typing import List, Optional
 from app.auth import get_current_admin, log_admin_action
-from app.database import db
+from app.database import db, offload_db
 from pydantic import BaseModel, validator, Field
 from typing import Optional as Opt
 import logging
@@ -125,6 +125,7 @@ class CategoryStatsResponse(BaseModel):
 
 # Категории услуг
 @router.get("/categories", response_model=List[CategoryResponse])
+@offload_db
 async def get_categories(
     current_user: dict = Depends(get_current_admin),
     is_active: Optional[bool] = None,
@@ -192,6 +193,7 @@ async def get_categories(
         )
 
 @router.get("/categories/tree", response_model=List[CategoryTreeResponse])
+@offload_db
 async def get_categories_tree(
     current_user: dict = Depends(get_current_admin),
     language: str = "ru",
@@ -264,6 +266,7 @@ async def get_categories_tree(
         )
 
 @router.get("/categories/{category_id}", response_model=CategoryResponse)
+@offload_db
 async def get_category(
     category_id: int,
     current_user: dict = Depends(get_current_admin),
@@ -310,6 +313,7 @@ async def get_category(
         )
 
 @router.post("/categories", response_model=dict, status_code=status.HTTP_201_CREATED)
+@offload_db
 async def create_category(
     category_data: CategoryCreate,
     current_user: dict = Depends(get_current_admin)
@@ -354,11 +358,10 @@ async def create_category(
             )
         
         # Добавляем переводы
-        for translation in category_data.translations:
-            db.execute_query("""
-                INSERT INTO service_category_translations (category_id, language, title)
-                VALUES (?, ?, ?)
-            """, (category_id, translation.language, translation.title))
+        db.insert_rows(
+            "service_category_translations", ("category_id", "language", "title"),
+            [(category_id, t.language, t.title) for t in category_data.translations],
+        )
         
         log_admin_action(
             current_user["id"], 
@@ -384,6 +387,7 @@ async def create_category(
         )
 
 @router.put("/categories/{category_id}", response_model=dict)
+@offload_db
 async def update_category(
     category_id: int,
     category_data: CategoryUpdate,
@@ -469,23 +473,11 @@ async def update_category(
         
         # Обновляем переводы
         if category_data.translations:
-            for translation in category_data.translations:
-                existing_translation = db.fetch_one("""
-                    SELECT id FROM service_category_translations 
-                    WHERE category_id = ? AND language = ?
-                """, (category_id, translation.language))
-                
-                if existing_translation:
-                    db.execute_query("""
-                        UPDATE service_category_translations 
-                        SET title = ?
-                        WHERE id = ?
-                    """, (translation.title, existing_translation["id"]))
-                else:
-                    db.execute_query("""
-                        INSERT INTO service_category_translations (category_id, language, title)
-                        VALUES (?, ?, ?)
-                    """, (category_id, translation.language, translation.title))
+            db.upsert_rows(
+                "service_category_translations", ("category_id", "language", "title"),
+                [(category_id, t.language, t.title) for t in category_data.translations],
+                conflict_columns=("category_id", "language"),
+            )
         
         log_admin_action(
             current_user["id"], 
@@ -506,6 +498,7 @@ async def update_category(
         )
 
 @router.delete("/categories/{category_id}", response_model=dict)
+@offload_db
 async def delete_category(
     category_id: int,
     current_user: dict = Depends(get_current_admin)
@@ -592,6 +585,7 @@ async def delete_category(
         )
 
 @router.get("/categories/{category_id}/stats", response_model=CategoryStatsResponse)
+@offload_db
 async def get_category_stats(
     category_id: int,
     current_user: dict = Depends(get_current_admin),
@@ -637,6 +631,7 @@ async def get_category_stats(
 
 # Услуги
 @router.get("", response_model=PaginatedResponse)
+@offload_db
 async def get_services(
     current_user: dict = Depends(get_current_admin),
     category_id: Optional[int] = Query(None, description="ID категории для фильтрации"),
@@ -759,6 +754,7 @@ async def get_services(
         }
 
 @router.post("", response_model=dict, status_code=status.HTTP_201_CREATED)
+@offload_db
 async def create_service(
     service_data: ServiceCreate,
     current_user: dict = Depends(get_current_admin)
@@ -810,16 +806,10 @@ async def create_service(
             )
         
         # Добавляем переводы
-        for translation in service_data.translations:
-            db.execute_query("""
-                INSERT INTO service_translations (service_id, language, title, description)
-                VALUES (?, ?, ?, ?)
-            """, (
-                service_id,
-                translation.language,
-                translation.title,
-                translation.description or ""
-            ))
+        db.insert_rows(
+            "service_translations", ("service_id", "language", "title", "description"),
+            [(service_id, t.language, t.title, t.description or "") for t in service_data.translations],
+        )
         
         log_admin_action(
             current_user["id"], 
@@ -844,6 +834,7 @@ async def create_service(
         )
 
 @router.get("/{service_id}", response_model=ServiceWithDetailsResponse)
+@offload_db
 async def get_service(
     service_id: int,
     current_user: dict = Depends(get_current_admin),
@@ -928,6 +919,7 @@ async def get_service(
         )
 
 @router.put("/{service_id}", response_model=dict)
+@offload_db
 async def update_service(
     service_id: int,
     service_data: ServiceUpdate,
@@ -1002,32 +994,11 @@ async def update_service(
         
         # Обновляем переводы
         if service_data.translations:
-            for translation in service_data.translations:
-                existing_translation = db.fetch_one("""
-                    SELECT id FROM service_translations 
-                    WHERE service_id = ? AND language = ?
-                """, (service_id, translation.language))
-                
-                if existing_translation:
-                    db.execute_query("""
-                        UPDATE service_translations 
-                        SET title = ?, description = ?
-                        WHERE id = ?
-                    """, (
-                        translation.title,
-                        translation.description or "",
-                        existing_translation["id"]
-                    ))
-                else:
-                    db.execute_query("""
-                        INSERT INTO service_translations (service_id, language, title, description)
-                        VALUES (?, ?, ?, ?)
-                    """, (
-                        service_id,
-                        translation.language,
-                        translation.title,
-                        translation.description or ""
-                    ))
+            db.upsert_rows(
+                "service_translations", ("service_id", "language", "title", "description"),
+                [(service_id, t.language, t.title, t.description or "") for t in service_data.translations],
+                conflict_columns=("service_id", "language"),
+            )
         
         log_admin_action(
             current_user["id"], 
@@ -1049,6 +1020,7 @@ async def update_service(
 # В разделе услуг добавим новый endpoint после существующего delete_service:
 
 @router.delete("/{service_id}/force", response_model=dict)
+@offload_db
 async def force_delete_service(
     service_id: int,
     current_user: dict = Depends(get_current_admin)
@@ -1120,6 +1092,7 @@ async def force_delete_service(
             detail=f"Ошибка при удалении услуги: {str(e)}"
         )
 @router.delete("/{service_id}", response_model=dict)
+@offload_db
 async def delete_service(
     service_id: int,
     current_user: dict = Depends(get_current_admin)
@@ -1172,6 +1145,7 @@ async def delete_service(
         )
 
 @router.get("/{service_id}/translations", response_model=List[TranslationBase])
+@offload_db
 async def get_service_translations(
     service_id: int,
     current_user: dict = Depends(get_current_admin)
@@ -1199,6 +1173,7 @@ async def get_service_translations(
         )
 
 @router.get("/search/suggestions", response_model=List[ServiceResponse])
+@offload_db
 async def search_service_suggestions(
     current_user: dict = Depends(get_current_admin),
     q: str = Query(..., min_length=2, description="Поисковый запрос"),
@@ -1230,6 +1205,7 @@ async def search_service_suggestions(
         return []
 
 @router.get("/categories/{category_id}/services", response_model=List[ServiceResponse])
+@offload_db
 async def get_services_by_category(
     category_id: int,
     current_user: dict = Depends(get_current_admin),
@@ -0,0 +1,88 @@
+"""
+Преобразование строк результата в словари и JSON.
+
+Имена колонок берутся из cursor.description один раз на запрос, а строки
+читаются как обычные кортежи (без промежуточных sqlite3.Row) и собираются
+в dict через zip (или сразу по колонкам — fetch_columns). При повторяющихся
+именах колонок (m.*, u.telegram_id) берётся первая, как row[key] у
+sqlite3.Row, которым API пользовался раньше. Для больших
+страниц ответ можно сразу сериализовать в JSON (dumps_json), минуя
+рекурсивный jsonable_encoder FastAPI.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def column_names(cursor) -> Tuple[str, ...]:
+    """Имена колонок последнего запроса курсора"""
+    return tuple(column[0] for column in cursor.description or ())
+
+
+def _first_positions(keys: Sequence[str]) -> Optional[Dict[str, int]]:
+    """Позиции колонок с повторяющимися именами (первое вхождение); None, если повторов нет"""
+    positions: Dict[str, int] = {}
+    for i, key in enumerate(keys):
+        positions.setdefault(key, i)
+    return positions if len(positions) != len(keys) else None
+
+
+def rows_to_dicts(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Список словарей из строк-кортежей с общими именами колонок"""
+    positions = _first_positions(keys)
+    if positions is None:
+        return [dict(zip(keys, row)) for row in rows]
+    return [{key: row[i] for key, i in positions.items()} for row in rows]
+
+
+def _fetch_plain(cursor, fetch):
+    # sqlite3: на время чтения отключаем row_factory курсора — строки придут кортежами
+    factory = getattr(cursor, "row_factory", None)
+    if factory is None:
+        return fetch()
+    cursor.row_factory = None
+    try:
+        return fetch()
+    finally:
+        cursor.row_factory = factory
+
+
+def fetch_dicts(cursor) -> List[Dict[str, Any]]:
+    """Все строки результата в виде словарей"""
+    return rows_to_dicts(column_names(cursor), _fetch_plain(cursor, cursor.fetchall))
+
+
+def fetch_dict(cursor) -> Optional[Dict[str, Any]]:
+    """Одна строка результата в виде словаря (None, если строк нет)"""
+    keys = column_names(cursor)
+    row = _fetch_plain(cursor, cursor.fetchone)
+    return rows_to_dicts(keys, [row])[0] if row is not None else None
+
+
+def fetch_columns(cursor) -> Dict[str, List[Any]]:
+    """Результат по колонкам: {колонка: [значения]} — компактный JSON без повторения ключей"""
+    keys = column_names(cursor)
+    rows = _fetch_plain(cursor, cursor.fetchall)
+    if not rows:
+        return {key: [] for key in keys}
+    columns = list(zip(*rows))
+    positions = _first_positions(keys)
+    if positions is None:
+        return {key: list(values) for key, values in zip(keys, columns)}
+    return {key: list(columns[i]) for key, i in positions.items()}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_json(payload: Any) -> bytes:
+    """Сериализация ответа в JSON одним проходом json.dumps"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
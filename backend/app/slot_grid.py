@@ -0,0 +1,289 @@
+"""
+Материализованная сетка свободного времени на ближайшие дни.
+
+Для каждого мастер-дня горизонта (по умолчанию 14 дней) в таблице
+slot_grid (миграция 9) хранится битовая маска свободных минут дня —
+1440 бит, 180 байт: бит m установлен, если минута m внутри графика и не
+занята записью, перерывом или закрытием салона (с учётом перерыва buffer
+между записями). Вместе с маской хранятся границы рабочего дня и версии
+(мастер, дата) и (мастер, «*») из availability_versions, по которым она
+построена.
+
+Чтение — один запрос на дату для всех мастеров: строка используется,
+только если её версии совпадают с текущими (их увеличивают триггеры при
+любом изменении записей, графиков, перерывов и закрытий). Свободные
+промежутки маски — те же, что дал бы расчёт из графиков и записей,
+поэтому слоты любой длительности и шага (и их ранжирование) по сетке
+совпадают с availability.
+
+Запись обновляет сетку в той же транзакции: новая запись снимает биты
+своего интервала (occupy), перенос пересчитывает затронутые мастер-дни
+(refresh). Устаревшие и недостающие строки горизонта перестраивает
+SlotGridRefresher в процессе API; до этого чтение идёт расчётом.
+"""
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app import availability, bulk, repository
+from app.rows import fetch_dict
+
+logger = logging.getLogger(__name__)
+
+MASK_BYTES = availability.MINUTES_PER_DAY // 8
+
+_COLUMNS = (
+    "master_id", "grid_date", "buffer", "work_start", "work_end", "free_mask",
+    "day_version", "schedule_version",
+)
+
+
+# ==================== МАСКИ ====================
+
+def build_mask(work_start: int, work_end: int, busy: Iterable[availability.Interval], buffer: int = 0) -> int:
+    """Свободные минуты рабочего дня битами целого числа (бит m — минута m)"""
+    work_end = min(work_end, availability.MINUTES_PER_DAY)
+    if work_end <= work_start:
+        return 0
+    mask = ((1 << (work_end - work_start)) - 1) << work_start
+    for start, end in availability.merge_intervals(busy, buffer):
+        start, end = max(start, 0), min(end, availability.MINUTES_PER_DAY)
+        if end > start:
+            mask &= ~(((1 << (end - start)) - 1) << start)
+    return mask
+
+
+def occupy_mask(mask: int, start: int, end: int, buffer: int = 0) -> int:
+    """Маска без интервала [start - buffer, end + buffer)"""
+    start, end = max(start - buffer, 0), min(end + buffer, availability.MINUTES_PER_DAY)
+    if end <= start:
+        return mask
+    return mask & ~(((1 << (end - start)) - 1) << start)
+
+
+def encode(mask: int) -> bytes:
+    return mask.to_bytes(MASK_BYTES, "little")
+
+
+def decode(value: Any) -> int:
+    return int.from_bytes(bytes(value), "little") if value is not None else 0
+
+
+def busy_from_mask(work_start: int, work_end: int, mask: int) -> List[availability.Interval]:
+    """Занятые промежутки рабочего дня — дополнение свободных битов маски"""
+    busy: List[availability.Interval] = []
+    cursor = work_start
+    while cursor < work_end:
+        # Первый свободный бит не раньше cursor
+        rest = mask >> cursor
+        if not rest:
+            busy.append((cursor, work_end))
+            break
+        free_start = cursor + ((rest & -rest).bit_length() - 1)
+        if free_start >= work_end:
+            busy.append((cursor, work_end))
+            break
+        if free_start > cursor:
+            busy.append((cursor, free_start))
+        # Конец свободного промежутка — первый нулевой бит после free_start
+        inverted = ~(mask >> free_start)
+        cursor = free_start + ((inverted & -inverted).bit_length() - 1)
+    return busy
+
+
+# ==================== ЧТЕНИЕ ====================
+
+def load_grid_day(
+    conn,
+    master_ids: Iterable[int],
+    appointment_date: str,
+    buffer: int,
+) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, List[Dict[str, Any]]], Set[int]]:
+    """
+    Актуальные строки сетки на дату в виде графиков и занятости, как у
+    availability_cache.load_day, но с уже учтённым buffer (считать с buffer=0).
+    Третий элемент — мастера, для которых строка есть (в том числе не
+    работающие в этот день); для остальных нужен расчёт.
+    """
+    schedules: Dict[int, Dict[str, Any]] = {}
+    bookings: Dict[int, List[Dict[str, Any]]] = {}
+    rows = repository.get_slot_grid(conn, master_ids, appointment_date, buffer)
+    for master_id, row in rows.items():
+        if row["work_start"] is None:
+            continue
+        work_start, work_end = row["work_start"], row["work_end"]
+        schedules[master_id] = {
+            "start_time": availability.format_minutes(work_start),
+            "end_time": availability.format_minutes(work_end),
+        }
+        bookings[master_id] = [
+            {"start_time": availability.format_minutes(start), "end_time": availability.format_minutes(end)}
+            for start, end in busy_from_mask(work_start, work_end, decode(row["free_mask"]))
+        ]
+    return schedules, bookings, set(rows)
+
+
+# ==================== ЗАПИСЬ ====================
+
+def build_rows(conn, master_ids: Sequence[int], days: Iterable[date], buffer: int) -> List[tuple]:
+    """Строки сетки для мастеров на даты из графиков, записей, перерывов и закрытий"""
+    # availability_cache сам читает сетку — импорт здесь, чтобы не было цикла
+    from app.availability_cache import load_day
+
+    rows = []
+    for day in days:
+        day_str = day.isoformat()
+        # Версии читаются до данных, как в кэше слотов
+        versions = repository.get_availability_versions(conn, master_ids, day_str)
+        schedules, bookings = load_day(conn, master_ids, day_str, day.weekday())
+        for master_id in master_ids:
+            schedule = schedules.get(master_id)
+            work_start = work_end = mask = None
+            if schedule and schedule.get("start_time") and schedule.get("end_time"):
+                work_start = availability.to_minutes(schedule["start_time"])
+                work_end = min(availability.to_minutes(schedule["end_time"]), availability.MINUTES_PER_DAY)
+                mask = encode(build_mask(work_start, work_end, availability.busy_from_rows(bookings[master_id]), buffer))
+            rows.append((master_id, day_str, buffer, work_start, work_end, mask, *versions[master_id]))
+    return rows
+
+
+def refresh(conn, master_ids: Iterable[int], days: Iterable[date], buffer: int) -> int:
+    """Пересчёт строк сетки мастеров на даты (в транзакции записи)"""
+    ids = list(dict.fromkeys(int(master_id) for master_id in master_ids if master_id is not None))
+    if not ids:
+        return 0
+    rows = build_rows(conn, ids, days, buffer)
+    return bulk.upsert_rows(conn, "slot_grid", _COLUMNS, rows, conflict_columns=("master_id", "grid_date"))
+
+
+def occupy(conn, master_id: int, appointment_date: str, start_time: str, end_time: str, buffer: int) -> bool:
+    """
+    Снятие битов новой записи после её вставки в той же транзакции. Строка
+    должна быть актуальной до вставки (версия даты меньше текущей ровно на
+    один — вставка увеличила её триггером); иначе мастер-день пересчитывается.
+    Возвращает False, если строки сетки на эту дату нет.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT work_start, free_mask, buffer, day_version, schedule_version FROM slot_grid
+        WHERE master_id = ? AND grid_date = ?
+    """, (master_id, appointment_date))
+    row = fetch_dict(cursor)
+    if not row:
+        return False
+    day_version, schedule_version = repository.get_availability_versions(conn, [master_id], appointment_date)[master_id]
+    if (row["buffer"] == buffer and row["day_version"] == day_version - 1
+            and row["schedule_version"] == schedule_version):
+        mask = decode(row["free_mask"]) if row["work_start"] is not None else 0
+        mask = occupy_mask(mask, availability.to_minutes(start_time), availability.to_minutes(end_time), buffer)
+        cursor.execute("""
+            UPDATE slot_grid SET free_mask = ?, day_version = ?
+            WHERE master_id = ? AND grid_date = ?
+        """, (encode(mask) if row["work_start"] is not None else None, day_version, master_id, appointment_date))
+    else:
+        refresh(conn, [master_id], [date.fromisoformat(appointment_date)], buffer)
+    return True
+
+
+def refresh_day(conn, master_id: int, appointment_date: str, buffer: int) -> bool:
+    """Пересчёт мастер-дня после переноса или отмены записи, если он есть в сетке"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM slot_grid WHERE master_id = ? AND grid_date = ?", (master_id, appointment_date))
+    if cursor.fetchone() is None:
+        return False
+    refresh(conn, [master_id], [date.fromisoformat(appointment_date)], buffer)
+    return True
+
+
+def refresh_stale(conn, start_date: date, days: int, buffer: int) -> int:
+    """
+    Перестройка устаревших и недостающих строк горизонта для активных
+    мастеров и удаление строк прошедших дней. Возвращает число пересчитанных
+    мастер-дней.
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM slot_grid WHERE grid_date < ?", (start_date.isoformat(),))
+    if days <= 0:
+        return 0
+    horizon = [start_date + timedelta(days=offset) for offset in range(days)]
+    cursor.execute("SELECT id FROM masters WHERE is_active = 1 ORDER BY id")
+    master_ids = [row[0] for row in cursor.fetchall()]
+    if not master_ids:
+        return 0
+
+    fresh = repository.get_fresh_slot_grid_days(conn, horizon[0].isoformat(), horizon[-1].isoformat(), buffer)
+
+    refreshed = 0
+    for day in horizon:
+        stale = [master_id for master_id in master_ids if (master_id, day.isoformat()) not in fresh]
+        if stale:
+            refresh(conn, stale, [day], buffer)
+            refreshed += len(stale)
+    return refreshed
+
+
+# ==================== ФОНОВОЕ ОБНОВЛЕНИЕ ====================
+
+class SlotGridRefresher:
+    """
+    Фоновый поток, раз в interval секунд перестраивающий устаревшие строки
+    сетки на days дней вперёд через write (функция транзакции записи)
+    """
+
+    def __init__(self, write: Callable[..., Any], days: int = 14, buffer: int = 0, interval: float = 300):
+        self.write = write
+        self.days = days
+        self.buffer = buffer
+        self.interval = interval
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._runs = 0
+        self._last_refreshed = 0
+        self._last_duration_ms: Optional[float] = None
+
+    def run_once(self) -> int:
+        started = time.monotonic()
+        refreshed = self.write(refresh_stale, date.today(), self.days, self.buffer)
+        self._runs += 1
+        self._last_refreshed = refreshed
+        self._last_duration_ms = round((time.monotonic() - started) * 1000, 3)
+        if refreshed:
+            logger.info(f"Slot grid: {refreshed} master-days rebuilt in {self._last_duration_ms} ms")
+        return refreshed
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                # Не даём потоку умереть: чтение без сетки идёт расчётом
+                logger.error(f"Slot grid refresh error: {e}", exc_info=True)
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="slot-grid", daemon=True)
+        self._thread.start()
+        logger.info(f"Slot grid: {self.days} days ahead, refresh every {self.interval:g} s")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None,
+            "days": self.days,
+            "interval": self.interval,
+            "runs": self._runs,
+            "last_refreshed": self._last_refreshed,
+            "last_duration_ms": self._last_duration_ms,
+        }
@@ -0,0 +1,72 @@
+"""
+Профиль настроек SQLite для соединений с БД салона.
+
+Один набор PRAGMA применяется ко всем соединениям API и бота: режим
+журнала WAL, synchronous=NORMAL (в WAL безопасно при сбое процесса,
+fsync только на checkpoint), размер кэша страниц, mmap, временные
+таблицы в памяти и проверка внешних ключей.
+"""
+import sqlite3
+from typing import List
+
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+TEMP_STORES = ("DEFAULT", "FILE", "MEMORY")
+
+
+def _choice(name: str, value: str, allowed: tuple) -> str:
+    value = value.upper()
+    if value not in allowed:
+        raise ValueError(f"Invalid {name}: {value} (expected one of {', '.join(allowed)})")
+    return value
+
+
+class SqliteProfile:
+    """Набор PRAGMA для соединения (cache_size в КиБ, mmap_size в МиБ)"""
+
+    def __init__(
+        self,
+        journal_mode: str = "WAL",
+        synchronous: str = "NORMAL",
+        cache_size_kb: int = 16384,
+        mmap_size_mb: int = 128,
+        temp_store: str = "MEMORY",
+        foreign_keys: bool = False,
+    ):
+        self.journal_mode = _choice("journal_mode", journal_mode, JOURNAL_MODES)
+        self.synchronous = _choice("synchronous", synchronous, SYNCHRONOUS_MODES)
+        self.cache_size_kb = int(cache_size_kb)
+        self.mmap_size_mb = int(mmap_size_mb)
+        self.temp_store = _choice("temp_store", temp_store, TEMP_STORES)
+        self.foreign_keys = bool(foreign_keys)
+
+    def pragmas(self, journal_mode: bool = True) -> List[str]:
+        """PRAGMA профиля; journal_mode=False — без смены режима журнала (он хранится в файле БД)"""
+        statements = []
+        if journal_mode:
+            statements.append(f"PRAGMA journal_mode = {self.journal_mode}")
+        statements += [
+            f"PRAGMA synchronous = {self.synchronous}",
+            # Отрицательное значение — размер в КиБ, а не в страницах
+            f"PRAGMA cache_size = {-self.cache_size_kb}",
+            f"PRAGMA mmap_size = {self.mmap_size_mb * 1024 * 1024}",
+            f"PRAGMA temp_store = {self.temp_store}",
+            f"PRAGMA foreign_keys = {'ON' if self.foreign_keys else 'OFF'}",
+        ]
+        return statements
+
+    def apply(self, conn: sqlite3.Connection, journal_mode: bool = True) -> None:
+        """Применение профиля к соединению"""
+        for statement in self.pragmas(journal_mode):
+            conn.execute(statement)
+
+    def as_dict(self) -> dict:
+        return {
+            "journal_mode": self.journal_mode,
+            "synchronous": self.synchronous,
+            "cache_size_kb": self.cache_size_kb,
+            "mmap_size_mb": self.mmap_size_mb,
+            "temp_store": self.temp_store,
+            "foreign_keys": self.foreign_keys,
+        }
+
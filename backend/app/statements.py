@@ -0,0 +1,152 @@
+"""
+Реестр SQL-запросов списков с фильтрами.
+
+Запрос описывается один раз: базовый SELECT, набор необязательных условий
+(имя фильтра -> фрагмент WHERE) и хвост (ORDER BY / LIMIT). Для каждой
+комбинации включённых фильтров текст SQL собирается один раз, кэшируется
+и дальше используется как есть — одинаковая строка попадает в кэш
+подготовленных запросов sqlite3 (и в автоподготовку psycopg), вместо
+сборки через `query +=` и повторного разбора на каждом вызове.
+
+Условия добавляются всегда в порядке объявления, поэтому у каждой
+комбинации ровно один канонический текст. Значение фильтра подставляется
+во все `?` своего фрагмента; None — фильтр выключен.
+
+Для каждого варианта запроса считаются число выполнений, ошибки, суммарное
+и максимальное время (см. registry.stats()).
+"""
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+Conditions = Sequence[Tuple[str, str]]
+
+
+class QueryTemplate:
+    """Запрос с необязательными условиями; SQL каждой комбинации фильтров кэшируется"""
+
+    def __init__(self, registry: "StatementRegistry", name: str, base: str, conditions: Conditions, suffix: str = ""):
+        names = [condition for condition, _ in conditions]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate filter names in statement {name!r}")
+        self.registry = registry
+        self.name = name
+        self.base = base.strip()
+        self.conditions = tuple(conditions)
+        self.suffix = suffix
+        self._sql: Dict[Tuple[str, ...], str] = {}
+
+    def sql(self, active: Sequence[str] = ()) -> str:
+        """Канонический текст запроса для набора включённых фильтров"""
+        key = tuple(name for name, _ in self.conditions if name in active)
+        sql = self._sql.get(key)
+        if sql is None:
+            unknown = set(active) - {name for name, _ in self.conditions}
+            if unknown:
+                raise KeyError(f"Unknown filters for statement {self.name!r}: {', '.join(sorted(unknown))}")
+            clauses = "".join(f" AND {fragment}" for name, fragment in self.conditions if name in key)
+            sql = f"{self.base}{clauses}{self.suffix}"
+            self._sql[key] = sql
+        return sql
+
+    def bind(
+        self,
+        filters: Mapping[str, Any],
+        params: Sequence[Any] = (),
+        tail: Sequence[Any] = (),
+    ) -> Tuple[str, Tuple[str, ...], tuple]:
+        """
+        SQL, включённые фильтры и параметры: params (для `?` базового запроса),
+        значения фильтров, tail (для `?` хвоста, например LIMIT/OFFSET)
+        """
+        active = []
+        values = list(params)
+        for name, fragment in self.conditions:
+            value = filters.get(name)
+            if value is None:
+                continue
+            active.append(name)
+            values.extend([value] * fragment.count("?"))
+        values.extend(tail)
+        active = tuple(active)
+        return self.sql(active), active, tuple(values)
+
+    def execute(
+        self,
+        cursor,
+        filters: Mapping[str, Any],
+        params: Sequence[Any] = (),
+        tail: Sequence[Any] = (),
+    ):
+        """Выполнение на курсоре с учётом времени; возвращает курсор"""
+        sql, active, values = self.bind(filters, params, tail)
+        started = time.perf_counter()
+        try:
+            cursor.execute(sql, values)
+        except Exception:
+            self.registry.record(self.name, active, time.perf_counter() - started, failed=True)
+            raise
+        self.registry.record(self.name, active, time.perf_counter() - started)
+        return cursor
+
+
+class StatementRegistry:
+    """Именованные шаблоны запросов и статистика выполнения по вариантам"""
+
+    def __init__(self):
+        self._templates: Dict[str, QueryTemplate] = {}
+        self._stats: Dict[Tuple[str, Tuple[str, ...]], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def template(self, name: str, base: str, conditions: Conditions = (), suffix: str = "") -> QueryTemplate:
+        """Регистрация шаблона; имя должно быть уникальным"""
+        if name in self._templates:
+            raise ValueError(f"Statement {name!r} is already registered")
+        template = QueryTemplate(self, name, base, conditions, suffix)
+        self._templates[name] = template
+        return template
+
+    def get(self, name: str) -> QueryTemplate:
+        return self._templates[name]
+
+    def record(self, name: str, active: Tuple[str, ...], elapsed: float, failed: bool = False) -> None:
+        with self._lock:
+            # [выполнений, ошибок, суммарно, максимум] в секундах
+            stats = self._stats.setdefault((name, active), [0, 0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += int(failed)
+            stats[2] += elapsed
+            stats[3] = max(stats[3], elapsed)
+
+    def stats(self, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Статистика по вариантам запросов, самые затратные первыми"""
+        with self._lock:
+            items = [(key, list(value)) for key, value in self._stats.items() if name is None or key[0] == name]
+        result = []
+        for (statement, active), (calls, errors, total, longest) in items:
+            result.append({
+                "statement": statement,
+                "filters": list(active),
+                "calls": calls,
+                "errors": errors,
+                "total_ms": round(total * 1000, 3),
+                "avg_ms": round(total * 1000 / calls, 3) if calls else 0.0,
+                "max_ms": round(longest * 1000, 3),
+            })
+        result.sort(key=lambda item: item["total_ms"], reverse=True)
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "templates": len(self._templates),
+            "variants": sum(len(template._sql) for template in self._templates.values()),
+            "statements": self.stats(),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+# Общий реестр процесса
+registry = StatementRegistry()
@@ -0,0 +1,260 @@
+"""
+Координация записи в SQLite.
+
+API и бот пишут в один файл БД из разных процессов. Чтобы не ловить
+«database is locked», в каждом процессе все записи идут через одну очередь:
+отдельный поток-писатель с собственным соединением выполняет задания
+по очереди в транзакциях BEGIN IMMEDIATE (блокировка на запись берётся сразу,
+а не посреди транзакции), при занятой БД ждёт busy_timeout и повторяет
+транзакцию с экспоненциальной задержкой. БД переводится в режим WAL, чтобы
+читатели не блокировали писателя и наоборот.
+"""
+import asyncio
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.sqlite_profile import SqliteProfile
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+def configure_connection(
+    conn: sqlite3.Connection,
+    busy_timeout: float = 5.0,
+    wal: bool = True,
+    profile: Optional[SqliteProfile] = None,
+) -> None:
+    """Общие PRAGMA для соединений с БД салона (busy_timeout в секундах)"""
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+    if profile is not None:
+        profile.apply(conn, journal_mode=wal)
+    elif wal:
+        # Режим журнала хранится в файле БД, повторный вызов ничего не стоит
+        conn.execute("PRAGMA journal_mode = WAL")
+
+
+def is_busy_error(error: Exception) -> bool:
+    """Ошибка из-за блокировки БД другим соединением/процессом"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+class WriteQueue:
+    """
+    Очередь записей с единственным потоком-писателем.
+
+    Задание — функция fn(conn, *args), выполняемая внутри транзакции
+    BEGIN IMMEDIATE; её результат возвращается вызывающему. Исключение
+    внутри fn откатывает транзакцию и пробрасывается вызывающему, ошибки
+    блокировки повторяются до max_retries раз.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        busy_timeout: float = 5.0,
+        max_retries: int = 5,
+        retry_backoff: float = 0.05,
+        retry_backoff_max: float = 2.0,
+        max_queue_size: int = 0,
+        name: str = "db-writer",
+        profile: Optional[SqliteProfile] = None,
+    ):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.profile = profile
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.name = name
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self._metrics_lock = threading.Lock()
+        self._completed = 0
+        self._failed = 0
+        self._retries = 0
+        self._busy_errors = 0
+        self._max_depth = 0
+        self._lock_wait_total = 0.0
+        self._lock_wait_max = 0.0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    # ==================== ПОТОК-ПИСАТЕЛЬ ====================
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: транзакциями управляем сами (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn, self.busy_timeout, profile=self.profile)
+        return conn
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            future, fn, args, kwargs, enqueued_at = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            waited = time.monotonic() - enqueued_at
+            with self._metrics_lock:
+                self._queue_wait_total += waited
+                self._queue_wait_max = max(self._queue_wait_max, waited)
+            try:
+                result = self._execute(fn, args, kwargs)
+            except BaseException as e:
+                with self._metrics_lock:
+                    self._failed += 1
+                future.set_exception(e)
+            else:
+                with self._metrics_lock:
+                    self._completed += 1
+                future.set_result(result)
+
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _execute(self, fn: Callable[..., T], args: tuple, kwargs: dict) -> T:
+        attempt = 0
+        while True:
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                conn = self._conn
+
+                # Время ожидания блокировки учитываем и для неудачных попыток
+                started = time.monotonic()
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                finally:
+                    lock_wait = time.monotonic() - started
+                    with self._metrics_lock:
+                        self._lock_wait_total += lock_wait
+                        self._lock_wait_max = max(self._lock_wait_max, lock_wait)
+
+                try:
+                    result = fn(conn, *args, **kwargs)
+                    conn.execute("COMMIT")
+                    return result
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                delay = min(self.retry_backoff * (2 ** (attempt - 1)), self.retry_backoff_max)
+                delay *= random.uniform(0.5, 1.0)
+                with self._metrics_lock:
+                    self._busy_errors += 1
+                    self._retries += 1
+                logger.warning(f"Database is busy, retrying write ({attempt}/{self.max_retries}) in {delay:.3f}s")
+                time.sleep(delay)
+
+    # ==================== ПОСТАНОВКА ЗАДАНИЙ ====================
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+        """Постановка записи в очередь; возвращает Future с результатом fn"""
+        if self._closed:
+            raise RuntimeError("Write queue is closed")
+        if self._thread is not None and threading.current_thread() is self._thread:
+            raise RuntimeError("Nested write submitted from the writer thread")
+        self._ensure_started()
+        future: "Future[T]" = Future()
+        self._queue.put((future, fn, args, kwargs, time.monotonic()))
+        depth = self._queue.qsize()
+        with self._metrics_lock:
+            self._max_depth = max(self._max_depth, depth)
+        return future
+
+    def execute(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Синхронное выполнение записи через очередь"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Асинхронное выполнение записи через очередь"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Остановка писателя после выполнения уже поставленных заданий"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    # ==================== МЕТРИКИ ====================
+
+    def metrics(self) -> Dict[str, Any]:
+        """Метрики очереди: глубина, ожидание блокировки, повторы"""
+        with self._metrics_lock:
+            finished = self._completed + self._failed
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "completed": self._completed,
+                "failed": self._failed,
+                "retries": self._retries,
+                "busy_errors": self._busy_errors,
+                "lock_wait_ms_total": round(self._lock_wait_total * 1000, 3),
+                "lock_wait_ms_max": round(self._lock_wait_max * 1000, 3),
+                "lock_wait_ms_avg": round(self._lock_wait_total * 1000 / finished, 3) if finished else 0.0,
+                "queue_wait_ms_max": round(self._queue_wait_max * 1000, 3),
+                "queue_wait_ms_avg": round(self._queue_wait_total * 1000 / finished, 3) if finished else 0.0,
+            }
+
+
+_shared_writers: Dict[str, WriteQueue] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_writer(db_path: str, **kwargs) -> WriteQueue:
+    """
+    Единственный в процессе писатель для файла БД.
+
+    Бот создаёт Database в нескольких модулях, поэтому очередь берётся
+    из общего реестра, а не создаётся на каждый экземпляр.
+    """
+    key = os.path.abspath(db_path)
+    with _shared_lock:
+        writer = _shared_writers.get(key)
+        if writer is None or writer.closed:
+            writer = WriteQueue(db_path, **kwargs)
+            _shared_writers[key] = writer
+        return writer
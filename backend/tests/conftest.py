@@ -0,0 +1,76 @@
+"""
+Общие настройки тестов бэкенда.
+
+Запуск из каталога backend: python -m pytest -q tests
+Переменные окружения задаются до импорта app.config, чтобы модули
+приложения работали с временной БД, а не с salon.db.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+TEST_DIR = Path(tempfile.mkdtemp(prefix="salon-tests-"))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DIR / 'salon.db'}")
+os.environ.setdefault("UPLOAD_DIR", str(TEST_DIR / "uploads"))
+
+
+@pytest.fixture
+def migrated_conn(tmp_path):
+    """Соединение с пустой SQLite-БД, к которой применены все миграции"""
+    from app.migrations import migrate
+
+    conn = sqlite3.connect(str(tmp_path / "salon.db"))
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient запущенного приложения (lifespan выполняется) на временной БД"""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    # Каталог загрузок в main.py относительный и монтируется при импорте
+    cwd = os.getcwd()
+    os.makedirs(TEST_DIR / "uploads" / "masters", exist_ok=True)
+    os.chdir(TEST_DIR)
+    try:
+        from app.main import app
+
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture(scope="session")
+def bookable_master(client):
+    """Мастер 1 демо-данных с услугой 3 (30 минут) и графиком 09:00-18:00 на все дни"""
+    from app.database import db
+
+    def _write(conn):
+        conn.execute("""
+            INSERT INTO master_services (master_id, service_id, category_id)
+            SELECT 1, id, category_id FROM services WHERE id = 3
+        """)
+        for day_of_week in range(7):
+            conn.execute("""
+                INSERT INTO master_work_schedule (master_id, day_of_week, start_time, end_time)
+                VALUES (1, ?, '09:00', '18:00')
+            """, (day_of_week,))
+
+    db.write(_write)
+    return 1
@@ -0,0 +1,57 @@
+"""
+Создание и изменение записей через API: проверка пересечений в транзакции
+записи (демо-данные миграции 2: клиенты 2-4, мастер 1, услуга 1 на 60 минут).
+"""
+
+
+def _create(client, appointment_date, start_time, status="confirmed"):
+    return client.post("/appointments", json={
+        "client_id": 2,
+        "master_id": 1,
+        "appointment_date": appointment_date,
+        "start_time": start_time,
+        "services": [1],
+        "status": status,
+    })
+
+
+def test_create_appointment(client):
+    response = _create(client, "2031-03-03", "10:00")
+    assert response.status_code == 200
+    assert response.json()["appointment_id"]
+
+
+def test_create_overlapping_appointment_conflicts(client):
+    assert _create(client, "2031-03-04", "10:00").status_code == 200
+
+    response = _create(client, "2031-03-04", "10:30")
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicts"]
+
+
+def test_move_appointment_onto_busy_time_conflicts(client):
+    assert _create(client, "2031-03-05", "10:00").status_code == 200
+    other_id = _create(client, "2031-03-05", "12:00").json()["appointment_id"]
+
+    response = client.put(f"/appointments/{other_id}", json={"start_time": "10:30"})
+    assert response.status_code == 409
+
+
+def test_restore_cancelled_appointment_onto_busy_time_conflicts(client):
+    cancelled_id = _create(client, "2031-03-06", "10:00").json()["appointment_id"]
+    assert client.put(f"/appointments/{cancelled_id}/status", params={"status": "cancelled"}).status_code == 200
+    assert _create(client, "2031-03-06", "10:00").status_code == 200
+
+    response = client.put(f"/appointments/{cancelled_id}/status", params={"status": "confirmed"})
+    assert response.status_code == 409
+
+    response = client.put(f"/appointments/{cancelled_id}", json={"status": "pending"})
+    assert response.status_code == 409
+
+
+def test_restore_cancelled_appointment_on_free_time(client):
+    appointment_id = _create(client, "2031-03-07", "10:00").json()["appointment_id"]
+    assert client.put(f"/appointments/{appointment_id}/status", params={"status": "cancelled"}).status_code == 200
+
+    response = client.put(f"/appointments/{appointment_id}/status", params={"status": "confirmed"})
+    assert response.status_code == 200
@@ -0,0 +1,33 @@
+"""
+Дни со свободным временем (availability.available_days): сегодняшний день
+с учётом текущего времени.
+"""
+from datetime import date, datetime
+
+from app import availability
+
+DAY = date(2031, 6, 3)
+SCHEDULES = {1: {DAY.weekday(): {"start_time": "09:00", "end_time": "18:00"}}}
+NEXT_WEEK = date(2031, 6, 10)
+
+
+def days_from(not_before, bookings=None):
+    return availability.available_days(
+        SCHEDULES, bookings or {}, [DAY, NEXT_WEEK], 60, step=15, not_before=not_before,
+    )
+
+
+def test_today_after_last_slot_not_available():
+    assert days_from(datetime(2031, 6, 3, 17, 1)) == [NEXT_WEEK]
+    assert days_from(datetime(2031, 6, 3, 17, 0)) == [DAY, NEXT_WEEK]
+
+
+def test_today_free_time_only_before_now():
+    bookings = {1: {DAY.isoformat(): [{"start_time": "12:00", "end_time": "18:00"}]}}
+    assert days_from(datetime(2031, 6, 3, 11, 0), bookings) == [DAY, NEXT_WEEK]
+    assert days_from(datetime(2031, 6, 3, 11, 5), bookings) == [NEXT_WEEK]
+
+
+def test_past_days_skipped_and_default_unchanged():
+    assert days_from(datetime(2031, 6, 4, 8, 0)) == [NEXT_WEEK]
+    assert days_from(None) == [DAY, NEXT_WEEK]
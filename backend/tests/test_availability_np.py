@@ -0,0 +1,43 @@
+"""
+Векторный расчёт слотов (app.availability_np) даёт те же результаты, что
+скалярный availability.masters_day_slots, на случайных днях бенчмарка.
+"""
+import pytest
+
+pytest.importorskip("numpy")
+
+from app import availability, availability_np
+from app.availability_bench import generate_day
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("duration, step, buffer", [
+    (30, 15, 0),
+    (60, 15, 10),
+    (45, 5, 0),
+    (90, 30, 15),
+    (120, 10, 5),
+    (15, 15, 0),
+])
+def test_numpy_matches_scalar(seed, duration, step, buffer):
+    schedules, bookings = generate_day(masters=40, bookings_per_master=6, seed=seed)
+    assert (availability_np.masters_day_slots(schedules, bookings, duration, step, buffer)
+            == availability.masters_day_slots(schedules, bookings, duration, step, buffer))
+
+
+def test_numpy_matches_scalar_edge_days():
+    # Пустой день, день без записей, запись на весь день и график до полуночи
+    schedules = {
+        1: {"start_time": "09:00", "end_time": "18:00"},
+        2: {"start_time": "10:00", "end_time": "12:00"},
+        3: {"start_time": "20:00", "end_time": "24:00"},
+    }
+    bookings = {
+        1: [],
+        2: [{"start_time": "09:30", "end_time": "12:30"}],
+        3: [{"start_time": "21:00", "end_time": "21:45"}, {"start_time": "21:30", "end_time": "22:00"}],
+    }
+    for duration, step, buffer in [(30, 15, 0), (60, 30, 15), (240, 15, 0)]:
+        assert (availability_np.masters_day_slots(schedules, bookings, duration, step, buffer)
+                == availability.masters_day_slots(schedules, bookings, duration, step, buffer))
+    assert availability_np.masters_day_slots({}, {}, 30) == {}
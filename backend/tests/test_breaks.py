@@ -0,0 +1,45 @@
+"""
+Перерывы мастеров: общая проверка app.breaks и эндпоинты main.py.
+"""
+from datetime import date
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+from app.breaks import validate_break
+
+
+@pytest.mark.parametrize("start_date, end_date, start_time, end_time", [
+    (date(2031, 5, 2), date(2031, 5, 1), None, None),
+    (date(2031, 5, 1), date(2031, 5, 1), "13:00", None),
+    (date(2031, 5, 1), date(2031, 5, 1), "14:00", "13:00"),
+    (date(2031, 5, 1), date(2031, 5, 1), "1pm", "2pm"),
+])
+def test_validate_break_rejects(start_date, end_date, start_time, end_time):
+    with pytest.raises(HTTPException) as error:
+        validate_break(start_date, end_date, start_time, end_time)
+    assert error.value.status_code == 400
+
+
+def test_validate_break_accepts_day_off_and_interval():
+    validate_break(date(2031, 5, 1), date(2031, 5, 3), None, None)
+    validate_break(date(2031, 5, 1), date(2031, 5, 1), "13:00", "14:00")
+
+
+def test_break_crud(client):
+    response = client.post("/schedule/masters/1/breaks", json={
+        "start_date": "2031-05-01", "start_time": "13:00", "end_time": "14:00", "reason": "обед",
+    })
+    assert response.status_code == 200
+    break_id = response.json()["break_id"]
+
+    breaks = client.get("/schedule/masters/1/breaks", params={"date_from": "2031-05-01", "date_to": "2031-05-01"}).json()
+    assert [item["id"] for item in breaks] == [break_id]
+    assert client.get("/schedule/masters/1/breaks", params={"date_from": "2031-05-02"}).json() == []
+
+    assert client.put(f"/schedule/breaks/{break_id}", json={"end_time": "12:00"}).status_code == 400
+    assert client.delete(f"/schedule/breaks/{break_id}").status_code == 200
+    assert client.delete(f"/schedule/breaks/{break_id}").status_code == 404
@@ -0,0 +1,122 @@
+"""
+Календарь всех мастеров (GET /calendar): число запросов не зависит от
+числа мастеров, колонки ответа выровнены по индексу.
+"""
+import pytest
+
+pytest.importorskip("fastapi")
+
+import app.main as main
+from app.database import db
+
+PERIOD = {"date_from": "2032-03-01", "date_to": "2032-03-07"}
+
+
+def count_statements(client, monkeypatch, **params):
+    """Число SQL-запросов одного GET /calendar и его ответ"""
+    statements, connections = [], []
+
+    def traced_connection():
+        conn = db.connect()
+        conn.set_trace_callback(statements.append)
+        connections.append(conn._raw())
+        return conn
+
+    monkeypatch.setattr(main, "get_db_connection", traced_connection)
+    try:
+        response = client.get("/calendar", params={**PERIOD, **params})
+    finally:
+        for conn in connections:
+            conn.set_trace_callback(None)
+    assert response.status_code == 200
+    return len(statements), response.json()
+
+
+def add_masters(count):
+    """Активные мастера с графиком, перерывом и записью на 2032-03-02 (услуга 3)"""
+    def _write(conn):
+        ids = []
+        for number in range(count):
+            cursor = conn.execute("INSERT INTO users (role, first_name) VALUES ('master', ?)", (f"Календарь {number}",))
+            cursor = conn.execute("INSERT INTO masters (user_id, is_active) VALUES (?, 1)", (cursor.lastrowid,))
+            master_id = cursor.lastrowid
+            ids.append(master_id)
+            conn.execute("""
+                INSERT INTO master_work_schedule (master_id, day_of_week, start_time, end_time)
+                VALUES (?, 1, '10:00', '19:00')
+            """, (master_id,))
+            conn.execute("""
+                INSERT INTO master_breaks (master_id, start_date, end_date, start_time, end_time, reason)
+                VALUES (?, '2032-03-02', '2032-03-02', '13:00', '14:00', 'обед')
+            """, (master_id,))
+            cursor = conn.execute("""
+                INSERT INTO appointments (client_id, master_id, appointment_date, start_time, end_time, status)
+                VALUES (2, ?, '2032-03-02', ?, ?, 'confirmed')
+            """, (master_id, f"{10 + number:02d}:00", f"{10 + number:02d}:30"))
+            conn.execute("INSERT INTO appointment_services (appointment_id, service_id) VALUES (?, 3)", (cursor.lastrowid,))
+        return ids
+
+    return db.write(_write)
+
+
+def deactivate(master_ids):
+    def _write(conn):
+        conn.execute(
+            f"UPDATE masters SET is_active = 0 WHERE id IN ({', '.join('?' for _ in master_ids)})",
+            tuple(master_ids),
+        )
+
+    db.write(_write)
+
+
+def assert_aligned(columns):
+    lengths = {len(values) for values in columns.values()}
+    assert len(lengths) == 1, columns
+
+
+def test_calendar_statements_independent_of_masters(client, monkeypatch):
+    # Первый запрос прогревает календарь закрытий (год читается один раз)
+    count_statements(client, monkeypatch)
+    first = add_masters(1)
+    try:
+        one, _ = count_statements(client, monkeypatch)
+        more = add_masters(5)
+        try:
+            many, payload = count_statements(client, monkeypatch)
+        finally:
+            deactivate(more)
+    finally:
+        deactivate(first)
+    assert one == many
+    assert set(first + more) <= set(payload["masters"]["id"])
+
+
+def test_calendar_columns_aligned(client):
+    master_ids = add_masters(3)
+    try:
+        payload = client.get("/calendar", params=PERIOD).json()
+    finally:
+        deactivate(master_ids)
+
+    for key in ("masters", "hours", "breaks", "closures", "appointments", "services"):
+        assert_aligned(payload[key])
+
+    masters, hours, appointments, services = (
+        payload["masters"], payload["hours"], payload["appointments"], payload["services"]
+    )
+    for number, master_id in enumerate(master_ids):
+        assert masters["first_name"][masters["id"].index(master_id)] == f"Календарь {number}"
+
+        worked = [i for i, value in enumerate(hours["master_id"]) if value == master_id]
+        assert [(hours["date"][i], hours["start_time"][i], hours["end_time"][i]) for i in worked] == [
+            ("2032-03-02", "10:00", "19:00")
+        ]
+
+        booked = [i for i, value in enumerate(appointments["master_id"]) if value == master_id]
+        assert len(booked) == 1
+        i = booked[0]
+        assert (appointments["date"][i], appointments["start_time"][i]) == ("2032-03-02", f"{10 + number:02d}:00")
+        assert appointments["service_ids"][i] == [3]
+
+    assert {service_id for ids in appointments["service_ids"] for service_id in ids} == set(services["id"])
+    assert services["title"][services["id"].index(3)]
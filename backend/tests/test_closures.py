@@ -0,0 +1,42 @@
+"""
+Календарь закрытий салона: кэш годов не отдаёт данные, прочитанные до
+изменения закрытий.
+"""
+from datetime import date
+
+from app import closures, repository
+from app.closures import ClosureCalendar
+
+DAY = date(2031, 1, 7)
+
+
+def add_closure(conn, day: date):
+    conn.execute(
+        "INSERT INTO salon_closures (start_date, end_date, reason) VALUES (?, ?, 'праздник')",
+        (day.isoformat(), day.isoformat()),
+    )
+    conn.commit()
+
+
+def test_change_seen_after_refresh(migrated_conn):
+    calendar = ClosureCalendar()
+    assert calendar.for_day(migrated_conn, DAY) == []
+    add_closure(migrated_conn, DAY)
+    assert calendar.for_day(migrated_conn, DAY) == [{"start_time": "00:00", "end_time": "24:00"}]
+
+
+def test_year_loaded_before_change_not_cached(migrated_conn, monkeypatch):
+    calendar = ClosureCalendar()
+    load = repository.get_salon_closures
+
+    def racing_load(conn, date_from, date_to):
+        # Год прочитан, затем закрытие добавлено и другой читатель уже увидел новую версию
+        result = load(conn, date_from, date_to)
+        monkeypatch.setattr(closures.repository, "get_salon_closures", load)
+        add_closure(conn, DAY)
+        calendar.refresh(conn)
+        return result
+
+    monkeypatch.setattr(closures.repository, "get_salon_closures", racing_load)
+    assert calendar.for_day(migrated_conn, DAY) == []
+    assert calendar.for_day(migrated_conn, DAY) == [{"start_time": "00:00", "end_time": "24:00"}]
@@ -0,0 +1,31 @@
+"""
+Планы горячих запросов на схеме последней миграции (app.query_plans).
+"""
+import sqlite3
+
+from app import query_plans
+
+
+def test_hot_queries_use_indexes(migrated_conn):
+    assert query_plans.check_query_plans(migrated_conn) == []
+
+
+def test_full_scan_detected(migrated_conn):
+    scans = query_plans.full_scans(migrated_conn, "SELECT * FROM appointments WHERE end_time = ?", ("10:00",))
+    assert scans and scans[0].startswith("SCAN appointments")
+
+
+def test_cli_reports_unmigrated_database(tmp_path, capsys):
+    path = tmp_path / "empty.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+
+    assert query_plans.main(["--db", str(path)]) == 2
+    assert "no such table" in capsys.readouterr().err
+
+
+def test_cli_passes_on_migrated_schema(capsys):
+    assert query_plans.main([]) == 0
+    assert f"{len(query_plans.HOT_QUERIES)}/{len(query_plans.HOT_QUERIES)}" in capsys.readouterr().out
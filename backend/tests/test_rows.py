@@ -0,0 +1,49 @@
+"""
+Строки результата в словари (app.rows): повторяющиеся имена колонок
+разрешаются так же, как row[key] у sqlite3.Row.
+"""
+import sqlite3
+
+import pytest
+
+from app.rows import fetch_columns, fetch_dict, fetch_dicts
+
+QUERY = """
+    SELECT m.*, u.first_name, u.telegram_id
+    FROM masters m JOIN users u ON m.user_id = u.id
+    ORDER BY m.id
+"""
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, first_name TEXT, telegram_id INTEGER);
+        CREATE TABLE masters (id INTEGER PRIMARY KEY, user_id INTEGER, telegram_id INTEGER);
+        INSERT INTO users VALUES (10, 'Анна', 111), (20, 'Олег', 222);
+        INSERT INTO masters VALUES (1, 10, 501), (2, 20, NULL);
+    """)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def test_fetch_dicts_matches_sqlite_row(conn):
+    expected = [{key: row[key] for key in row.keys()} for row in conn.execute(QUERY).fetchall()]
+
+    result = fetch_dicts(conn.execute(QUERY))
+    assert result == expected
+    assert [list(row) for row in result] == [list(row) for row in expected]
+    # telegram_id мастера из m.*, а не пользователя
+    assert [row["telegram_id"] for row in result] == [501, None]
+
+
+def test_fetch_dict_and_columns_keep_first_duplicate(conn):
+    assert fetch_dict(conn.execute(QUERY))["telegram_id"] == 501
+
+    columns = fetch_columns(conn.execute(QUERY))
+    assert list(columns) == ["id", "user_id", "telegram_id", "first_name"]
+    assert columns["telegram_id"] == [501, None]
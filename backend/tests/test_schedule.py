@@ -0,0 +1,25 @@
+"""
+Поиск свободного времени через API на временной БД (мастер из bookable_master).
+"""
+
+
+def test_first_available_slots(client, bookable_master):
+    response = client.get("/schedule/first-available", params={
+        "service_ids": [3], "date_from": "2031-04-01", "days": 3, "limit": 3,
+    })
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["duration_minutes"] == 30
+    assert [slot["time"] for slot in payload["slots"]] == ["09:00", "09:15", "09:30"]
+    assert {slot["master_id"] for slot in payload["slots"]} == {bookable_master}
+
+
+def test_ranked_slots(client, bookable_master):
+    response = client.get("/schedule/slots", params={
+        "service_ids": [3], "appointment_date": "2031-04-02", "master_id": bookable_master,
+    })
+    assert response.status_code == 200
+    slots = response.json()["slots"]
+    assert slots[0]["time"] == "09:00"
+    assert slots[0]["recommended"]
+    assert all(slot["master_id"] == bookable_master for slot in slots)
@@ -0,0 +1,46 @@
+"""
+Шаблоны графика через API: создание, применение к мастерам и график по дням.
+"""
+import pytest
+
+pytest.importorskip("fastapi")
+
+from app.main import MAX_TEMPLATE_APPLY_MASTER_DAYS
+
+WORKDAYS = [{"day_of_week": day, "start_time": "10:00", "end_time": "19:00"} for day in range(5)]
+
+
+def test_template_apply_and_days(client):
+    response = client.post("/schedule/templates", json={"name": "Пятидневка", "days": WORKDAYS})
+    assert response.status_code == 200
+    template = response.json()
+    assert [day["day_of_week"] for day in template["days"]] == [0, 1, 2, 3, 4]
+
+    # 2031-06-02 — понедельник; периоды пересекаются, даты считаются один раз
+    response = client.post(f"/schedule/templates/{template['id']}/apply", json={
+        "master_ids": [1],
+        "periods": [
+            {"date_from": "2031-06-02", "date_to": "2031-06-06"},
+            {"date_from": "2031-06-05", "date_to": "2031-06-08"},
+        ],
+    })
+    assert response.status_code == 200
+    assert response.json()["dates"] == 7
+
+    days = client.get("/schedule/masters/1/days", params={"date_from": "2031-06-02", "date_to": "2031-06-09"}).json()
+    assert [day["date"] for day in days][:7] == [f"2031-06-0{day}" for day in range(2, 9)]
+    assert all(day["source"] == "date" and day["template_id"] == template["id"] for day in days[:7])
+    assert [(day["start_time"], day["end_time"]) for day in days[:7]] == [("10:00", "19:00")] * 5 + [(None, None)] * 2
+    assert days[7]["source"] != "date"
+
+
+def test_template_apply_master_days_capped(client):
+    template = client.post("/schedule/templates", json={"name": "Лимит", "days": WORKDAYS}).json()
+    year = {"date_from": "2031-01-01", "date_to": "2031-12-31"}
+    periods = [year] * (MAX_TEMPLATE_APPLY_MASTER_DAYS // 365 + 1)
+    response = client.post(f"/schedule/templates/{template['id']}/apply", json={"master_ids": [1], "periods": periods})
+    assert response.status_code == 400
+
+    master_ids = list(range(1, MAX_TEMPLATE_APPLY_MASTER_DAYS // 365 + 2))
+    response = client.post(f"/schedule/templates/{template['id']}/apply", json={"master_ids": master_ids, "periods": [year]})
+    assert response.status_code == 400
@@ -0,0 +1,288 @@
+"""
+Сетка свободного времени (app.slot_grid): слоты по сетке совпадают с
+расчётом из таблиц (availability.masters_day_slots по load_day) после
+записи, переноса, отмены, перерыва и закрытия салона — при записи напрямую
+через функции модуля, через API и через Database бота.
+"""
+import sqlite3
+import sys
+import time
+from datetime import date
+
+import pytest
+
+from app import availability, slot_grid
+from app.availability_cache import load_day
+from app.closures import salon_calendar
+from app.migrations import migrate
+
+from conftest import BACKEND_DIR
+
+DAY = date(2031, 6, 3)
+MASTERS = [1, 2]
+VARIANTS = [(30, 15), (45, 15), (60, 30), (90, 5)]  # (длительность, шаг)
+
+
+def assert_grid_matches(conn, master_ids, day, buffer):
+    """Сетка на день актуальна для всех мастеров и даёт те же слоты, что расчёт"""
+    schedules, bookings, covered = slot_grid.load_grid_day(conn, master_ids, day.isoformat(), buffer)
+    assert covered == set(master_ids)
+    fresh_schedules, fresh_bookings = load_day(conn, master_ids, day.isoformat(), day.weekday())
+    for duration, step in VARIANTS:
+        assert (availability.masters_day_slots(schedules, bookings, duration, step, 0)
+                == availability.masters_day_slots(fresh_schedules, fresh_bookings, duration, step, buffer))
+
+
+def prepare(conn):
+    """Второй мастер и графики: мастер 1 — 09:00-18:00, мастер 2 — 10:00-20:00 на все дни"""
+    conn.execute("INSERT INTO users (id, role, first_name) VALUES (50, 'master', 'Ольга')")
+    conn.execute("INSERT INTO masters (id, user_id, is_active) VALUES (2, 50, 1)")
+    for day_of_week in range(7):
+        conn.execute("""
+            INSERT INTO master_work_schedule (master_id, day_of_week, start_time, end_time)
+            VALUES (1, ?, '09:00', '18:00'), (2, ?, '10:00', '20:00')
+        """, (day_of_week, day_of_week))
+    conn.commit()
+
+
+def book(conn, master_id, start_time, end_time, buffer, day=DAY):
+    """Запись как в create_appointment: вставка и occupy в одной транзакции"""
+    cursor = conn.execute("""
+        INSERT INTO appointments (client_id, master_id, appointment_date, start_time, end_time, status)
+        VALUES (2, ?, ?, ?, ?, 'confirmed')
+    """, (master_id, day.isoformat(), start_time, end_time))
+    assert slot_grid.occupy(conn, master_id, day.isoformat(), start_time, end_time, buffer)
+    conn.commit()
+    return cursor.lastrowid
+
+
+@pytest.fixture
+def grid_conn(migrated_conn):
+    # Календарь закрытий — один на процесс; версии разных тестовых БД совпадают
+    salon_calendar.invalidate()
+    prepare(migrated_conn)
+    yield migrated_conn
+    salon_calendar.invalidate()
+
+
+@pytest.mark.parametrize("buffer", [0, 10])
+def test_grid_built_from_tables(grid_conn, buffer):
+    slot_grid.refresh(grid_conn, MASTERS, [DAY], buffer)
+    assert_grid_matches(grid_conn, MASTERS, DAY, buffer)
+
+
+@pytest.mark.parametrize("buffer", [0, 10])
+def test_occupy_updates_row_in_place(grid_conn, monkeypatch, buffer):
+    slot_grid.refresh(grid_conn, MASTERS, [DAY], buffer)
+    calls = []
+    original_refresh = slot_grid.refresh
+    monkeypatch.setattr(slot_grid, "refresh", lambda *args: calls.append(args) or original_refresh(*args))
+
+    book(grid_conn, 1, "10:00", "11:00", buffer)
+    book(grid_conn, 1, "11:30", "12:15", buffer)
+    book(grid_conn, 2, "17:45", "19:00", buffer)
+
+    # Строка была актуальной (версия меньше на один) — без пересчёта
+    assert calls == []
+    assert_grid_matches(grid_conn, MASTERS, DAY, buffer)
+
+
+def test_occupy_rebuilds_stale_row(grid_conn, monkeypatch):
+    slot_grid.refresh(grid_conn, MASTERS, [DAY], 0)
+    # Изменение записей мимо сетки: строка отстаёт больше чем на одну версию
+    grid_conn.execute("""
+        INSERT INTO appointments (client_id, master_id, appointment_date, start_time, end_time, status)
+        VALUES (2, 1, ?, '15:00', '16:00', 'pending')
+    """, (DAY.isoformat(),))
+    calls = []
+    original_refresh = slot_grid.refresh
+    monkeypatch.setattr(slot_grid, "refresh", lambda *args: calls.append(args) or original_refresh(*args))
+
+    book(grid_conn, 1, "10:00", "11:00", 0)
+
+    assert len(calls) == 1
+    assert_grid_matches(grid_conn, MASTERS, DAY, 0)
+
+
+def test_occupy_without_grid_row(grid_conn):
+    grid_conn.execute("""
+        INSERT INTO appointments (client_id, master_id, appointment_date, start_time, end_time, status)
+        VALUES (2, 1, ?, '10:00', '11:00', 'confirmed')
+    """, (DAY.isoformat(),))
+    assert not slot_grid.occupy(grid_conn, 1, DAY.isoformat(), "10:00", "11:00", 0)
+    assert not slot_grid.refresh_day(grid_conn, 1, DAY.isoformat(), 0)
+
+
+def test_move_and_cancel(grid_conn):
+    other_day = date(2031, 6, 4)
+    slot_grid.refresh(grid_conn, MASTERS, [DAY, other_day], 5)
+    appointment_id = book(grid_conn, 1, "10:00", "11:00", 5)
+
+    # Перенос к другому мастеру на другой день: пересчёт обоих мастер-дней
+    grid_conn.execute("""
+        UPDATE appointments SET master_id = 2, appointment_date = ?, start_time = '12:00', end_time = '13:00'
+        WHERE id = ?
+    """, (other_day.isoformat(), appointment_id))
+    assert slot_grid.refresh_day(grid_conn, 1, DAY.isoformat(), 5)
+    assert slot_grid.refresh_day(grid_conn, 2, other_day.isoformat(), 5)
+    assert_grid_matches(grid_conn, MASTERS, DAY, 5)
+    assert_grid_matches(grid_conn, MASTERS, other_day, 5)
+
+    grid_conn.execute("UPDATE appointments SET status = 'cancelled' WHERE id = ?", (appointment_id,))
+    assert slot_grid.refresh_day(grid_conn, 2, other_day.isoformat(), 5)
+    assert_grid_matches(grid_conn, MASTERS, other_day, 5)
+    free = slot_grid.load_grid_day(grid_conn, [2], other_day.isoformat(), 5)[1][2]
+    assert free == []
+
+
+def test_break_and_closure_make_rows_stale(grid_conn):
+    slot_grid.refresh(grid_conn, MASTERS, [DAY], 0)
+
+    grid_conn.execute("""
+        INSERT INTO master_breaks (master_id, start_date, end_date, start_time, end_time, reason)
+        VALUES (1, ?, ?, '13:00', '14:00', 'обед')
+    """, (DAY.isoformat(), DAY.isoformat()))
+    assert slot_grid.load_grid_day(grid_conn, MASTERS, DAY.isoformat(), 0)[2] == {2}
+    assert slot_grid.refresh_stale(grid_conn, DAY, 1, 0) == 1
+    assert_grid_matches(grid_conn, MASTERS, DAY, 0)
+
+    grid_conn.execute("""
+        INSERT INTO salon_closures (start_date, end_date, start_time, end_time, reason)
+        VALUES (?, ?, '16:00', '24:00', 'сокращённый день')
+    """, (DAY.isoformat(), DAY.isoformat()))
+    assert slot_grid.load_grid_day(grid_conn, MASTERS, DAY.isoformat(), 0)[2] == set()
+    assert slot_grid.refresh_stale(grid_conn, DAY, 1, 0) == 2
+    assert_grid_matches(grid_conn, MASTERS, DAY, 0)
+
+    # Закрытие на весь день: мастера не работают, строки есть
+    grid_conn.execute("""
+        INSERT INTO salon_closures (start_date, end_date, reason) VALUES (?, ?, 'праздник')
+    """, (DAY.isoformat(), DAY.isoformat()))
+    slot_grid.refresh_stale(grid_conn, DAY, 1, 0)
+    schedules, _, covered = slot_grid.load_grid_day(grid_conn, MASTERS, DAY.isoformat(), 0)
+    assert schedules == {} and covered == set(MASTERS)
+
+
+def test_refresh_stale_drops_past_days(grid_conn):
+    slot_grid.refresh(grid_conn, MASTERS, [date(2031, 6, 1), DAY], 0)
+    # DAY актуален, следующий день строится для обоих мастеров, прошедший удаляется
+    assert slot_grid.refresh_stale(grid_conn, DAY, 2, 0) == 2
+    days = {row[0] for row in grid_conn.execute("SELECT DISTINCT grid_date FROM slot_grid")}
+    assert days == {DAY.isoformat(), "2031-06-04"}
+
+
+def test_refresher_thread(tmp_path):
+    path = str(tmp_path / "grid.db")
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    prepare(conn)
+    conn.close()
+
+    def write(fn, *args):
+        # Как db.write: отдельное соединение и одна транзакция на задание
+        write_conn = sqlite3.connect(path)
+        write_conn.row_factory = sqlite3.Row
+        try:
+            with write_conn:
+                return fn(write_conn, *args)
+        finally:
+            write_conn.close()
+
+    salon_calendar.invalidate()
+    refresher = slot_grid.SlotGridRefresher(write, days=3, buffer=0, interval=60)
+    refresher.start()
+    try:
+        deadline = time.monotonic() + 5
+        while refresher.status()["runs"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        refresher.stop(timeout=5)
+        salon_calendar.invalidate()
+
+    status = refresher.status()
+    assert status["runs"] >= 1 and not status["running"]
+    assert status["last_refreshed"] == len(MASTERS) * 3
+    # Всё актуально — повторный проход ничего не перестраивает
+    assert refresher.run_once() == 0
+
+
+# ==================== ЧЕРЕЗ API ====================
+
+def test_grid_through_api(client, bookable_master):
+    from app.database import db
+    from app.main import settings
+
+    buffer = settings.APPOINTMENT_BUFFER_MINUTES
+    day = date(2031, 6, 10)
+    salon_calendar.invalidate()
+    db.write(slot_grid.refresh, [bookable_master], [day], buffer)
+
+    def check():
+        conn = db.connect()
+        try:
+            assert_grid_matches(conn, [bookable_master], day, buffer)
+        finally:
+            conn.close()
+
+    def create(start_time):
+        response = client.post("/appointments", json={
+            "client_id": 2, "master_id": bookable_master, "appointment_date": day.isoformat(),
+            "start_time": start_time, "services": [3], "status": "confirmed",
+        })
+        assert response.status_code == 200
+        return response.json()["appointment_id"]
+
+    appointment_id = create("10:00")
+    create("12:00")
+    check()
+    assert client.put(f"/appointments/{appointment_id}", json={"start_time": "15:00"}).status_code == 200
+    check()
+    assert client.put(f"/appointments/{appointment_id}/status", params={"status": "cancelled"}).status_code == 200
+    check()
+    assert client.post(f"/schedule/masters/{bookable_master}/breaks", json={
+        "start_date": day.isoformat(), "start_time": "13:00", "end_time": "14:00",
+    }).status_code == 200
+    db.write(slot_grid.refresh_stale, day, 1, buffer)
+    check()
+
+
+# ==================== ЧЕРЕЗ БОТА ====================
+
+@pytest.fixture
+def bot_db(tmp_path):
+    pytest.importorskip("dotenv")
+    if str(BACKEND_DIR.parent) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR.parent))
+    from bot.database import Database
+
+    path = str(tmp_path / "bot.db")
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    prepare(conn)
+    conn.close()
+    salon_calendar.invalidate()
+    yield Database(db_path=path)
+    salon_calendar.invalidate()
+
+
+def test_grid_through_bot(bot_db):
+    from bot.config import Config
+
+    buffer = Config.APPOINTMENT_BUFFER_MINUTES
+    bot_db.writer.execute(slot_grid.refresh, MASTERS, [DAY], buffer)
+
+    def check():
+        conn = bot_db.get_connection()
+        try:
+            assert_grid_matches(conn, MASTERS, DAY, buffer)
+        finally:
+            conn.close()
+
+    appointment_id, _ = bot_db.create_appointment(2, 1, DAY, "10:00", [1], status="confirmed")
+    assert appointment_id
+    # Пересечение отклоняется, сетка не меняется
+    assert bot_db.create_appointment(2, 1, DAY, "10:30", [1], status="confirmed") == (None, None)
+    check()
+    assert bot_db.cancel_appointment(appointment_id)
+    check()
+    assert bot_db.get_available_time_slots(1, DAY, 60)[0] == "09:00"
@@ -0,0 +1,24 @@
+"""
+Запуск API целиком: lifespan (миграции, обслуживание SQLite, сетка слотов)
+и ответ /health на временной БД из conftest.
+"""
+
+
+def test_startup_and_health(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["status"] == "healthy"
+    assert payload["maintenance"] is not None
+    assert payload["slot_grid"]["running"]
+
+
+def test_schema_migrated_on_startup(client):
+    from app.database import db
+    from app.migrations import get_schema_version, latest_version
+
+    conn = db.connect()
+    try:
+        assert get_schema_version(conn) == latest_version()
+    finally:
+        conn.close()
@@ -0,0 +1,105 @@
+"""
+Адаптер PostgreSQL (app.storage): эмуляция lastrowid и миграции через него.
+
+Миграции на настоящем PostgreSQL выполняются, только если задан
+TEST_DATABASE_URL=postgresql://... и установлен psycopg; каждый запуск идёт
+во временной схеме, которая затем удаляется.
+"""
+import os
+import uuid
+
+import pytest
+
+from app.storage import POSTGRESQL, PgCursor, insert_table, parse_database_url
+
+
+@pytest.mark.parametrize("sql, table", [
+    ("INSERT INTO users (first_name) VALUES (?)", "users"),
+    ("  insert into Users (first_name) values (?)", "users"),
+    ('INSERT INTO "Users" (first_name) VALUES (?)', "Users"),
+    ("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)", "schema_version"),
+    ("INSERT INTO slot_grid (master_id) VALUES (?) ON CONFLICT (master_id, grid_date) DO UPDATE SET buffer = 0", None),
+    ("INSERT INTO users (first_name) VALUES (?) RETURNING id", None),
+    ("UPDATE users SET first_name = ?", None),
+])
+def test_insert_table(sql, table):
+    assert insert_table(sql) == table
+
+
+class _RecordingCursor:
+    """Курсор psycopg, запоминающий запросы; RETURNING id возвращает 42"""
+
+    connection = None
+
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+
+    def fetchone(self):
+        return (42,) if self.queries[-1].endswith("RETURNING id") else None
+
+
+class _Backend:
+    """Таблицы с колонкой id, как их видит PostgresBackend.has_id_column"""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def has_id_column(self, conn, table):
+        return table in self.tables
+
+
+def test_lastrowid_only_for_tables_with_id():
+    raw = _RecordingCursor()
+    cursor = PgCursor(raw, _Backend({"users"}))
+
+    cursor.execute("INSERT INTO users (first_name) VALUES (?)", ("Анна",))
+    assert raw.queries[-1].endswith("RETURNING id")
+    assert cursor.lastrowid == 42
+
+    cursor.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)", (1, "initial", "now"))
+    assert "RETURNING" not in raw.queries[-1]
+    assert cursor.lastrowid is None
+
+    cursor.execute("INSERT INTO users (id) VALUES (?) ON CONFLICT (id) DO NOTHING", (1,))
+    assert "RETURNING" not in raw.queries[-1]
+
+
+@pytest.fixture
+def pg_conn():
+    url = os.getenv("TEST_DATABASE_URL", "")
+    if not url.startswith("postgres"):
+        pytest.skip("TEST_DATABASE_URL=postgresql://... не задан")
+    pytest.importorskip("psycopg")
+    pytest.importorskip("psycopg_pool")
+    from app.storage import PostgresBackend
+
+    dialect, dsn = parse_database_url(url)
+    assert dialect == POSTGRESQL
+    backend = PostgresBackend(dsn, max_size=1)
+    conn = backend.acquire()
+    schema = f"salon_test_{uuid.uuid4().hex[:8]}"
+    conn.execute(f"CREATE SCHEMA {schema}")
+    conn.execute(f"SET search_path TO {schema}")
+    conn.commit()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.execute("SET search_path TO DEFAULT")
+        conn.commit()
+        conn.close()
+        backend.close()
+
+
+def test_migrations_through_postgres_adapter(pg_conn):
+    from app.migrations import get_schema_version, latest_version, migrate
+
+    applied = migrate(pg_conn)
+    assert len(applied) == latest_version()
+    assert get_schema_version(pg_conn) == latest_version()
+    # lastrowid из демо-данных (миграция 2) — настоящие id
+    assert pg_conn.execute("SELECT COUNT(*) FROM services").fetchone()[0] > 0
@@ -13,6 +13,28 @@ class Config:
     # Путь к базе данных (в Docker переопределяется через DATABASE_PATH env var)
     DATABASE_PATH = os.getenv('DATABASE_PATH', '')
     
+    # Запись в общую с API базу: ожидание блокировки (сек) и повторы
+    DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', '5'))
+    DB_WRITE_MAX_RETRIES = int(os.getenv('DB_WRITE_MAX_RETRIES', '5'))
+    DB_WRITE_RETRY_BACKOFF = float(os.getenv('DB_WRITE_RETRY_BACKOFF', '0.05'))
+    
+    # Профиль SQLite (тот же, что у API)
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '16384'))
+    SQLITE_MMAP_SIZE_MB = int(os.getenv('SQLITE_MMAP_SIZE_MB', '128'))
+    SQLITE_TEMP_STORE = os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
+    SQLITE_FOREIGN_KEYS = os.getenv('SQLITE_FOREIGN_KEYS', 'false').lower() == 'true'
+    
+    # Сетка свободного времени: шаг начала записи и перерыв между записями (минуты)
+    SLOT_STEP_MINUTES = int(os.getenv('SLOT_STEP_MINUTES', '15'))
+    APPOINTMENT_BUFFER_MINUTES = int(os.getenv('APPOINTMENT_BUFFER_MINUTES', '0'))
+    AVAILABILITY_CACHE_SIZE = int(os.getenv('AVAILABILITY_CACHE_SIZE', '2048'))  # записей (мастер, дата, длительность)
+    # Расчёт слотов через NumPy (если установлен), начиная с этого числа мастеров; 0 — выключить
+    AVAILABILITY_NUMPY_MIN_MASTERS = int(os.getenv('AVAILABILITY_NUMPY_MIN_MASTERS', '20'))
+    # Поиск ближайшего времени: на сколько дней вперёд и сколько вариантов показать
+    FIRST_AVAILABLE_DAYS = int(os.getenv('FIRST_AVAILABLE_DAYS', '14'))
+    FIRST_AVAILABLE_LIMIT = int(os.getenv('FIRST_AVAILABLE_LIMIT', '6'))
+    
     # Часовой пояс
     TIMEZONE = os.getenv('TIMEZONE', 'Europe/Moscow')
     
@@ -2,6 +2,7 @@
 import sqlite3
 import logging
 import os
+import sys
 from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, date, time, timedelta
 
@@ -15,6 +16,23 @@ except ImportError:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     from config import Config
 
+try:
+    from app import availability, availability_np, booking, bulk, repository, slot_grid
+    from app.availability_cache import AvailabilityCache, compute_ranked_slots
+    from app.closures import add_to_bookings, salon_calendar
+    from app.rows import fetch_dict, fetch_dicts
+    from app.sqlite_profile import SqliteProfile
+    from app.writer import shared_writer
+except ImportError:
+    # Общие с API модули лежат в backend/app (в Docker backend скопирован в корень образа)
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+    from app import availability, availability_np, booking, bulk, repository, slot_grid
+    from app.availability_cache import AvailabilityCache, compute_ranked_slots
+    from app.closures import add_to_bookings, salon_calendar
+    from app.rows import fetch_dict, fetch_dicts
+    from app.sqlite_profile import SqliteProfile
+    from app.writer import shared_writer
+
 logger = logging.getLogger(__name__)
 
 class Database:
@@ -32,14 +50,38 @@ class Database:
                     db_path = os.path.join(project_root, 'backend', 'salon.db')
 
         self.db_path = db_path
+        self.profile = SqliteProfile(
+            synchronous=Config.SQLITE_SYNCHRONOUS,
+            cache_size_kb=Config.SQLITE_CACHE_SIZE_KB,
+            mmap_size_mb=Config.SQLITE_MMAP_SIZE_MB,
+            temp_store=Config.SQLITE_TEMP_STORE,
+            foreign_keys=Config.SQLITE_FOREIGN_KEYS,
+        )
+        # Записи идут через общий для процесса поток-писатель (BEGIN IMMEDIATE + повторы)
+        self.writer = shared_writer(
+            self.db_path,
+            busy_timeout=Config.DB_BUSY_TIMEOUT,
+            max_retries=Config.DB_WRITE_MAX_RETRIES,
+            retry_backoff=Config.DB_WRITE_RETRY_BACKOFF,
+            profile=self.profile,
+        )
+        # Кэш слотов; сбрасывается версиями из БД при изменении записей любым путём
+        self.availability_cache = AvailabilityCache(Config.AVAILABILITY_CACHE_SIZE)
+        availability_np.configure(Config.AVAILABILITY_NUMPY_MIN_MASTERS)
         logger.info(f"Используется база данных: {self.db_path}")
     
     def get_connection(self):
-        """Получение соединения с БД"""
-        conn = sqlite3.connect(self.db_path)
+        """Получение соединения с БД (для чтения; запись — через self.writer)"""
+        conn = sqlite3.connect(self.db_path, timeout=Config.DB_BUSY_TIMEOUT)
         conn.row_factory = sqlite3.Row
+        # Режим журнала (WAL) уже выставлен писателем и хранится в файле БД
+        self.profile.apply(conn, journal_mode=False)
         return conn
     
+    def get_write_metrics(self) -> Dict[str, Any]:
+        """Метрики очереди записи: глубина, ожидание блокировки, повторы"""
+        return self.writer.metrics()
+    
     # ==================== ПОЛЬЗОВАТЕЛИ ====================
     
     def get_or_create_user(self, telegram_id: int, first_name: str, last_name: str = "", username: str = "") -> Dict[str, Any]:
@@ -81,28 +123,33 @@ class Database:
                 logger.info(f"Найден существующий пользователь: ID={user_dict['id']}, TG ID={telegram_id}, Role={user_dict.get('role')}")
                 return user_dict
             
-            # Пользователь не найден - создаем нового клиента
-            cursor.execute("""
-                INSERT INTO users (telegram_id, role, first_name, last_name, language, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                telegram_id,
-                'client', 
-                first_name, 
-                last_name or '', 
-                Config.DEFAULT_LANGUAGE, 
-                datetime.now()
-            ))
-            
-            user_id = cursor.lastrowid
-            conn.commit()
+            conn.close()
             
-            # Получаем созданного пользователя
-            cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-            new_user = cursor.fetchone()
+            # Пользователь не найден - создаем нового клиента
+            def _create(conn):
+                # Повторная проверка уже под блокировкой записи: пользователя мог создать другой процесс
+                existing = conn.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,)).fetchone()
+                if existing:
+                    return dict(existing)
+                
+                cursor = conn.execute("""
+                    INSERT INTO users (telegram_id, role, first_name, last_name, language, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    telegram_id,
+                    'client', 
+                    first_name, 
+                    last_name or '', 
+                    Config.DEFAULT_LANGUAGE, 
+                    datetime.now()
+                ))
+                
+                # Получаем созданного пользователя
+                new_user = conn.execute("SELECT * FROM users WHERE id = ?", (cursor.lastrowid,)).fetchone()
+                return dict(new_user)
             
-            user_dict = dict(new_user)
-            conn.close()
+            user_dict = self.writer.execute(_create)
+            user_id = user_dict['id']
             
             logger.info(f"Создан новый пользователь: ID={user_id}, Telegram ID={telegram_id}, Role=client")
             return user_dict
@@ -114,15 +161,9 @@ class Database:
     def update_user_language(self, user_id: int, language: str) -> bool:
         """Обновление языка пользователя"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
+            self.writer.execute(lambda conn: conn.execute("""
                 UPDATE users SET language = ? WHERE id = ?
-            """, (language, user_id))
-            
-            conn.commit()
-            conn.close()
+            """, (language, user_id)))
             return True
             
         except Exception as e:
@@ -161,9 +202,7 @@ class Database:
             
             cursor.execute(query, tuple(params))
             
-            categories = []
-            for row in cursor.fetchall():
-                categories.append(dict(row))
+            categories = fetch_dicts(cursor)
             
             conn.close()
             return categories
@@ -190,10 +229,10 @@ class Database:
                 WHERE sc.id = ? AND sc.is_active = 1
             """, (language, category_id))
             
-            row = cursor.fetchone()
+            row = fetch_dict(cursor)
             conn.close()
             
-            return dict(row) if row else None
+            return row
             
         except Exception as e:
             logger.error(f"Ошибка при получении категории: {e}")
@@ -223,9 +262,7 @@ class Database:
                 ORDER BY s.price
             """, (language, category_id))
             
-            services = []
-            for row in cursor.fetchall():
-                services.append(dict(row))
+            services = fetch_dicts(cursor)
             
             conn.close()
             return services
@@ -236,33 +273,20 @@ class Database:
     
     def get_service_by_id(self, service_id: int, language: str) -> Optional[Dict[str, Any]]:
         """Получение услуги по ID с переводом"""
+        return self.get_services_by_ids([service_id], language).get(service_id)
+    
+    def get_services_by_ids(self, service_ids: List[int], language: str = 'ru') -> Dict[int, Dict[str, Any]]:
+        """Получение активных услуг с переводом одним запросом: {id: услуга}"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT 
-                    s.id, 
-                    s.category_id, 
-                    s.duration_minutes, 
-                    s.price, 
-                    s.is_active,
-                    COALESCE(st.title, 'Услуга ' || s.id) as title,
-                    st.description
-                FROM services s
-                LEFT JOIN service_translations st 
-                    ON s.id = st.service_id AND st.language = ?
-                WHERE s.id = ? AND s.is_active = 1
-            """, (language, service_id))
-            
-            row = cursor.fetchone()
-            conn.close()
-            
-            return dict(row) if row else None
+            try:
+                return repository.get_services_by_ids(conn, service_ids, language)
+            finally:
+                conn.close()
             
         except Exception as e:
-            logger.error(f"Ошибка при получении услуги: {e}")
-            return None
+            logger.error(f"Ошибка при получении услуг {service_ids}: {e}")
+            return {}
     
     # ==================== МАСТЕРЫ ====================
     
@@ -426,59 +450,50 @@ class Database:
     
     def get_master_by_id(self, master_id: int) -> Optional[Dict[str, Any]]:
         """Получение мастера по ID"""
+        master = self.get_masters_by_ids([master_id]).get(master_id)
+        if master:
+            logger.info(f"Найден мастер ID={master_id}: user_id={master.get('user_id')}, telegram_id={master.get('telegram_id')}")
+        else:
+            logger.warning(f"Мастер ID={master_id} не найден в базе")
+        return master
+    
+    def get_masters_by_ids(self, master_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Получение мастеров одним запросом: {id: мастер}"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # ПРОСТОЙ ЗАПРОС без сложных условий
-            cursor.execute("""
-                SELECT 
-                    m.id, 
-                    m.photo, 
-                    m.qualification, 
-                    m.description, 
-                    m.is_active,
-                    u.first_name, 
-                    u.last_name, 
-                    u.telegram_id,
-                    u.id as user_id
-                FROM masters m
-                JOIN users u ON m.user_id = u.id
-                WHERE m.id = ?
-            """, (master_id,))
-            
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row:
-                master = dict(row)
-                if master.get('photo'):
-                    master['photo_url'] = f"{Config.BASE_URL}/uploads/masters/{master['photo']}"
-                logger.info(f"Найден мастер ID={master_id}: user_id={master.get('user_id')}, telegram_id={master.get('telegram_id')}")
-                return master
-            
-            logger.warning(f"Мастер ID={master_id} не найден в базе")
-            return None
+            try:
+                return repository.get_masters_by_ids(conn, master_ids, Config.BASE_URL)
+            finally:
+                conn.close()
             
         except Exception as e:
-            logger.error(f"Ошибка при получении мастера {master_id}: {e}", exc_info=True)
-            return None
+            logger.error(f"Ошибка при получении мастеров {master_ids}: {e}", exc_info=True)
+            return {}
     
-    def get_master_schedule(self, master_id: int, day_of_week: int) -> Optional[Dict[str, Any]]:
-        """Получение графика работы мастера на конкретный день"""
+    def get_masters_providing_services(self, service_ids: List[int], active_only: bool = False) -> List[Dict[str, Any]]:
+        """Мастера, которые оказывают все выбранные услуги: [{master_id, telegram_id}]"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                SELECT * FROM master_work_schedule
-                WHERE master_id = ? AND day_of_week = ?
-            """, (master_id, day_of_week))
-            
-            row = cursor.fetchone()
-            conn.close()
+            try:
+                return repository.get_masters_providing_services(conn, service_ids, active_only)
+            finally:
+                conn.close()
             
-            return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Ошибка при поиске мастеров для услуг {service_ids}: {e}")
+            return []
+    
+    def get_master_schedule(self, master_id: int, work_date: date) -> Optional[Dict[str, Any]]:
+        """
+        График работы мастера на дату (график на дату из шаблона или недельный)
+        одним запросом; None — мастер в этот день не работает
+        """
+        try:
+            conn = self.get_connection()
+            try:
+                return repository.get_resolved_schedule(conn, master_id, work_date.isoformat())
+            finally:
+                conn.close()
             
         except Exception as e:
             logger.error(f"Ошибка при получении графика мастера: {e}")
@@ -486,7 +501,7 @@ class Database:
     
     # ==================== ЗАНЯТОЕ ВРЕМЯ ====================
     
-    def get_busy_time_slots(self, master_id: int, appointment_date: date) -> List[str]:
+    def get_busy_time_slots(self, master_id: int, appointment_date: date) -> List[Dict[str, str]]:
         """Получение занятых временных слотов мастера на дату"""
         try:
             conn = self.get_connection()
@@ -515,50 +530,151 @@ class Database:
     
     def get_available_time_slots(self, master_id: int, appointment_date: date, service_duration: int) -> List[str]:
         """Получение доступных временных слотов для мастера"""
+        slots = self.get_available_time_slots_for_masters([master_id], appointment_date, service_duration)
+        return slots.get(master_id, [])
+    
+    def get_available_time_slots_for_masters(self, master_ids: List[int], appointment_date: date,
+                                             service_duration: int) -> Dict[int, List[str]]:
+        """
+        Свободные слоты нескольких мастеров на дату: {master_id: [«HH:MM»]}.
+        Графики и записи всех мастеров загружаются двумя запросами (только
+        для мастеров, которых нет в кэше или чьи записи изменились);
+        мастера, не работающие в этот день, в результат не попадают.
+        В дни закрытия салона слотов нет: закрытия берутся из календаря
+        в памяти, без запросов на каждый слот.
+        Порядок мастеров — как в master_ids.
+        """
         try:
-            # Получаем график работы мастера на этот день недели
-            day_of_week = appointment_date.weekday()  # 0-понедельник, 6-воскресенье
-            schedule = self.get_master_schedule(master_id, day_of_week)
-            
-            if not schedule:
-                return []  # Мастер не работает в этот день
-            
-            # Получаем занятые слоты
-            busy_slots = self.get_busy_time_slots(master_id, appointment_date)
+            conn = self.get_connection()
+            try:
+                return self.availability_cache.get_slots(
+                    conn,
+                    master_ids,
+                    appointment_date.isoformat(),
+                    appointment_date.weekday(),
+                    service_duration,
+                    step=Config.SLOT_STEP_MINUTES,
+                    buffer=Config.APPOINTMENT_BUFFER_MINUTES,
+                )
+            finally:
+                conn.close()
             
-            # Генерируем доступные слоты
-            start_time = datetime.strptime(schedule['start_time'], '%H:%M').time()
-            end_time = datetime.strptime(schedule['end_time'], '%H:%M').time()
+        except Exception as e:
+            logger.error(f"Ошибка при получении доступных слотов: {e}")
+            return {}
+    
+    def get_ranked_time_slots_for_masters(self, master_ids: List[int], appointment_date: date,
+                                          service_duration: int) -> Dict[int, List[Tuple[str, int, int]]]:
+        """
+        Слоты мастеров с оценкой плотности дня: {master_id: [(«HH:MM», простой, примыканий)]}.
+        Простой считается относительно самой короткой активной услуги.
+        """
+        if not master_ids:
+            return {}
+        try:
+            conn = self.get_connection()
+            try:
+                return compute_ranked_slots(
+                    conn,
+                    master_ids,
+                    appointment_date.isoformat(),
+                    appointment_date.weekday(),
+                    service_duration,
+                    step=Config.SLOT_STEP_MINUTES,
+                    buffer=Config.APPOINTMENT_BUFFER_MINUTES,
+                    min_gap=repository.get_min_service_duration(conn),
+                )
+            finally:
+                conn.close()
             
-            available_slots = []
-            current_time = datetime.combine(appointment_date, start_time)
-            end_datetime = datetime.combine(appointment_date, end_time)
+        except Exception as e:
+            logger.error(f"Ошибка при ранжировании слотов: {e}")
+            return {}
+    
+    def get_available_days(self, master_ids: List[int], year: int, month: int, service_duration: int) -> List[date]:
+        """
+        Дни месяца (начиная с сегодняшнего), в которые хотя бы у одного из
+        мастеров есть свободное время на service_duration минут (сегодня —
+        не раньше текущего времени, как в find_first_available_slots). Графики
+        (недельные и на даты), записи и перерывы за весь месяц загружаются
+        пачкой, по запросу на таблицу; закрытия салона — из календаря в памяти.
+        """
+        import calendar as cal_module
+        
+        first_day = max(date(year, month, 1), date.today())
+        last_day = date(year, month, cal_module.monthrange(year, month)[1])
+        if first_day > last_day or not master_ids:
+            return []
+        
+        try:
+            conn = self.get_connection()
+            try:
+                schedules, dated = repository.get_schedules_for_period(
+                    conn, master_ids, first_day.isoformat(), last_day.isoformat()
+                )
+                bookings = repository.get_bookings_for_period(
+                    conn, list(schedules), first_day.isoformat(), last_day.isoformat()
+                )
+                # Перерывы и выходные занимают время так же, как записи
+                breaks = repository.get_breaks_for_period(
+                    conn, list(schedules), first_day.isoformat(), last_day.isoformat()
+                )
+                closures, closed = salon_calendar.for_period(conn, first_day, last_day)
+            finally:
+                conn.close()
             
-            # Шаг - 15 минут
-            while current_time + timedelta(minutes=service_duration) <= end_datetime:
-                slot_start = current_time.time()
-                slot_end = (current_time + timedelta(minutes=service_duration)).time()
-                
-                # Проверяем, не пересекается ли слот с занятыми
-                is_available = True
-                for busy in busy_slots:
-                    busy_start = datetime.strptime(busy['start'], '%H:%M').time()
-                    busy_end = datetime.strptime(busy['end'], '%H:%M').time()
-                    
-                    # Проверка пересечения интервалов
-                    if not (slot_end <= busy_start or slot_start >= busy_end):
-                        is_available = False
-                        break
-                
-                if is_available:
-                    available_slots.append(slot_start.strftime('%H:%M'))
-                
-                current_time += timedelta(minutes=15)
+            for master_id, days_off in breaks.items():
+                for day, intervals in days_off.items():
+                    bookings[master_id].setdefault(day, []).extend(intervals)
+            add_to_bookings(bookings, closures)
+            
+            # Дни, когда салон закрыт целиком, не проверяются
+            days = (
+                first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)
+                if (first_day + timedelta(days=offset)).isoformat() not in closed
+            )
+            return availability.available_days(
+                schedules,
+                bookings,
+                days,
+                service_duration,
+                step=Config.SLOT_STEP_MINUTES,
+                buffer=Config.APPOINTMENT_BUFFER_MINUTES,
+                dated=dated,
+                not_before=datetime.now(),
+            )
             
-            return available_slots
+        except Exception as e:
+            logger.error(f"Ошибка при получении доступных дней: {e}")
+            return []
+    
+    def find_first_available_slots(self, master_ids: List[int], service_duration: int,
+                                   days: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Ближайшие свободные слоты мастеров за days дней начиная с сегодняшнего:
+        [{date, time, master_id}] по возрастанию (прошедшее время сегодня не предлагается)
+        """
+        if not master_ids:
+            return []
+        try:
+            conn = self.get_connection()
+            try:
+                return booking.first_available(
+                    conn,
+                    master_ids,
+                    date.today(),
+                    days,
+                    service_duration,
+                    step=Config.SLOT_STEP_MINUTES,
+                    buffer=Config.APPOINTMENT_BUFFER_MINUTES,
+                    limit=limit,
+                    not_before=datetime.now(),
+                )
+            finally:
+                conn.close()
             
         except Exception as e:
-            logger.error(f"Ошибка при получении доступных слотов: {e}")
+            logger.error(f"Ошибка при поиске ближайшего времени: {e}")
             return []
     
     # ==================== ЗАПИСИ ====================
@@ -567,18 +683,12 @@ class Database:
                       appointment_date: date, start_time: str, 
                       service_ids: List[int], status: str = 'pending') -> Tuple[Optional[int], Optional[int]]:
         """Создание новой записи"""
-        try:
-            conn = self.get_connection()
+        def _create(conn):
             cursor = conn.cursor()
             
             # Рассчитываем время окончания
-            total_duration = 0
-            for service_id in service_ids:
-                cursor.execute("SELECT duration_minutes FROM services WHERE id = ?", (service_id,))
-                service = cursor.fetchone()
-                if service:
-                    service_dict = dict(service)
-                    total_duration += service_dict.get('duration_minutes', 0)
+            services = repository.get_services_by_ids(conn, service_ids, active_only=False)
+            total_duration, _ = repository.services_totals(services, service_ids)
             
             start_dt = datetime.strptime(start_time, '%H:%M')
             end_dt = datetime.combine(date.today(), start_dt.time()) + timedelta(minutes=total_duration)
@@ -594,6 +704,18 @@ class Database:
                     logger.error(f"Мастер ID={master_id} не существует в таблице masters!")
                     return None, None
                 logger.info(f"Мастер ID={master_id} существует, user_id={master_check['user_id']}")
+                
+                if status in repository.BUSY_STATUSES:
+                    # Время могли занять после показа слотов — проверяем в транзакции вставки
+                    try:
+                        end_time_str = booking.ensure_slot_free(
+                            conn, master_id, appointment_date.isoformat(), appointment_date.weekday(),
+                            start_time, total_duration,
+                            step=Config.SLOT_STEP_MINUTES, buffer=Config.APPOINTMENT_BUFFER_MINUTES,
+                        )
+                    except booking.SlotConflict as e:
+                        logger.warning(f"Время занято: {e}; свободно: {', '.join(e.alternatives) or 'нет'}")
+                        return None, None
             
             # Создаем запись
             cursor.execute("""
@@ -614,19 +736,23 @@ class Database:
             
             if not appointment_id:
                 logger.error("Не удалось получить appointment_id после создания записи!")
-                conn.rollback()
-                conn.close()
                 return None, None
             
+            if master_id and status in repository.BUSY_STATUSES:
+                # Запись занимает время в сетке слотов той же транзакцией
+                slot_grid.occupy(
+                    conn, master_id, appointment_date.isoformat(), start_time, end_time_str,
+                    Config.APPOINTMENT_BUFFER_MINUTES,
+                )
+            
             logger.info(f"Запись создана с ID: {appointment_id}")
             
-            # Добавляем услуги к записи
-            for service_id in service_ids:
-                cursor.execute("""
-                    INSERT INTO appointment_services (appointment_id, service_id)
-                    VALUES (?, ?)
-                """, (appointment_id, service_id))
-                logger.info(f"Добавлена услуга {service_id} к записи {appointment_id}")
+            # Добавляем услуги к записи одним запросом
+            bulk.insert_rows(
+                conn, "appointment_services", ("appointment_id", "service_id"),
+                [(appointment_id, service_id) for service_id in service_ids],
+            )
+            logger.info(f"Добавлены услуги {service_ids} к записи {appointment_id}")
             
             # Получаем user_id мастера для уведомления
             master_user_id = None
@@ -652,25 +778,21 @@ class Database:
                 else:
                     logger.error(f"Мастер с ID {master_id} не найден в связке masters-users")
             
-            conn.commit()
-            conn.close()
-            
             logger.info(f"Создана запись ID={appointment_id} для клиента {client_id}, master_user_id={master_user_id}")
             return appointment_id, master_user_id
-            
+        
+        try:
+            # Проверки и вставка выполняются одной транзакцией потока-писателя
+            return self.writer.execute(_create)
         except Exception as e:
             logger.error(f"Ошибка при создании записи: {e}", exc_info=True)
-            if 'conn' in locals():
-                conn.rollback()
-                conn.close()
             return None, None
     
     def create_appointment_by_telegram_id(self, client_id: int, master_telegram_id: Optional[int], 
                                          appointment_date: date, start_time: str, 
                                          service_ids: List[int], status: str = 'pending') -> Tuple[Optional[int], Optional[int]]:
         """Создание записи по telegram_id мастера"""
-        try:
-            conn = self.get_connection()
+        def _create(conn):
             cursor = conn.cursor()
             
             # Получаем master_id по telegram_id (если указан)
@@ -689,13 +811,8 @@ class Database:
                     logger.info(f"Найден мастер ID={master_id} по telegram_id={master_telegram_id}")
             
             # Рассчитываем время окончания
-            total_duration = 0
-            for service_id in service_ids:
-                cursor.execute("SELECT duration_minutes FROM services WHERE id = ?", (service_id,))
-                service = cursor.fetchone()
-                if service:
-                    service_dict = dict(service)
-                    total_duration += service_dict.get('duration_minutes', 0)
+            services = repository.get_services_by_ids(conn, service_ids, active_only=False)
+            total_duration, _ = repository.services_totals(services, service_ids)
             
             start_dt = datetime.strptime(start_time, '%H:%M')
             end_dt = datetime.combine(date.today(), start_dt.time()) + timedelta(minutes=total_duration)
@@ -703,6 +820,18 @@ class Database:
             
             logger.info(f"Создание записи по telegram_id: клиент={client_id}, мастер (telegram_id)={master_telegram_id}, дата={appointment_date}")
             
+            if master_id and status in repository.BUSY_STATUSES:
+                # Время могли занять после показа слотов — проверяем в транзакции вставки
+                try:
+                    end_time_str = booking.ensure_slot_free(
+                        conn, master_id, appointment_date.isoformat(), appointment_date.weekday(),
+                        start_time, total_duration,
+                        step=Config.SLOT_STEP_MINUTES, buffer=Config.APPOINTMENT_BUFFER_MINUTES,
+                    )
+                except booking.SlotConflict as e:
+                    logger.warning(f"Время занято: {e}; свободно: {', '.join(e.alternatives) or 'нет'}")
+                    return None, None
+            
             # Создаем запись с master_telegram_id
             cursor.execute("""
                 INSERT INTO appointments 
@@ -723,31 +852,32 @@ class Database:
             
             if not appointment_id:
                 logger.error("Не удалось получить appointment_id после создания записи!")
-                conn.rollback()
-                conn.close()
                 return None, None
             
-            logger.info(f"Запись создана с ID: {appointment_id}")
+            if master_id and status in repository.BUSY_STATUSES:
+                # Запись занимает время в сетке слотов той же транзакцией
+                slot_grid.occupy(
+                    conn, master_id, appointment_date.isoformat(), start_time, end_time_str,
+                    Config.APPOINTMENT_BUFFER_MINUTES,
+                )
             
-            # Добавляем услуги к записи
-            for service_id in service_ids:
-                cursor.execute("""
-                    INSERT INTO appointment_services (appointment_id, service_id)
-                    VALUES (?, ?)
-                """, (appointment_id, service_id))
-                logger.info(f"Добавлена услуга {service_id} к записи {appointment_id}")
+            logger.info(f"Запись создана с ID: {appointment_id}")
             
-            conn.commit()
-            conn.close()
+            # Добавляем услуги к записи одним запросом
+            bulk.insert_rows(
+                conn, "appointment_services", ("appointment_id", "service_id"),
+                [(appointment_id, service_id) for service_id in service_ids],
+            )
+            logger.info(f"Добавлены услуги {service_ids} к записи {appointment_id}")
             
             logger.info(f"Создана запись ID={appointment_id} для клиента {client_id}, master_telegram_id={master_telegram_id}")
             return appointment_id, master_telegram_id
-            
+        
+        try:
+            # Проверки и вставка выполняются одной транзакцией потока-писателя
+            return self.writer.execute(_create)
         except Exception as e:
             logger.error(f"Ошибка при создании записи по telegram_id: {e}", exc_info=True)
-            if 'conn' in locals():
-                conn.rollback()
-                conn.close()
             return None, None
     
     def get_user_appointments(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
@@ -779,9 +909,7 @@ class Database:
                 LIMIT ?
             """, (user_id, limit))
             
-            appointments = []
-            for row in cursor.fetchall():
-                appointments.append(dict(row))
+            appointments = fetch_dicts(cursor)
             
             conn.close()
             return appointments
@@ -792,22 +920,27 @@ class Database:
     
     def cancel_appointment(self, appointment_id: int) -> bool:
         """Отмена записи"""
-        try:
-            conn = self.get_connection()
+        def _cancel(conn):
             cursor = conn.cursor()
-            
-            # Обновляем статус
             cursor.execute("""
                 UPDATE appointments 
                 SET status = 'cancelled' 
                 WHERE id = ?
             """, (appointment_id,))
-            
-            affected_rows = cursor.rowcount
-            conn.commit()
-            conn.close()
-            
-            return affected_rows > 0
+            if cursor.rowcount == 0:
+                return False
+            # Освободившееся время возвращается в сетку слотов
+            cursor.execute("SELECT master_id, appointment_date FROM appointments WHERE id = ?", (appointment_id,))
+            row = fetch_dict(cursor)
+            if row and row["master_id"]:
+                slot_grid.refresh_day(
+                    conn, row["master_id"], str(row["appointment_date"]), Config.APPOINTMENT_BUFFER_MINUTES
+                )
+            return True
+        
+        try:
+            # Обновляем статус
+            return self.writer.execute(_cancel)
             
         except Exception as e:
             logger.error(f"Ошибка при отмене записи: {e}")
@@ -847,9 +980,7 @@ class Database:
             logger.info(f"Выполняем запрос для мастера {master_id} на дату {target_date}")
             cursor.execute(query, tuple(params))
             
-            appointments = []
-            for row in cursor.fetchall():
-                appointments.append(dict(row))
+            appointments = fetch_dicts(cursor)
             
             conn.close()
             logger.info(f"Найдено записей для мастера {master_id}: {len(appointments)}")
@@ -883,9 +1014,7 @@ class Database:
             
             cursor.execute(query, (str(telegram_id),))
             
-            appointments = []
-            for row in cursor.fetchall():
-                appointments.append(dict(row))
+            appointments = fetch_dicts(cursor)
             
             conn.close()
             logger.info(f"Найдено записей для мастера telegram_id={telegram_id}: {len(appointments)}")
@@ -920,9 +1049,7 @@ class Database:
             
             cursor.execute(query, (str(telegram_id), target_date.isoformat()))
             
-            appointments = []
-            for row in cursor.fetchall():
-                appointments.append(dict(row))
+            appointments = fetch_dicts(cursor)
             
             conn.close()
             return appointments
@@ -952,7 +1079,7 @@ class Database:
                 JOIN users u ON a.client_id = u.id
                 LEFT JOIN masters m ON a.master_id = m.id
                 WHERE a.status IN ('pending', 'confirmed')
-                AND DATE(a.appointment_date) = DATE(?)
+                AND a.appointment_date = ?
                 AND TIME(a.start_time) BETWEEN TIME(?) AND TIME(?, '+1 hour')
             """, (
                 notification_time.date().isoformat(),
@@ -960,9 +1087,7 @@ class Database:
                 notification_time.time().strftime('%H:%M')
             ))
             
-            appointments = []
-            for row in cursor.fetchall():
-                appointments.append(dict(row))
+            appointments = fetch_dicts(cursor)
             
             conn.close()
             return appointments
@@ -999,10 +1124,10 @@ class Database:
                 GROUP BY a.id
             """, (appointment_id,))
             
-            row = cursor.fetchone()
+            row = fetch_dict(cursor)
             conn.close()
             
-            return dict(row) if row else None
+            return row
             
         except Exception as e:
             logger.error(f"Ошибка при получении записи: {e}")
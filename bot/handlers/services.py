@@ -84,14 +84,9 @@ async def process_finish_selection(callback: CallbackQuery, state: FSMContext):
     await state.update_data(selected_services=selected_services)
     
     # Показываем сводку по выбранным услугам
-    services_info = []
-    total_price = 0
-    
-    for service_id in selected_services:
-        service = db.get_service_by_id(service_id, language)
-        if service:
-            services_info.append(service)
-            total_price += service.get('price', 0)
+    services_by_id = db.get_services_by_ids(selected_services, language)
+    services_info = [services_by_id[service_id] for service_id in selected_services if service_id in services_by_id]
+    total_price = Utils.calculate_total_price(selected_services, db)
     
     await callback.message.edit_text(
         Messages.get_selected_services_message(language, services_info, total_price)
@@ -1,5 +1,5 @@
 # keyboards.py
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional
 from telegram import InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton
 from datetime import datetime, date
 import calendar
@@ -117,8 +117,9 @@ class UnifiedKeyboards:
         return InlineKeyboardMarkup(keyboard)
     
     @staticmethod
-    def get_calendar_keyboard(year: int, month: int, language: str) -> InlineKeyboardMarkup:
-        """Клавиатура календаря"""
+    def get_calendar_keyboard(year: int, month: int, language: str,
+                              available_days: Optional[Iterable[date]] = None) -> InlineKeyboardMarkup:
+        """Клавиатура календаря (если передан available_days — выбрать можно только эти дни)"""
         import calendar as cal_module
         
         keyboard = []
@@ -147,6 +148,7 @@ class UnifiedKeyboards:
         # Дни месяца
         cal = cal_module.monthcalendar(year, month)
         today = datetime.now().date()
+        bookable = set(available_days) if available_days is not None else None
         
         for week in cal:
             row = []
@@ -157,7 +159,7 @@ class UnifiedKeyboards:
                     date_str = f"{year}-{month:02d}-{day:02d}"
                     date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
                     
-                    if date_obj < today:
+                    if date_obj < today or (bookable is not None and date_obj not in bookable):
                         row.append(InlineKeyboardButton(" ", callback_data="ignore"))
                     else:
                         row.append(InlineKeyboardButton(str(day), callback_data=f"select_date_{date_str}"))
@@ -192,6 +194,15 @@ class UnifiedKeyboards:
                 InlineKeyboardButton("▶️", callback_data=f"change_month_{next_year}_{next_month}")
             ])
         
+        # Поиск ближайшего свободного времени (только в календаре записи)
+        if bookable is not None:
+            first_text = (
+                "⚡ Ближайшее свободное время" if language == 'ru' else
+                "⚡ Earliest available time" if language == 'en' else
+                "⚡ En yakın uygun saat"
+            )
+            keyboard.append([InlineKeyboardButton(first_text, callback_data="first_available")])
+        
         # Кнопка назад
         back_text = "⬅️ Назад" if language == 'ru' else "⬅️ Back" if language == 'en' else "⬅️ Geri"
         keyboard.append([InlineKeyboardButton(back_text, callback_data="back_to_services")])
@@ -244,19 +255,40 @@ class UnifiedKeyboards:
         return InlineKeyboardMarkup(keyboard)
     
     @staticmethod
-    def get_time_slots_keyboard(time_slots: List[str], language: str) -> InlineKeyboardMarkup:
-        """Клавиатура со временем"""
+    def get_time_slots_keyboard(time_slots: List[str], language: str,
+                                recommended: Optional[Iterable[str]] = None) -> InlineKeyboardMarkup:
+        """Клавиатура со временем (recommended — слоты, плотнее заполняющие день, отмечаются ⭐)"""
         keyboard = []
+        recommended = set(recommended or ())
         # Группируем временные слоты по 3 в ряд
         for i in range(0, len(time_slots), 3):
             row = time_slots[i:i+3]
-            keyboard.append([InlineKeyboardButton(slot, callback_data=f"select_time_{slot}") for slot in row])
+            keyboard.append([
+                InlineKeyboardButton(f"⭐ {slot}" if slot in recommended else slot, callback_data=f"select_time_{slot}")
+                for slot in row
+            ])
         
         back_text = "⬅️ Назад" if language == 'ru' else "⬅️ Back" if language == 'en' else "⬅️ Geri"
         keyboard.append([InlineKeyboardButton(back_text, callback_data="back_to_masters")])
         
         return InlineKeyboardMarkup(keyboard)
     
+    @staticmethod
+    def get_first_slots_keyboard(slots: List[Dict[str, Any]], language: str) -> InlineKeyboardMarkup:
+        """Клавиатура ближайших свободных слотов (дата, время, мастер)"""
+        keyboard = []
+        for index, slot in enumerate(slots):
+            slot_date = date.fromisoformat(slot['date'])
+            button_text = f"{slot_date.strftime('%d.%m')} {slot['time']}"
+            if slot.get('master_name'):
+                button_text += f" · {slot['master_name']}"
+            keyboard.append([InlineKeyboardButton(button_text, callback_data=f"first_slot_{index}")])
+        
+        back_text = "⬅️ Назад" if language == 'ru' else "⬅️ Back" if language == 'en' else "⬅️ Geri"
+        keyboard.append([InlineKeyboardButton(back_text, callback_data="back_to_date")])
+        
+        return InlineKeyboardMarkup(keyboard)
+    
     @staticmethod
     def get_confirmation_keyboard(language: str) -> InlineKeyboardMarkup:
         """Клавиатура подтверждения записи"""
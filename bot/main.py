@@ -27,6 +27,9 @@ from . import database
 from . import messages
 from . import keyboards
 
+# Общие с API запросы (путь к backend/app настраивает database)
+from app import availability, repository
+
 # Настройка логирования
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -45,22 +48,14 @@ class UtilsWrapper:
     @staticmethod
     def calculate_total_duration(service_ids: List[int]) -> int:
         """Рассчитывает общую длительность услуг"""
-        total = 0
-        for service_id in service_ids:
-            service = db.get_service_by_id(service_id, 'ru')
-            if service and service.get('duration_minutes'):
-                total += service['duration_minutes']
-        return total
+        services = db.get_services_by_ids(service_ids, 'ru')
+        return repository.services_totals(services, service_ids)[0]
     
     @staticmethod
     def calculate_total_price(service_ids: List[int]) -> float:
         """Рассчитывает общую стоимость услуг"""
-        total = 0
-        for service_id in service_ids:
-            service = db.get_service_by_id(service_id, 'ru')
-            if service and service.get('price'):
-                total += service['price']
-        return total
+        services = db.get_services_by_ids(service_ids, 'ru')
+        return repository.services_totals(services, service_ids)[1]
     
     @staticmethod
     def get_available_time_slots_for_services(service_ids, appointment_date, master_telegram_id=None):
@@ -78,72 +73,62 @@ class UtilsWrapper:
         else:
             # Для любого мастера
             # Получаем всех мастеров, которые предоставляют все услуги
-            conn = db.get_connection()
-            cursor = conn.cursor()
+            masters = db.get_masters_providing_services(service_ids)
             
-            # Запрос для поиска мастеров, которые предоставляют все выбранные услуги
-            placeholders = ', '.join('?' for _ in service_ids)
-            query = f"""
-                SELECT m.id as master_id, u.telegram_id
-                FROM master_services ms
-                JOIN masters m ON ms.master_id = m.id
-                JOIN users u ON m.user_id = u.id
-                WHERE ms.service_id IN ({placeholders})
-                GROUP BY m.id, u.telegram_id
-                HAVING COUNT(DISTINCT ms.service_id) = ?
-            """
-            
-            cursor.execute(query, tuple(service_ids) + (len(service_ids),))
-            masters = cursor.fetchall()
-            conn.close()
-            
-            # Получаем доступные слоты для каждого мастера
+            # Слоты всех мастеров за два запроса
+            telegram_ids = {master['master_id']: master['telegram_id'] for master in masters}
+            slots_by_master = db.get_available_time_slots_for_masters(list(telegram_ids), appointment_date, total_duration)
             all_slots = []
-            for master in masters:
-                master_id = master['master_id']
-                telegram_id = master['telegram_id']
-                slots = db.get_available_time_slots(master_id, appointment_date, total_duration)
-                all_slots.extend([(telegram_id, slot) for slot in slots])
+            for master_id, slots in slots_by_master.items():
+                all_slots.extend([(telegram_ids[master_id], slot) for slot in slots])
             
             # Преобразуем в нужный формат
             return [{'master_telegram_id': telegram_id, 'time': slot} for telegram_id, slot in all_slots]
     
+    @staticmethod
+    def get_ranked_time_slots(service_ids, appointment_date, master_ids=None):
+        """Слоты мастеров (по умолчанию всех, кто оказывает услуги) с оценкой плотности дня"""
+        total_duration = UtilsWrapper.calculate_total_duration(service_ids)
+        if master_ids is None:
+            master_ids = [master['master_id'] for master in db.get_masters_providing_services(service_ids)]
+        return db.get_ranked_time_slots_for_masters(master_ids, appointment_date, total_duration)
+    
+    @staticmethod
+    def get_recommended_time_slots(ranked_by_master):
+        """
+        Все времена по возрастанию и рекомендуемые из них: запись вплотную
+        к занятому времени или краю дня, не оставляющая непродаваемых обрывков
+        """
+        best = {}
+        for ranked in ranked_by_master.values():
+            for slot, idle, adjacent in ranked:
+                key = availability.rank_key(idle, adjacent)
+                if slot not in best or key < best[slot]:
+                    best[slot] = key
+        # rank_key: (простой, -примыканий, ...)
+        recommended = [slot for slot, key in best.items() if key[0] == 0 and key[1] < 0]
+        return sorted(best), recommended
+    
     @staticmethod
     def find_master_for_time_slot(service_ids, appointment_date, time_slot):
         """Находит мастера (telegram_id) для заданного временного слота"""
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        total_duration = UtilsWrapper.calculate_total_duration(service_ids)
-        
         # Ищем мастеров, которые предоставляют все услуги
-        placeholders = ', '.join('?' for _ in service_ids)
-        query = f"""
-            SELECT m.id as master_id, u.telegram_id
-            FROM master_services ms
-            JOIN masters m ON ms.master_id = m.id
-            JOIN users u ON m.user_id = u.id
-            WHERE ms.service_id IN ({placeholders})
-            GROUP BY m.id, u.telegram_id
-            HAVING COUNT(DISTINCT ms.service_id) = ?
-        """
-        
-        cursor.execute(query, tuple(service_ids) + (len(service_ids),))
-        masters = cursor.fetchall()
-        
-        # Проверяем доступность слота у каждого мастера
-        for master in masters:
-            master_id = master['master_id']
-            telegram_id = master['telegram_id']
-            
-            # Проверяем, свободен ли мастер в это время
-            time_slots = db.get_available_time_slots(master_id, appointment_date, total_duration)
-            if time_slot in time_slots:
-                conn.close()
-                return telegram_id  # Возвращаем telegram_id
-        
-        conn.close()
-        return None
+        masters = db.get_masters_providing_services(service_ids)
+        telegram_ids = {master['master_id']: master['telegram_id'] for master in masters}
+        
+        # Из мастеров, у которых время свободно, выбираем того, чей день запись
+        # заполняет плотнее (меньше простоя, вплотную к другим записям)
+        ranked_by_master = UtilsWrapper.get_ranked_time_slots(service_ids, appointment_date, list(telegram_ids))
+        best_master_id, best_key = None, None
+        for master_id, ranked in ranked_by_master.items():
+            for slot, idle, adjacent in ranked:
+                if slot == time_slot:
+                    key = availability.rank_key(idle, adjacent)
+                    if best_key is None or key < best_key:
+                        best_master_id, best_key = master_id, key
+                    break
+        
+        return telegram_ids[best_master_id] if best_master_id is not None else None
     
     @staticmethod
     def validate_time_slot(master_telegram_id, appointment_date, time_slot, service_ids):
@@ -161,12 +146,10 @@ class UtilsWrapper:
     @staticmethod
     def generate_appointment_summary(service_ids, appointment_date, time_slot, master_telegram_id, language):
         """Генерирует сводку бронирования по telegram_id мастера"""
-        # Получаем информацию об услугах
-        services = []
-        for service_id in service_ids:
-            service = db.get_service_by_id(service_id, language)
-            if service:
-                services.append(service)
+        # Получаем информацию об услугах одним запросом
+        services_by_id = db.get_services_by_ids(service_ids, language)
+        services = [services_by_id[service_id] for service_id in service_ids if service_id in services_by_id]
+        total_duration, total_price = repository.services_totals(services_by_id, service_ids)
         
         # Получаем информацию о мастере по telegram_id
         master_info = None
@@ -180,9 +163,6 @@ class UtilsWrapper:
                 master_id = master.get('id')
                 master_name = f"{master.get('first_name', '')} {master.get('last_name', '')}".strip()
         
-        # Рассчитываем общую стоимость
-        total_price = UtilsWrapper.calculate_total_price(service_ids)
-        
         return {
             'date': appointment_date.isoformat() if isinstance(appointment_date, date) else appointment_date,
             'time': time_slot,
@@ -192,9 +172,36 @@ class UtilsWrapper:
             'master_name': master_name,
             'services': services,
             'total_price': total_price,
-            'total_duration': UtilsWrapper.calculate_total_duration(service_ids)
+            'total_duration': total_duration
         }
     
+    @staticmethod
+    def get_available_days_for_services(service_ids, year, month):
+        """Дни месяца, в которые у кого-то из мастеров есть время на все услуги"""
+        total_duration = UtilsWrapper.calculate_total_duration(service_ids)
+        masters = db.get_masters_providing_services(service_ids)
+        return db.get_available_days([master['master_id'] for master in masters], year, month, total_duration)
+    
+    @staticmethod
+    def get_calendar_keyboard(service_ids, year, month, language):
+        """Календарь, в котором выбрать можно только дни со свободным временем"""
+        available_days = UtilsWrapper.get_available_days_for_services(service_ids, year, month) if service_ids else None
+        return Keyboards.get_calendar_keyboard(year, month, language, available_days)
+    
+    @staticmethod
+    def find_first_available_slots(service_ids):
+        """Ближайшие свободные слоты на услуги у всех подходящих мастеров (с telegram_id и именем)"""
+        total_duration = UtilsWrapper.calculate_total_duration(service_ids)
+        masters = {master['master_id']: master for master in db.get_masters_providing_services(service_ids, active_only=True)}
+        slots = db.find_first_available_slots(
+            list(masters), total_duration, Config.FIRST_AVAILABLE_DAYS, Config.FIRST_AVAILABLE_LIMIT
+        )
+        for slot in slots:
+            master = masters[slot['master_id']]
+            slot['master_telegram_id'] = master.get('telegram_id')
+            slot['master_name'] = f"{master.get('first_name') or ''} {master.get('last_name') or ''}".strip()
+        return slots
+    
     @staticmethod
     def check_user_is_master(telegram_id):
         """Проверяет, является ли пользователь мастером по telegram_id"""
@@ -871,12 +878,9 @@ async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             # Берем минимальную длительность услуги для демонстрации
             min_duration = 60  # 1 час по умолчанию
-            if service_ids:
-                for service_id in service_ids:
-                    service = db.get_service_by_id(service_id, 'ru')
-                    if service and service.get('duration_minutes'):
-                        if service['duration_minutes'] < min_duration:
-                            min_duration = service['duration_minutes']
+            for service in db.get_services_by_ids(service_ids, 'ru').values():
+                if service.get('duration_minutes') and service['duration_minutes'] < min_duration:
+                    min_duration = service['duration_minutes']
             
             time_slots = db.get_available_time_slots(master_id, today, min_duration)
             
@@ -1142,6 +1146,52 @@ async def handle_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return MAIN_MENU
 
+async def show_appointment_confirmation(query, context: ContextTypes.DEFAULT_TYPE, language: str,
+                                        selected_services: List[int], appointment_date: date,
+                                        time_slot: str, master_telegram_id: Optional[int]):
+    """Сводка записи и кнопки подтверждения"""
+    # Получаем информацию о мастере
+    master_name = None
+    if master_telegram_id:
+        master = db.get_master_by_telegram_id(master_telegram_id)
+        if master:
+            master_name = f"{master.get('first_name', '')} {master.get('last_name', '')}".strip()
+    
+    # Если имя мастера не получено, используем заглушку
+    if not master_name:
+        master_name = (
+            "Любой доступный мастер" if language == 'ru' else
+            "Any available master" if language == 'en' else
+            "Uygun herhangi usta"
+        )
+    
+    # Генерируем сводку по telegram_id мастера
+    appointment_summary = Utils.generate_appointment_summary(
+        selected_services,
+        appointment_date,
+        time_slot,
+        master_telegram_id,
+        language
+    )
+    
+    context.user_data['appointment_summary'] = appointment_summary
+    context.user_data['state'] = APPOINTMENT_CONFIRMATION
+    
+    # Формируем сообщение подтверждения
+    confirmation_details = {
+        'date': appointment_date.isoformat(),
+        'time': time_slot,
+        'master_name': master_name,
+        'services': appointment_summary['services'],
+        'total_price': appointment_summary['total_price']
+    }
+    
+    await query.edit_message_text(
+        Messages.get_appointment_confirmation_message(language, confirmation_details),
+        reply_markup=Keyboards.get_confirmation_keyboard(language)
+    )
+    return APPOINTMENT_CONFIRMATION
+
 async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка callback-запросов"""
     query = update.callback_query
@@ -1228,14 +1278,9 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
             return SERVICE_SELECTION
         
         # Показываем сводку
-        services_info = []
-        total_price = 0
-        
-        for service_id in selected_services:
-            service = db.get_service_by_id(service_id, language)
-            if service:
-                services_info.append(service)
-                total_price += service.get('price', 0)
+        services_by_id = db.get_services_by_ids(selected_services, language)
+        services_info = [services_by_id[service_id] for service_id in selected_services if service_id in services_by_id]
+        total_price = repository.services_totals(services_by_id, selected_services)[1]
         
         await query.edit_message_text(
             Messages.get_selected_services_message(language, services_info, total_price)
@@ -1247,7 +1292,9 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
         
         await query.message.reply_text(
             Messages.get_date_selection_message(language),
-            reply_markup=Keyboards.get_calendar_keyboard(today.year, today.month, language)
+            reply_markup=Utils.get_calendar_keyboard(
+                context.user_data.get('selected_services'), today.year, today.month, language
+            )
         )
         return DATE_SELECTION
     
@@ -1333,25 +1380,24 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
         
         appointment_date = date.fromisoformat(appointment_date_str)
         
-        # Получаем доступные слоты для любого мастера (по telegram_id)
-        time_slots_data = Utils.get_available_time_slots_for_services(
-            selected_services, appointment_date, master_telegram_id=None
+        # Слоты всех подходящих мастеров с оценкой плотности дня
+        time_slots, recommended = Utils.get_recommended_time_slots(
+            Utils.get_ranked_time_slots(selected_services, appointment_date)
         )
         
-        if not time_slots_data:
+        if not time_slots:
             await query.edit_message_text(
                 Messages.get_no_time_slots_message(language),
                 reply_markup=Keyboards.get_master_choice_keyboard(language)
             )
             return MASTER_CHOICE
         
-        time_slots = [item['time'] for item in time_slots_data]
         context.user_data['master_telegram_id'] = None
         context.user_data['state'] = TIME_SELECTION
         
         await query.edit_message_text(
             Messages.get_time_selection_message(language, appointment_date_str),
-            reply_markup=Keyboards.get_time_slots_keyboard(time_slots, language)
+            reply_markup=Keyboards.get_time_slots_keyboard(time_slots, language, recommended)
         )
         return TIME_SELECTION
     
@@ -1372,9 +1418,10 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
             await query.answer(Messages.get_error_message(language))
             return MASTER_SELECTION
         
-        # Получаем доступные слоты по master_id
-        total_duration = Utils.calculate_total_duration(selected_services)
-        time_slots = db.get_available_time_slots(master_id, appointment_date, total_duration)
+        # Получаем доступные слоты по master_id с оценкой плотности дня
+        time_slots, recommended = Utils.get_recommended_time_slots(
+            Utils.get_ranked_time_slots(selected_services, appointment_date, [master_id])
+        )
         
         if not time_slots:
             await query.edit_message_text(
@@ -1391,7 +1438,7 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
         
         await query.edit_message_text(
             Messages.get_time_selection_message(language, appointment_date_str, master_name),
-            reply_markup=Keyboards.get_time_slots_keyboard(time_slots, language)
+            reply_markup=Keyboards.get_time_slots_keyboard(time_slots, language, recommended)
         )
         return TIME_SELECTION
     
@@ -1431,47 +1478,64 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
                 await query.answer("Это время уже занято")
                 return TIME_SELECTION
         
-        # Получаем информацию о мастере
-        master_name = None
-        if master_telegram_id:
-            master = db.get_master_by_telegram_id(master_telegram_id)
-            if master:
-                master_name = f"{master.get('first_name', '')} {master.get('last_name', '')}".strip()
+        return await show_appointment_confirmation(
+            query, context, language, selected_services, appointment_date, time_slot, master_telegram_id
+        )
+    
+    # Поиск ближайшего свободного времени без выбора даты
+    elif data == "first_available":
+        selected_services = context.user_data.get('selected_services', [])
+        
+        if not selected_services:
+            await query.answer("Выберите хотя бы одну услугу")
+            return SERVICE_SELECTION
+        
+        slots = Utils.find_first_available_slots(selected_services)
+        context.user_data['first_slots'] = slots
+        context.user_data['state'] = DATE_SELECTION
         
-        # Если имя мастера не получено, используем заглушку
-        if not master_name:
-            master_name = (
-                "Любой доступный мастер" if language == 'ru' else
-                "Any available master" if language == 'en' else
-                "Uygun herhangi usta"
+        if not slots:
+            today = datetime.now()
+            await query.edit_message_text(
+                Messages.get_no_first_slots_message(language, Config.FIRST_AVAILABLE_DAYS),
+                reply_markup=Utils.get_calendar_keyboard(selected_services, today.year, today.month, language)
             )
+            return DATE_SELECTION
         
-        # Генерируем сводку по telegram_id мастера
-        appointment_summary = Utils.generate_appointment_summary(
-            selected_services,
-            appointment_date,
-            time_slot,
-            master_telegram_id,
-            language
+        await query.edit_message_text(
+            Messages.get_first_slots_message(language),
+            reply_markup=Keyboards.get_first_slots_keyboard(slots, language)
         )
+        return DATE_SELECTION
+    
+    # Выбор одного из ближайших слотов
+    elif data.startswith("first_slot_"):
+        index = int(data.split("_")[2])
+        slots = context.user_data.get('first_slots') or []
+        selected_services = context.user_data.get('selected_services', [])
         
-        context.user_data['appointment_summary'] = appointment_summary
-        context.user_data['state'] = APPOINTMENT_CONFIRMATION
+        if index >= len(slots) or not selected_services:
+            await query.answer(Messages.get_error_message(language))
+            return DATE_SELECTION
         
-        # Формируем сообщение подтверждения
-        confirmation_details = {
-            'date': appointment_date_str,
-            'time': time_slot,
-            'master_name': master_name,
-            'services': appointment_summary['services'],
-            'total_price': appointment_summary['total_price']
-        }
+        slot = slots[index]
+        appointment_date = date.fromisoformat(slot['date'])
+        master_telegram_id = slot.get('master_telegram_id')
         
-        await query.edit_message_text(
-            Messages.get_appointment_confirmation_message(language, confirmation_details),
-            reply_markup=Keyboards.get_confirmation_keyboard(language)
+        # Слот мог быть занят, пока клиент выбирал
+        if not master_telegram_id or not Utils.validate_time_slot(
+            master_telegram_id, appointment_date, slot['time'], selected_services
+        ):
+            await query.answer("Это время уже занято")
+            return DATE_SELECTION
+        
+        context.user_data['appointment_date'] = slot['date']
+        context.user_data['master_telegram_id'] = master_telegram_id
+        context.user_data['master_id'] = slot['master_id']
+        
+        return await show_appointment_confirmation(
+            query, context, language, selected_services, appointment_date, slot['time'], master_telegram_id
         )
-        return APPOINTMENT_CONFIRMATION
     
     # Подтверждение записи
     elif data == "confirm_appointment":
@@ -1657,7 +1721,9 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
         
         await query.edit_message_text(
             Messages.get_date_selection_message(language),
-            reply_markup=Keyboards.get_calendar_keyboard(today.year, today.month, language)
+            reply_markup=Utils.get_calendar_keyboard(
+                context.user_data.get('selected_services'), today.year, today.month, language
+            )
         )
         return DATE_SELECTION
     
@@ -1725,7 +1791,7 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
         
         # Генерируем новую клавиатуру календаря
         logger.info(f"Генерируем календарь для года={year}, месяца={month}")
-        new_keyboard = Keyboards.get_calendar_keyboard(year, month, language)
+        new_keyboard = Utils.get_calendar_keyboard(context.user_data.get('selected_services'), year, month, language)
         
         try:
             await query.edit_message_reply_markup(
@@ -1762,14 +1828,9 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
             return SERVICE_SELECTION
         
         # Показываем сводку
-        services_info = []
-        total_price = 0
-        
-        for service_id in selected_services:
-            service = db.get_service_by_id(service_id, language)
-            if service:
-                services_info.append(service)
-                total_price += service.get('price', 0)
+        services_by_id = db.get_services_by_ids(selected_services, language)
+        services_info = [services_by_id[service_id] for service_id in selected_services if service_id in services_by_id]
+        total_price = repository.services_totals(services_by_id, selected_services)[1]
         
         await query.edit_message_text(
             Messages.get_selected_services_message(language, services_info, total_price)
@@ -1781,7 +1842,9 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
         
         await query.message.reply_text(
             Messages.get_date_selection_message(language),
-            reply_markup=Keyboards.get_calendar_keyboard(today.year, today.month, language)
+            reply_markup=Utils.get_calendar_keyboard(
+                context.user_data.get('selected_services'), today.year, today.month, language
+            )
         )
         return DATE_SELECTION
     
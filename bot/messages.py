@@ -190,6 +190,24 @@ class Messages:
         }
         return messages.get(language, messages['ru'])
     
+    @staticmethod
+    def get_first_slots_message(language: str) -> str:
+        messages = {
+            'ru': "⚡ Ближайшее свободное время на выбранные услуги:",
+            'en': "⚡ Earliest available time for the selected services:",
+            'tr': "⚡ Seçilen hizmetler için en yakın uygun saatler:"
+        }
+        return messages.get(language, messages['ru'])
+    
+    @staticmethod
+    def get_no_first_slots_message(language: str, days: int) -> str:
+        messages = {
+            'ru': f"😔 В ближайшие {days} дней нет свободного времени на выбранные услуги.",
+            'en': f"😔 No available time for the selected services in the next {days} days.",
+            'tr': f"😔 Önümüzdeki {days} gün içinde seçilen hizmetler için uygun saat yok."
+        }
+        return messages.get(language, messages['ru'])
+    
     # Подтверждение записи
     @staticmethod
     def get_appointment_confirmation_message(language: str, appointment_details: Dict[str, Any]) -> str:
@@ -3,32 +3,22 @@ import logging
 from datetime import datetime, date, time, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 
+from app import availability, repository
+
 logger = logging.getLogger(__name__)
 
 class Utils:
     @staticmethod
     def calculate_total_duration(service_ids: List[int], db) -> int:
         """Рассчет общей длительности выбранных услуг"""
-        total_duration = 0
-        
-        for service_id in service_ids:
-            service = db.get_service_by_id(service_id, 'ru')  # Язык не важен для длительности
-            if service:
-                total_duration += service.get('duration_minutes', 0)
-        
-        return total_duration
+        services = db.get_services_by_ids(service_ids, 'ru')  # Язык не важен для длительности
+        return repository.services_totals(services, service_ids)[0]
     
     @staticmethod
     def calculate_total_price(service_ids: List[int], db) -> float:
         """Рассчет общей стоимости выбранных услуг"""
-        total_price = 0.0
-        
-        for service_id in service_ids:
-            service = db.get_service_by_id(service_id, 'ru')  # Язык не важен для цены
-            if service:
-                total_price += service.get('price', 0)
-        
-        return total_price
+        services = db.get_services_by_ids(service_ids, 'ru')  # Язык не важен для цены
+        return repository.services_totals(services, service_ids)[1]
     
     @staticmethod
     def get_available_time_slots_for_services(
@@ -42,11 +32,9 @@ class Utils:
         # Если выбран конкретный мастер
         if master_id:
             # Проверяем, предоставляет ли мастер все выбранные услуги
-            for service_id in service_ids:
-                masters_for_service = db.get_masters_for_service(service_id)
-                master_ids = [m['id'] for m in masters_for_service]
-                if master_id not in master_ids:
-                    return []  # Мастер не предоставляет одну из услуг
+            suitable = db.get_masters_providing_services(service_ids, active_only=True)
+            if master_id not in [m['master_id'] for m in suitable]:
+                return []  # Мастер не предоставляет одну из услуг
             
             # Получаем доступные слоты для этого мастера
             total_duration = Utils.calculate_total_duration(service_ids, db)
@@ -57,41 +45,17 @@ class Utils:
         # Если выбран "любой доступный мастер"
         else:
             # Находим мастеров, которые предоставляют все выбранные услуги
-            all_masters = {}
-            
-            for service_id in service_ids:
-                masters_for_service = db.get_masters_for_service(service_id)
-                
-                for master in masters_for_service:
-                    master_id = master['id']
-                    if master_id not in all_masters:
-                        all_masters[master_id] = {
-                            'master': master,
-                            'services_count': 1
-                        }
-                    else:
-                        all_masters[master_id]['services_count'] += 1
-            
-            # Фильтруем мастеров, которые предоставляют все услуги
-            suitable_masters = []
-            for master_id, data in all_masters.items():
-                if data['services_count'] == len(service_ids):
-                    suitable_masters.append(master_id)
+            suitable_masters = [
+                m['master_id'] for m in db.get_masters_providing_services(service_ids, active_only=True)
+            ]
             
             if not suitable_masters:
                 return []
             
             # Получаем общие свободные слоты для всех подходящих мастеров
             total_duration = Utils.calculate_total_duration(service_ids, db)
-            all_time_slots = {}
-            
-            for master_id in suitable_masters:
-                time_slots = db.get_available_time_slots(master_id, appointment_date, total_duration)
-                for slot in time_slots:
-                    if slot not in all_time_slots:
-                        all_time_slots[slot] = [master_id]
-                    else:
-                        all_time_slots[slot].append(master_id)
+            slots_by_master = db.get_available_time_slots_for_masters(suitable_masters, appointment_date, total_duration)
+            all_time_slots = availability.slot_map(slots_by_master)
             
             # Преобразуем в нужный формат
             result = []
@@ -102,9 +66,6 @@ class Utils:
                     'is_common': len(master_ids_list) > 1
                 })
             
-            # Сортируем по времени
-            result.sort(key=lambda x: x['time'])
-            
             return result
     
     @staticmethod
@@ -117,31 +78,26 @@ class Utils:
         """Поиск мастера для временного слота"""
         
         # Получаем всех мастеров, которые предоставляют все услуги
-        suitable_masters = []
-        
-        for service_id in service_ids:
-            masters_for_service = db.get_masters_for_service(service_id)
-            
-            if not suitable_masters:
-                # Первая услуга - добавляем всех мастеров
-                suitable_masters = [m['id'] for m in masters_for_service]
-            else:
-                # Пересечение с мастерами для предыдущих услуг
-                current_masters = [m['id'] for m in masters_for_service]
-                suitable_masters = [m for m in suitable_masters if m in current_masters]
-            
-            if not suitable_masters:
-                return None
+        suitable_masters = [
+            m['master_id'] for m in db.get_masters_providing_services(service_ids, active_only=True)
+        ]
+        if not suitable_masters:
+            return None
         
-        # Проверяем, у кого из подходящих мастеров свободен этот слот
+        # Из мастеров со свободным слотом выбираем того, чей день запись заполняет плотнее
         total_duration = Utils.calculate_total_duration(service_ids, db)
         
-        for master_id in suitable_masters:
-            available_slots = db.get_available_time_slots(master_id, appointment_date, total_duration)
-            if time_slot in available_slots:
-                return master_id
+        ranked_by_master = db.get_ranked_time_slots_for_masters(suitable_masters, appointment_date, total_duration)
+        best_master_id, best_key = None, None
+        for master_id, ranked in ranked_by_master.items():
+            for slot, idle, adjacent in ranked:
+                if slot == time_slot:
+                    key = availability.rank_key(idle, adjacent)
+                    if best_key is None or key < best_key:
+                        best_master_id, best_key = master_id, key
+                    break
         
-        return None
+        return best_master_id
     
     @staticmethod
     def validate_time_slot(
@@ -167,10 +123,11 @@ class Utils:
     ) -> Dict[str, Any]:
         """Генерация сводки по записи"""
         services = []
-        total_price = 0
+        services_by_id = db.get_services_by_ids(service_ids, language)
+        total_duration, total_price = repository.services_totals(services_by_id, service_ids)
         
         for service_id in service_ids:
-            service = db.get_service_by_id(service_id, language)
+            service = services_by_id.get(service_id)
             if service:
                 services.append({
                     'id': service_id,
@@ -178,7 +135,6 @@ class Utils:
                     'price': service.get('price', 0),
                     'duration': service.get('duration_minutes', 0)
                 })
-                total_price += service.get('price', 0)
         
         master_info = None
         if master_id:
@@ -196,5 +152,5 @@ class Utils:
             'date': appointment_date.isoformat(),
             'time': time_slot,
             'master': master_info,
-            'total_duration': Utils.calculate_total_duration(service_ids, db)
+            'total_duration': total_duration
         }
\ No newline at end of file